@@ -1,18 +1,26 @@
 """AWS resource validation endpoints."""
+import asyncio
 import logging
+import time
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import boto3
-from botocore.exceptions import ClientError, NoCredentialsError
-import requests
+
+from app.config import settings
+from app.responses import FastJSONResponse
+from app.services import aws_sdk
+from app.services.credential_store import credential_store
+from app.services.diagram import SUPPORTED_FORMATS, render_diagram, routes_from_api
+from app.services.fleet_monitor import FleetMonitor, fleet_monitor_hub, format_sse
+from app.services.public_ip import public_ip_resolver
+from app.services.region_discovery import region_discovery, summarize
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/aws", tags=["aws"])
 
-# In-memory credential storage for remote/container deployments
-# These take precedence over environment variables when set
-_session_credentials: dict = {}
+# Session credentials for remote/container deployments live in the shared
+# credential store; when set they take precedence over environment variables
 
 
 class AWSCredentials(BaseModel):
@@ -29,15 +37,29 @@ def get_boto3_client(service: str, region_name: str = 'us-east-1'):
     Falls back to default credential chain (env vars, instance profile, etc.)
     if no session credentials are set.
     """
-    if _session_credentials:
-        session = boto3.Session(
-            aws_access_key_id=_session_credentials.get('access_key'),
-            aws_secret_access_key=_session_credentials.get('secret_key'),
-            aws_session_token=_session_credentials.get('session_token'),
+    return _client_for(credential_store.get(), service, region_name)
+
+
+def _client_for(credentials: Optional[dict], service: str, region_name: str = 'us-east-1'):
+    """Build a boto3 client from explicit credentials, or the default chain if None."""
+    if credentials:
+        session = aws_sdk.boto3.Session(
+            aws_access_key_id=credentials.get('access_key'),
+            aws_secret_access_key=credentials.get('secret_key'),
+            aws_session_token=credentials.get('session_token'),
             region_name=region_name
         )
-        return session.client(service)
-    return boto3.client(service, region_name=region_name)
+        return aws_sdk.instrument(session.client(service))
+    return aws_sdk.instrument(aws_sdk.boto3.client(service, region_name=region_name))
+
+
+def _on_credentials_changed(credentials: Optional[dict]) -> None:
+    """Drop boto3 clients that long-running monitors built with the old credentials."""
+    logger.info("AWS credentials changed (%s)", "session" if credentials else "environment/default")
+    fleet_monitor_hub.reset_clients()
+
+
+credential_store.subscribe(_on_credentials_changed)
 
 
 class AWSRegion(BaseModel):
@@ -75,25 +97,23 @@ async def set_credentials(credentials: AWSCredentials):
     """
     Set AWS credentials for remote/container deployments.
 
-    Accepts credentials via POST and stores them in memory for use by
-    subsequent API calls. Useful when the UI runs in a container and
-    can't access local AWS CLI credentials.
+    Accepts credentials via POST and stores them in the shared credential
+    store for use by subsequent API calls in every worker. Useful when the
+    UI runs in a container and can't access local AWS CLI credentials.
 
     The aws_login.sh script can POST credentials here after SSO login.
     """
-    global _session_credentials
-
-    # Store credentials
-    _session_credentials = {
+    session_credentials = {
         'access_key': credentials.access_key,
         'secret_key': credentials.secret_key,
         'session_token': credentials.session_token
     }
 
-    # Validate immediately
+    # Validate before storing so other workers never pick up invalid credentials
     try:
-        sts = get_boto3_client('sts')
+        sts = _client_for(session_credentials, 'sts')
         identity = sts.get_caller_identity()
+        credential_store.set(session_credentials)
 
         logger.info("AWS credentials set successfully for account %s", identity['Account'])
         return {
@@ -103,8 +123,6 @@ async def set_credentials(credentials: AWSCredentials):
             "message": "AWS credentials set successfully"
         }
     except Exception as e:
-        # Clear invalid credentials
-        _session_credentials.clear()
         logger.error("Invalid AWS credentials provided: %s", str(e))
         raise HTTPException(status_code=400, detail=f"Invalid credentials: {str(e)}")
 
@@ -117,8 +135,7 @@ async def clear_credentials():
     After clearing, the API will fall back to default credential chain
     (environment variables, instance profile, etc.)
     """
-    global _session_credentials
-    _session_credentials.clear()
+    credential_store.clear()
     logger.info("AWS credentials cleared")
     return {"message": "AWS credentials cleared"}
 
@@ -132,11 +149,12 @@ async def check_credentials_status():
     """
     try:
         # Try to get caller identity to validate credentials
-        sts = get_boto3_client('sts')
+        session_credentials = credential_store.get()
+        sts = _client_for(session_credentials, 'sts')
         identity = sts.get_caller_identity()
 
         # Indicate source of credentials
-        source = "session" if _session_credentials else "environment/default"
+        source = "session" if session_credentials else "environment/default"
 
         return {
             "valid": True,
@@ -146,12 +164,12 @@ async def check_credentials_status():
             "source": source,
             "message": "AWS credentials are valid"
         }
-    except NoCredentialsError:
+    except aws_sdk.NoCredentialsError:
         return {
             "valid": False,
             "message": "No AWS credentials found. Please run aws_login.sh"
         }
-    except ClientError as e:
+    except aws_sdk.ClientError as e:
         if e.response['Error']['Code'] == 'ExpiredToken':
             return {
                 "valid": False,
@@ -191,12 +209,12 @@ async def list_regions():
         logger.info("Successfully retrieved %d AWS regions", len(regions))
         return regions
 
-    except NoCredentialsError:
+    except aws_sdk.NoCredentialsError:
         raise HTTPException(
             status_code=401,
             detail="No AWS credentials found. Please run aws_login.sh"
         )
-    except ClientError as e:
+    except aws_sdk.ClientError as e:
         if e.response['Error']['Code'] == 'ExpiredToken':
             raise HTTPException(
                 status_code=401,
@@ -238,7 +256,7 @@ async def list_availability_zones(region: str = Query(..., description="AWS regi
         logger.info("Retrieved %d availability zones for region %s", len(azs), region)
         return azs
 
-    except ClientError as e:
+    except aws_sdk.ClientError as e:
         logger.error("AWS ClientError for region %s: %s", region, str(e))
         raise HTTPException(status_code=400, detail=f"Invalid region or AWS error: {str(e)}")
     except Exception as e:
@@ -275,7 +293,7 @@ async def list_keypairs(region: str = Query(..., description="AWS region name"))
         logger.info("Retrieved %d key pairs for region %s", len(keypairs), region)
         return keypairs
 
-    except ClientError as e:
+    except aws_sdk.ClientError as e:
         logger.error("AWS ClientError for region %s: %s", region, str(e))
         raise HTTPException(status_code=400, detail=f"Invalid region or AWS error: {str(e)}")
     except Exception as e:
@@ -321,7 +339,7 @@ async def list_vpcs(region: str = Query(..., description="AWS region name")):
         logger.info("Retrieved %d VPCs for region %s", len(vpcs), region)
         return vpcs
 
-    except ClientError as e:
+    except aws_sdk.ClientError as e:
         logger.error("AWS ClientError for region %s: %s", region, str(e))
         raise HTTPException(status_code=400, detail=f"Invalid region or AWS error: {str(e)}")
     except Exception as e:
@@ -364,9 +382,9 @@ async def list_transit_gateways(region: str = Query(..., description="AWS region
         tgws.sort(key=lambda x: (x['name'] is None, x['name']))
 
         logger.info("Retrieved %d Transit Gateways for region %s", len(tgws), region)
-        return tgws
+        return FastJSONResponse(tgws)
 
-    except ClientError as e:
+    except aws_sdk.ClientError as e:
         logger.error("AWS ClientError for region %s: %s", region, str(e))
         raise HTTPException(status_code=400, detail=f"Invalid region or AWS error: {str(e)}")
     except Exception as e:
@@ -580,7 +598,7 @@ async def discover_resource_by_tag(
         # Resource not found
         return None
 
-    except ClientError as e:
+    except aws_sdk.ClientError as e:
         logger.error("AWS ClientError for tag discovery: %s", str(e))
         raise HTTPException(status_code=400, detail=f"AWS error: {str(e)}")
     except Exception as e:
@@ -609,204 +627,415 @@ async def discover_fortinet_resources(
     Returns:
         Dictionary of discovered resources by type
     """
+    return FastJSONResponse(await find_fortinet_resources(region, cp, env))
+
+
+async def find_fortinet_resources(region: str, cp: str, env: str) -> dict:
+    """Discover Fortinet-Role tagged resources for cp/env (see discover_fortinet_resources)."""
     try:
-        ec2 = get_boto3_client('ec2', region_name=region)
-        prefix = f"{cp}-{env}"
-
-        discovered = {
-            "vpcs": [],
-            "subnets": [],
-            "internet_gateways": [],
-            "transit_gateways": [],
-            "tgw_attachments": [],
-            "tgw_route_tables": [],
-            "route_tables": []
-        }
+        return await asyncio.to_thread(scan_fortinet_resources, region, cp, env)
+    except aws_sdk.ClientError as e:
+        logger.error("AWS ClientError for Fortinet resource discovery: %s", str(e))
+        raise HTTPException(status_code=400, detail=f"AWS error: {str(e)}")
+    except Exception as e:
+        logger.error("Error discovering Fortinet resources: %s", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Discover VPCs
-        vpcs = ec2.describe_vpcs(
-            Filters=[
-                {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
-                {'Name': 'state', 'Values': ['available']}
-            ]
-        )
-        for vpc in vpcs.get('Vpcs', []):
-            fortinet_role = None
-            name = None
-            for tag in vpc.get('Tags', []):
-                if tag['Key'] == 'Fortinet-Role':
-                    fortinet_role = tag['Value']
-                elif tag['Key'] == 'Name':
-                    name = tag['Value']
-            if fortinet_role:
-                discovered["vpcs"].append({
-                    "id": vpc['VpcId'],
-                    "fortinet_role": fortinet_role,
-                    "name": name,
-                    "cidr_block": vpc['CidrBlock']
-                })
-
-        # Discover Subnets
-        subnets = ec2.describe_subnets(
-            Filters=[
-                {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
-                {'Name': 'state', 'Values': ['available']}
-            ]
-        )
-        for subnet in subnets.get('Subnets', []):
-            fortinet_role = None
-            name = None
-            for tag in subnet.get('Tags', []):
-                if tag['Key'] == 'Fortinet-Role':
-                    fortinet_role = tag['Value']
-                elif tag['Key'] == 'Name':
-                    name = tag['Value']
-            if fortinet_role:
-                discovered["subnets"].append({
-                    "id": subnet['SubnetId'],
-                    "fortinet_role": fortinet_role,
-                    "name": name,
-                    "cidr_block": subnet['CidrBlock'],
-                    "availability_zone": subnet['AvailabilityZone'],
-                    "vpc_id": subnet['VpcId']
-                })
-
-        # Discover Internet Gateways
-        igws = ec2.describe_internet_gateways(
-            Filters=[
-                {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]}
-            ]
-        )
-        for igw in igws.get('InternetGateways', []):
-            fortinet_role = None
-            name = None
-            for tag in igw.get('Tags', []):
-                if tag['Key'] == 'Fortinet-Role':
-                    fortinet_role = tag['Value']
-                elif tag['Key'] == 'Name':
-                    name = tag['Value']
-            if fortinet_role:
-                vpc_id = None
-                if igw.get('Attachments'):
-                    vpc_id = igw['Attachments'][0].get('VpcId')
-                discovered["internet_gateways"].append({
-                    "id": igw['InternetGatewayId'],
-                    "fortinet_role": fortinet_role,
-                    "name": name,
-                    "vpc_id": vpc_id
-                })
-
-        # Discover Transit Gateways
-        tgws = ec2.describe_transit_gateways(
-            Filters=[
-                {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
-                {'Name': 'state', 'Values': ['available']}
-            ]
-        )
-        for tgw in tgws.get('TransitGateways', []):
-            fortinet_role = None
-            name = None
-            for tag in tgw.get('Tags', []):
-                if tag['Key'] == 'Fortinet-Role':
-                    fortinet_role = tag['Value']
-                elif tag['Key'] == 'Name':
-                    name = tag['Value']
-            if fortinet_role:
-                discovered["transit_gateways"].append({
-                    "id": tgw['TransitGatewayId'],
-                    "fortinet_role": fortinet_role,
-                    "name": name,
-                    "amazon_side_asn": tgw.get('Options', {}).get('AmazonSideAsn')
-                })
-
-        # Discover TGW Attachments
-        attachments = ec2.describe_transit_gateway_vpc_attachments(
-            Filters=[
-                {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
-                {'Name': 'state', 'Values': ['available']}
-            ]
+
+@router.get("/resources/by-fortinet-role/all-regions")
+async def discover_fortinet_resources_all_regions(
+    cp: str = Query(..., description="Customer prefix (e.g., 'acme')"),
+    env: str = Query(..., description="Environment (e.g., 'test')"),
+    regions: Optional[str] = Query(None, description="Comma-separated regions (default: all enabled regions)"),
+    refresh: bool = Query(False, description="Ignore cached region results"),
+    stream: bool = Query(True, description="Stream per-region results as server-sent events")
+):
+    """
+    Discover Fortinet-Role tagged resources for a cp/env in every enabled region.
+
+    Finds environments built in the wrong region and resources left behind
+    by a cleanup. Regions are scanned concurrently (see
+    app/services/region_discovery.py) and results are cached per
+    account/cp/env.
+
+    Args:
+        cp: Customer prefix
+        env: Environment name
+        regions: Regions to scan instead of all enabled regions
+        refresh: Rescan regions that have cached results
+        stream: Send a ``start`` event, one ``region`` event per region as it
+            completes and a ``done`` summary; false returns one JSON document
+
+    Returns:
+        text/event-stream response, or the combined results when stream=false
+    """
+    prefix = f"{cp}-{env}"
+    try:
+        account = await asyncio.to_thread(
+            lambda: get_boto3_client('sts').get_caller_identity()['Account']
         )
-        for attachment in attachments.get('TransitGatewayVpcAttachments', []):
-            fortinet_role = None
-            name = None
-            for tag in attachment.get('Tags', []):
-                if tag['Key'] == 'Fortinet-Role':
-                    fortinet_role = tag['Value']
-                elif tag['Key'] == 'Name':
-                    name = tag['Value']
-            if fortinet_role:
-                discovered["tgw_attachments"].append({
-                    "id": attachment['TransitGatewayAttachmentId'],
-                    "fortinet_role": fortinet_role,
-                    "name": name,
-                    "transit_gateway_id": attachment['TransitGatewayId'],
-                    "vpc_id": attachment['VpcId']
-                })
-
-        # Discover TGW Route Tables
-        rtbs = ec2.describe_transit_gateway_route_tables(
-            Filters=[
-                {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
-                {'Name': 'state', 'Values': ['available']}
-            ]
+        if regions:
+            region_names = sorted({name.strip() for name in regions.split(",") if name.strip()})
+        else:
+            region_names = await asyncio.to_thread(_enabled_regions)
+    except aws_sdk.NoCredentialsError:
+        raise HTTPException(status_code=401, detail="No AWS credentials found. Please run aws_login.sh")
+    except aws_sdk.ClientError as e:
+        logger.error("AWS ClientError for multi-region discovery: %s", str(e))
+        raise HTTPException(status_code=400, detail=f"AWS error: {str(e)}")
+    except Exception as e:
+        logger.error("Error starting multi-region discovery: %s", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+    results = region_discovery.scan(
+        (account, cp, env),
+        region_names,
+        lambda region: scan_fortinet_resources(region, cp, env),
+        refresh=refresh,
+    )
+    started = time.perf_counter()
+
+    def summary(collected: List[dict]) -> dict:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        return {"prefix": prefix, "account": account, **summarize(collected), "elapsed_ms": elapsed_ms}
+
+    if not stream:
+        collected = [result async for result in results]
+        collected.sort(key=lambda result: result["region"])
+        return FastJSONResponse({**summary(collected), "regions": collected})
+
+    async def events():
+        collected = []
+        yield format_sse("start", {"prefix": prefix, "account": account, "regions": region_names})
+        async for result in results:
+            collected.append(result)
+            yield format_sse("region", result)
+        done = summary(collected)
+        logger.info(
+            "Multi-region discovery for %s found %d resources in %d of %d regions",
+            prefix, done["total_resources"], len(done["regions_with_resources"]), done["regions_scanned"]
         )
-        for rtb in rtbs.get('TransitGatewayRouteTables', []):
-            fortinet_role = None
-            name = None
-            for tag in rtb.get('Tags', []):
-                if tag['Key'] == 'Fortinet-Role':
-                    fortinet_role = tag['Value']
-                elif tag['Key'] == 'Name':
-                    name = tag['Value']
-            if fortinet_role:
-                discovered["tgw_route_tables"].append({
-                    "id": rtb['TransitGatewayRouteTableId'],
-                    "fortinet_role": fortinet_role,
-                    "name": name,
-                    "transit_gateway_id": rtb['TransitGatewayId']
-                })
-
-        # Discover Route Tables
-        route_tables = ec2.describe_route_tables(
-            Filters=[
-                {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]}
-            ]
+        yield format_sse("done", done)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _enabled_regions() -> List[str]:
+    """Regions enabled for the account (opted-in or not requiring opt-in)."""
+    ec2 = get_boto3_client('ec2', region_name='us-east-1')
+    return sorted(region['RegionName'] for region in ec2.describe_regions(AllRegions=False)['Regions'])
+
+
+def scan_fortinet_resources(region: str, cp: str, env: str) -> dict:
+    """
+    Discover Fortinet-Role tagged resources for cp/env in one region (blocking).
+
+    Raises boto3 errors as is; find_fortinet_resources maps them to HTTP errors.
+    """
+    ec2 = get_boto3_client('ec2', region_name=region)
+    prefix = f"{cp}-{env}"
+
+    discovered = {
+        "vpcs": [],
+        "subnets": [],
+        "internet_gateways": [],
+        "transit_gateways": [],
+        "tgw_attachments": [],
+        "tgw_route_tables": [],
+        "route_tables": []
+    }
+
+    # Discover VPCs
+    vpcs = ec2.describe_vpcs(
+        Filters=[
+            {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
+            {'Name': 'state', 'Values': ['available']}
+        ]
+    )
+    for vpc in vpcs.get('Vpcs', []):
+        fortinet_role = None
+        name = None
+        for tag in vpc.get('Tags', []):
+            if tag['Key'] == 'Fortinet-Role':
+                fortinet_role = tag['Value']
+            elif tag['Key'] == 'Name':
+                name = tag['Value']
+        if fortinet_role:
+            discovered["vpcs"].append({
+                "id": vpc['VpcId'],
+                "fortinet_role": fortinet_role,
+                "name": name,
+                "cidr_block": vpc['CidrBlock']
+            })
+
+    # Discover Subnets
+    subnets = ec2.describe_subnets(
+        Filters=[
+            {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
+            {'Name': 'state', 'Values': ['available']}
+        ]
+    )
+    for subnet in subnets.get('Subnets', []):
+        fortinet_role = None
+        name = None
+        for tag in subnet.get('Tags', []):
+            if tag['Key'] == 'Fortinet-Role':
+                fortinet_role = tag['Value']
+            elif tag['Key'] == 'Name':
+                name = tag['Value']
+        if fortinet_role:
+            discovered["subnets"].append({
+                "id": subnet['SubnetId'],
+                "fortinet_role": fortinet_role,
+                "name": name,
+                "cidr_block": subnet['CidrBlock'],
+                "availability_zone": subnet['AvailabilityZone'],
+                "vpc_id": subnet['VpcId']
+            })
+
+    # Discover Internet Gateways
+    igws = ec2.describe_internet_gateways(
+        Filters=[
+            {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]}
+        ]
+    )
+    for igw in igws.get('InternetGateways', []):
+        fortinet_role = None
+        name = None
+        for tag in igw.get('Tags', []):
+            if tag['Key'] == 'Fortinet-Role':
+                fortinet_role = tag['Value']
+            elif tag['Key'] == 'Name':
+                name = tag['Value']
+        if fortinet_role:
+            vpc_id = None
+            if igw.get('Attachments'):
+                vpc_id = igw['Attachments'][0].get('VpcId')
+            discovered["internet_gateways"].append({
+                "id": igw['InternetGatewayId'],
+                "fortinet_role": fortinet_role,
+                "name": name,
+                "vpc_id": vpc_id
+            })
+
+    # Discover Transit Gateways
+    tgws = ec2.describe_transit_gateways(
+        Filters=[
+            {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
+            {'Name': 'state', 'Values': ['available']}
+        ]
+    )
+    for tgw in tgws.get('TransitGateways', []):
+        fortinet_role = None
+        name = None
+        for tag in tgw.get('Tags', []):
+            if tag['Key'] == 'Fortinet-Role':
+                fortinet_role = tag['Value']
+            elif tag['Key'] == 'Name':
+                name = tag['Value']
+        if fortinet_role:
+            discovered["transit_gateways"].append({
+                "id": tgw['TransitGatewayId'],
+                "fortinet_role": fortinet_role,
+                "name": name,
+                "amazon_side_asn": tgw.get('Options', {}).get('AmazonSideAsn')
+            })
+
+    # Discover TGW Attachments
+    attachments = ec2.describe_transit_gateway_vpc_attachments(
+        Filters=[
+            {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
+            {'Name': 'state', 'Values': ['available']}
+        ]
+    )
+    for attachment in attachments.get('TransitGatewayVpcAttachments', []):
+        fortinet_role = None
+        name = None
+        for tag in attachment.get('Tags', []):
+            if tag['Key'] == 'Fortinet-Role':
+                fortinet_role = tag['Value']
+            elif tag['Key'] == 'Name':
+                name = tag['Value']
+        if fortinet_role:
+            discovered["tgw_attachments"].append({
+                "id": attachment['TransitGatewayAttachmentId'],
+                "fortinet_role": fortinet_role,
+                "name": name,
+                "transit_gateway_id": attachment['TransitGatewayId'],
+                "vpc_id": attachment['VpcId']
+            })
+
+    # Discover TGW Route Tables
+    rtbs = ec2.describe_transit_gateway_route_tables(
+        Filters=[
+            {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]},
+            {'Name': 'state', 'Values': ['available']}
+        ]
+    )
+    for rtb in rtbs.get('TransitGatewayRouteTables', []):
+        fortinet_role = None
+        name = None
+        for tag in rtb.get('Tags', []):
+            if tag['Key'] == 'Fortinet-Role':
+                fortinet_role = tag['Value']
+            elif tag['Key'] == 'Name':
+                name = tag['Value']
+        if fortinet_role:
+            discovered["tgw_route_tables"].append({
+                "id": rtb['TransitGatewayRouteTableId'],
+                "fortinet_role": fortinet_role,
+                "name": name,
+                "transit_gateway_id": rtb['TransitGatewayId']
+            })
+
+    # Discover Route Tables
+    route_tables = ec2.describe_route_tables(
+        Filters=[
+            {'Name': 'tag:Fortinet-Role', 'Values': [f"{prefix}-*"]}
+        ]
+    )
+    for rt in route_tables.get('RouteTables', []):
+        fortinet_role = None
+        name = None
+        for tag in rt.get('Tags', []):
+            if tag['Key'] == 'Fortinet-Role':
+                fortinet_role = tag['Value']
+            elif tag['Key'] == 'Name':
+                name = tag['Value']
+        if fortinet_role:
+            discovered["route_tables"].append({
+                "id": rt['RouteTableId'],
+                "fortinet_role": fortinet_role,
+                "name": name,
+                "vpc_id": rt['VpcId'],
+                "routes": routes_from_api(rt.get('Routes', []))
+            })
+
+    # Summary
+    total = sum(len(v) for v in discovered.values())
+    logger.info("Discovered %d Fortinet-Role tagged resources for %s in %s", total, prefix, region)
+
+    return {
+        "prefix": prefix,
+        "region": region,
+        "total_resources": total,
+        "resources": discovered
+    }
+
+
+@router.get("/diagram")
+async def get_network_diagram(
+    region: str = Query(..., description="AWS region name"),
+    cp: str = Query(..., description="Customer prefix (e.g., 'acme')"),
+    env: str = Query(..., description="Environment (e.g., 'test')"),
+    format: str = Query("mermaid", description="Output format: mermaid, dot or svg")
+):
+    """
+    Render a network diagram of the Fortinet-Role tagged resources for a cp/env.
+
+    Uses a single discovery snapshot (the same data as /resources/by-fortinet-role)
+    instead of per-resource AWS calls. Output is cached by snapshot hash and only
+    VPCs whose subnets or routes changed are re-rendered.
+
+    Args:
+        region: AWS region name
+        cp: Customer prefix
+        env: Environment name
+        format: Output format
+
+    Returns:
+        Diagram content with snapshot hash and graph stats
+    """
+    if format not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Must be one of: {', '.join(SUPPORTED_FORMATS)}"
         )
-        for rt in route_tables.get('RouteTables', []):
-            fortinet_role = None
-            name = None
-            for tag in rt.get('Tags', []):
-                if tag['Key'] == 'Fortinet-Role':
-                    fortinet_role = tag['Value']
-                elif tag['Key'] == 'Name':
-                    name = tag['Value']
-            if fortinet_role:
-                discovered["route_tables"].append({
-                    "id": rt['RouteTableId'],
-                    "fortinet_role": fortinet_role,
-                    "name": name,
-                    "vpc_id": rt['VpcId']
-                })
-
-        # Summary
-        total = sum(len(v) for v in discovered.values())
-        logger.info("Discovered %d Fortinet-Role tagged resources for %s", total, prefix)
 
+    snapshot = await find_fortinet_resources(region, cp, env)
+    try:
+        result = render_diagram(snapshot["resources"], format)
+        return FastJSONResponse({"prefix": snapshot["prefix"], "region": region, **result})
+    except Exception as e:
+        logger.error("Error rendering network diagram: %s", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ================================================================================
+# AUTOSCALE GROUP MONITORING
+# ================================================================================
+
+
+@router.get("/asg/status")
+async def get_asg_status(
+    region: str = Query(..., description="AWS region name"),
+    asg_prefix: str = Query(..., description="ASG module prefix (e.g., 'acme-test-asg')")
+):
+    """
+    Get a one-time snapshot of autoscale groups, instances and GWLB target health.
+
+    Args:
+        region: AWS region name
+        asg_prefix: ASG module prefix used to match ASG and target group names
+
+    Returns:
+        Snapshot of all monitored entities and the number of AWS API calls made
+    """
+    try:
+        monitor = FleetMonitor(region, asg_prefix, get_boto3_client)
+        snapshot = await monitor.collect()
         return {
-            "prefix": prefix,
             "region": region,
-            "total_resources": total,
-            "resources": discovered
+            "asg_prefix": asg_prefix,
+            "entities": snapshot,
+            "api_calls": monitor.api_calls
         }
-
-    except ClientError as e:
-        logger.error("AWS ClientError for Fortinet resource discovery: %s", str(e))
+    except aws_sdk.ClientError as e:
+        logger.error("AWS ClientError for ASG status: %s", str(e))
         raise HTTPException(status_code=400, detail=f"AWS error: {str(e)}")
     except Exception as e:
-        logger.error("Error discovering Fortinet resources: %s", str(e))
+        logger.error("Error getting ASG status: %s", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/asg/watch")
+async def watch_asg(
+    region: str = Query(..., description="AWS region name"),
+    asg_prefix: str = Query(..., description="ASG module prefix (e.g., 'acme-test-asg')")
+):
+    """
+    Stream autoscale group changes as server-sent events.
+
+    Sends a full ``snapshot`` event first, then ``changes`` events containing
+    only added, removed and changed entities. Polling is shared between all
+    clients watching the same region/prefix and speeds up while instances or
+    targets are transitioning.
+
+    Args:
+        region: AWS region name
+        asg_prefix: ASG module prefix used to match ASG and target group names
+
+    Returns:
+        text/event-stream response
+    """
+    events = fleet_monitor_hub.watch(
+        region,
+        asg_prefix,
+        get_boto3_client,
+        min_interval=settings.asg_monitor_min_interval,
+        max_interval=settings.asg_monitor_max_interval,
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/my-ip")
 async def get_my_ip(request: Request):
     """
@@ -826,12 +1055,11 @@ async def get_my_ip(request: Request):
 
         # If we got localhost/private IP, try to get public IP via external service
         if not client_ip or client_ip.startswith(("127.", "192.168.", "10.", "172.")):
-            try:
-                response = requests.get("https://api.ipify.org?format=text", timeout=5.0)
-                if response.status_code == 200:
-                    client_ip = response.text.strip()
-            except Exception as e:
-                logger.warning(f"Could not get public IP from ipify: {e}")
+            public_ip = await public_ip_resolver.resolve(budget=settings.public_ip_timeout)
+            if public_ip:
+                client_ip = public_ip
+            else:
+                logger.warning("Could not get public IP from any provider")
 
         if client_ip:
             # Return as CIDR /32
@@ -2,13 +2,61 @@
 import logging
 import subprocess
 import asyncio
+import time
 from pathlib import Path
-from typing import Dict, Any
-from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-
-from app.parsers.tfvars_parser import parse_tfvars_file
+from pydantic import BaseModel, Field
+
+from app.api.aws import (
+    check_credentials_status,
+    find_fortinet_resources,
+    get_boto3_client,
+    list_availability_zones,
+    list_keypairs,
+    list_regions,
+    list_vpcs,
+)
+from app.config import settings
+from app.responses import FastJSONResponse
+from app.services.build_history import BuildJob, get_build_history
+from app.services.cidr_index import (
+    KIND_VPC,
+    CidrEntry,
+    CidrIndex,
+    entries_from_aws,
+    find_conflicts,
+    parse_network,
+    suggest_free_block,
+    template_entries,
+)
+from app.services.cidr_planner import AllocationError, is_planned_field, plan_distributed_egress
+from app.services.config_store import (
+    ConfigConflictError,
+    ConfigPatchError,
+    get_config_store,
+    parse_etag,
+)
+from app.services.diagram import SUPPORTED_FORMATS, inventory_from_tfstate, render_diagram
+from app.services.drift import detect_drift
+from app.services.inheritance import get_inheritance_engine
+from app.services.license_index import get_license_index
+from app.services.metrics import SUBPROCESS_SECONDS
+from app.services.orchestrator import ACTIONS, get_orchestrator
+from app.services.plan_summary import PLAN_FILE, PlanError, discard_plan, page, plan_summaries, stale_reason
+from app.services.public_ip import public_ip_resolver
+from app.services.schema_registry import schema_registry
+from app.services.tfvars_renderer import render_tfvars, required_variables
+from app.services.validation import batch_validator, validate_config
+from app.services.workspaces import (
+    WorkspaceError,
+    build_scheduler,
+    get_workspace_manager,
+    subprocess_env,
+    uses_plugin_cache,
+    workspace_name,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/terraform", tags=["terraform"])
@@ -24,6 +72,15 @@ class ConfigSaveRequest(BaseModel):
     """Request to save configuration."""
     template: str
     config: Dict[str, Any]
+    revision: Optional[int] = None  # Revision the config was loaded at (optimistic concurrency)
+
+
+class JsonPatchOperation(BaseModel):
+    """Single RFC 6902 JSON Patch operation."""
+    op: str
+    path: str
+    value: Any = None
+    from_: Optional[str] = Field(default=None, alias="from")
 
 
 class SaveLogRequest(BaseModel):
@@ -33,10 +90,44 @@ class SaveLogRequest(BaseModel):
     mode: str  # 'append' or 'truncate'
 
 
+class ConfigComputeRequest(BaseModel):
+    """Request to evaluate @ui-compute fields."""
+    template: str
+    config: Dict[str, Any]
+    changed: Optional[List[str]] = None  # Only recompute fields affected by these
+
+
+class CidrCheckRequest(BaseModel):
+    """Request to check a configuration's CIDRs for overlaps."""
+    template: str
+    config: Dict[str, Any]
+    region: Optional[str] = None  # Also check against VPCs/subnets/TGW routes in AWS
+
+
+class CidrPlanRequest(BaseModel):
+    """Request to allocate distributed egress VPC CIDRs for several environments."""
+    supernet: str
+    environments: int = Field(default=1, ge=1, le=4096)
+    vpcs_per_environment: int = Field(default=1, ge=1, le=3)
+    vpc_prefixlen: int = Field(default=24, ge=8, le=28)
+    subnet_bits: int = Field(default=4, ge=3, le=8)
+    region: Optional[str] = None  # Also avoid VPCs/subnets/TGW routes in AWS
+    apply: bool = False  # Write the plan to the config store
+    revision: Optional[int] = None  # existing_vpc_resources revision the plan is based on
+
+
+class OrchestrateRequest(BaseModel):
+    """Request to deploy or destroy several templates in dependency order."""
+    action: str  # deploy or destroy
+    templates: Optional[List[str]] = None  # default: all templates
+    workspace: Optional[str] = None  # Workspace (cp-env) to run in instead of the template directories
+
+
 class ConfigGenerateResponse(BaseModel):
     """Response with generated tfvars content."""
     content: str
     filename: str
+    computed: Dict[str, Any] = {}
 
 
 # Get path to terraform templates directory
@@ -46,7 +137,8 @@ def get_terraform_dir() -> Path:
     return Path(__file__).parent.parent.parent.parent.parent / "terraform"
 
 
-@router.get("/schema", response_model=ConfigSchema)
+# Documented as ConfigSchema; the cached parser output is sent as is, without validation
+@router.get("/schema", responses={200: {"model": ConfigSchema}})
 async def get_config_schema(
     template: str = Query(..., description="Template name (e.g., 'existing_vpc_resources')")
 ):
@@ -82,16 +174,15 @@ async def get_config_schema(
                 detail=f"Template not found: {tfvars_path}"
             )
 
-        # Parse the file
-        logger.info(f"Parsing tfvars file: {tfvars_path}")
-        schema = parse_tfvars_file(tfvars_path)
+        # Parse the file (cached until it changes)
+        schema = schema_registry.get(tfvars_path).schema
 
         logger.info(
             f"Parsed schema: {schema['metadata']['total_groups']} groups, "
             f"{schema['metadata']['total_fields']} fields"
         )
 
-        return schema
+        return FastJSONResponse(schema)
 
     except FileNotFoundError as e:
         logger.error(f"File not found: {str(e)}")
@@ -101,16 +192,172 @@ async def get_config_schema(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _in_thread(endpoint: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+    """Run an AWS endpoint on a worker thread; they make blocking boto3 calls."""
+    return await asyncio.to_thread(asyncio.run, endpoint(*args))
+
+
+async def _section(name: str, awaitable: Awaitable[Any], timings: Dict[str, float], errors: Dict[str, str]) -> Any:
+    """
+    Await one bootstrap section, recording its duration and turning failures into errors.
+
+    A section that takes longer than BOOTSTRAP_SECTION_TIMEOUT is reported as
+    an error so it does not hold up the others (e.g. an unreachable STS).
+    """
+    started = time.perf_counter()
+    timeout = settings.bootstrap_section_timeout
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Bootstrap section {name} timed out after {timeout:g}s")
+        errors[name] = f"Timed out after {timeout:g}s"
+    except HTTPException as e:
+        errors[name] = str(e.detail)
+    except Exception as e:
+        logger.error(f"Bootstrap section {name} failed: {str(e)}")
+        errors[name] = str(e)
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+    return None
+
+
+def _option_requests(
+    template: str,
+    compiled: Any,
+    config: Dict[str, Any],
+    aws_available: bool,
+) -> Dict[str, Callable[[], Awaitable[Any]]]:
+    """
+    Option lists the form requests first: one per select source of a visible field.
+
+    Returns:
+        GET path of the equivalent endpoint (as the frontend requests it) -> fetch function
+    """
+    requests: Dict[str, Callable[[], Awaitable[Any]]] = {}
+    region = config.get("aws_region")
+    for name, field in compiled.fields.items():
+        if field.get("type") != "select" or not compiled.visibility.is_visible(name, config):
+            continue
+        source = field.get("source")
+        if source == "license-files":
+            requests[f"/api/terraform/license-files?template={template}"] = (
+                lambda: asyncio.to_thread(license_file_options, template)
+            )
+        elif not aws_available:
+            continue
+        elif source == "aws-regions":
+            requests["/api/aws/regions"] = lambda: _in_thread(list_regions)
+        elif source == "aws-availability-zones" and config.get(field.get("depends_on") or ""):
+            az_region = config[field["depends_on"]]
+            requests[f"/api/aws/availability-zones?region={az_region}"] = (
+                lambda az_region=az_region: _in_thread(list_availability_zones, az_region)
+            )
+        elif source == "aws-keypairs" and region:
+            requests[f"/api/aws/keypairs?region={region}"] = lambda: _in_thread(list_keypairs, region)
+        elif source == "aws-vpcs" and region:
+            requests[f"/api/aws/vpcs?region={region}"] = lambda: _in_thread(list_vpcs, region)
+    return requests
+
+
+@router.get("/bootstrap")
+async def bootstrap(
+    template: str = Query(..., description="Template name")
+):
+    """
+    Everything the configuration page needs on load, in one response.
+
+    The schema, the saved (or inherited) configuration and the AWS credential
+    status are gathered concurrently; then the option lists of the visible
+    select fields (regions, availability zones, key pairs, VPCs, license
+    files) are fetched concurrently for the loaded config (schema defaults
+    filled in). AWS lists are skipped when the credentials are not valid.
+
+    A failing section, or one slower than BOOTSTRAP_SECTION_TIMEOUT, is
+    returned as null with its message under ``errors``; the other sections are
+    still returned.
+
+    Args:
+        template: Template name
+
+    Returns:
+        schema, config (the /config/load body), credentials (the
+        /api/aws/credentials/status body), options (keyed by the GET path of
+        the endpoint that returns the same list), errors and per-section
+        ``timings_ms``
+    """
+    valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+    if template not in valid_templates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+        )
+
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+
+    compiled, loaded, credentials = await asyncio.gather(
+        _section(
+            "schema",
+            asyncio.to_thread(schema_registry.get_template, get_terraform_dir(), template),
+            timings,
+            errors,
+        ),
+        _section("config", read_configuration(template), timings, errors),
+        _section("credentials", _in_thread(check_credentials_status), timings, errors),
+    )
+    config_body, etag = loaded if loaded else (None, None)
+
+    options: Dict[str, Any] = {}
+    if compiled is not None:
+        effective = {
+            name: field["default_value"]
+            for name, field in compiled.fields.items()
+            if field.get("default_value") is not None
+        }
+        effective.update((config_body or {}).get("config") or {})
+        aws_available = bool(credentials and credentials.get("valid"))
+        requests = _option_requests(template, compiled, effective, aws_available)
+        results = await asyncio.gather(*(
+            _section(path, fetch(), timings, errors) for path, fetch in requests.items()
+        ))
+        options = {path: result for path, result in zip(requests, results) if path not in errors}
+
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info(f"Bootstrapped {template} in {timings['total']:.1f}ms ({len(options)} option lists, {len(errors)} errors)")
+
+    return FastJSONResponse(
+        {
+            "template": template,
+            "schema": compiled.schema if compiled is not None else None,
+            "config": config_body,
+            "credentials": credentials,
+            "options": options,
+            "errors": errors,
+            "timings_ms": timings,
+        },
+        headers={"ETag": etag} if etag else None,
+    )
+
+
 @router.post("/config/save")
-async def save_configuration(request: ConfigSaveRequest):
+async def save_configuration(
+    request: ConfigSaveRequest,
+    response: Response,
+    if_match: Optional[str] = Header(default=None)
+):
     """
     Save configuration to JSON file.
 
+    The file is written atomically and every save is recorded as a revision.
+    Pass the revision from /config/load (``revision`` field or If-Match header)
+    to reject saves based on stale data with 409 Conflict.
+
     Args:
         request: Config save request with template name and configuration
 
     Returns:
-        Success message
+        Success message with the new revision
     """
     try:
         # Validate template name
@@ -123,29 +370,202 @@ async def save_configuration(request: ConfigSaveRequest):
 
         # Save to JSON file in terraform directory
         terraform_dir = get_terraform_dir()
-        config_file = terraform_dir / request.template / "ui_config.json"
+        store = get_config_store(terraform_dir / request.template)
 
-        # Create directory if it doesn't exist
-        config_file.parent.mkdir(parents=True, exist_ok=True)
+        expected = request.revision if request.revision is not None else parse_etag(if_match)
+        result = store.save(request.config, expected_revision=expected)
+        response.headers["ETag"] = result["etag"]
 
-        # Write configuration
-        import json
-        with open(config_file, 'w') as f:
-            json.dump(request.config, f, indent=2)
-
-        logger.info(f"Saved configuration to {config_file}")
+        logger.info(f"Saved configuration to {store.config_file} (revision {result['revision']})")
 
         return {
             "success": True,
             "message": "Configuration saved successfully",
-            "file": str(config_file)
+            "file": str(store.config_file),
+            "revision": result["revision"]
         }
 
+    except HTTPException:
+        raise
+    except ConfigConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ConfigPatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error saving configuration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.patch("/config")
+async def patch_configuration(
+    operations: List[JsonPatchOperation],
+    response: Response,
+    template: str = Query(..., description="Template name"),
+    revision: Optional[int] = Query(None, description="Revision the patch was computed against"),
+    if_match: Optional[str] = Header(default=None)
+):
+    """
+    Apply a JSON Patch (RFC 6902) to the saved configuration.
+
+    Lets autosave send only the fields that changed. Pass the current revision
+    (query parameter or If-Match header) to get 409 Conflict instead of
+    overwriting a concurrent change.
+
+    Args:
+        operations: JSON Patch operations
+        template: Template name
+
+    Returns:
+        New revision and whether anything changed
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+
+        store = get_config_store(get_terraform_dir() / template)
+        expected = revision if revision is not None else parse_etag(if_match)
+        result = store.patch(
+            [op.model_dump(by_alias=True, exclude_unset=True) for op in operations],
+            expected_revision=expected
+        )
+        response.headers["ETag"] = result["etag"]
+
+        logger.info(f"Patched configuration for {template} ({len(operations)} ops, revision {result['revision']})")
+
+        return {
+            "success": True,
+            "message": "Configuration updated" if result["changed"] else "No changes",
+            "revision": result["revision"],
+            "changed": result["changed"]
+        }
+
+    except HTTPException:
+        raise
+    except ConfigConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ConfigPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error patching configuration: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/config/history")
+async def get_configuration_history(
+    template: str = Query(..., description="Template name"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum revisions to return")
+):
+    """
+    List saved revisions of a configuration, newest first.
+
+    Args:
+        template: Template name
+        limit: Maximum number of revisions
+
+    Returns:
+        Revision summaries with timestamps and changed field paths
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+
+        store = get_config_store(get_terraform_dir() / template)
+        return FastJSONResponse({"template": template, "revisions": store.history(limit)})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading configuration history: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/config/revision")
+async def get_configuration_revision(
+    template: str = Query(..., description="Template name"),
+    revision: int = Query(..., description="Revision number")
+):
+    """
+    Get the configuration as it was at a given revision.
+
+    Args:
+        template: Template name
+        revision: Revision number from /config/history
+
+    Returns:
+        Configuration at that revision
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+
+        store = get_config_store(get_terraform_dir() / template)
+        return FastJSONResponse(
+            {"template": template, "revision": revision, "config": store.get_revision(revision)}
+        )
+
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Revision {revision} not found")
+    except Exception as e:
+        logger.error(f"Error reading configuration revision: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/config/diff")
+async def diff_configuration_revisions(
+    template: str = Query(..., description="Template name"),
+    from_revision: int = Query(..., description="Base revision"),
+    to_revision: int = Query(..., description="Target revision")
+):
+    """
+    Get the JSON Patch between two configuration revisions.
+
+    Args:
+        template: Template name
+        from_revision: Base revision
+        to_revision: Target revision
+
+    Returns:
+        JSON Patch operations turning from_revision into to_revision
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+
+        store = get_config_store(get_terraform_dir() / template)
+        return FastJSONResponse({
+            "template": template,
+            "from_revision": from_revision,
+            "to_revision": to_revision,
+            "operations": store.diff(from_revision, to_revision)
+        })
+
+    except HTTPException:
+        raise
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Revision {e.args[0]} not found")
+    except Exception as e:
+        logger.error(f"Error diffing configuration revisions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/config/load")
 async def load_configuration(
     template: str = Query(..., description="Template name")
@@ -168,145 +588,67 @@ async def load_configuration(
                 detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
             )
 
-        # Load from JSON file
-        terraform_dir = get_terraform_dir()
-        config_file = terraform_dir / template / "ui_config.json"
-
-        # Read configuration if it exists
-        import json
-        config = {}
-        if config_file.exists():
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-
-        # If loading existing_vpc_resources, auto-populate management_cidr_sg with current public IP
-        if template == "existing_vpc_resources":
-            if "management_cidr_sg" not in config or not config["management_cidr_sg"] or config["management_cidr_sg"] == "x.x.x.x/32":
-                try:
-                    import requests
-                    response = requests.get("https://api.ipify.org?format=text", timeout=3.0)
-                    if response.status_code == 200:
-                        user_ip = response.text.strip()
-                        config["management_cidr_sg"] = f"{user_ip}/32"
-                        logger.info(f"Auto-populated management_cidr_sg with current public IP: {config['management_cidr_sg']}")
-                except Exception as e:
-                    logger.warning(f"Could not auto-detect user IP for management_cidr_sg: {e}")
-
-        # If loading autoscale_template or ha_pair, inherit values from existing_vpc_resources
-        inherited_fields = []
-        if template == "autoscale_template" or template == "ha_pair":
-            existing_vpc_config_file = terraform_dir / "existing_vpc_resources" / "ui_config.json"
-            if existing_vpc_config_file.exists():
-                with open(existing_vpc_config_file, 'r') as f:
-                    existing_config = json.load(f)
-
-                # Fields to inherit from existing_vpc_resources (these become read-only)
-                inherit_fields = [
-                    "aws_region",
-                    "availability_zone_1",
-                    "availability_zone_2",
-                    "cp",
-                    "env",
-                    "enable_build_management_vpc"  # Maps to enable_dedicated_management_vpc
-                ]
-
-                # Inherit values from existing_vpc_resources (overwrite autoscale config)
-                for field in inherit_fields:
-                    if field in existing_config:
-                        # Special mapping for enable_build_management_vpc -> enable_dedicated_management_vpc
-                        if field == "enable_build_management_vpc":
-                            config["enable_dedicated_management_vpc"] = existing_config[field]
-                            inherited_fields.append("enable_dedicated_management_vpc")
-                        else:
-                            config[field] = existing_config[field]
-                            inherited_fields.append(field)
+        result, etag = await read_configuration(template)
+        return FastJSONResponse(result, headers={"ETag": etag})
 
-                logger.info(f"Inherited {len(inherited_fields)} fields from existing_vpc_resources")
+    except Exception as e:
+        logger.error(f"Error loading configuration: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-                # Auto-populate fortigate_management_cidr based on management configuration
-                default_cidrs = []
 
-                # Start with existing user-provided CIDRs if any
-                existing_cidrs = config.get("fortigate_management_cidr", "")
-                if existing_cidrs:
-                    # Split existing comma-separated CIDRs
-                    default_cidrs = [cidr.strip() for cidr in existing_cidrs.split(",") if cidr.strip()]
-                else:
-                    # If empty, try to detect user's public IP as default
-                    try:
-                        import requests
-                        response = requests.get("https://api.ipify.org?format=text", timeout=3.0)
-                        if response.status_code == 200:
-                            user_ip = response.text.strip()
-                            default_cidrs.append(f"{user_ip}/32")
-                            logger.info(f"Auto-detected user IP: {user_ip}/32")
-                    except Exception as e:
-                        logger.warning(f"Could not auto-detect user IP: {e}")
-
-                # If dedicated management VPC is enabled, add management VPC CIDR
-                if existing_config.get("enable_build_management_vpc"):
-                    mgmt_cidr = existing_config.get("vpc_cidr_management")
-                    if mgmt_cidr and mgmt_cidr not in default_cidrs:
-                        default_cidrs.append(mgmt_cidr)
-
-                # If dedicated management ENI + management subnets in inspection VPC
-                elif config.get("enable_dedicated_management_eni") and existing_config.get("enable_build_management_subnets"):
-                    # Get management subnet CIDRs from existing_vpc_resources
-                    mgmt_subnet_az1 = existing_config.get("cidr_for_mgmt_subnet_in_inspection_vpc_az1")
-                    mgmt_subnet_az2 = existing_config.get("cidr_for_mgmt_subnet_in_inspection_vpc_az2")
-
-                    if mgmt_subnet_az1 and mgmt_subnet_az1 not in default_cidrs:
-                        default_cidrs.append(mgmt_subnet_az1)
-                    if mgmt_subnet_az2 and mgmt_subnet_az2 not in default_cidrs:
-                        default_cidrs.append(mgmt_subnet_az2)
-
-                if default_cidrs:
-                    config["fortigate_management_cidr"] = ", ".join(default_cidrs)
-                    logger.info(f"Merged fortigate_management_cidr with: {config['fortigate_management_cidr']}")
-
-                # Auto-populate asg_module_prefix if not already set
-                if "asg_module_prefix" not in config or not config["asg_module_prefix"]:
-                    cp = config.get("cp", "")
-                    env = config.get("env", "")
-                    if cp and env:
-                        config["asg_module_prefix"] = f"{cp}-{env}-asg"
-                        logger.info(f"Auto-populated asg_module_prefix: {config['asg_module_prefix']}")
-
-                # Auto-populate GWLB endpoint names if not already set
-                cp = config.get("cp", "")
-                env = config.get("env", "")
-                if cp and env:
-                    if "endpoint_name_az1" not in config or not config["endpoint_name_az1"]:
-                        config["endpoint_name_az1"] = f"{cp}-{env}-asg-gwlbe_az1"
-                        logger.info(f"Auto-populated endpoint_name_az1: {config['endpoint_name_az1']}")
-                    if "endpoint_name_az2" not in config or not config["endpoint_name_az2"]:
-                        config["endpoint_name_az2"] = f"{cp}-{env}-asg-gwlbe_az2"
-                        logger.info(f"Auto-populated endpoint_name_az2: {config['endpoint_name_az2']}")
-
-        # Return message based on whether config file existed
-        if not config_file.exists():
-            message = "No saved configuration found"
-            if (template == "autoscale_template" or template == "ha_pair") and config:
-                message += " (inherited defaults from existing_vpc_resources)"
-            return {
-                "success": False,
-                "message": message,
-                "config": config,
-                "inherited_fields": inherited_fields if (template == "autoscale_template" or template == "ha_pair") else []
-            }
-
-        logger.info(f"Loaded configuration from {config_file}")
+async def read_configuration(template: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Saved configuration of a template with the public IP and inherited values applied.
 
+    Returns:
+        Tuple of (/config/load response body, ETag)
+    """
+    # Load from JSON file
+    terraform_dir = get_terraform_dir()
+    store = get_config_store(terraform_dir / template)
+    config_file = store.config_file
+
+    # Read configuration if it exists
+    saved_config, revision, etag = store.load()
+    config = saved_config or {}
+
+    # If loading existing_vpc_resources, auto-populate management_cidr_sg with current public IP
+    if template == "existing_vpc_resources":
+        if "management_cidr_sg" not in config or not config["management_cidr_sg"] or config["management_cidr_sg"] == "x.x.x.x/32":
+            user_ip = await public_ip_resolver.resolve(budget=settings.public_ip_load_budget)
+            if user_ip:
+                config["management_cidr_sg"] = f"{user_ip}/32"
+                logger.info(f"Auto-populated management_cidr_sg with current public IP: {config['management_cidr_sg']}")
+            else:
+                logger.warning("Could not auto-detect user IP for management_cidr_sg")
+
+    # Apply values inherited from upstream templates (@ui-inherit-from / @ui-derive)
+    inheritance = await get_inheritance_engine(terraform_dir).resolve(template, config)
+    config = inheritance.config
+    inherited_fields = inheritance.inherited_fields
+
+    # Return message based on whether config file existed
+    if saved_config is None:
+        message = "No saved configuration found"
+        if inheritance.upstreams and config:
+            message += f" (inherited defaults from {', '.join(inheritance.upstreams)})"
         return {
-            "success": True,
-            "message": "Configuration loaded successfully",
+            "success": False,
+            "message": message,
             "config": config,
-            "inherited_fields": inherited_fields if (template == "autoscale_template" or template == "ha_pair") else []
-        }
+            "inherited_fields": inherited_fields,
+            "revision": revision
+        }, etag
 
-    except Exception as e:
-        logger.error(f"Error loading configuration: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    logger.info(f"Loaded configuration from {config_file}")
+
+    return {
+        "success": True,
+        "message": "Configuration loaded successfully",
+        "config": config,
+        "inherited_fields": inherited_fields,
+        "revision": revision
+    }, etag
 
 
 @router.delete("/config/delete")
@@ -331,25 +673,27 @@ async def delete_configuration(
                 detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
             )
 
-        # Delete config file
+        # Delete config file (history is kept so the config can be restored)
         terraform_dir = get_terraform_dir()
-        config_file = terraform_dir / template / "ui_config.json"
+        store = get_config_store(terraform_dir / template)
+        result = store.delete()
 
-        if not config_file.exists():
+        if result is None:
             return {
                 "success": False,
                 "message": "No saved configuration found to delete"
             }
 
-        # Delete the file
-        config_file.unlink()
-        logger.info(f"Deleted configuration file: {config_file}")
+        logger.info(f"Deleted configuration file: {store.config_file}")
 
         return {
             "success": True,
-            "message": "Configuration deleted successfully"
+            "message": "Configuration deleted successfully",
+            "revision": result["revision"]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting configuration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -360,87 +704,335 @@ class ConfigValidateResponse(BaseModel):
     valid: bool
     errors: list
     warnings: list
+    field_errors: Dict[str, str] = {}  # Field name -> first error, as shown in the form
+
+
+class ConfigValidateItem(BaseModel):
+    """One configuration in a batch validation request."""
+    template: str
+    config: Dict[str, Any]
+    id: Optional[str] = None  # Echoed back to match results to inputs
+
+
+class ConfigValidateBatchRequest(BaseModel):
+    """Request to validate many configurations."""
+    items: List[ConfigValidateItem]
 
 
-def validate_autoscale_config(config: Dict[str, Any]) -> Dict[str, Any]:
+@router.post("/config/validate", response_model=ConfigValidateResponse)
+async def validate_configuration(request: ConfigSaveRequest):
     """
-    Validate autoscale_template configuration.
+    Validate configuration for a Terraform template.
+
+    Runs the template's @ui-validation, @ui-required and @ui-pattern rules
+    per field, then the template-level rules. Fields the form hides
+    (show-if/hide-if) are not validated.
+
+    Args:
+        request: Config with template name and values
+
+    Returns:
+        Validation result with errors, warnings and per-field errors
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if request.template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
 
-    Returns dict with 'errors' and 'warnings' lists.
+        compiled = schema_registry.get_template(get_terraform_dir(), request.template)
+        return ConfigValidateResponse(**validate_config(request.template, compiled, request.config))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error validating configuration: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/config/validate-batch")
+async def validate_configuration_batch(request: ConfigValidateBatchRequest):
     """
-    errors = []
-    warnings = []
+    Validate many configurations at once.
 
-    license_model = config.get("autoscale_license_model", "hybrid")
+    Same checks as /config/validate. Large batches are split into chunks
+    and validated in parallel worker processes.
 
-    # Validate BYOL capacity for hybrid mode
-    if license_model == "hybrid":
-        byol_min = config.get("asg_byol_asg_min_size", 1)
-        byol_max = config.get("asg_byol_asg_max_size", 2)
-        byol_desired = config.get("asg_byol_asg_desired_size", 1)
+    Args:
+        request: Items with template, config and an optional id
 
-        # In hybrid mode, BYOL provides fixed baseline - min should equal desired
-        if byol_min != byol_desired:
-            errors.append(
-                f"Hybrid mode requires BYOL min_size ({byol_min}) == desired_size ({byol_desired}) "
-                "for fixed baseline capacity. The BYOL ASG provides steady-state capacity."
+    Returns:
+        Per-item results in input order and the number of invalid items
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        unknown = sorted({item.template for item in request.items} - set(valid_templates))
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template {', '.join(unknown)}. Must be one of: {', '.join(valid_templates)}"
+            )
+        if len(request.items) > settings.validate_batch_max_items:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {settings.validate_batch_max_items} configurations per batch"
             )
 
-        # Warning: max > min allows manual scale-out (need extra licenses)
-        if byol_max > byol_min:
-            warnings.append(
-                f"BYOL max_size ({byol_max}) > min_size ({byol_min}) allows manual scale-out. "
-                "Ensure you have sufficient licenses available before manually increasing capacity."
+        started = time.perf_counter()
+        results = await batch_validator.validate(
+            get_terraform_dir(),
+            [(item.template, item.config) for item in request.items]
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        invalid = 0
+        for index, (item, result) in enumerate(zip(request.items, results)):
+            result["index"] = index
+            result["template"] = item.template
+            if item.id is not None:
+                result["id"] = item.id
+            invalid += not result["valid"]
+
+        logger.info(f"Validated {len(results)} configurations ({invalid} invalid) in {elapsed_ms:.1f}ms")
+
+        return FastJSONResponse({
+            "valid": invalid == 0,
+            "count": len(results),
+            "invalid": invalid,
+            "results": results,
+            "elapsed_ms": round(elapsed_ms, 2),
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error validating configurations: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/config/compute")
+async def compute_fields(request: ConfigComputeRequest):
+    """
+    Evaluate @ui-compute expressions for a configuration.
+
+    Expressions are compiled once per schema version. When ``changed`` is
+    given, only computed fields that depend on those fields are evaluated.
+
+    Args:
+        request: Template, current config and optionally the changed field names
+
+    Returns:
+        Computed field values
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if request.template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
             )
 
-    # Validate scale thresholds
-    scale_out = config.get("asg_scale_out_threshold", 80)
-    scale_in = config.get("asg_scale_in_threshold", 20)
+        compiled = schema_registry.get_template(get_terraform_dir(), request.template)
+        computed = compiled.compute.evaluate(request.config, changed=request.changed)
 
-    if scale_in >= scale_out:
-        errors.append(
-            f"Scale-in threshold ({scale_in}%) must be less than scale-out threshold ({scale_out}%). "
-            "Otherwise, scaling oscillation will occur."
-        )
+        return {
+            "template": request.template,
+            "computed": computed,
+        }
 
-    # Warn if thresholds are too close (< 30% gap)
-    if (scale_out - scale_in) < 30 and scale_in < scale_out:
-        warnings.append(
-            f"Scale thresholds are close ({scale_out}% out, {scale_in}% in). "
-            "Consider at least 30% gap to prevent scaling oscillation."
-        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing fields: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-    return {"errors": errors, "warnings": warnings}
 
+def _saved_cidr_entries(terraform_dir: Path, exclude: Optional[str] = None) -> List[CidrEntry]:
+    """Collect CIDR entries from the saved configs of all templates except ``exclude``."""
+    entries = []
+    for template in ['existing_vpc_resources', 'autoscale_template', 'ha_pair']:
+        if template == exclude:
+            continue
+        saved, _, _ = get_config_store(terraform_dir / template).load()
+        if saved:
+            compiled = schema_registry.get_template(terraform_dir, template)
+            entries.extend(template_entries(compiled, template, saved))
+    return entries
+
+
+async def _discovered_cidr_entries(region: str, config: Dict[str, Any]) -> List[CidrEntry]:
+    """Collect VPC/subnet/TGW route CIDRs in a region, skipping this config's cp/env resources."""
+    cp = config.get("cp", "")
+    env = config.get("env", "")
+    ec2 = get_boto3_client('ec2', region_name=region)
+    return await asyncio.to_thread(
+        entries_from_aws,
+        ec2,
+        f"aws:{region}",
+        f"{cp}-{env}-" if cp and env else None,
+    )
+
+
+@router.post("/config/cidr-check")
+async def check_cidr_overlaps(request: CidrCheckRequest):
+    """
+    Check a configuration's VPC and subnet CIDRs for overlaps.
 
-@router.post("/config/validate", response_model=ConfigValidateResponse)
-async def validate_configuration(request: ConfigSaveRequest):
+    Compares against the other CIDRs in the same config, the saved configs of
+    the other templates and, when ``region`` is given, the VPCs, subnets and
+    Transit Gateway routes already in the account. Resources named after this
+    config's cp/env are skipped so a deployed environment does not conflict
+    with itself.
+
+    Args:
+        request: Template, config and optional AWS region
+
+    Returns:
+        Conflicts (errors and warnings) and a suggested free block for each
+        conflicting VPC CIDR
     """
-    Validate configuration for a Terraform template.
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if request.template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+
+        terraform_dir = get_terraform_dir()
+        saved = _saved_cidr_entries(terraform_dir, exclude=request.template)
+        compiled = schema_registry.get_template(terraform_dir, request.template)
+        candidates = template_entries(compiled, request.template, request.config)
+        discovered = []
+        if request.region:
+            discovered = await _discovered_cidr_entries(request.region, request.config)
+
+        index = CidrIndex([*saved, *candidates, *discovered])
+        conflicts = find_conflicts(index, candidates)
+
+        suggestions = {}
+        for conflict in conflicts:
+            candidate = next(c for c in candidates if c.name == conflict["field"])
+            if conflict["severity"] == "error" and candidate.kind == KIND_VPC and candidate.name not in suggestions:
+                block = suggest_free_block(index, candidate.network)
+                if block is not None:
+                    suggestions[candidate.name] = str(block)
+                    # Reserve it so later suggestions don't reuse the block
+                    index.add(CidrEntry(block, KIND_VPC, "suggested", candidate.name))
+
+        return {
+            "valid": not any(c["severity"] == "error" for c in conflicts),
+            "conflicts": conflicts,
+            "suggestions": suggestions,
+            "checked": [c.to_dict() for c in candidates],
+            "indexed": len(index),
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error checking CIDR overlaps: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/config/cidr-plan")
+async def plan_cidrs(request: CidrPlanRequest):
+    """
+    Allocate distributed egress VPC and subnet CIDRs for many environments.
+
+    Blocks are packed into ``supernet`` with a buddy allocator, avoiding the
+    CIDRs in all saved configs and, when ``region`` is given, the VPCs,
+    subnets and Transit Gateway routes already in the account.
+
+    With ``apply``, the first environment's values are patched into the
+    existing_vpc_resources config and the whole plan is saved as a versioned
+    ``cidr_plan.json`` next to it. The distributed egress CIDRs currently in
+    that config are then not treated as in use, since the plan replaces them.
 
     Args:
-        request: Config with template name and values
+        request: Supernet, sizes, environment count and apply flag
 
     Returns:
-        Validation result with errors and warnings
+        Allocations per environment (and the new revisions when applied)
     """
     try:
-        errors = []
-        warnings = []
-
-        if request.template == "autoscale_template":
-            result = validate_autoscale_config(request.config)
-            errors.extend(result["errors"])
-            warnings.extend(result["warnings"])
-
-        return ConfigValidateResponse(
-            valid=len(errors) == 0,
-            errors=errors,
-            warnings=warnings
+        supernet = parse_network(request.supernet)
+        if supernet is None:
+            raise HTTPException(status_code=400, detail=f"Invalid supernet: {request.supernet}")
+
+        started = time.perf_counter()
+        terraform_dir = get_terraform_dir()
+        store = get_config_store(terraform_dir / 'existing_vpc_resources')
+        current, _, _ = store.load()
+
+        used = [
+            entry for entry in _saved_cidr_entries(terraform_dir)
+            if not (
+                request.apply
+                and entry.source == 'existing_vpc_resources'
+                and (is_planned_field(entry.name) or is_planned_field(entry.parent))
+            )
+        ]
+        if request.region:
+            used.extend(await _discovered_cidr_entries(request.region, current or {}))
+
+        plans = plan_distributed_egress(
+            supernet,
+            request.environments,
+            request.vpcs_per_environment,
+            request.vpc_prefixlen,
+            request.subnet_bits,
+            existing=[entry.network for entry in used],
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"Planned {request.environments} environment(s) in {supernet} "
+            f"around {len(used)} existing CIDRs in {elapsed_ms:.1f}ms"
         )
 
+        result = {
+            "success": True,
+            "supernet": str(supernet),
+            "environments": plans,
+            "reserved": len(used),
+            "elapsed_ms": round(elapsed_ms, 2),
+        }
+
+        if request.apply:
+            updates = plans[0]["config"]
+            operations = [
+                {"op": "replace" if current and name in current else "add", "path": f"/{name}", "value": value}
+                for name, value in updates.items()
+            ]
+            if current is None:
+                applied = store.save(updates, expected_revision=request.revision)
+            else:
+                applied = store.patch(operations, expected_revision=request.revision)
+            plan_store = get_config_store(terraform_dir / 'existing_vpc_resources', 'cidr_plan')
+            saved_plan = plan_store.save({
+                "request": request.model_dump(exclude={"apply", "revision"}),
+                "environments": plans,
+            })
+            result["revision"] = applied["revision"]
+            result["plan_revision"] = saved_plan["revision"]
+            result["file"] = str(plan_store.config_file)
+
+        return FastJSONResponse(result)
+
+    except HTTPException:
+        raise
+    except ConfigConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except AllocationError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error validating configuration: {str(e)}")
+        logger.error(f"Error planning CIDRs: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -456,448 +1048,506 @@ async def generate_tfvars(request: ConfigSaveRequest):
         Generated tfvars content
     """
     try:
-        # Load schema to get group structure
         terraform_dir = get_terraform_dir()
-        tfvars_path = terraform_dir / request.template / "terraform.tfvars.example"
-        schema = parse_tfvars_file(tfvars_path)
-
-        # Generate tfvars content
-        lines = []
-        lines.append("# Generated by Terraform UI")
-        lines.append("# Template: " + request.template)
-        lines.append("")
-
-        # Iterate through groups in order
-        for group in schema['groups']:
-            # Add group header
-            lines.append("#" + "=" * 100)
-            lines.append(f"# {group['name'].upper()}")
-            lines.append("#" + "=" * 100)
-
-            # Iterate through fields in this group
-            for field in group['fields']:
-                field_name = field['name']
-
-                # Skip output fields (calculated/computed values that shouldn't be in tfvars)
-                if field.get('type') == 'output':
-                    continue
-
-                # Skip UI-only fields that are converted to other variables
-                if field_name == 'create_nat_gateway_subnets':
-                    # This is converted to access_internet_mode in hidden fields
-                    continue
-
-                # Skip all FortiManager/FortiAnalyzer fields if resource is disabled
-                if request.template == "existing_vpc_resources":
-                    fortimanager_fields = [
-                        "enable_fortimanager_public_ip", "fortimanager_instance_type",
-                        "fortimanager_os_version", "fortimanager_host_ip",
-                        "fortimanager_license_file", "fortimanager_vm_name",
-                        "fortimanager_admin_password"
-                    ]
-                    if field_name in fortimanager_fields and not request.config.get("enable_fortimanager", False):
-                        continue
-
-                    fortianalyzer_fields = [
-                        "enable_fortianalyzer_public_ip", "fortianalyzer_instance_type",
-                        "fortianalyzer_os_version", "fortianalyzer_host_ip",
-                        "fortianalyzer_license_file", "fortianalyzer_vm_name",
-                        "fortianalyzer_admin_password"
-                    ]
-                    if field_name in fortianalyzer_fields and not request.config.get("enable_fortianalyzer", False):
-                        continue
-
-                    # Skip FortiTester common fields if neither FortiTester is enabled
-                    fortitester_common_fields = [
-                        "fortitester_instance_type", "fortitester_os_version",
-                        "fortitester_host_ip", "fortitester_admin_password"
-                    ]
-                    any_fortitester = request.config.get("enable_fortitester_1", False) or request.config.get("enable_fortitester_2", False)
-                    if field_name in fortitester_common_fields and not any_fortitester:
-                        continue
-
-                # Skip fields based on license model (autoscale_template)
-                if request.template == "autoscale_template":
-                    license_model = request.config.get("autoscale_license_model", "hybrid")
-
-                    # BYOL fields - skip if using on_demand only
-                    byol_fields = [
-                        "asg_byol_asg_min_size", "asg_byol_asg_max_size", "asg_byol_asg_desired_size",
-                        "asg_license_directory", "fortiflex_username", "fortiflex_password",
-                        "fortiflex_sn_list", "fortiflex_configid_list"
-                    ]
-                    if license_model == "on_demand" and field_name in byol_fields:
-                        continue
-
-                    # On-demand fields - skip if using byol only
-                    ondemand_fields = [
-                        "asg_ondemand_asg_min_size", "asg_ondemand_asg_max_size", "asg_ondemand_asg_desired_size"
-                    ]
-                    if license_model == "byol" and field_name in ondemand_fields:
-                        continue
-
-                    # Skip FortiFlex fields if not using FortiFlex (empty username)
-                    fortiflex_fields = [
-                        "fortiflex_username", "fortiflex_password",
-                        "fortiflex_sn_list", "fortiflex_configid_list"
-                    ]
-                    if field_name in fortiflex_fields and not request.config.get("fortiflex_username", ""):
-                        continue
-
-                # Skip if field not in config (e.g., computed output fields)
-                if field_name not in request.config:
-                    continue
-
-                value = request.config[field_name]
-
-                # Auto-generate attach_to_tgw_name if empty or using default value
-                if field_name == "attach_to_tgw_name" and request.template == "existing_vpc_resources":
-                    cp = request.config.get("cp", "")
-                    env = request.config.get("env", "")
-                    # If value is empty or still has default "acme-test-tgw", regenerate it
-                    if cp and env and (not value or value == "acme-test-tgw" or value.startswith("acme-")):
-                        value = f"{cp}-{env}-tgw"
-                        logger.info(f"Auto-generated attach_to_tgw_name: {value}")
-
-                # Format value based on type
-                if isinstance(value, bool):
-                    formatted_value = "true" if value else "false"
-                elif isinstance(value, (int, float)):
-                    formatted_value = str(value)
-                elif isinstance(value, str):
-                    # Fields that need to be converted from comma-separated strings to lists
-                    list_fields = [
-                        "management_cidr_sg", "fortigate_management_cidr",
-                        "fortiflex_sn_list", "fortiflex_configid_list"
-                    ]
-                    if field_name in list_fields:
-                        if value and "," in value:
-                            # Split by comma and strip whitespace
-                            items = [item.strip() for item in value.split(",") if item.strip()]
-                            # Format as Terraform list
-                            formatted_value = "[" + ", ".join(f'"{item}"' for item in items) + "]"
-                        elif value:
-                            # Single value, still convert to list
-                            formatted_value = f'["{value}"]'
-                        else:
-                            # Empty string, output empty list
-                            formatted_value = "[]"
-                    else:
-                        # Quote strings
-                        formatted_value = f'"{value}"'
-                elif isinstance(value, list):
-                    formatted_value = str(value).replace("'", '"')
-                else:
-                    formatted_value = str(value)
+        compiled = schema_registry.get_template(terraform_dir, request.template)
+
+        # Fill computed (@ui-compute) inputs the caller left empty
+        request.config, computed = compiled.with_computed(request.config)
+
+        content = render_tfvars(
+            request.template,
+            compiled,
+            request.config,
+            required_variables(terraform_dir / request.template),
+        )
+
+        filename = f"{request.template}_terraform.tfvars"
+
+        logger.info(f"Generated tfvars for {request.template}")
+
+        return ConfigGenerateResponse(
+            content=content,
+            filename=filename,
+            computed=computed
+        )
+
+    except Exception as e:
+        logger.error(f"Error generating tfvars: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/config/save-to-template")
+async def save_tfvars_to_template(request: ConfigSaveRequest):
+    """
+    Save generated terraform.tfvars directly to template directory.
+
+    Args:
+        request: Config with template name and values
+
+    Returns:
+        Success message with file path
+    """
+    try:
+        terraform_dir = get_terraform_dir()
+        compiled = schema_registry.get_template(terraform_dir, request.template)
+
+        # Fill computed (@ui-compute) inputs the caller left empty
+        request.config, computed = compiled.with_computed(request.config)
+
+        content = render_tfvars(
+            request.template,
+            compiled,
+            request.config,
+            required_variables(terraform_dir / request.template),
+        )
+
+        # Write to terraform.tfvars in template directory
+        output_file = terraform_dir / request.template / "terraform.tfvars"
+        with open(output_file, 'w') as f:
+            f.write(content)
+        discard_plan(output_file.parent)
+
+        logger.info(f"Saved terraform.tfvars to {output_file}")
+
+        return {
+            "success": True,
+            "message": "terraform.tfvars saved successfully",
+            "file": str(output_file)
+        }
+
+    except Exception as e:
+        logger.error(f"Error saving tfvars to template: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/license-files")
+async def list_license_files(template: str = Query(...)):
+    """
+    List all .lic files in the template directory.
+
+    Served from a pruned, watched index (see app/services/license_index.py),
+    so ``.terraform`` trees are never walked.
+
+    Args:
+        template: Template name (e.g., "existing_vpc_resources")
+
+    Returns:
+        License file options (path relative to template directory, size,
+        mtime and license metadata)
+    """
+    try:
+        return FastJSONResponse(license_file_options(template))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing license files: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def license_file_options(template: str) -> List[Dict[str, Any]]:
+    """License file select options for a template, PAYG first (404 for unknown templates)."""
+    terraform_dir = get_terraform_dir()
+    template_dir = terraform_dir / template
+
+    # Only template directories (not "..") get an index and a watcher
+    if not template_dir.is_dir() or template_dir.resolve().parent != terraform_dir.resolve():
+        raise HTTPException(status_code=404, detail=f"Template '{template}' not found")
+
+    license_files = [f.to_option() for f in get_license_index(template_dir).files()]
+
+    # Add empty option at the beginning for PAYG
+    license_files.insert(0, {"value": "", "label": "(None - Use PAYG)"})
+
+    logger.info(f"Found {len(license_files) - 1} license files in {template}")
+    return license_files
+
+
+@router.get("/diagram")
+async def get_state_diagram(
+    template: str = Query(..., description="Template name"),
+    format: str = Query("mermaid", description="Output format: mermaid, dot or svg"),
+    workspace: Optional[str] = Query(None, description="Workspace (cp-env) whose state to draw instead of the template directory's")
+):
+    """
+    Render a network diagram from the template's (or workspace's) terraform.tfstate.
+
+    Works without AWS credentials since all data comes from local state.
+
+    Args:
+        template: Template name
+        format: Output format
+        workspace: Workspace name (cp-env) created with POST /workspaces
+
+    Returns:
+        Diagram content with snapshot hash and graph stats
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+        if format not in SUPPORTED_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid format. Must be one of: {', '.join(SUPPORTED_FORMATS)}"
+            )
+
+        terraform_dir = get_terraform_dir()
+        working_dir = terraform_dir / template
+        if workspace:
+            try:
+                working_dir = await asyncio.to_thread(workspace_directory, terraform_dir, template, workspace)
+            except WorkspaceError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+
+        state_file = working_dir / "terraform.tfstate"
+        if not state_file.exists():
+            raise HTTPException(status_code=404, detail=f"No terraform state found for {build_key(template, workspace)}")
+
+        import json
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+
+        result = render_diagram(inventory_from_tfstate(state), format)
+        return FastJSONResponse({"template": template, "workspace": workspace, **result})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering state diagram: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _state_inventories(terraform_dir: Path) -> Dict[str, Dict[str, List[dict]]]:
+    """
+    Fortinet-Role inventory of every working directory that has a terraform.tfstate.
+
+    Covers the template directories and every workspace, keyed by build key
+    (``template`` or ``template/workspace``), so a resource managed from any
+    of them is never reported as extra.
+    """
+    import json
+    valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+    directories = [(template, terraform_dir / template) for template in valid_templates]
+    directories += [
+        (build_key(entry["template"], entry["workspace"]), Path(entry["path"]))
+        for entry in get_workspace_manager(terraform_dir).list_workspaces()
+        if entry["template"] in valid_templates
+    ]
+    states = {}
+    for key, directory in directories:
+        state_file = directory / "terraform.tfstate"
+        if state_file.exists():
+            with open(state_file, 'r') as f:
+                states[key] = inventory_from_tfstate(json.load(f), foreign_routes=True)
+    return states
+
+
+@router.get("/drift")
+async def detect_state_drift(
+    template: str = Query(..., description="Template name"),
+    region: Optional[str] = Query(None, description="AWS region (default: the template's aws_region)"),
+    cp: Optional[str] = Query(None, description="Customer prefix (default: the template's cp)"),
+    env: Optional[str] = Query(None, description="Environment (default: the template's env)"),
+    workspace: Optional[str] = Query(None, description="Workspace (cp-env) whose state to compare instead of the template directory's")
+):
+    """
+    Compare the template's (or workspace's) terraform.tfstate with the live Fortinet-Role inventory.
+
+    Detects console edits to VPCs, subnets, route tables, TGW attachments and
+    their tags from one discovery snapshot instead of a terraform plan (see
+    app/services/drift.py).
+
+    Args:
+        template: Template name
+        region: AWS region
+        cp: Customer prefix
+        env: Environment name
+        workspace: Workspace name (cp-env) created with POST /workspaces;
+            cp and env are then required unless the saved configuration names it
+
+    Returns:
+        Drift report with summary counts and missing, extra, modified and
+        unchecked resources
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
 
-                lines.append(f"{field_name} = {formatted_value}")
+        terraform_dir = get_terraform_dir()
+        key = build_key(template, workspace)
+        if workspace:
+            try:
+                await asyncio.to_thread(workspace_directory, terraform_dir, template, workspace)
+            except WorkspaceError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+
+        saved, _, _ = get_config_store(terraform_dir / template).load()
+        saved = saved or {}
+        region = region or saved.get("aws_region")
+        if workspace and not (cp and env):
+            # The saved configuration may belong to another cp/env; only trust it if it names this workspace
+            if saved.get("cp") and saved.get("env") and f"{saved['cp']}-{saved['env']}" == workspace:
+                cp, env = cp or saved["cp"], env or saved["env"]
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"cp and env are required for workspace {workspace}"
+                )
+        cp = cp or saved.get("cp")
+        env = env or saved.get("env")
+        if not (region and cp and env):
+            raise HTTPException(
+                status_code=400,
+                detail="region, cp and env are required (pass them or save the template's configuration first)"
+            )
 
-            lines.append("")  # Blank line between groups
+        started = time.perf_counter()
+        states = await asyncio.to_thread(_state_inventories, terraform_dir)
+        if key not in states:
+            raise HTTPException(status_code=404, detail=f"No terraform state found for {key}")
+        state_ms = (time.perf_counter() - started) * 1000
 
-        content = "\n".join(lines)
+        snapshot = await find_fortinet_resources(region, cp, env)
+        discovery_ms = (time.perf_counter() - started) * 1000 - state_ms
 
-        # Add hidden/derived fields that aren't in the UI but required by Terraform
-        hidden_fields = []
-        if "vpc_cidr_inspection" in request.config:
-            hidden_fields.append(f'vpc_cidr_ns_inspection = "{request.config["vpc_cidr_inspection"]}"')
-        if "vpc_cidr_west" in request.config or "vpc_cidr_east" in request.config:
-            hidden_fields.append('vpc_cidr_spoke = "192.168.0.0/16"')
-        if "linux_host_ip" in request.config:
-            hidden_fields.append('acl = "private"')
+        report = detect_drift(states, snapshot["resources"], snapshot["prefix"], templates=[key])
+        total_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"Drift for {template} ({snapshot['prefix']} in {region}): "
+            f"{report['summary']['missing']} missing, {report['summary']['extra']} extra, "
+            f"{report['summary']['modified']} modified in {total_ms:.0f} ms"
+        )
+        return FastJSONResponse({
+            "template": template,
+            "workspace": workspace,
+            "prefix": snapshot["prefix"],
+            "region": region,
+            "drifted": bool(report["summary"]["missing"] or report["summary"]["extra"] or report["summary"]["modified"]),
+            **report,
+            "timings_ms": {
+                "state": round(state_ms, 1),
+                "discovery": round(discovery_ms, 1),
+                "diff": round(total_ms - state_ms - discovery_ms, 1),
+                "total": round(total_ms, 1),
+            },
+        })
 
-        # Template-specific hidden fields
-        if request.template == "existing_vpc_resources":
-            # Convert create_nat_gateway_subnets checkbox to access_internet_mode
-            create_nat_gw = request.config.get("create_nat_gateway_subnets", False)
-            access_mode = "nat_gw" if create_nat_gw else "eip"
-            hidden_fields.append(f'access_internet_mode = "{access_mode}"')
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error detecting drift: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if request.template == "autoscale_template":
-            # acl is required by autoscale_template but not shown in UI
-            hidden_fields.append('acl = "private"')
 
-        if request.template == "ha_pair":
-            # acl is required by ha_pair but not shown in UI
-            hidden_fields.append('acl = "private"')
+def build_key(template: str, workspace: Optional[str] = None) -> str:
+    """Scheduler key of a build's working directory."""
+    return f"{template}/{workspace}" if workspace else template
 
-        if hidden_fields:
-            content += "\n\n# Hidden fields (required by Terraform, auto-generated)\n"
-            content += "\n".join(hidden_fields)
 
-        filename = f"{request.template}_terraform.tfvars"
+def workspace_directory(terraform_dir: Path, template: str, workspace: str) -> Path:
+    """Refresh an existing workspace's source links and return its directory."""
+    manager = get_workspace_manager(terraform_dir)
+    if not manager.exists(template, workspace):
+        raise WorkspaceError(
+            f"Workspace {workspace} of {template} does not exist. Create it first (POST /api/terraform/workspaces)."
+        )
+    return Path(manager.sync(template, workspace)["path"])
 
-        logger.info(f"Generated tfvars for {request.template}")
 
-        return ConfigGenerateResponse(
-            content=content,
-            filename=filename
-        )
+@router.get("/workspaces")
+async def list_workspaces(template: Optional[str] = Query(None, description="Only this template's workspaces")):
+    """
+    List per-environment workspaces and the build queue.
 
+    Returns:
+        Workspaces with whether they have tfvars and state, and the running
+        and queued builds
+    """
+    try:
+        manager = get_workspace_manager(get_terraform_dir())
+        workspaces = await asyncio.to_thread(manager.list_workspaces, template)
+        for entry in workspaces:
+            key = build_key(entry["template"], entry["workspace"])
+            entry["building"] = key in build_scheduler.running
+            entry["queued"] = key in build_scheduler.queued
+        return {"workspaces": workspaces, "builds": build_scheduler.status()}
     except Exception as e:
-        logger.error(f"Error generating tfvars: {str(e)}")
+        logger.error(f"Error listing workspaces: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/config/save-to-template")
-async def save_tfvars_to_template(request: ConfigSaveRequest):
+@router.post("/workspaces")
+async def create_workspace(request: ConfigSaveRequest):
     """
-    Save generated terraform.tfvars directly to template directory.
+    Create (or refresh) the workspace for a configuration's cp/env and write its terraform.tfvars.
+
+    The workspace links the template's sources and keeps its own state and
+    tfvars, so several environments of one template can be built at once
+    (GET /build/{template}?workspace=...).
 
     Args:
-        request: Config with template name and values
+        request: Config with template name and values (cp and env name the workspace)
 
     Returns:
-        Success message with file path
+        Workspace name, directory and link counts
     """
     try:
-        # Generate tfvars content (reuse the generation logic)
-        terraform_dir = get_terraform_dir()
-        tfvars_path = terraform_dir / request.template / "terraform.tfvars.example"
-        schema = parse_tfvars_file(tfvars_path)
-
-        # Generate tfvars content
-        lines = []
-        lines.append("# Generated by Terraform UI")
-        lines.append("# Template: " + request.template)
-        lines.append("")
-
-        # Iterate through groups in order
-        for group in schema['groups']:
-            # Add group header
-            lines.append("#" + "=" * 100)
-            lines.append(f"# {group['name'].upper()}")
-            lines.append("#" + "=" * 100)
-
-            # Iterate through fields in this group
-            for field in group['fields']:
-                field_name = field['name']
-
-                # Skip output fields (calculated/computed values that shouldn't be in tfvars)
-                if field.get('type') == 'output':
-                    continue
-
-                # Skip UI-only fields that are converted to other variables
-                if field_name == 'create_nat_gateway_subnets':
-                    # This is converted to access_internet_mode in hidden fields
-                    continue
-
-                # Skip all FortiManager/FortiAnalyzer fields if resource is disabled
-                if request.template == "existing_vpc_resources":
-                    fortimanager_fields = [
-                        "enable_fortimanager_public_ip", "fortimanager_instance_type",
-                        "fortimanager_os_version", "fortimanager_host_ip",
-                        "fortimanager_license_file", "fortimanager_vm_name",
-                        "fortimanager_admin_password"
-                    ]
-                    if field_name in fortimanager_fields and not request.config.get("enable_fortimanager", False):
-                        continue
-
-                    fortianalyzer_fields = [
-                        "enable_fortianalyzer_public_ip", "fortianalyzer_instance_type",
-                        "fortianalyzer_os_version", "fortianalyzer_host_ip",
-                        "fortianalyzer_license_file", "fortianalyzer_vm_name",
-                        "fortianalyzer_admin_password"
-                    ]
-                    if field_name in fortianalyzer_fields and not request.config.get("enable_fortianalyzer", False):
-                        continue
-
-                    # Skip FortiTester common fields if neither FortiTester is enabled
-                    fortitester_common_fields = [
-                        "fortitester_instance_type", "fortitester_os_version",
-                        "fortitester_host_ip", "fortitester_admin_password"
-                    ]
-                    any_fortitester = request.config.get("enable_fortitester_1", False) or request.config.get("enable_fortitester_2", False)
-                    if field_name in fortitester_common_fields and not any_fortitester:
-                        continue
-
-                # Skip fields based on license model (autoscale_template)
-                if request.template == "autoscale_template":
-                    license_model = request.config.get("autoscale_license_model", "hybrid")
-
-                    # BYOL fields - skip if using on_demand only
-                    byol_fields = [
-                        "asg_byol_asg_min_size", "asg_byol_asg_max_size", "asg_byol_asg_desired_size",
-                        "asg_license_directory", "fortiflex_username", "fortiflex_password",
-                        "fortiflex_sn_list", "fortiflex_configid_list"
-                    ]
-                    if license_model == "on_demand" and field_name in byol_fields:
-                        continue
-
-                    # On-demand fields - skip if using byol only
-                    ondemand_fields = [
-                        "asg_ondemand_asg_min_size", "asg_ondemand_asg_max_size", "asg_ondemand_asg_desired_size"
-                    ]
-                    if license_model == "byol" and field_name in ondemand_fields:
-                        continue
-
-                    # Skip FortiFlex fields if not using FortiFlex (empty username)
-                    fortiflex_fields = [
-                        "fortiflex_username", "fortiflex_password",
-                        "fortiflex_sn_list", "fortiflex_configid_list"
-                    ]
-                    if field_name in fortiflex_fields and not request.config.get("fortiflex_username", ""):
-                        continue
-
-                # Skip if field not in config (e.g., computed output fields)
-                if field_name not in request.config:
-                    continue
-
-                value = request.config[field_name]
-
-                # Auto-generate attach_to_tgw_name if empty or using default value
-                if field_name == "attach_to_tgw_name" and request.template == "existing_vpc_resources":
-                    cp = request.config.get("cp", "")
-                    env = request.config.get("env", "")
-                    # If value is empty or still has default "acme-test-tgw", regenerate it
-                    if cp and env and (not value or value == "acme-test-tgw" or value.startswith("acme-")):
-                        value = f"{cp}-{env}-tgw"
-                        logger.info(f"Auto-generated attach_to_tgw_name: {value}")
-
-                # Format value based on type
-                if isinstance(value, bool):
-                    formatted_value = "true" if value else "false"
-                elif isinstance(value, (int, float)):
-                    formatted_value = str(value)
-                elif isinstance(value, str):
-                    # Fields that need to be converted from comma-separated strings to lists
-                    list_fields = [
-                        "management_cidr_sg", "fortigate_management_cidr",
-                        "fortiflex_sn_list", "fortiflex_configid_list"
-                    ]
-                    if field_name in list_fields:
-                        if value and "," in value:
-                            # Split by comma and strip whitespace
-                            items = [item.strip() for item in value.split(",") if item.strip()]
-                            # Format as Terraform list
-                            formatted_value = "[" + ", ".join(f'"{item}"' for item in items) + "]"
-                        elif value:
-                            # Single value, still convert to list
-                            formatted_value = f'["{value}"]'
-                        else:
-                            # Empty string, output empty list
-                            formatted_value = "[]"
-                    else:
-                        # Quote strings
-                        formatted_value = f'"{value}"'
-                elif isinstance(value, list):
-                    formatted_value = str(value).replace("'", '"')
-                else:
-                    formatted_value = str(value)
-
-                lines.append(f"{field_name} = {formatted_value}")
-
-            lines.append("")  # Blank line between groups
-
-        content = "\n".join(lines)
-
-        # Add hidden/derived fields that aren't in the UI but required by Terraform
-        hidden_fields = []
-        if "vpc_cidr_inspection" in request.config:
-            hidden_fields.append(f'vpc_cidr_ns_inspection = "{request.config["vpc_cidr_inspection"]}"')
-        if "vpc_cidr_west" in request.config or "vpc_cidr_east" in request.config:
-            hidden_fields.append('vpc_cidr_spoke = "192.168.0.0/16"')
-        if "linux_host_ip" in request.config:
-            hidden_fields.append('acl = "private"')
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if request.template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+        try:
+            name = workspace_name(str(request.config.get("cp", "")), str(request.config.get("env", "")))
+        except WorkspaceError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        # Template-specific hidden fields
-        if request.template == "existing_vpc_resources":
-            # Convert create_nat_gateway_subnets checkbox to access_internet_mode
-            create_nat_gw = request.config.get("create_nat_gateway_subnets", False)
-            access_mode = "nat_gw" if create_nat_gw else "eip"
-            hidden_fields.append(f'access_internet_mode = "{access_mode}"')
+        terraform_dir = get_terraform_dir()
+        compiled = schema_registry.get_template(terraform_dir, request.template)
 
-        if request.template == "autoscale_template":
-            # acl is required by autoscale_template but not shown in UI
-            hidden_fields.append('acl = "private"')
+        # Fill computed (@ui-compute) inputs the caller left empty
+        request.config, computed = compiled.with_computed(request.config)
 
-        if request.template == "ha_pair":
-            # acl is required by ha_pair but not shown in UI
-            hidden_fields.append('acl = "private"')
+        content = render_tfvars(
+            request.template,
+            compiled,
+            request.config,
+            required_variables(terraform_dir / request.template),
+        )
 
-        if hidden_fields:
-            content += "\n\n# Hidden fields (required by Terraform, auto-generated)\n"
-            content += "\n".join(hidden_fields)
+        key = build_key(request.template, name)
+        if key in build_scheduler.running:
+            raise HTTPException(status_code=409, detail=f"A build of {key} is running")
 
-        # Write to terraform.tfvars in template directory
-        output_file = terraform_dir / request.template / "terraform.tfvars"
+        result = await asyncio.to_thread(get_workspace_manager(terraform_dir).sync, request.template, name)
+        output_file = Path(result["path"]) / "terraform.tfvars"
         with open(output_file, 'w') as f:
             f.write(content)
+        discard_plan(output_file.parent)
 
-        logger.info(f"Saved terraform.tfvars to {output_file}")
+        logger.info(f"Saved terraform.tfvars to workspace {key}")
 
         return {
             "success": True,
-            "message": "terraform.tfvars saved successfully",
+            "template": request.template,
+            "workspace": name,
+            **result,
             "file": str(output_file)
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error saving tfvars to template: {str(e)}")
+        logger.error(f"Error creating workspace: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/license-files")
-async def list_license_files(template: str = Query(...)):
+@router.delete("/workspaces/{template}/{workspace}")
+async def delete_workspace(template: str, workspace: str):
     """
-    List all .lic files in the template directory.
+    Delete a workspace. Refused while its state still has resources (destroy them first).
 
     Args:
-        template: Template name (e.g., "existing_vpc_resources")
+        template: Template name
+        workspace: Workspace name (cp-env)
 
     Returns:
-        List of license file paths relative to template directory
+        Success message
     """
     try:
-        terraform_dir = get_terraform_dir()
-        template_dir = terraform_dir / template
-
-        if not template_dir.exists():
-            raise HTTPException(status_code=404, detail=f"Template '{template}' not found")
-
-        # Find all .lic files recursively
-        license_files = []
-        for lic_file in template_dir.rglob("*.lic"):
-            # Get path relative to template directory
-            rel_path = lic_file.relative_to(template_dir)
-            license_files.append({
-                "value": f"./{rel_path}",
-                "label": str(rel_path)
-            })
-
-        # Sort by label
-        license_files.sort(key=lambda x: x["label"])
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+        key = build_key(template, workspace)
+        if key in build_scheduler.running or key in build_scheduler.queued:
+            raise HTTPException(status_code=409, detail=f"A build of {key} is running or queued")
 
-        # Add empty option at the beginning for PAYG
-        license_files.insert(0, {"value": "", "label": "(None - Use PAYG)"})
+        manager = get_workspace_manager(get_terraform_dir())
+        try:
+            exists = manager.exists(template, workspace)
+        except WorkspaceError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not exists:
+            raise HTTPException(status_code=404, detail=f"Workspace {key} does not exist")
+        try:
+            await asyncio.to_thread(manager.remove, template, workspace)
+        except WorkspaceError as e:
+            raise HTTPException(status_code=409, detail=str(e))
 
-        logger.info(f"Found {len(license_files) - 1} license files in {template}")
-        return license_files
+        return {"success": True, "message": f"Workspace {key} deleted"}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error listing license files: {str(e)}")
+        logger.error(f"Error deleting workspace: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def run_command_stream(command: list, cwd: Path):
+def command_step(command: list) -> str:
+    """Build step label for metrics ("init", "plan", ..., "verify_all")."""
+    if Path(command[0]).name == "terraform" and len(command) > 1:
+        return command[1]
+    return Path(command[0]).stem
+
+
+def start_build_job(template: str, kind: str, working_dir: Path, workspace: Optional[str] = None) -> Optional[BuildJob]:
+    """Start recording a build in the build history (None if disabled or unavailable)."""
+    try:
+        history = get_build_history(get_terraform_dir())
+        return history.start(template, kind, working_dir, workspace) if history else None
+    except Exception as e:
+        logger.warning(f"Build history unavailable: {str(e)}")
+        return None
+
+
+async def run_command_stream(command: list, cwd: Path, job: Optional[BuildJob] = None):
     """
     Run a command and stream output line by line.
 
+    The runtime is recorded in the ``build_subprocess_duration_seconds``
+    metric, labelled with the build step and outcome. Terraform runs with the
+    shared provider cache (``TF_PLUGIN_CACHE_DIR``), and ``init`` waits for any
+    other ``init`` to finish.
+
     Args:
         command: Command and arguments as list
         cwd: Working directory
+        job: Build history job to record the step and its resource timings in
 
     Yields:
         Tuple of (line, exit_code) where exit_code is None until process completes
     """
+    # Concurrent builds share the provider cache, which is not safe for concurrent init
+    init_lock = build_scheduler.init_lock if command_step(command) == "init" and uses_plugin_cache() else None
+    if init_lock is not None:
+        if init_lock.locked():
+            yield ("Waiting for another terraform init to finish (shared provider cache)...\n", None)
+        await init_lock.acquire()
+
+    started = time.perf_counter()
+    outcome = "cancelled"  # client disconnected before the process finished
+    recorder = job.step(command_step(command), command) if job is not None else None
+    exit_code = None
     try:
         # Start the process
         process = await asyncio.create_subprocess_exec(
             *command,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,
-            cwd=str(cwd)
+            cwd=str(cwd),
+            env=subprocess_env(get_workspace_manager(get_terraform_dir()))
         )
 
         # Stream output line by line
@@ -905,37 +1555,59 @@ async def run_command_stream(command: list, cwd: Path):
             line = await process.stdout.readline()
             if not line:
                 break
-            yield (line.decode('utf-8', errors='replace'), None)
+            text = line.decode('utf-8', errors='replace')
+            if recorder is not None:
+                recorder.feed(text)
+            yield (text, None)
 
         # Wait for process to complete
         await process.wait()
+        outcome = "success" if process.returncode == 0 else "failure"
+        exit_code = process.returncode
 
         # Yield exit code
         yield (f"\n[Exit code: {process.returncode}]\n", process.returncode)
 
     except Exception as e:
+        outcome = "error"
+        exit_code = 1
         yield (f"\n[Error: {str(e)}]\n", 1)
 
+    finally:
+        SUBPROCESS_SECONDS.labels(command_step(command), outcome).observe(time.perf_counter() - started)
+        if recorder is not None:
+            recorder.finish(exit_code)
+        if init_lock is not None:
+            init_lock.release()
+
 
 @router.get("/build/{template}")
-async def build_infrastructure(template: str):
+async def build_infrastructure(
+    template: str,
+    workspace: Optional[str] = Query(None, description="Workspace (cp-env) to build in instead of the template directory")
+):
     """
     Run Terraform deployment process with real-time output streaming.
 
     Executes:
     1. terraform init
-    2. terraform plan
-    3. terraform apply -auto-approve
+    2. terraform plan -out=tfplan (summarized by GET /plan/summary)
+    3. terraform apply tfplan (the plan is deleted afterwards)
     4. generate_verification_data.sh
     5. verify_all.sh --verify all
 
+    Builds run in parallel up to BUILD_MAX_PARALLEL, one at a time per
+    working directory; a build that has to wait says so first.
+
     Args:
         template: Template name (e.g., "existing_vpc_resources")
+        workspace: Workspace name (cp-env) created with POST /workspaces
 
     Returns:
         Streaming response with command output
     """
     async def generate():
+        job = None
         try:
             # Validate template
             valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
@@ -943,7 +1615,7 @@ async def build_infrastructure(template: str):
                 yield f"Error: Invalid template. Must be one of: {', '.join(valid_templates)}\n"
                 return
 
-            # Get template directory
+            # Get template directory (or the workspace's)
             terraform_dir = get_terraform_dir()
             template_dir = terraform_dir / template
 
@@ -951,12 +1623,21 @@ async def build_infrastructure(template: str):
                 yield f"Error: Template directory not found: {template_dir}\n"
                 return
 
+            if workspace:
+                try:
+                    template_dir = await asyncio.to_thread(workspace_directory, terraform_dir, template, workspace)
+                except WorkspaceError as e:
+                    yield f"Error: {str(e)}\n"
+                    return
+
             # Check if terraform.tfvars exists
             tfvars_file = template_dir / "terraform.tfvars"
             if not tfvars_file.exists():
                 yield f"Error: terraform.tfvars not found. Please generate it first.\n"
                 return
 
+            job = await asyncio.to_thread(start_build_job, template, "build", template_dir, workspace)
+
             yield f"=== Starting Terraform Deployment for {template} ===\n"
             yield f"Working directory: {template_dir}\n\n"
 
@@ -965,7 +1646,7 @@ async def build_infrastructure(template: str):
             yield "STEP 1: terraform init\n"
             yield "=" * 80 + "\n"
             init_failed = False
-            async for line, exit_code in run_command_stream(['terraform', 'init'], template_dir):
+            async for line, exit_code in run_command_stream(['terraform', 'init'], template_dir, job):
                 yield line
                 if exit_code is not None and exit_code != 0:
                     init_failed = True
@@ -979,10 +1660,10 @@ async def build_infrastructure(template: str):
 
             # Step 2: terraform plan
             yield "\n" + "=" * 80 + "\n"
-            yield "STEP 2: terraform plan\n"
+            yield f"STEP 2: terraform plan -out={PLAN_FILE}\n"
             yield "=" * 80 + "\n"
             plan_failed = False
-            async for line, exit_code in run_command_stream(['terraform', 'plan'], template_dir):
+            async for line, exit_code in run_command_stream(['terraform', 'plan', f'-out={PLAN_FILE}'], template_dir, job):
                 yield line
                 if exit_code is not None and exit_code != 0:
                     plan_failed = True
@@ -996,10 +1677,13 @@ async def build_infrastructure(template: str):
 
             # Step 3: terraform apply
             yield "\n" + "=" * 80 + "\n"
-            yield "STEP 3: terraform apply -auto-approve\n"
+            yield f"STEP 3: terraform apply {PLAN_FILE}\n"
             yield "=" * 80 + "\n"
-            async for line, exit_code in run_command_stream(['terraform', 'apply', '-auto-approve'], template_dir):
-                yield line
+            try:
+                async for line, exit_code in run_command_stream(['terraform', 'apply', PLAN_FILE], template_dir, job):
+                    yield line
+            finally:
+                discard_plan(template_dir)
 
             # Steps 4 & 5: Verification scripts (only for existing_vpc_resources)
             if template == "existing_vpc_resources":
@@ -1013,7 +1697,7 @@ async def build_infrastructure(template: str):
                         yield "STEP 4: generate_verification_data.sh\n"
                         yield "=" * 80 + "\n"
                         gen_failed = False
-                        async for line, exit_code in run_command_stream(['./generate_verification_data.sh'], verify_scripts_dir):
+                        async for line, exit_code in run_command_stream(['./generate_verification_data.sh'], verify_scripts_dir, job):
                             yield line
                             if exit_code is not None and exit_code != 0:
                                 gen_failed = True
@@ -1032,7 +1716,7 @@ async def build_infrastructure(template: str):
                         yield "STEP 5: verify_all.sh --verify all\n"
                         yield "=" * 80 + "\n"
                         verify_failed = False
-                        async for line, exit_code in run_command_stream(['./verify_all.sh', '--verify', 'all'], verify_scripts_dir):
+                        async for line, exit_code in run_command_stream(['./verify_all.sh', '--verify', 'all'], verify_scripts_dir, job):
                             yield line
                             if exit_code is not None and exit_code != 0:
                                 verify_failed = True
@@ -1049,25 +1733,37 @@ async def build_infrastructure(template: str):
             yield "=" * 80 + "\n"
 
         except Exception as e:
+            if job is not None:
+                job.finish("failed")
             logger.error(f"Error during build: {str(e)}")
             yield f"\nError during build: {str(e)}\n"
 
-    return StreamingResponse(generate(), media_type="text/plain")
+        finally:
+            if job is not None:
+                job.finish()
+
+    return StreamingResponse(build_scheduler.run(build_key(template, workspace), generate()), media_type="text/plain")
 
 
 @router.get("/build/{template}/{step}")
-async def build_step(template: str, step: str):
+async def build_step(
+    template: str,
+    step: str,
+    workspace: Optional[str] = Query(None, description="Workspace (cp-env) to build in instead of the template directory")
+):
     """
     Run a single Terraform build step with real-time output streaming.
 
     Args:
         template: Template name (e.g., "existing_vpc_resources")
         step: Step to run (init, plan, apply, verify_data, verify_all)
+        workspace: Workspace name (cp-env) created with POST /workspaces
 
     Returns:
         Streaming response with command output
     """
     async def generate():
+        job = None
         try:
             # Validate template
             valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
@@ -1075,7 +1771,7 @@ async def build_step(template: str, step: str):
                 yield f"Error: Invalid template. Must be one of: {', '.join(valid_templates)}\n"
                 return
 
-            # Get template directory
+            # Get template directory (or the workspace's)
             terraform_dir = get_terraform_dir()
             template_dir = terraform_dir / template
 
@@ -1083,6 +1779,13 @@ async def build_step(template: str, step: str):
                 yield f"Error: Template directory not found: {template_dir}\n"
                 return
 
+            if workspace:
+                try:
+                    template_dir = await asyncio.to_thread(workspace_directory, terraform_dir, template, workspace)
+                except WorkspaceError as e:
+                    yield f"Error: {str(e)}\n"
+                    return
+
             # Check if terraform.tfvars exists (except for init)
             if step != "init":
                 tfvars_file = template_dir / "terraform.tfvars"
@@ -1090,6 +1793,8 @@ async def build_step(template: str, step: str):
                     yield f"Error: terraform.tfvars not found. Please generate it first.\n"
                     return
 
+            job = await asyncio.to_thread(start_build_job, template, "step", template_dir, workspace)
+
             yield f"=== Running {step} for {template} ===\n"
             yield f"Working directory: {template_dir}\n\n"
 
@@ -1098,29 +1803,40 @@ async def build_step(template: str, step: str):
                 yield "=" * 80 + "\n"
                 yield "terraform init\n"
                 yield "=" * 80 + "\n"
-                async for line, exit_code in run_command_stream(['terraform', 'init'], template_dir):
+                async for line, exit_code in run_command_stream(['terraform', 'init'], template_dir, job):
                     yield line
 
             elif step == "plan":
                 yield "=" * 80 + "\n"
-                yield "terraform plan\n"
+                yield f"terraform plan -out={PLAN_FILE}\n"
                 yield "=" * 80 + "\n"
-                async for line, exit_code in run_command_stream(['terraform', 'plan'], template_dir):
+                async for line, exit_code in run_command_stream(['terraform', 'plan', f'-out={PLAN_FILE}'], template_dir, job):
                     yield line
 
             elif step == "apply":
+                # Apply the reviewed plan; without one (or with an outdated one) plan again
+                reason = stale_reason(template_dir)
+                if reason and discard_plan(template_dir):
+                    yield f"Saved plan discarded: {reason}\n"
+                command = ['terraform', 'apply', PLAN_FILE] if (template_dir / PLAN_FILE).exists() else ['terraform', 'apply', '-auto-approve']
                 yield "=" * 80 + "\n"
-                yield "terraform apply -auto-approve\n"
+                yield " ".join(command) + "\n"
                 yield "=" * 80 + "\n"
-                async for line, exit_code in run_command_stream(['terraform', 'apply', '-auto-approve'], template_dir):
-                    yield line
+                try:
+                    async for line, exit_code in run_command_stream(command, template_dir, job):
+                        yield line
+                finally:
+                    discard_plan(template_dir)
 
             elif step == "destroy":
                 yield "=" * 80 + "\n"
                 yield "terraform destroy -auto-approve\n"
                 yield "=" * 80 + "\n"
-                async for line, exit_code in run_command_stream(['terraform', 'destroy', '-auto-approve'], template_dir):
-                    yield line
+                try:
+                    async for line, exit_code in run_command_stream(['terraform', 'destroy', '-auto-approve'], template_dir, job):
+                        yield line
+                finally:
+                    discard_plan(template_dir)
 
             elif step == "verify_data":
                 if template == "existing_vpc_resources":
@@ -1130,7 +1846,7 @@ async def build_step(template: str, step: str):
                         yield "=" * 80 + "\n"
                         yield "generate_verification_data.sh\n"
                         yield "=" * 80 + "\n"
-                        async for line, exit_code in run_command_stream(['./generate_verification_data.sh'], verify_scripts_dir):
+                        async for line, exit_code in run_command_stream(['./generate_verification_data.sh'], verify_scripts_dir, job):
                             yield line
                     else:
                         yield "Error: generate_verification_data.sh not found\n"
@@ -1145,7 +1861,7 @@ async def build_step(template: str, step: str):
                         yield "=" * 80 + "\n"
                         yield "verify_all.sh --verify all\n"
                         yield "=" * 80 + "\n"
-                        async for line, exit_code in run_command_stream(['./verify_all.sh', '--verify', 'all'], verify_scripts_dir):
+                        async for line, exit_code in run_command_stream(['./verify_all.sh', '--verify', 'all'], verify_scripts_dir, job):
                             yield line
                     else:
                         yield "Error: verify_all.sh not found\n"
@@ -1161,10 +1877,389 @@ async def build_step(template: str, step: str):
             yield "=" * 80 + "\n"
 
         except Exception as e:
+            if job is not None:
+                job.finish("failed")
             logger.error(f"Error during build step {step}: {str(e)}")
             yield f"\nError during {step}: {str(e)}\n"
 
-    return StreamingResponse(generate(), media_type="text/plain")
+        finally:
+            if job is not None:
+                job.finish()
+
+    return StreamingResponse(build_scheduler.run(build_key(template, workspace), generate()), media_type="text/plain")
+
+
+def _template_directory(terraform_dir: Path, workspace: Optional[str]) -> Callable[[str], Path]:
+    """Working directory of each template of an orchestrated run."""
+    if workspace:
+        return lambda template: workspace_directory(terraform_dir, template, workspace)
+    return lambda template: terraform_dir / template
+
+
+@router.post("/orchestrate", status_code=202)
+async def start_orchestration(request: OrchestrateRequest):
+    """
+    Deploy or destroy several templates in dependency order, in the background.
+
+    Replaces deploy_all.sh / destroy_all.sh. Dependencies come from the
+    templates' inheritance (autoscale_template and ha_pair build on
+    existing_vpc_resources): deploy runs upstreams first, destroy runs them
+    last, and independent templates run concurrently. Transient AWS/terraform
+    failures are retried with backoff. Templates without terraform.tfvars
+    (deploy) or without resources in state (destroy) are skipped.
+
+    Args:
+        request: Action, templates and optional workspace
+
+    Returns:
+        The run record (poll GET /orchestrate/{run_id}; logs at
+        GET /orchestrate/{run_id}/log/{template})
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        templates = request.templates or valid_templates
+        invalid = [t for t in templates if t not in valid_templates]
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+        if request.action not in ACTIONS:
+            raise HTTPException(status_code=400, detail=f"Invalid action. Must be one of: {', '.join(ACTIONS)}")
+
+        terraform_dir = get_terraform_dir()
+        if request.workspace:
+            manager = get_workspace_manager(terraform_dir)
+            try:
+                missing = [t for t in templates if not manager.exists(t, request.workspace)]
+            except WorkspaceError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if missing:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Workspace {request.workspace} does not exist for: {', '.join(missing)}"
+                )
+
+        orchestrator = get_orchestrator(terraform_dir, run_command_stream)
+        active = orchestrator.active(request.workspace)
+        if active:
+            raise HTTPException(status_code=409, detail=f"Run {active} is still in progress")
+
+        graph = await asyncio.to_thread(lambda: get_inheritance_engine(terraform_dir).graph)
+        return orchestrator.start(
+            request.action,
+            list(dict.fromkeys(templates)),
+            graph.upstreams,
+            _template_directory(terraform_dir, request.workspace),
+            request.workspace,
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting orchestration: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/orchestrate")
+async def list_orchestrations(limit: int = Query(20, ge=1, le=200)):
+    """List recent orchestrated runs, newest first, with each template's status."""
+    try:
+        orchestrator = get_orchestrator(get_terraform_dir(), run_command_stream)
+        return {"runs": await asyncio.to_thread(orchestrator.list_runs, limit)}
+    except Exception as e:
+        logger.error(f"Error listing orchestrations: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/orchestrate/{run_id}")
+async def get_orchestration(run_id: str):
+    """
+    Status of an orchestrated run.
+
+    Returns:
+        Run record: status (running, succeeded, failed, interrupted), order,
+        dependencies, and per template its status, attempts, error,
+        duration and per-step exit codes and timings
+    """
+    try:
+        orchestrator = get_orchestrator(get_terraform_dir(), run_command_stream)
+        return orchestrator.get(run_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    except Exception as e:
+        logger.error(f"Error reading orchestration {run_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/orchestrate/{run_id}/resume", status_code=202)
+async def resume_orchestration(run_id: str):
+    """
+    Resume a failed or interrupted run (e.g. after a backend restart).
+
+    Templates that already succeeded or were skipped are not run again.
+    """
+    try:
+        terraform_dir = get_terraform_dir()
+        orchestrator = get_orchestrator(terraform_dir, run_command_stream)
+        run = orchestrator.get(run_id)
+        active = orchestrator.active(run.get("workspace"))
+        if active:
+            raise HTTPException(status_code=409, detail=f"Run {active} is still in progress")
+        try:
+            return orchestrator.resume(run_id, _template_directory(terraform_dir, run.get("workspace")))
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    except Exception as e:
+        logger.error(f"Error resuming orchestration {run_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/orchestrate/{run_id}/log/{template}")
+async def get_orchestration_log(run_id: str, template: str):
+    """Terraform output of one template of a run, all attempts."""
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+        orchestrator = get_orchestrator(get_terraform_dir(), run_command_stream)
+        log_file = orchestrator.log_path(run_id, template)
+        if not log_file.exists():
+            raise HTTPException(status_code=404, detail=f"No log for {template} in run {run_id}")
+        return Response(content=await asyncio.to_thread(log_file.read_text), media_type="text/plain")
+
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    except Exception as e:
+        logger.error(f"Error reading orchestration log: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/plan/summary")
+async def get_plan_summary(
+    template: str = Query(...),
+    workspace: Optional[str] = Query(None, description="Workspace (cp-env) whose plan to summarize"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    action: Optional[str] = Query(None, description="Only changes with this action (create, update, replace, delete, read)"),
+    resource_type: Optional[str] = Query(None, alias="type", description="Only changes of this resource type")
+):
+    """
+    Summarize the saved plan (tfplan, written by the plan step) for review before apply.
+
+    Runs ``terraform show -json tfplan`` and parses its output as it streams,
+    keeping only the resource changes. Summaries are cached by the plan
+    file's hash, so paging does not run terraform again. terraform runs
+    holding the working directory, so no build changes it meanwhile.
+
+    Args:
+        template: Template name
+        workspace: Workspace name (cp-env) created with POST /workspaces
+        offset: First change of the page
+        limit: Changes per page
+        action: Filter the page by action
+        resource_type: Filter the page by resource type
+
+    Returns:
+        Plan file hash and age, ``summary`` (counts by action and by
+        resource type, replaced and destroyed addresses) and a page of
+        ``changes`` (address, type, action, reason, replace paths)
+
+    Raises:
+        404 without a saved plan, 409 while a build of the directory runs or
+        waits or when terraform.tfvars or the state changed after the plan,
+        422 when terraform show fails or prints invalid JSON
+    """
+    try:
+        valid_templates = ['existing_vpc_resources', 'autoscale_template', 'ha_pair']
+        if template not in valid_templates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid template. Must be one of: {', '.join(valid_templates)}"
+            )
+
+        terraform_dir = get_terraform_dir()
+        working_dir = terraform_dir / template
+        if workspace:
+            try:
+                working_dir = await asyncio.to_thread(workspace_directory, terraform_dir, template, workspace)
+            except WorkspaceError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+
+        plan_file = working_dir / PLAN_FILE
+        if not plan_file.exists():
+            raise HTTPException(
+                status_code=404,
+                detail=f"No saved plan for {build_key(template, workspace)}. Run the plan step first."
+            )
+
+        key = build_key(template, workspace)
+        if build_scheduler.directory_busy(key):
+            raise HTTPException(status_code=409, detail=f"A build of {key} is running or queued")
+        reason = stale_reason(working_dir)
+        if reason:
+            raise HTTPException(status_code=409, detail=f"The saved plan for {key} is out of date: {reason}. Run the plan step again.")
+
+        started = time.perf_counter()
+        env = subprocess_env(get_workspace_manager(terraform_dir))
+        try:
+            digest, result, cached = await plan_summaries.get(
+                working_dir, env, hold=lambda: build_scheduler.directory(key)
+            )
+        except PlanError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        return FastJSONResponse({
+            "template": template,
+            "workspace": workspace,
+            "plan": {
+                "file": str(plan_file),
+                "hash": digest,
+                "modified": plan_file.stat().st_mtime,
+                "cached": cached,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            },
+            "summary": result["summary"],
+            "changes": page(result["changes"], offset, limit, action, resource_type),
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error summarizing plan: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _build_history():
+    history = get_build_history(get_terraform_dir())
+    if history is None:
+        raise HTTPException(status_code=404, detail="Build history is disabled (BUILD_HISTORY=false)")
+    return history
+
+
+@router.get("/history")
+async def list_build_history(
+    template: Optional[str] = Query(None),
+    status: Optional[str] = Query(None, description="running, succeeded, failed or cancelled"),
+    limit: int = Query(50, ge=1, le=1000)
+):
+    """
+    List recorded builds, newest first.
+
+    Returns:
+        Builds with template, workspace, kind (build, step, orchestrate),
+        config hash, timings, status and their steps' exit codes and durations
+    """
+    try:
+        history = _build_history()
+        return FastJSONResponse({"builds": await asyncio.to_thread(history.list_builds, template, status, limit)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing build history: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/history/trends")
+async def get_build_trends(
+    template: str = Query(...),
+    step: str = Query("apply", description="Step to trend (init, plan, apply, destroy, ...)"),
+    days: int = Query(90, ge=1, le=3650),
+    bucket: str = Query("week", description="day or week")
+):
+    """
+    Duration of a build step over time for a template.
+
+    Returns:
+        Per day/week count and avg/min/max seconds of successful runs, and
+        the builds where the template's terraform.tfvars changed
+    """
+    try:
+        if bucket not in ("day", "week"):
+            raise HTTPException(status_code=400, detail="Invalid bucket. Must be one of: day, week")
+        history = _build_history()
+        return await asyncio.to_thread(history.trends, template, step, days, bucket)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing build trends: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/history/slowest-resources")
+async def get_slowest_resources(
+    template: Optional[str] = Query(None),
+    action: str = Query("create", description="create, destroy, update or read"),
+    days: int = Query(90, ge=1, le=3650),
+    group_by: str = Query("type", description="type or address"),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """
+    Resource types (or addresses) with the longest average create/destroy/update time.
+
+    Returns:
+        List of ``{key, count, avg_s, max_s}``, slowest first
+    """
+    try:
+        if action not in ("create", "destroy", "update", "read"):
+            raise HTTPException(status_code=400, detail="Invalid action. Must be one of: create, destroy, update, read")
+        if group_by not in ("type", "address"):
+            raise HTTPException(status_code=400, detail="Invalid group_by. Must be one of: type, address")
+        history = _build_history()
+        resources = await asyncio.to_thread(history.slowest_resources, template, action, days, group_by, limit)
+        return {"action": action, "group_by": group_by, "resources": resources}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error querying slowest resources: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/history/{build_id}")
+async def get_build_history_entry(build_id: int):
+    """One recorded build with its steps and every resource's timings."""
+    try:
+        build = await asyncio.to_thread(_build_history().get_build, build_id)
+        if build is None:
+            raise HTTPException(status_code=404, detail=f"Build {build_id} not found")
+        return FastJSONResponse(build)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading build {build_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/history/{build_id}/critical-path")
+async def get_build_critical_path(build_id: int, step: str = Query("apply")):
+    """
+    Critical path of a build's apply (or another step), inferred from resource timings.
+
+    Returns:
+        The chain of resources, each starting after the previous one
+        finished, with waits between them, and its total against the step
+        duration
+    """
+    try:
+        result = await asyncio.to_thread(_build_history().critical_path, build_id, step)
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"No {step} step recorded for build {build_id}")
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing critical path of build {build_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 def convert_to_markdown(content: str) -> str:
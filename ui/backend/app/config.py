@@ -23,7 +23,25 @@ class Settings(BaseSettings):
         "http://127.0.0.1:5173",
     ]
 
-    @field_validator("cors_origins", mode="before")
+    # Public IP lookup (management CIDR defaults and /api/aws/my-ip)
+    public_ip_providers: Union[List[str], str] = [
+        "https://api.ipify.org?format=text",
+        "https://checkip.amazonaws.com",
+        "https://icanhazip.com",
+    ]
+    public_ip_cache_ttl: float = 300.0
+    public_ip_timeout: float = 3.0
+    # Longest a config load waits for the lookup; past this it loads without it
+    public_ip_load_budget: float = 0.3
+
+    # License file index (/api/terraform/license-files)
+    license_index_watch: bool = True  # use watchfiles when installed
+    license_index_poll_interval: float = 2.0  # mtime re-check interval without a watcher
+    license_index_ignore: Union[List[str], str] = [
+        ".terraform", ".git", "node_modules", "__pycache__", ".venv",
+    ]
+
+    @field_validator("cors_origins", "public_ip_providers", "license_index_ignore", mode="before")
     @classmethod
     def parse_cors_origins(cls, v):
         """Parse comma-separated string into list."""
@@ -34,7 +52,70 @@ class Settings(BaseSettings):
     # AWS Configuration (optional)
     aws_profile: str = ""
     aws_region: str = "us-west-2"
-    
+    # Import boto3/botocore at startup instead of on first AWS request
+    preload_aws_sdk: bool = False
+
+    # Session credentials from /api/aws/credentials/set
+    credential_store: str = "memory"  # memory (this process only) or file (encrypted, shared by workers)
+    credential_store_path: str = ".credentials/aws_credentials"
+    credential_store_key: str = ""  # Fernet key, required by the file store
+
+    # Multi-region discovery (/api/aws/resources/by-fortinet-role/all-regions)
+    discovery_max_concurrency: int = 8  # regions scanned at once, shared by all scans
+    discovery_region_timeout: float = 20.0  # seconds per region
+    discovery_cache_ttl: float = 300.0  # seconds region results are reused per account/cp/env
+
+    # /api/terraform/bootstrap: longest wait for one section (seconds); a slow one is reported in errors
+    bootstrap_section_timeout: float = 3.0
+
+    # ASG/GWLB fleet monitor poll interval bounds (seconds)
+    asg_monitor_min_interval: float = 2.0
+    asg_monitor_max_interval: float = 30.0
+
+    # Builds and per-cp/env workspaces (<terraform dir>/.workspaces/<template>/<cp>-<env>)
+    build_max_parallel: int = 2  # concurrent builds per backend process
+    workspace_dir: str = ""  # empty = <terraform dir>/.workspaces
+    terraform_plugin_cache: bool = True  # share providers via TF_PLUGIN_CACHE_DIR (unless already set)
+
+    # Multi-template deploy/destroy runs (/api/terraform/orchestrate)
+    orchestrator_runs_dir: str = ""  # empty = <terraform dir>/.orchestrator
+    orchestrator_max_attempts: int = 3  # attempts per template on transient failures
+    orchestrator_backoff_base: float = 10.0  # seconds before the first retry, doubled per attempt
+    orchestrator_backoff_max: float = 120.0  # longest wait between attempts
+
+    # Build history (SQLite): builds, steps and per-resource timings
+    build_history: bool = True
+    build_history_path: str = ""  # empty = <terraform dir>/.build_history.sqlite3
+    build_history_retention_days: int = 365  # 0 = keep everything
+
+    # Saved plan summaries (terraform show -json), cached by plan file hash
+    plan_summary_cache_size: int = 8
+
+    # Schemas: use precompiled .schema_bundle.json files (python -m app.services.schema_bundle)
+    # when they match the source, and load all templates at startup
+    schema_bundles: bool = True
+    schema_preload: bool = True
+
+    # gzip/brotli compression of complete responses (streamed build output is never compressed)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # bytes
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4  # used when the brotli package is installed
+
+    # Request/AWS/subprocess metrics served at /metrics (Prometheus text format)
+    metrics_enabled: bool = True
+
+    # Per-request profiling (X-Profile header or ?profile=); off by default
+    profiling_enabled: bool = False
+    profile_token: str = ""  # if set, profiling and /profiles require a matching X-Profile-Token
+    profile_dir: str = "profiles"
+    profile_max_files: int = 50
+    profile_sample_interval: float = 0.002  # seconds, speedscope format
+
+    # /api/terraform/config/validate-batch
+    validate_batch_workers: int = 0  # worker processes, 0 = CPU count
+    validate_batch_max_items: int = 10000
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
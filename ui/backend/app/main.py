@@ -1,12 +1,22 @@
 """FastAPI application factory and configuration."""
+import asyncio
 import logging
 from datetime import datetime, timezone
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.middleware import CompressionMiddleware, MetricsMiddleware, ProfilingMiddleware
 from app.schemas import HealthResponse
 from app.api import root, aws, terraform
+from app.services import aws_sdk, metrics
+from app.services.license_index import close_license_indexes
+from app.services.profiling import profile_store, token_matches
+from app.services.public_ip import public_ip_resolver
+from app.services.schema_registry import schema_registry
+from app.services.validation import batch_validator
 
 # Configure logging
 logging.basicConfig(
@@ -22,9 +32,18 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting %s v%s", settings.app_name, settings.app_version)
     logger.info("CORS origins: %s", settings.cors_origins)
+    # Warm the public IP cache so the first config load doesn't wait on it
+    public_ip_resolver.prefetch()
+    if settings.preload_aws_sdk:
+        await asyncio.to_thread(aws_sdk.preload)
+    if settings.schema_preload:
+        loaded = await asyncio.to_thread(schema_registry.preload, terraform.get_terraform_dir())
+        logger.info("Preloaded %d template schemas", loaded)
     yield
     # Shutdown
     logger.info("Shutting down %s", settings.app_name)
+    batch_validator.shutdown()
+    close_license_indexes()
 
 
 # Create FastAPI application
@@ -35,6 +54,15 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Compress complete JSON/text responses (innermost, so other middleware sees final headers)
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -44,6 +72,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (not installed at all unless enabled)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware, store=profile_store, token=settings.profile_token)
+
+# Per-route request metrics (outermost, so CORS preflights are counted too)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(root.router, tags=["root"])
 app.include_router(aws.router)
@@ -65,6 +101,43 @@ async def health_check() -> HealthResponse:
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Prometheus metrics (text exposition format)."""
+    if not settings.metrics_enabled:
+        return Response(status_code=404)
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _check_profile_access(token: Optional[str]) -> None:
+    """404 unless profiling is enabled; 403 unless the PROFILE_TOKEN (if any) matches."""
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token_matches(token, settings.profile_token):
+        raise HTTPException(status_code=403, detail="Missing or invalid X-Profile-Token")
+
+
+@app.get("/profiles", include_in_schema=False)
+async def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    """Saved request profiles, newest first (PROFILING_ENABLED only)."""
+    _check_profile_access(x_profile_token)
+    return [
+        {"name": path.name, "url": f"/profiles/{path.name}", "size": path.stat().st_size}
+        for path in profile_store.list()
+    ]
+
+
+@app.get("/profiles/{name}", include_in_schema=False)
+async def get_profile(name: str, x_profile_token: Optional[str] = Header(None)):
+    """Download a saved profile (.prof for pstats, .speedscope.json for speedscope)."""
+    _check_profile_access(x_profile_token)
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{name}' not found")
+    media_type = "application/json" if name.endswith(".json") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
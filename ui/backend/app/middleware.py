@@ -0,0 +1,286 @@
+"""ASGI middleware."""
+import asyncio
+import gzip
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import HTTP_ERRORS, HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+from app.services.profiling import ProfileStore, create_profiler, requested_format, token_matches
+
+try:
+    import brotli
+except ImportError:  # a dependency; gzip only for installs without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Content types worth compressing (prefix match)
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+# text/event-stream is streamed anyway; listed so a one-shot SSE body is never buffered
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+# Bodies at least this large are compressed in a worker thread
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route that handled (or is handling) a request."""
+    return getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """
+    Record per-route request counts, latency, in-flight requests and errors.
+
+    Requests are labelled with the route template (``/api/terraform/build/{template}``),
+    not the raw path, so label cardinality stays bounded. The router stores
+    the matched route in the request scope before calling the endpoint, so
+    in-flight requests are counted by route when ``/metrics`` is scraped.
+    Latency runs until the response body is complete, so streaming endpoints
+    report their full duration.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._active: Dict[int, Scope] = {}
+        HTTP_IN_FLIGHT.function = self._in_flight
+
+    def _in_flight(self) -> Dict[Tuple[str, str], int]:
+        return dict(Counter(
+            (scope["method"], route_template(scope)) for scope in list(self._active.values())
+        ))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # unless a response is started
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        key = id(scope)
+        self._active[key] = scope
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            del self._active[key]
+            method, route = scope["method"], route_template(scope)
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(elapsed)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            if status >= 500:
+                HTTP_ERRORS.labels(method, route, str(status)).inc()
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests that ask for it (see ``app.services.profiling``).
+
+    Only added when ``PROFILING_ENABLED`` is set. A request is profiled when
+    it sends ``X-Profile: pstats|speedscope`` or ``?profile=...`` and, if a
+    token is configured, a matching ``X-Profile-Token``. The response gets
+    ``X-Profile-Url`` pointing at the saved profile; for streaming responses
+    the file appears once the stream ends. While another request is being
+    profiled the request runs normally with ``X-Profile-Status: busy``.
+
+    Args:
+        app: ASGI application
+        store: Where profiles are saved
+        token: Required ``X-Profile-Token`` value ("" = none)
+    """
+
+    def __init__(self, app: ASGIApp, store: ProfileStore, token: str = ""):
+        self.app = app
+        self.store = store
+        self.token = token
+        self._busy = threading.Lock()
+
+    def _requested(self, scope: Scope) -> str:
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        value = headers.get("x-profile")
+        if value is None and b"profile=" in scope.get("query_string", b""):
+            value = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [None])[0]
+        profile_format = requested_format(value)
+        if profile_format and not token_matches(headers.get("x-profile-token"), self.token):
+            return ""
+        return profile_format or ""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile_format = self._requested(scope)
+        if not profile_format:
+            await self.app(scope, receive, send)
+            return
+
+        if not self._busy.acquire(blocking=False):
+            async def send_busy(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("X-Profile-Status", "busy")
+                await send(message)
+
+            await self.app(scope, receive, send_busy)
+            return
+
+        name = self.store.new_name(scope["method"], scope["path"], profile_format)
+        url = f"{scope.get('root_path', '')}/profiles/{name}"
+
+        async def send_with_link(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Url", url)
+            await send(message)
+
+        profiler = create_profiler(profile_format)
+        started = time.perf_counter()
+        try:
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_with_link)
+            finally:
+                profiler.stop()
+            data = await asyncio.to_thread(profiler.dump, name)
+            await asyncio.to_thread(self.store.write, name, data)
+            logger.info(
+                "Profiled %s %s in %.0f ms: %s",
+                scope["method"], scope["path"], (time.perf_counter() - started) * 1000, name
+            )
+        finally:
+            self._busy.release()
+
+
+def negotiate_encoding(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Header value, e.g. ``"gzip, deflate, br;q=0.9"``
+        available: Supported codings in order of preference
+
+    Returns:
+        The acceptable coding with the highest q-value (ties go to the
+        earlier entry of ``available``), or None for identity
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress complete responses with brotli or gzip, negotiated via Accept-Encoding.
+
+    A response is compressed when its whole body arrives in one message, is at
+    least ``minimum_size`` bytes and has a textual content type. Streaming
+    responses (build output, server-sent events) pass through unchanged so each
+    line still reaches the browser as soon as it is produced. Brotli is offered
+    only when the ``brotli`` package is installed. A strong ``ETag`` on a
+    compressed response is made weak.
+
+    Args:
+        app: ASGI application
+        minimum_size: Smallest body worth compressing (bytes)
+        gzip_level: gzip compression level (1-9)
+        brotli_quality: brotli quality (0-11)
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def _compressible(self, status: int, headers: MutableHeaders, body: bytes) -> bool:
+        content_type = headers.get("content-type", "").lower()
+        return (
+            len(body) >= self.minimum_size
+            and status not in (204, 206, 304)
+            and "content-encoding" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith(UNCOMPRESSED_TYPES)
+        )
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending: Optional[Message] = None  # response start, held until the first body message
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal pending
+            if message["type"] == "http.response.start":
+                pending = message
+                return
+            if pending is None:
+                await send(message)
+                return
+
+            start, pending = pending, None
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or not self._compressible(start["status"], headers, body)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_MINIMUM_SIZE:
+                body = await asyncio.to_thread(self._compress, encoding, body)
+            else:
+                body = self._compress(encoding, body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            # The compressed bytes differ from the representation a strong ETag names
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -216,6 +216,10 @@ class TFVarsParser:
             'link': 'link',
             'compute': 'compute',
             'exclusive-with': 'exclusive_with',
+            # Cross-template inheritance (see app/services/inheritance.py)
+            'inherit-from': 'inherit_from',    # e.g., "existing_vpc_resources.cp"
+            'inherit-rule': 'inherit_rule',    # e.g., "management-cidrs"
+            'derive': 'derive',                # e.g., "{cp}-{env}-asg"
             # Fortinet-Role tag-based discovery annotations
             'tag-key': 'tag_key',              # e.g., "Fortinet-Role"
             'tag-pattern': 'tag_pattern',      # e.g., "{cp}-{env}-inspection-vpc"
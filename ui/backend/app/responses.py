@@ -0,0 +1,40 @@
+"""Fast JSON responses for large payloads.
+
+Returning a plain dict from an endpoint makes FastAPI walk it with
+``jsonable_encoder`` and then ``json.dumps`` it; for the autoscale schema
+(~18 KB) the walk alone costs about 2 ms. Endpoints with large payloads
+return ``FastJSONResponse(content)`` instead, which serializes the dict in
+one pass: with ``orjson`` when it is installed, else with the standard
+library. Only values neither serializer understands (Pydantic models,
+Decimals, ...) go through ``jsonable_encoder``.
+"""
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # a dependency; the json module covers installs without it
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize ``content`` to compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        default=jsonable_encoder,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` that skips ``jsonable_encoder`` (see module docstring)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1 @@
+"""Backend services shared by the API routers."""
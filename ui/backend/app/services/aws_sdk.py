@@ -0,0 +1,112 @@
+"""Lazily imported AWS SDK.
+
+``boto3`` and ``botocore`` take well over 100 ms to import, which every
+backend start used to pay even when only tfvars are generated. Attribute
+access on this module imports them on first use instead::
+
+    from app.services import aws_sdk
+
+    ec2 = aws_sdk.boto3.client("ec2", region_name=region)
+    ...
+    except aws_sdk.ClientError as e:
+
+An ``except aws_sdk.ClientError`` clause is only evaluated when an exception
+reaches it, by which time a client has been created and botocore is loaded.
+Set ``PRELOAD_AWS_SDK=true`` to import (and warm) the SDK during startup.
+"""
+import importlib
+import logging
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.services.metrics import AWS_CALL_SECONDS, AWS_CALLS
+
+logger = logging.getLogger(__name__)
+
+# Attribute -> (module, attribute in module or None for the module itself)
+LAZY_ATTRIBUTES: Dict[str, Tuple[str, Optional[str]]] = {
+    "boto3": ("boto3", None),
+    "ClientError": ("botocore.exceptions", "ClientError"),
+    "NoCredentialsError": ("botocore.exceptions", "NoCredentialsError"),
+}
+
+# Modules a cold start should not import (see benchmarks/bench_startup.py)
+HEAVY_MODULES = ("boto3", "botocore", "requests")
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module_name, attribute = LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    started = time.perf_counter()
+    already_loaded = module_name in sys.modules
+    module = importlib.import_module(module_name)
+    value = module if attribute is None else getattr(module, attribute)
+    if not already_loaded:
+        logger.info("Imported %s in %.0f ms", module_name, (time.perf_counter() - started) * 1000)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def loaded() -> bool:
+    """True once boto3 has been imported."""
+    return "boto3" in sys.modules
+
+
+def _before_call(model, context, **kwargs) -> None:
+    # after-call-error has no model, so keep the labels in the request context
+    context["metrics"] = (model.service_model.service_name, model.name, time.perf_counter())
+
+
+def _record_call(context, outcome: str) -> None:
+    labels = context.get("metrics")
+    if labels is None:
+        return
+    service, operation, started = labels
+    AWS_CALLS.labels(service, operation, outcome).inc()
+    AWS_CALL_SECONDS.labels(service, operation).observe(time.perf_counter() - started)
+
+
+def _after_call(http_response, context, **kwargs) -> None:
+    status = getattr(http_response, "status_code", 200)
+    _record_call(context, "success" if status < 300 else "error")
+
+
+def _after_call_error(context, **kwargs) -> None:
+    _record_call(context, "exception")  # connection errors, no response
+
+
+def instrument(client: Any) -> Any:
+    """Count and time every API call made by a boto3 client (see app.services.metrics)."""
+    events = client.meta.events
+    events.register("before-call", _before_call, unique_id="metrics-before-call")
+    events.register("after-call", _after_call, unique_id="metrics-after-call")
+    events.register("after-call-error", _after_call_error, unique_id="metrics-after-call-error")
+    return client
+
+
+def preload() -> float:
+    """
+    Import the SDK and build default EC2/STS clients (loads their service models).
+
+    Client creation needs no credentials. Blocking; run in a thread.
+
+    Returns:
+        Elapsed seconds
+    """
+    started = time.perf_counter()
+    for name in LAZY_ATTRIBUTES:
+        __getattr__(name)
+    boto3 = globals()["boto3"]
+    for service in ("ec2", "sts"):
+        try:
+            boto3.client(service, region_name=settings.aws_region)
+        except Exception as e:
+            logger.warning("Could not warm %s client: %s", service, e)
+    elapsed = time.perf_counter() - started
+    logger.info("Preloaded AWS SDK in %.0f ms", elapsed * 1000)
+    return elapsed
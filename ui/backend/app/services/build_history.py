@@ -0,0 +1,499 @@
+"""Build history: every build, its steps and per-resource timings in SQLite.
+
+Build output only lives as long as the stream, so questions like "did apply
+get slower after FortiAnalyzer was enabled?" could not be answered. Every
+build job (a full build, a single step, or one template of an orchestrated
+run) is recorded in an embedded SQLite database:
+
+- ``builds``: template, workspace, kind, a hash of the ``terraform.tfvars``
+  it ran with, start/end, duration and status
+- ``steps``: each command (init, plan, apply, ...) with its exit code and timings
+- ``resources``: per resource and action (create, destroy, update, read) the
+  start/end offsets within the step, parsed from terraform's progress lines
+  (``aws_vpc.main: Creation complete after 2m3s [id=vpc-...]``)
+
+Parsing is one regex match per output line and keeps open resources in a
+dict; rows are written once per step, in one transaction. Terraform does not
+print its dependency graph, so ``critical_path`` infers the chain of waits from
+the timings: the resource that finished last, the resource that finished just
+before it started, and so on.
+"""
+import bisect
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = ".build_history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    template TEXT NOT NULL,
+    workspace TEXT,
+    kind TEXT NOT NULL,
+    config_hash TEXT,
+    started REAL NOT NULL,
+    finished REAL,
+    duration_s REAL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS builds_template_started ON builds (template, started);
+
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY,
+    build_id INTEGER NOT NULL REFERENCES builds (id) ON DELETE CASCADE,
+    step TEXT NOT NULL,
+    command TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration_s REAL,
+    exit_code INTEGER
+);
+CREATE INDEX IF NOT EXISTS steps_build ON steps (build_id);
+
+CREATE TABLE IF NOT EXISTS resources (
+    id INTEGER PRIMARY KEY,
+    build_id INTEGER NOT NULL REFERENCES builds (id) ON DELETE CASCADE,
+    step_id INTEGER NOT NULL REFERENCES steps (id) ON DELETE CASCADE,
+    address TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    action TEXT NOT NULL,
+    start_s REAL,
+    end_s REAL,
+    duration_s REAL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resources_step ON resources (step_id);
+CREATE INDEX IF NOT EXISTS resources_type ON resources (resource_type, action);
+"""
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+_STARTED = re.compile(r"^(?P<address>\S.*?): (?P<verb>Creating|Destroying|Modifying|Reading)\.\.\.")
+_COMPLETED = re.compile(
+    r"^(?P<address>\S.*?): (?P<verb>Creation|Destruction|Modifications|Read) complete after (?P<elapsed>[0-9hms.]+)"
+)
+_ERROR_WITH = re.compile(r"^[│|]\s+with (?P<address>\S+?),?$")
+_ELAPSED = re.compile(r"(\d+(?:\.\d+)?)(h|ms|m|s)")
+_INDEX = re.compile(r"\[[^\]]*\]")
+
+ACTIONS = {
+    "Creating": "create", "Creation": "create",
+    "Destroying": "destroy", "Destruction": "destroy",
+    "Modifying": "update", "Modifications": "update",
+    "Reading": "read", "Read": "read",
+}
+_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_elapsed(text: str) -> float:
+    """Seconds in a terraform duration such as ``2m3s``, ``1h0m5s`` or ``500ms``."""
+    return sum(float(value) * _UNITS[unit] for value, unit in _ELAPSED.findall(text))
+
+
+def resource_type(address: str) -> str:
+    """``aws_instance`` for ``module.fgt.aws_instance.this["a"]`` (``data.`` kept for data sources)."""
+    parts = _INDEX.sub("", address).split(".")
+    while parts[:1] == ["module"]:
+        parts = parts[2:]
+    if parts[:1] == ["data"]:
+        return ".".join(parts[:2])
+    return parts[0] if parts else address
+
+
+def config_hash(working_dir: Path) -> Optional[str]:
+    """Short hash of a working directory's terraform.tfvars (None if there is none)."""
+    try:
+        return hashlib.sha256((Path(working_dir) / "terraform.tfvars").read_bytes()).hexdigest()[:12]
+    except OSError:
+        return None
+
+
+class StepRecorder:
+    """Collects one step's resource timings from its output lines."""
+
+    def __init__(self, job: "BuildJob", step: str, command: List[str]):
+        self.job = job
+        self.step = step
+        self.command = command
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self._open: Dict[Tuple[str, str], float] = {}
+        self.resources: List[Dict[str, Any]] = []
+        self._failed: set = set()
+
+    def feed(self, line: str) -> None:
+        """Parse one output line (cheap for lines without a resource event)."""
+        if ": " not in line and "with " not in line:
+            return
+        if "\x1b" in line:
+            line = _ANSI.sub("", line)
+        line = line.rstrip()
+        match = _COMPLETED.match(line)
+        if match:
+            now = time.perf_counter() - self._clock
+            key = (match["address"], ACTIONS[match["verb"]])
+            start = self._open.pop(key, None)
+            if start is not None:
+                duration = now - start
+            else:
+                # No start line: terraform's own elapsed time; if that reaches back
+                # before the step started (output from an earlier run), the start is unknown
+                duration = parse_elapsed(match["elapsed"])
+                start = now - duration if duration <= now else None
+            self.resources.append({
+                "address": key[0], "action": key[1], "start_s": round(start, 3) if start is not None else None,
+                "end_s": round(now, 3), "duration_s": round(duration, 3), "status": "complete",
+            })
+            return
+        match = _STARTED.match(line)
+        if match:
+            self._open[(match["address"], ACTIONS[match["verb"]])] = time.perf_counter() - self._clock
+            return
+        match = _ERROR_WITH.match(line)
+        if match:
+            self._failed.add(match["address"])
+
+    def finish(self, exit_code: Optional[int]) -> None:
+        """Record the step; resources still in progress are recorded as ``error`` or ``incomplete``."""
+        now = time.perf_counter() - self._clock
+        for (address, action), start in self._open.items():
+            self.resources.append({
+                "address": address, "action": action, "start_s": round(start, 3), "end_s": round(now, 3),
+                "duration_s": round(now - start, 3), "status": "error" if address in self._failed else "incomplete",
+            })
+        self._open.clear()
+        self.job.history.record_step(self.job, self, exit_code, round(now, 3))
+
+
+class BuildJob:
+    """One recorded build; create with ``BuildHistory.start``."""
+
+    def __init__(self, history: "BuildHistory", build_id: int, started: float):
+        self.history = history
+        self.id = build_id
+        self.started = started
+        self.exit_codes: List[Optional[int]] = []
+        self.finished = False
+
+    def step(self, step: str, command: List[str]) -> StepRecorder:
+        return StepRecorder(self, step, command)
+
+    def finish(self, status: Optional[str] = None) -> None:
+        """
+        Close the build. Without ``status`` it is derived from the steps:
+        ``cancelled`` if one did not finish, ``failed`` if one exited non-zero,
+        else ``succeeded``.
+        """
+        if self.finished:
+            return
+        if status is None:
+            if None in self.exit_codes:
+                status = "cancelled"
+            elif any(code != 0 for code in self.exit_codes):
+                status = "failed"
+            else:
+                status = "succeeded"
+        self.finished = True
+        self.history.finish(self, status)
+
+
+class BuildHistory:
+    """
+    SQLite store of builds, steps and resource timings.
+
+    Writes are single short transactions under a lock on one connection (WAL
+    mode), so recording from the event loop does not stall streaming.
+
+    Args:
+        path: Database file
+        retention_days: Builds older than this are deleted when the store opens (0 = keep all)
+    """
+
+    def __init__(self, path: Path, retention_days: int = 365):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            if retention_days > 0:
+                self._conn.execute("DELETE FROM builds WHERE started < ?", (time.time() - retention_days * 86400,))
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    # --------------------------------------------------------------------------
+    # Recording
+    # --------------------------------------------------------------------------
+
+    def start(self, template: str, kind: str, working_dir: Path, workspace: Optional[str] = None) -> BuildJob:
+        """
+        Record the start of a build.
+
+        Args:
+            template: Template name
+            kind: ``build`` (full build), ``step`` (one step) or ``orchestrate``
+            working_dir: Directory holding the terraform.tfvars the build uses
+            workspace: Workspace name, if the build runs in one
+        """
+        started = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO builds (template, workspace, kind, config_hash, started, status) "
+                "VALUES (?, ?, ?, ?, ?, 'running')",
+                (template, workspace, kind, config_hash(working_dir), started),
+            )
+        return BuildJob(self, cursor.lastrowid, started)
+
+    def record_step(self, job: BuildJob, step: StepRecorder, exit_code: Optional[int], duration: float) -> None:
+        job.exit_codes.append(exit_code)
+        try:
+            self._insert_step(job, step, exit_code, duration)
+        except sqlite3.Error as e:
+            logger.warning("Could not record %s step of build %d: %s", step.step, job.id, e)
+
+    def _insert_step(self, job: BuildJob, step: StepRecorder, exit_code: Optional[int], duration: float) -> None:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO steps (build_id, step, command, started, duration_s, exit_code) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, step.step, " ".join(step.command), step.started, duration, exit_code),
+            )
+            self._conn.executemany(
+                "INSERT INTO resources (build_id, step_id, address, resource_type, action, start_s, end_s, "
+                "duration_s, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (job.id, cursor.lastrowid, r["address"], resource_type(r["address"]), r["action"],
+                     r["start_s"], r["end_s"], r["duration_s"], r["status"])
+                    for r in step.resources
+                ],
+            )
+
+    def finish(self, job: BuildJob, status: str) -> None:
+        """Close a build; one that ran no command (e.g. it failed validation) is not kept."""
+        finished = time.time()
+        try:
+            with self._lock, self._conn:
+                if not job.exit_codes:
+                    self._conn.execute("DELETE FROM builds WHERE id = ?", (job.id,))
+                    return
+                self._conn.execute(
+                    "UPDATE builds SET finished = ?, duration_s = ?, status = ? WHERE id = ?",
+                    (finished, round(finished - job.started, 3), status, job.id),
+                )
+        except sqlite3.Error as e:
+            logger.warning("Could not record the end of build %d: %s", job.id, e)
+
+    # --------------------------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------------------------
+
+    def list_builds(
+        self, template: Optional[str] = None, status: Optional[str] = None, limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Most recent builds first, each with its steps' names, exit codes and durations."""
+        clauses, params = [], []
+        for column, value in (("template", template), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        builds = self._query(f"SELECT * FROM builds {where} ORDER BY started DESC LIMIT ?", (*params, limit))
+        if builds:
+            ids = [build["id"] for build in builds]
+            steps: Dict[int, List[dict]] = {}
+            for step in self._query(
+                f"SELECT build_id, step, exit_code, duration_s FROM steps "
+                f"WHERE build_id IN ({','.join('?' * len(ids))}) ORDER BY id", tuple(ids)
+            ):
+                steps.setdefault(step.pop("build_id"), []).append(step)
+            for build in builds:
+                build["steps"] = steps.get(build["id"], [])
+        return builds
+
+    def get_build(self, build_id: int) -> Optional[Dict[str, Any]]:
+        """A build with all steps and resource timings, or None."""
+        builds = self._query("SELECT * FROM builds WHERE id = ?", (build_id,))
+        if not builds:
+            return None
+        build = builds[0]
+        build["steps"] = self._query("SELECT * FROM steps WHERE build_id = ? ORDER BY id", (build_id,))
+        resources: Dict[int, List[dict]] = {}
+        for resource in self._query(
+            "SELECT step_id, address, resource_type, action, start_s, end_s, duration_s, status "
+            "FROM resources WHERE build_id = ? ORDER BY start_s", (build_id,)
+        ):
+            resources.setdefault(resource.pop("step_id"), []).append(resource)
+        for step in build["steps"]:
+            step["resources"] = resources.get(step["id"], [])
+        return build
+
+    def trends(self, template: str, step: str = "apply", days: int = 90, bucket: str = "week") -> Dict[str, Any]:
+        """
+        Duration of a step over time, per day or week, and where the config changed.
+
+        Only steps that exited 0 count, so failed applies do not skew the trend.
+
+        Returns:
+            Dict with ``buckets`` (start, count, avg/min/max seconds) and
+            ``config_changes`` (first build with each new terraform.tfvars hash)
+        """
+        seconds = {"day": 86400, "week": 7 * 86400}[bucket]
+        since = time.time() - days * 86400
+        runs = self._query(
+            "SELECT b.id, b.config_hash, s.started, s.duration_s FROM steps s JOIN builds b ON b.id = s.build_id "
+            "WHERE b.template = ? AND s.step = ? AND s.exit_code = 0 AND s.started >= ? ORDER BY s.started",
+            (template, step, since),
+        )
+        buckets: Dict[int, List[float]] = {}
+        changes, previous = [], None
+        for run in runs:
+            buckets.setdefault(int(run["started"] // seconds * seconds), []).append(run["duration_s"])
+            if run["config_hash"] != previous:
+                changes.append({"build_id": run["id"], "started": run["started"], "config_hash": run["config_hash"]})
+                previous = run["config_hash"]
+        return {
+            "template": template,
+            "step": step,
+            "bucket": bucket,
+            "buckets": [
+                {
+                    "start": start,
+                    "count": len(durations),
+                    "avg_s": round(sum(durations) / len(durations), 1),
+                    "min_s": round(min(durations), 1),
+                    "max_s": round(max(durations), 1),
+                }
+                for start, durations in sorted(buckets.items())
+            ],
+            "config_changes": changes,
+        }
+
+    def slowest_resources(
+        self,
+        template: Optional[str] = None,
+        action: str = "create",
+        days: int = 90,
+        group_by: str = "type",
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        Resources (by type or address) with the longest average completed duration.
+
+        Returns:
+            List of ``{key, count, avg_s, max_s}``, slowest first
+        """
+        column = {"type": "r.resource_type", "address": "r.address"}[group_by]
+        clauses = ["r.action = ?", "r.status = 'complete'", "b.started >= ?"]
+        params: List[Any] = [action, time.time() - days * 86400]
+        if template:
+            clauses.append("b.template = ?")
+            params.append(template)
+        return self._query(
+            f"SELECT {column} AS key, COUNT(*) AS count, ROUND(AVG(r.duration_s), 1) AS avg_s, "
+            f"ROUND(MAX(r.duration_s), 1) AS max_s FROM resources r JOIN builds b ON b.id = r.build_id "
+            f"WHERE {' AND '.join(clauses)} GROUP BY {column} ORDER BY AVG(r.duration_s) DESC LIMIT ?",
+            (*params, limit),
+        )
+
+    def critical_path(self, build_id: int, step: str = "apply") -> Optional[Dict[str, Any]]:
+        """
+        Inferred critical path of a build's step (the last one with that name).
+
+        Returns:
+            None if the build or step does not exist, else a dict with the
+            ``path`` (resources in order, each with ``wait_s`` since the
+            previous one finished), its length and the step duration
+        """
+        steps = self._query(
+            "SELECT id, duration_s FROM steps WHERE build_id = ? AND step = ? ORDER BY id DESC LIMIT 1",
+            (build_id, step),
+        )
+        if not steps:
+            return None
+        resources = self._query(
+            "SELECT address, action, start_s, end_s, duration_s, status FROM resources WHERE step_id = ?",
+            (steps[0]["id"],),
+        )
+        path = critical_path(resources)
+        return {
+            "build_id": build_id,
+            "step": step,
+            "step_duration_s": steps[0]["duration_s"],
+            "resources": len(resources),
+            "path_duration_s": round(sum(r["duration_s"] for r in path), 1),
+            "path": path,
+        }
+
+
+def critical_path(resources: List[Dict[str, Any]], slack: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Chain of resources that determined a step's length, from timings alone.
+
+    Starting from the resource that finished last, each resource's
+    predecessor is the one that finished last at or before it started
+    (within ``slack`` seconds: terraform starts a dependent as soon as its
+    dependencies complete, so their lines arrive close together) and that
+    started before it.
+
+    Args:
+        resources: Dicts with ``start_s`` and ``end_s`` offsets in the step;
+            untimed ones (no ``start_s``) are left out
+
+    Returns:
+        The path in execution order, each entry with ``wait_s`` (gap since
+        the previous resource finished, or since the step started)
+    """
+    timed = sorted(
+        (r for r in resources if r.get("start_s") is not None and r.get("end_s") is not None),
+        key=lambda r: r["end_s"],
+    )
+    if not timed:
+        return []
+    ends = [r["end_s"] for r in timed]
+    current = timed[-1]
+    path = [current]
+    while True:
+        index = bisect.bisect_right(ends, current["start_s"] + slack) - 1
+        # A predecessor started before this resource and finished before it did
+        while index >= 0 and (ends[index] >= current["end_s"] or timed[index]["start_s"] >= current["start_s"]):
+            index -= 1
+        if index < 0:
+            break
+        current = timed[index]
+        path.append(current)
+
+    result, previous_end = [], 0.0
+    for resource in reversed(path):
+        result.append({**resource, "wait_s": round(max(0.0, resource["start_s"] - previous_end), 3)})
+        previous_end = resource["end_s"]
+    return result
+
+
+_histories: Dict[Path, BuildHistory] = {}
+_histories_lock = threading.Lock()
+
+
+def get_build_history(terraform_dir: Path) -> Optional[BuildHistory]:
+    """Return the shared build history for a terraform directory (None if disabled)."""
+    if not settings.build_history:
+        return None
+    key = Path(terraform_dir).resolve()
+    with _histories_lock:
+        if key not in _histories:
+            path = Path(settings.build_history_path) if settings.build_history_path else key / DB_NAME
+            _histories[key] = BuildHistory(path, settings.build_history_retention_days)
+            logger.info("Recording build history in %s", path)
+        return _histories[key]
@@ -0,0 +1,550 @@
+"""IPv4 address-space index for CIDR overlap checks and free-block search.
+
+Collects the VPC, subnet and supernet CIDRs of every saved template config,
+plus VPCs, subnets and Transit Gateway routes discovered in AWS, and answers:
+
+- which entries overlap a prefix (``overlapping``)
+- which aligned blocks of a given size are still free in a supernet
+  (``free_blocks``)
+
+CIDR blocks are aligned, so two prefixes overlap only if one contains the
+other. Containing entries are found with one hash probe per shorter prefix
+length (at most 32), contained entries with a binary search over sorted start
+addresses. Free space is kept as merged gaps with a max segment tree over each
+gap's largest aligned block, so the first free block of a size is found in
+O(log n).
+"""
+import bisect
+import ipaddress
+import logging
+import re
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_BITS = 32
+ADDRESS_MAX = (1 << ADDRESS_BITS) - 1
+
+# Entry kinds. Subnets are expected inside their parent VPC and supernets are
+# route summaries expected to contain VPCs; anything else overlapping is a conflict.
+KIND_VPC = "vpc"
+KIND_SUBNET = "subnet"
+KIND_SUPERNET = "supernet"
+KIND_ROUTE = "route"
+
+# Address-space fields in saved configs: field -> (kind, flag that must be true)
+CONFIG_CIDR_FIELDS: Dict[str, Tuple[str, Optional[str]]] = {
+    "vpc_cidr_inspection": (KIND_VPC, None),
+    "vpc_cidr_management": (KIND_VPC, "enable_build_management_vpc"),
+    "vpc_cidr_east": (KIND_VPC, "enable_build_existing_subnets"),
+    "vpc_cidr_west": (KIND_VPC, "enable_build_existing_subnets"),
+    "vpc_cidr_spoke": (KIND_SUPERNET, "enable_build_existing_subnets"),
+}
+_DISTRIBUTED_EGRESS_FIELD = re.compile(r"^distributed_egress_vpc_(\d+)_cidr$")
+
+PRIVATE_RANGES = [
+    ipaddress.IPv4Network("10.0.0.0/8"),
+    ipaddress.IPv4Network("172.16.0.0/12"),
+    ipaddress.IPv4Network("192.168.0.0/16"),
+]
+
+
+@dataclass(frozen=True)
+class CidrEntry:
+    """One prefix in the index and where it came from."""
+
+    network: ipaddress.IPv4Network
+    kind: str
+    source: str  # e.g. "existing_vpc_resources" or "aws:us-west-2"
+    name: str  # config field, VPC/subnet id or route description
+    parent: Optional[str] = None  # name of the VPC a subnet belongs to
+
+    @cached_property
+    def start(self) -> int:
+        return network_bounds(self.network)[0]
+
+    @cached_property
+    def end(self) -> int:
+        return network_bounds(self.network)[1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            "cidr": str(self.network),
+            "kind": self.kind,
+            "source": self.source,
+            "name": self.name,
+        }
+        if self.parent:
+            result["parent"] = self.parent
+        return result
+
+
+def parse_network(value: Any) -> Optional[ipaddress.IPv4Network]:
+    """Parse an IPv4 CIDR (host bits ignored); None for empty or invalid values."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        network = ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        return None
+    return network if network.version == 4 else None
+
+
+def network_bounds(network: ipaddress.IPv4Network) -> Tuple[int, int]:
+    """Return the first and last address of a prefix as integers."""
+    start = int(network.network_address)
+    return start, start | ((1 << (ADDRESS_BITS - network.prefixlen)) - 1)
+
+
+def _aligned_capacity(start: int, end: int) -> int:
+    """Return log2 of the largest aligned block inside [start, end], or -1."""
+    if start > end:
+        return -1
+    for bits in range((end - start + 1).bit_length() - 1, -1, -1):
+        size = 1 << bits
+        first = -(-start // size) * size
+        if first + size - 1 <= end:
+            return bits
+    return -1
+
+
+class _MaxTree:
+    """Array segment tree answering 'first index in [lo, hi] with value >= x'."""
+
+    def __init__(self, values: Sequence[int]):
+        self.size = 1
+        while self.size < max(1, len(values)):
+            self.size *= 2
+        self.tree = [-1] * (2 * self.size)
+        self.tree[self.size:self.size + len(values)] = values
+        for i in range(self.size - 1, 0, -1):
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def first_at_least(self, lo: int, hi: int, threshold: int) -> Optional[int]:
+        return self._first(1, 0, self.size - 1, lo, hi, threshold)
+
+    def _first(self, node: int, left: int, right: int, lo: int, hi: int, threshold: int) -> Optional[int]:
+        if right < lo or left > hi or self.tree[node] < threshold:
+            return None
+        if left == right:
+            return left
+        middle = (left + right) // 2
+        found = self._first(2 * node, left, middle, lo, hi, threshold)
+        if found is None:
+            found = self._first(2 * node + 1, middle + 1, right, lo, hi, threshold)
+        return found
+
+
+class CidrIndex:
+    """Sorted, prefix-aware index of IPv4 CIDR entries."""
+
+    def __init__(self, entries: Iterable[CidrEntry] = ()):
+        self._entries: List[CidrEntry] = []
+        self._starts: List[int] = []
+        self._by_prefix: Dict[Tuple[int, int], List[CidrEntry]] = {}
+        self._gaps: Optional[Tuple[List[int], List[int], _MaxTree]] = None
+        self.extend(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[CidrEntry]:
+        return iter(self._entries)
+
+    def extend(self, entries: Iterable[CidrEntry]) -> None:
+        """Add many entries (one sort instead of one insert each)."""
+        new = list(entries)
+        if not new:
+            return
+        self._entries.extend(new)
+        self._entries.sort(key=lambda e: (e.start, e.network.prefixlen))
+        self._starts = [e.start for e in self._entries]
+        for entry in new:
+            key = (entry.start, entry.network.prefixlen)
+            self._by_prefix.setdefault(key, []).append(entry)
+        self._gaps = None
+
+    def add(self, entry: CidrEntry) -> None:
+        """Add one entry."""
+        position = bisect.bisect_right(self._starts, entry.start)
+        self._starts.insert(position, entry.start)
+        self._entries.insert(position, entry)
+        self._by_prefix.setdefault((entry.start, entry.network.prefixlen), []).append(entry)
+        self._gaps = None
+
+    # --------------------------------------------------------------------------
+    # Overlap queries
+    # --------------------------------------------------------------------------
+
+    def containing(self, network: ipaddress.IPv4Network) -> List[CidrEntry]:
+        """Entries that contain (or equal) a prefix."""
+        start = int(network.network_address)
+        found = []
+        for prefixlen in range(network.prefixlen, -1, -1):
+            mask = (ADDRESS_MAX << (ADDRESS_BITS - prefixlen)) & ADDRESS_MAX
+            found.extend(self._by_prefix.get((start & mask, prefixlen), ()))
+        return found
+
+    def contained(self, network: ipaddress.IPv4Network) -> List[CidrEntry]:
+        """Entries strictly inside a prefix."""
+        start, end = network_bounds(network)
+        lo = bisect.bisect_left(self._starts, start)
+        hi = bisect.bisect_right(self._starts, end)
+        return [
+            e for e in self._entries[lo:hi]
+            if e.network.prefixlen > network.prefixlen
+        ]
+
+    def overlapping(self, network: ipaddress.IPv4Network) -> List[CidrEntry]:
+        """Entries sharing any address with a prefix."""
+        return self.containing(network) + self.contained(network)
+
+    def overlaps(self, network: ipaddress.IPv4Network) -> bool:
+        """True if any entry shares an address with a prefix (O(log n))."""
+        if self.containing(network):
+            return True
+        start, end = network_bounds(network)
+        position = bisect.bisect_left(self._starts, start)
+        return position < len(self._starts) and self._starts[position] <= end
+
+    # --------------------------------------------------------------------------
+    # Free space
+    # --------------------------------------------------------------------------
+
+    def _build_gaps(self) -> Tuple[List[int], List[int], _MaxTree]:
+        gap_starts: List[int] = []
+        gap_ends: List[int] = []
+        cursor = 0
+        for entry in self._entries:
+            if entry.start > cursor:
+                gap_starts.append(cursor)
+                gap_ends.append(entry.start - 1)
+            cursor = max(cursor, entry.end + 1)
+        if cursor <= ADDRESS_MAX:
+            gap_starts.append(cursor)
+            gap_ends.append(ADDRESS_MAX)
+        capacities = [_aligned_capacity(s, e) for s, e in zip(gap_starts, gap_ends)]
+        return gap_starts, gap_ends, _MaxTree(capacities)
+
+    def first_free(
+        self,
+        supernet: ipaddress.IPv4Network,
+        prefixlen: int,
+        after: Optional[int] = None,
+    ) -> Optional[ipaddress.IPv4Network]:
+        """
+        Find the lowest free, aligned block of a prefix length inside a supernet.
+
+        Args:
+            supernet: Range to search
+            prefixlen: Size of the block (e.g. 24 for a /24)
+            after: Only consider addresses at or above this one
+
+        Returns:
+            The free block, or None if none fits
+        """
+        if prefixlen < supernet.prefixlen or prefixlen > ADDRESS_BITS:
+            return None
+        if self._gaps is None:
+            self._gaps = self._build_gaps()
+        gap_starts, gap_ends, tree = self._gaps
+
+        low, high = network_bounds(supernet)
+        if after is not None:
+            low = max(low, after)
+        bits = ADDRESS_BITS - prefixlen
+        size = 1 << bits
+
+        first = bisect.bisect_right(gap_starts, low) - 1
+        if first < 0 or gap_ends[first] < low:
+            first += 1
+        last = bisect.bisect_right(gap_starts, high) - 1
+        if first > last:
+            return None
+
+        def fit(index: int) -> Optional[ipaddress.IPv4Network]:
+            start = max(gap_starts[index], low)
+            end = min(gap_ends[index], high)
+            block = -(-start // size) * size
+            if block + size - 1 <= end:
+                return ipaddress.IPv4Network((block, prefixlen))
+            return None
+
+        # The first and last gaps may be clipped by the search range; gaps in
+        # between lie entirely inside it and are answered by the tree.
+        found = fit(first)
+        if found is not None or first == last:
+            return found
+        if last - first > 1:
+            index = tree.first_at_least(first + 1, last - 1, bits)
+            if index is not None:
+                return fit(index)
+        return fit(last)
+
+    def free_blocks(
+        self,
+        supernet: ipaddress.IPv4Network,
+        prefixlen: int,
+        limit: int = 10,
+    ) -> List[ipaddress.IPv4Network]:
+        """List up to ``limit`` free blocks of a prefix length, lowest first."""
+        blocks = []
+        after = None
+        while len(blocks) < limit:
+            block = self.first_free(supernet, prefixlen, after)
+            if block is None:
+                break
+            blocks.append(block)
+            after = network_bounds(block)[1] + 1
+            if after > ADDRESS_MAX:
+                break
+        return blocks
+
+
+# ================================================================================
+# ENTRY SOURCES
+# ================================================================================
+
+
+def egress_vpc_count(config: Dict[str, Any]) -> int:
+    """
+    Number of distributed egress VPCs a config enables.
+
+    Raises:
+        ValueError: ``distributed_egress_vpc_count`` is not a whole number
+    """
+    value = config.get("distributed_egress_vpc_count")
+    if value in (None, ""):
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"distributed_egress_vpc_count must be a whole number, got {value!r}") from None
+
+
+def entries_from_config(
+    source: str,
+    config: Dict[str, Any],
+    subnet_parents: Optional[Dict[str, str]] = None,
+) -> List[CidrEntry]:
+    """
+    Extract address-space entries from a template config.
+
+    Args:
+        source: Label for the entries (usually the template name)
+        config: Config values, including computed subnet CIDRs if available
+        subnet_parents: Computed subnet field -> VPC field it is carved from
+            (from the compute program's references)
+
+    Returns:
+        Entries for enabled VPCs, supernets and their subnets
+
+    Raises:
+        ValueError: A field the entries depend on is invalid
+    """
+    entries = []
+    included_vpcs = set()
+    try:
+        egress_count = egress_vpc_count(config)
+    except ValueError as e:
+        raise ValueError(f"{source}: {e}") from None
+    for field, value in config.items():
+        kind, flag = CONFIG_CIDR_FIELDS.get(field, (None, None))
+        match = _DISTRIBUTED_EGRESS_FIELD.match(field)
+        if match:
+            if not config.get("enable_distributed_egress_vpcs") or int(match.group(1)) > egress_count:
+                continue
+            kind = KIND_VPC
+        if kind is None or (flag and not config.get(flag)):
+            continue
+        network = parse_network(value)
+        if network is None:
+            continue
+        entries.append(CidrEntry(network, kind, source, field))
+        if kind == KIND_VPC:
+            included_vpcs.add(field)
+
+    for field, parent in (subnet_parents or {}).items():
+        network = parse_network(config.get(field))
+        if network is not None and parent in included_vpcs:
+            entries.append(CidrEntry(network, KIND_SUBNET, source, field, parent))
+    return entries
+
+
+def entries_from_aws(
+    ec2: Any,
+    source: str,
+    skip_name_prefix: Optional[str] = None,
+) -> List[CidrEntry]:
+    """
+    Collect VPC, subnet and Transit Gateway route CIDRs from an EC2 client.
+
+    Args:
+        ec2: boto3 EC2 client for the region
+        source: Label for the entries (e.g. "aws:us-west-2")
+        skip_name_prefix: Skip resources whose Name tag starts with this
+            (the environment being validated, e.g. "acme-test-")
+
+    Returns:
+        Discovered entries
+    """
+    def tag_name(resource: Dict[str, Any]) -> str:
+        for tag in resource.get("Tags", []):
+            if tag["Key"] == "Name":
+                return tag["Value"]
+        return ""
+
+    def skipped(resource: Dict[str, Any]) -> bool:
+        return bool(skip_name_prefix) and tag_name(resource).startswith(skip_name_prefix)
+
+    entries = []
+    skipped_vpcs = set()
+    for page in ec2.get_paginator("describe_vpcs").paginate():
+        for vpc in page["Vpcs"]:
+            if skipped(vpc):
+                skipped_vpcs.add(vpc["VpcId"])
+                continue
+            label = vpc["VpcId"] + (f" ({tag_name(vpc)})" if tag_name(vpc) else "")
+            cidrs = [a["CidrBlock"] for a in vpc.get("CidrBlockAssociationSet", [])
+                     if a.get("CidrBlockState", {}).get("State") in (None, "associated")]
+            for cidr in cidrs or [vpc["CidrBlock"]]:
+                network = parse_network(cidr)
+                if network is not None:
+                    entries.append(CidrEntry(network, KIND_VPC, source, label))
+
+    for page in ec2.get_paginator("describe_subnets").paginate():
+        for subnet in page["Subnets"]:
+            if subnet["VpcId"] in skipped_vpcs or skipped(subnet):
+                continue
+            network = parse_network(subnet.get("CidrBlock"))
+            if network is not None:
+                entries.append(CidrEntry(network, KIND_SUBNET, source, subnet["SubnetId"], subnet["VpcId"]))
+
+    for page in ec2.get_paginator("describe_transit_gateway_route_tables").paginate():
+        for table in page["TransitGatewayRouteTables"]:
+            if skipped(table):
+                continue
+            routes = ec2.search_transit_gateway_routes(
+                TransitGatewayRouteTableId=table["TransitGatewayRouteTableId"],
+                Filters=[{"Name": "state", "Values": ["active", "blackhole"]}],
+            ).get("Routes", [])
+            for route in routes:
+                network = parse_network(route.get("DestinationCidrBlock"))
+                if network is not None:
+                    entries.append(CidrEntry(
+                        network, KIND_ROUTE, source,
+                        f"{table['TransitGatewayRouteTableId']} -> {route.get('DestinationCidrBlock')}"
+                    ))
+    return entries
+
+
+# ================================================================================
+# CONFLICTS
+# ================================================================================
+
+
+def _expected(a: CidrEntry, b: CidrEntry) -> bool:
+    """True if an overlap between two entries is by design."""
+    pair = {a.kind, b.kind}
+    if a.source == b.source:
+        # A subnet inside its own VPC, a supernet summarizing VPCs
+        if KIND_SUBNET in pair and (a.parent == b.name or b.parent == a.name):
+            return True
+        if KIND_SUPERNET in pair:
+            outer, inner = (a, b) if a.network.prefixlen <= b.network.prefixlen else (b, a)
+            return outer.kind == KIND_SUPERNET and inner.kind != KIND_SUPERNET
+    if a.source.startswith("aws:") and b.source.startswith("aws:"):
+        return a.parent == b.name or b.parent == a.name
+    return False
+
+
+def find_conflicts(index: CidrIndex, candidates: Iterable[CidrEntry]) -> List[Dict[str, Any]]:
+    """
+    Report overlaps between candidate entries and an index.
+
+    Overlaps with Transit Gateway routes are warnings (traffic may be routed
+    elsewhere); all other unexpected overlaps are errors.
+
+    Args:
+        index: Index of existing entries (may include the candidates)
+        candidates: Entries to check (VPCs before their subnets)
+
+    Returns:
+        Conflict dicts with severity, the candidate and the entry it overlaps
+    """
+    conflicts = []
+    seen = set()
+    for candidate in candidates:
+        for other in index.overlapping(candidate.network):
+            if other == candidate or _expected(candidate, other):
+                continue
+            # Report each pair of VPCs once, not again for every subnet inside them
+            key = frozenset((
+                (candidate.source, candidate.parent or candidate.name),
+                (other.source, other.parent or other.name),
+            ))
+            if key in seen:
+                continue
+            seen.add(key)
+            severity = "warning" if KIND_ROUTE in (candidate.kind, other.kind) else "error"
+            conflicts.append({
+                "severity": severity,
+                "cidr": str(candidate.network),
+                "field": candidate.name,
+                "source": candidate.source,
+                "overlaps": other.to_dict(),
+                "message": (
+                    f"{candidate.name} ({candidate.network}) overlaps "
+                    f"{other.kind} {other.name} ({other.network}) from {other.source}"
+                ),
+            })
+    return conflicts
+
+
+def suggest_free_block(index: CidrIndex, network: ipaddress.IPv4Network) -> Optional[ipaddress.IPv4Network]:
+    """Suggest a free block of the same size in the private range containing a prefix."""
+    for supernet in PRIVATE_RANGES:
+        if network.subnet_of(supernet):
+            return index.first_free(supernet, network.prefixlen)
+    return None
+
+
+def subnet_parents_from_compute(references: Dict[str, Iterable[str]]) -> Dict[str, str]:
+    """
+    Map computed subnet fields to the VPC CIDR field they are carved from.
+
+    Args:
+        references: Computed field -> variables its expression references
+
+    Returns:
+        Subnet field -> parent VPC field
+    """
+    parents = {}
+    for field, refs in references.items():
+        vpc_fields = [r for r in refs if r in CONFIG_CIDR_FIELDS or _DISTRIBUTED_EGRESS_FIELD.match(r)]
+        if len(vpc_fields) == 1:
+            parents[field] = vpc_fields[0]
+    return parents
+
+
+def template_entries(compiled: Any, source: str, config: Dict[str, Any]) -> List[CidrEntry]:
+    """
+    Extract address-space entries from a config using its template schema.
+
+    Only fields the template declares are considered, and computed subnet
+    CIDRs are evaluated so subnets are checked too.
+
+    Args:
+        compiled: CompiledSchema of the template
+        source: Label for the entries
+        config: Config values
+    """
+    values = {k: v for k, v in config.items() if k in compiled.fields}
+    values.update(compiled.compute.evaluate(values))
+    parents = subnet_parents_from_compute({
+        name: expression.references
+        for name, expression in compiled.compute.expressions.items()
+    })
+    return entries_from_config(source, values, parents)
@@ -0,0 +1,199 @@
+"""Bulk CIDR allocation for distributed egress VPCs.
+
+Carves VPC blocks for many environments at once out of a supernet with a
+buddy allocator. There is one free list per prefix length. An allocation
+takes the lowest free block of the smallest size that fits and splits it
+down, so allocations pack towards the start of the supernet. Existing
+allocations are reserved first.
+
+Subnets follow the layout in ``terraform/existing_vpc_resources/vpc_distributed.tf``
+(``cidrsubnet(vpc, distributed_egress_subnet_bits, index)``).
+"""
+import heapq
+import ipaddress
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.services.cidr_index import ADDRESS_BITS, network_bounds
+from app.services.compute import cidrsubnet
+
+logger = logging.getLogger(__name__)
+
+# Subnet index within a distributed egress VPC (see vpc_distributed.tf)
+DISTRIBUTED_SUBNETS = {
+    "public_az1": 0,
+    "public_az2": 1,
+    "private_az1": 2,
+    "private_az2": 3,
+    "gwlbe_az1": 4,
+    "gwlbe_az2": 5,
+}
+
+# distributed_egress_vpc_count is validated to 1..3 in variables.tf
+MAX_VPCS_PER_ENVIRONMENT = 3
+
+# Config fields a plan writes (the VPC CIDRs and the subnets computed from them)
+_PLANNED_FIELD = re.compile(r"^distributed_egress_vpc_\d+_")
+
+
+class AllocationError(Exception):
+    """Raised when the supernet has no room for a requested block."""
+
+
+class BuddyAllocator:
+    """
+    Buddy allocator over an IPv4 supernet.
+
+    Args:
+        supernet: Address range to allocate from
+    """
+
+    def __init__(self, supernet: ipaddress.IPv4Network):
+        self.supernet = supernet
+        # prefix length -> free block starts (set for membership, heap for lowest)
+        self._free: Dict[int, Set[int]] = {}
+        self._heaps: Dict[int, List[int]] = {}
+        self._push(supernet.prefixlen, network_bounds(supernet)[0])
+
+    def _push(self, prefixlen: int, start: int) -> None:
+        self._free.setdefault(prefixlen, set()).add(start)
+        heapq.heappush(self._heaps.setdefault(prefixlen, []), start)
+
+    def _pop_lowest(self, prefixlen: int) -> Optional[int]:
+        heap = self._heaps.get(prefixlen)
+        free = self._free.get(prefixlen)
+        while heap:
+            start = heapq.heappop(heap)
+            if start in free:  # skip entries removed by reserve()
+                free.discard(start)
+                return start
+        return None
+
+    def _split(self, start: int, prefixlen: int, target: int, keep: int) -> None:
+        """Split a free block down to ``target`` length, freeing halves not containing ``keep``."""
+        while prefixlen < target:
+            prefixlen += 1
+            half = 1 << (ADDRESS_BITS - prefixlen)
+            if keep >= start + half:
+                self._push(prefixlen, start)
+                start += half
+            else:
+                self._push(prefixlen, start + half)
+
+    def free_addresses(self) -> int:
+        """Total number of free addresses."""
+        return sum(len(starts) << (ADDRESS_BITS - p) for p, starts in self._free.items())
+
+    def reserve(self, network: ipaddress.IPv4Network) -> None:
+        """Mark a prefix as used (ignored if it lies outside the supernet)."""
+        if not network.overlaps(self.supernet):
+            return
+        if network.prefixlen < self.supernet.prefixlen:
+            network = self.supernet
+        start, end = network_bounds(network)
+
+        # A free block containing the prefix: split it around the prefix
+        for prefixlen in range(network.prefixlen, self.supernet.prefixlen - 1, -1):
+            block = start & ~((1 << (ADDRESS_BITS - prefixlen)) - 1)
+            if block in self._free.get(prefixlen, ()):
+                self._free[prefixlen].discard(block)
+                self._split(block, prefixlen, network.prefixlen, start)
+                return
+
+        # Otherwise the prefix is partly used already: drop the free blocks inside it
+        for prefixlen in range(network.prefixlen + 1, ADDRESS_BITS + 1):
+            inside = {s for s in self._free.get(prefixlen, ()) if start <= s <= end}
+            self._free.get(prefixlen, set()).difference_update(inside)
+
+    def allocate(self, prefixlen: int) -> ipaddress.IPv4Network:
+        """
+        Allocate the lowest available block of a prefix length.
+
+        Raises:
+            AllocationError: If no block of that size is free
+        """
+        if prefixlen < self.supernet.prefixlen or prefixlen > ADDRESS_BITS:
+            raise AllocationError(f"/{prefixlen} does not fit in {self.supernet}")
+        for size in range(prefixlen, self.supernet.prefixlen - 1, -1):
+            start = self._pop_lowest(size)
+            if start is not None:
+                self._split(start, size, prefixlen, start)
+                return ipaddress.IPv4Network((start, prefixlen))
+        raise AllocationError(f"No free /{prefixlen} left in {self.supernet}")
+
+
+def is_planned_field(name: Optional[str]) -> bool:
+    """True for config fields that a distributed egress plan replaces."""
+    return bool(name) and bool(_PLANNED_FIELD.match(name))
+
+
+def distributed_subnets(vpc: ipaddress.IPv4Network, subnet_bits: int) -> Dict[str, str]:
+    """Subnet CIDRs of a distributed egress VPC, keyed by role and AZ."""
+    return {
+        name: cidrsubnet(str(vpc), subnet_bits, index)
+        for name, index in DISTRIBUTED_SUBNETS.items()
+    }
+
+
+def plan_distributed_egress(
+    supernet: ipaddress.IPv4Network,
+    environments: int,
+    vpcs_per_environment: int,
+    vpc_prefixlen: int,
+    subnet_bits: int,
+    existing: Iterable[ipaddress.IPv4Network] = (),
+) -> List[Dict[str, Any]]:
+    """
+    Allocate distributed egress VPCs for several environments.
+
+    Args:
+        supernet: Range to allocate from
+        environments: Number of environments to plan
+        vpcs_per_environment: Distributed egress VPCs per environment (1-3)
+        vpc_prefixlen: Prefix length of each VPC (e.g. 24)
+        subnet_bits: distributed_egress_subnet_bits (6 subnets must fit)
+        existing: Prefixes already in use
+
+    Returns:
+        One dict per environment with its VPC CIDRs, subnets and the config
+        values to apply
+
+    Raises:
+        ValueError: On invalid sizes
+        AllocationError: If the supernet is too small
+    """
+    if not 1 <= vpcs_per_environment <= MAX_VPCS_PER_ENVIRONMENT:
+        raise ValueError(f"vpcs_per_environment must be between 1 and {MAX_VPCS_PER_ENVIRONMENT}")
+    if (1 << subnet_bits) < len(DISTRIBUTED_SUBNETS):
+        raise ValueError(f"subnet_bits must be at least 3 to fit {len(DISTRIBUTED_SUBNETS)} subnets")
+    if vpc_prefixlen + subnet_bits > ADDRESS_BITS:
+        raise ValueError(f"/{vpc_prefixlen} VPCs cannot be split by {subnet_bits} more bits")
+
+    allocator = BuddyAllocator(supernet)
+    for network in existing:
+        allocator.reserve(network)
+
+    plans = []
+    for environment in range(environments):
+        vpcs = [allocator.allocate(vpc_prefixlen) for _ in range(vpcs_per_environment)]
+        config = {
+            "enable_distributed_egress_vpcs": True,
+            "distributed_egress_vpc_count": vpcs_per_environment,
+            "distributed_egress_subnet_bits": subnet_bits,
+        }
+        for number, vpc in enumerate(vpcs, start=1):
+            config[f"distributed_egress_vpc_{number}_cidr"] = str(vpc)
+        plans.append({
+            "environment": environment,
+            "vpcs": [
+                {"cidr": str(vpc), "subnets": distributed_subnets(vpc, subnet_bits)}
+                for vpc in vpcs
+            ],
+            "config": config,
+        })
+    logger.info(
+        "Planned %d distributed egress VPCs in %s (%d addresses left)",
+        environments * vpcs_per_environment, supernet, allocator.free_addresses()
+    )
+    return plans
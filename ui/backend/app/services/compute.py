@@ -0,0 +1,307 @@
+"""Server-side evaluation of ``@ui-compute`` expressions.
+
+Mirrors ``ui/frontend/src/utils/compute.js`` so computed fields can be filled
+for API and batch callers. Expressions are compiled once per schema into
+closures, computed fields are ordered topologically by the variables they
+reference, and ``ComputeProgram.evaluate`` can recompute just the fields
+affected by a set of changed inputs.
+
+Supported expressions::
+
+    cidrsubnet(vpc_cidr_inspection, subnet_bits, 0)
+    template("${cp}-${env}-tgw")
+
+Arguments may be field names, integer literals, string literals or nested
+calls. Missing inputs produce ``""`` (as in the frontend); template
+placeholders with no value are left as-is.
+"""
+import ipaddress
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(
+    r"\s*(?:"
+    r"(?P<number>-?\d+)"
+    r'|"(?P<string>(?:[^"\\]|\\.)*)"'
+    r"|(?P<name>[A-Za-z_]\w*)"
+    r"|(?P<punct>[(),])"
+    r")"
+)
+_TEMPLATE_VAR = re.compile(r"\$\{([^}]+)\}")
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+
+class ComputeError(ValueError):
+    """Raised when a compute expression cannot be compiled."""
+
+
+# ================================================================================
+# FUNCTIONS
+# ================================================================================
+
+
+def cidrsubnet(prefix: str, newbits: int, netnum: int) -> str:
+    """
+    Calculate a subnet CIDR within a parent range, like Terraform's cidrsubnet.
+
+    Args:
+        prefix: Parent CIDR (e.g. "10.0.0.0/16"); host bits are ignored
+        newbits: Bits to add to the parent prefix length
+        netnum: Subnet number
+
+    Returns:
+        Subnet CIDR string
+
+    Raises:
+        ValueError: If the parent is invalid or the subnet does not fit
+    """
+    network = ipaddress.ip_network(str(prefix).strip(), strict=False)
+    newbits = int(newbits)
+    netnum = int(netnum)
+    new_prefix = network.prefixlen + newbits
+    if newbits < 0 or new_prefix > network.max_prefixlen:
+        raise ValueError(f"cannot extend /{network.prefixlen} by {newbits} bits")
+    if not 0 <= netnum < (1 << newbits):
+        raise ValueError(f"netnum {netnum} does not fit in {newbits} bits")
+    size = 1 << (network.max_prefixlen - new_prefix)
+    address = network.network_address + netnum * size
+    return f"{address}/{new_prefix}"
+
+
+def _fn_cidrsubnet(config: Dict[str, Any], prefix: Any, newbits: Any, netnum: Any) -> str:
+    if prefix in (None, "") or newbits in (None, ""):
+        return ""
+    try:
+        return cidrsubnet(prefix, newbits, netnum)
+    except (TypeError, ValueError) as e:
+        logger.debug("cidrsubnet(%s, %s, %s) failed: %s", prefix, newbits, netnum, e)
+        return ""
+
+
+def _fn_template(config: Dict[str, Any], text: Any) -> str:
+    def substitute(match: re.Match) -> str:
+        value = config.get(match.group(1).strip())
+        return str(value) if value not in (None, "") else match.group(0)
+
+    return _TEMPLATE_VAR.sub(substitute, str(text))
+
+
+# name -> (implementation, arity). Implementations get the config first.
+FUNCTIONS: Dict[str, Tuple[Callable[..., Any], int]] = {
+    "cidrsubnet": (_fn_cidrsubnet, 3),
+    "template": (_fn_template, 1),
+}
+
+
+# ================================================================================
+# COMPILER
+# ================================================================================
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            raise ComputeError(f"Unexpected character at {position} in {expression!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing (evaluator, referenced variables)."""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.index = 0
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def _take(self, value: Optional[str] = None) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None or (value is not None and token[1] != value):
+            raise ComputeError(f"Expected {value or 'a value'} in {self.expression!r}")
+        self.index += 1
+        return token
+
+    def parse(self) -> Tuple[Evaluator, Set[str]]:
+        evaluator, refs = self._value()
+        if self._peek() is not None:
+            raise ComputeError(f"Unexpected trailing input in {self.expression!r}")
+        return evaluator, refs
+
+    def _value(self) -> Tuple[Evaluator, Set[str]]:
+        kind, text = self._take()
+        if kind == "number":
+            number = int(text)
+            return (lambda config: number), set()
+        if kind == "string":
+            literal = bytes(text, "utf-8").decode("unicode_escape")
+            refs = {name.strip() for name in _TEMPLATE_VAR.findall(literal)}
+            return (lambda config: literal), refs
+        if kind != "name":
+            raise ComputeError(f"Unexpected '{text}' in {self.expression!r}")
+
+        next_token = self._peek()
+        if next_token is None or next_token[1] != "(":
+            return (lambda config: config.get(text)), {text}
+
+        if text not in FUNCTIONS:
+            raise ComputeError(f"Unknown function '{text}' in {self.expression!r}")
+        function, arity = FUNCTIONS[text]
+        self._take("(")
+        args: List[Evaluator] = []
+        refs: Set[str] = set()
+        if self._peek() is not None and self._peek()[1] != ")":
+            while True:
+                arg, arg_refs = self._value()
+                args.append(arg)
+                refs |= arg_refs
+                if self._peek() is not None and self._peek()[1] == ",":
+                    self._take(",")
+                    continue
+                break
+        self._take(")")
+        if len(args) != arity:
+            raise ComputeError(f"{text}() takes {arity} arguments, got {len(args)}")
+
+        def call(config: Dict[str, Any]) -> Any:
+            return function(config, *(arg(config) for arg in args))
+
+        return call, refs
+
+
+@dataclass(frozen=True)
+class CompiledExpression:
+    """A compiled ``@ui-compute`` expression."""
+
+    field: str
+    expression: str
+    evaluate: Evaluator
+    references: frozenset
+
+
+def compile_expression(field: str, expression: str) -> CompiledExpression:
+    """
+    Compile one compute expression.
+
+    Raises:
+        ComputeError: On syntax errors, unknown functions or wrong arity
+    """
+    evaluator, refs = _Parser(expression).parse()
+    return CompiledExpression(field, expression, evaluator, frozenset(refs))
+
+
+# ================================================================================
+# PROGRAM
+# ================================================================================
+
+
+class ComputeProgram:
+    """
+    All compute expressions of one schema, in dependency order.
+
+    Args:
+        expressions: Field name -> expression source
+    """
+
+    def __init__(self, expressions: Dict[str, str]):
+        self.expressions: Dict[str, CompiledExpression] = {}
+        for field, source in expressions.items():
+            try:
+                self.expressions[field] = compile_expression(field, source)
+            except ComputeError as e:
+                logger.warning("Skipping @ui-compute for %s: %s", field, e)
+
+        # variable -> computed fields that read it directly
+        self._readers: Dict[str, Set[str]] = {}
+        for compiled in self.expressions.values():
+            for ref in compiled.references:
+                self._readers.setdefault(ref, set()).add(compiled.field)
+        self.order = self._topological_order()
+        self._position = {field: i for i, field in enumerate(self.order)}
+
+    @classmethod
+    def from_schema(cls, schema: Dict[str, Any]) -> "ComputeProgram":
+        """Build a program from a parsed tfvars schema."""
+        return cls({
+            field["name"]: field["compute"]
+            for group in schema.get("groups", [])
+            for field in group.get("fields", [])
+            if field.get("compute")
+        })
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}
+
+        def visit(field: str) -> None:
+            mark = state.get(field)
+            if mark == 2:
+                return
+            if mark == 1:
+                raise ComputeError(f"Compute cycle through field '{field}'")
+            state[field] = 1
+            for ref in self.expressions[field].references:
+                if ref in self.expressions and ref != field:
+                    visit(ref)
+            state[field] = 2
+            order.append(field)
+
+        for field in self.expressions:
+            visit(field)
+        return order
+
+    def affected(self, changed: Iterable[str]) -> List[str]:
+        """
+        List computed fields that depend (directly or transitively) on changed fields.
+
+        Returns:
+            Affected field names in evaluation order
+        """
+        pending = list(changed)
+        seen: Set[str] = set()
+        while pending:
+            name = pending.pop()
+            for reader in self._readers.get(name, ()):
+                if reader not in seen:
+                    seen.add(reader)
+                    pending.append(reader)
+        return sorted(seen, key=self._position.__getitem__)
+
+    def evaluate(
+        self,
+        config: Dict[str, Any],
+        changed: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Evaluate computed fields.
+
+        Args:
+            config: Current field values (computed values already in it are
+                used for fields that are not recomputed)
+            changed: Fields that changed since the last evaluation; None
+                recomputes everything
+
+        Returns:
+            Computed field -> value, only for the fields that were evaluated
+        """
+        fields = self.order if changed is None else self.affected(changed)
+        scope = dict(config)
+        results = {}
+        for field in fields:
+            value = self.expressions[field].evaluate(scope)
+            scope[field] = value
+            results[field] = value
+        return results
@@ -0,0 +1,251 @@
+"""Server-side evaluation of ``@ui-show-if`` / ``@ui-hide-if`` conditions.
+
+Mirrors ``ui/frontend/src/utils/conditions.js`` (including its JavaScript
+coercion rules) so the backend hides exactly the fields the form hides.
+Each expression is compiled once into a predicate and cached, and
+``Visibility`` combines the group and field conditions of a schema.
+
+Supported expressions::
+
+    enable_fortimanager == true
+    autoscale_license_model != "on_demand"
+    enable_distributed_egress_vpcs == true && distributed_egress_vpc_count >= 3
+    enable_fortitester_1 == true || enable_fortitester_2 == true
+
+``&&`` binds tighter than ``||``; there are no parentheses. A term without an
+operator is a truthiness check on the field.
+"""
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+# Checked in this order, as in conditions.js (>= and <= before > and <, != before ==)
+_COMPARISON = [
+    (op, re.compile(r"^(\w+)\s*" + re.escape(op) + r"\s*(.+)$"))
+    for op in (">=", "<=", ">", "<", "!=", "==")
+]
+_NUMBER = re.compile(r"^-?\d+(\.\d+)?$")
+
+
+# ================================================================================
+# JAVASCRIPT COERCION
+# ================================================================================
+
+
+def js_number(value: Any) -> float:
+    """``Number(value)``: NaN for missing or non-numeric values."""
+    if value is None:
+        return math.nan  # undefined (null is not representable in saved configs)
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return 0.0
+        try:
+            return float(text)
+        except ValueError:
+            return math.nan
+    return math.nan
+
+
+def js_truthy(value: Any) -> bool:
+    """``!!value``: lists and objects are truthy even when empty."""
+    if isinstance(value, (list, dict)):
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return False
+    return bool(value)
+
+
+def js_string(value: Any) -> str:
+    """``String(value)`` for the value types a config can hold."""
+    if value is None:
+        return "undefined"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, list):
+        return ",".join(js_string(v) for v in value)
+    return str(value)
+
+
+def _parse_value(text: str) -> Any:
+    """Literal on the right-hand side of a comparison."""
+    text = text.strip()
+    if text == "true":
+        return True
+    if text == "false":
+        return False
+    if _NUMBER.match(text):
+        return float(text)
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    return text
+
+
+# ================================================================================
+# COMPILER
+# ================================================================================
+
+
+def _compile_term(term: str) -> Predicate:
+    for op, pattern in _COMPARISON:
+        match = pattern.match(term)
+        if not match:
+            continue
+        field, expected = match.group(1), _parse_value(match.group(2))
+
+        if op in (">=", "<=", ">", "<"):
+            bound = js_number(expected)
+            compare = {
+                ">=": lambda a, b: a >= b,
+                "<=": lambda a, b: a <= b,
+                ">": lambda a, b: a > b,
+                "<": lambda a, b: a < b,
+            }[op]
+            return lambda config: compare(js_number(config.get(field)), bound)
+
+        if isinstance(expected, bool):
+            def equals(config: Dict[str, Any]) -> bool:
+                return js_truthy(config.get(field)) == expected
+        elif isinstance(expected, float):
+            def equals(config: Dict[str, Any]) -> bool:
+                return js_number(config.get(field)) == expected
+        else:
+            folded = expected.lower()
+
+            def equals(config: Dict[str, Any]) -> bool:
+                return js_string(config.get(field)).lower() == folded
+
+        if op == "!=":
+            return lambda config: not equals(config)
+        return equals
+
+    field = term.strip()
+    return lambda config: js_truthy(config.get(field))
+
+
+def _compile(expression: str) -> Predicate:
+    alternatives: List[List[Predicate]] = [
+        [_compile_term(term.strip()) for term in part.strip().split("&&")]
+        for part in expression.split("||")
+    ]
+    single = alternatives[0][0] if len(alternatives) == 1 and len(alternatives[0]) == 1 else None
+
+    def predicate(config: Dict[str, Any]) -> bool:
+        try:
+            if single is not None:
+                return single(config)
+            for terms in alternatives:
+                for term in terms:
+                    if not term(config):
+                        break
+                else:
+                    return True
+            return False
+        except Exception as e:  # conditions.js treats errors as false
+            logger.debug("Error evaluating condition %r: %s", expression, e)
+            return False
+
+    return predicate
+
+
+@lru_cache(maxsize=1024)
+def compile_condition(expression: str) -> Predicate:
+    """
+    Compile a show-if/hide-if expression into a predicate.
+
+    Predicates are cached per expression string; an empty expression is
+    always true.
+    """
+    if not expression or not expression.strip():
+        return lambda config: True
+    return _compile(expression)
+
+
+def evaluate_condition(expression: str, config: Dict[str, Any]) -> bool:
+    """Evaluate an expression against a config (``evaluateCondition`` in conditions.js)."""
+    return compile_condition(expression)(config)
+
+
+# ================================================================================
+# VISIBILITY
+# ================================================================================
+
+
+class Visibility:
+    """
+    Visibility predicates for every conditional field of a schema.
+
+    A field is visible when its group's ``show_if`` holds and then either its
+    own ``show_if`` holds or, without one, its ``hide_if`` does not (the same
+    precedence as FormGroup/FormField).
+
+    Args:
+        schema: Parsed tfvars schema
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        # Distinct conditions, evaluated once per config. Fields refer to them by
+        # 1-based index; a negative index is a hide_if (visible when false).
+        self.conditions: List[Predicate] = []
+        self.expressions: List[str] = []  # source of each condition
+        self.predicates: Dict[str, List[int]] = {}
+        positions: Dict[str, int] = {}
+
+        def position(expression: str) -> int:
+            if expression not in positions:
+                positions[expression] = len(self.conditions)
+                self.conditions.append(compile_condition(expression))
+                self.expressions.append(expression)
+            return positions[expression]
+
+        for group in schema.get("groups", []):
+            group_show = group.get("show_if")
+            for field in group.get("fields", []):
+                checks = []
+                if group_show:
+                    checks.append(position(group_show) + 1)
+                if field.get("show_if"):
+                    checks.append(position(field["show_if"]) + 1)
+                elif field.get("hide_if"):
+                    checks.append(-(position(field["hide_if"]) + 1))
+                if checks:
+                    self.predicates[field["name"]] = checks
+
+    @staticmethod
+    def _visible(checks: List[int], results: List[bool]) -> bool:
+        for check in checks:
+            if results[abs(check) - 1] != (check > 0):
+                return False
+        return True
+
+    def is_visible(self, field: str, config: Dict[str, Any]) -> bool:
+        """True if the form would show ``field`` for this config."""
+        return all(
+            self.conditions[abs(check) - 1](config) == (check > 0)
+            for check in self.predicates.get(field, ())
+        )
+
+    def hidden(self, config: Dict[str, Any]) -> Set[str]:
+        """Names of the fields the form hides for this config."""
+        results = [condition(config) for condition in self.conditions]
+        return {
+            field for field, checks in self.predicates.items()
+            if not self._visible(checks, results)
+        }
+
+    def visible_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """The config without the values of hidden fields."""
+        hidden = self.hidden(config)
+        return {name: value for name, value in config.items() if name not in hidden}
@@ -0,0 +1,617 @@
+"""Versioned, atomic storage for saved UI configurations.
+
+Each template keeps its current configuration in ``ui_config.json`` (so the
+file stays readable by humans and scripts) plus a compact revision log in
+``.ui_config.history.jsonl``:
+
+- every write goes to a temp file that is fsynced and renamed over the target,
+  so a crash never leaves a half-written config
+- writers take an exclusive file lock and may pass the revision they started
+  from; a stale revision raises ``ConfigConflictError`` (optimistic concurrency)
+- the log stores a JSON Patch (RFC 6902) per revision with a full snapshot
+  every ``SNAPSHOT_INTERVAL`` revisions, and is compacted once it grows past
+  ``HISTORY_LIMIT`` entries
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Default document name; other names (e.g. "cidr_plan") get their own files
+DEFAULT_NAME = "ui_config"
+
+# Store a full snapshot every N revisions so reconstruction replays few patches
+SNAPSHOT_INTERVAL = 20
+# Keep at most this many revisions after compaction
+HISTORY_LIMIT = 200
+
+
+class ConfigConflictError(Exception):
+    """Raised when a write is based on a stale revision."""
+
+    def __init__(self, expected: int, current: int):
+        self.expected = expected
+        self.current = current
+        super().__init__(
+            f"Configuration was modified elsewhere (expected revision {expected}, "
+            f"current revision {current}). Reload to get the latest changes."
+        )
+
+
+class ConfigPatchError(ValueError):
+    """Raised when a JSON Patch cannot be applied."""
+
+
+# ================================================================================
+# JSON PATCH (RFC 6902)
+# ================================================================================
+
+
+def _parse_pointer(path: str) -> List[str]:
+    """Split a JSON Pointer into unescaped tokens."""
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise ConfigPatchError(f"Invalid JSON pointer: {path}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _escape_token(token: str) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _resolve_parent(document: Any, tokens: List[str]) -> Tuple[Any, str]:
+    """Return the container holding the last token and the token itself."""
+    parent = document
+    for token in tokens[:-1]:
+        if isinstance(parent, dict):
+            if token not in parent:
+                raise ConfigPatchError(f"Path not found: /{'/'.join(tokens)}")
+            parent = parent[token]
+        elif isinstance(parent, list):
+            parent = parent[_list_index(parent, token)]
+        else:
+            raise ConfigPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return parent, tokens[-1]
+
+
+def _list_index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit():
+        raise ConfigPatchError(f"Invalid list index: {token}")
+    index = int(token)
+    limit = len(container) + (1 if allow_end else 0)
+    if index >= limit:
+        raise ConfigPatchError(f"List index out of range: {token}")
+    return index
+
+
+def _get(document: Any, path: str) -> Any:
+    value = document
+    for token in _parse_pointer(path):
+        if isinstance(value, dict) and token in value:
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_list_index(value, token)]
+        else:
+            raise ConfigPatchError(f"Path not found: {path}")
+    return value
+
+
+def _add(document: Any, path: str, value: Any) -> Any:
+    tokens = _parse_pointer(path)
+    if not tokens:
+        return value
+    parent, token = _resolve_parent(document, tokens)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, token, allow_end=True), value)
+    else:
+        raise ConfigPatchError(f"Cannot add at {path}")
+    return document
+
+
+def _remove(document: Any, path: str) -> Any:
+    tokens = _parse_pointer(path)
+    if not tokens:
+        raise ConfigPatchError("Cannot remove the document root")
+    parent, token = _resolve_parent(document, tokens)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise ConfigPatchError(f"Path not found: {path}")
+        del parent[token]
+    elif isinstance(parent, list):
+        del parent[_list_index(parent, token)]
+    else:
+        raise ConfigPatchError(f"Cannot remove at {path}")
+    return document
+
+
+def _replace(document: Any, path: str, value: Any) -> Any:
+    tokens = _parse_pointer(path)
+    if not tokens:
+        return value
+    parent, token = _resolve_parent(document, tokens)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise ConfigPatchError(f"Path not found: {path}")
+        # Assign in place so the member keeps its position in the object
+        parent[token] = value
+        return document
+    document = _remove(document, path)
+    return _add(document, path, value)
+
+
+def apply_json_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """
+    Apply an RFC 6902 JSON Patch and return the patched copy.
+
+    The input document is not modified. Supports add, remove, replace, move,
+    copy and test.
+
+    Args:
+        document: JSON document (normally the config dict)
+        operations: List of patch operations
+
+    Returns:
+        Patched document
+
+    Raises:
+        ConfigPatchError: If an operation is invalid or a test fails
+    """
+    result = copy.deepcopy(document)
+    for operation in operations:
+        op = operation.get("op")
+        path = operation.get("path")
+        if path is None:
+            raise ConfigPatchError(f"Operation is missing 'path': {operation}")
+        if op == "add":
+            result = _add(result, path, copy.deepcopy(operation.get("value")))
+        elif op == "remove":
+            result = _remove(result, path)
+        elif op == "replace":
+            _get(result, path)
+            result = _replace(result, path, copy.deepcopy(operation.get("value")))
+        elif op in ("move", "copy"):
+            source = operation.get("from")
+            if source is None:
+                raise ConfigPatchError(f"Operation is missing 'from': {operation}")
+            value = copy.deepcopy(_get(result, source))
+            if op == "move":
+                result = _remove(result, source)
+            result = _add(result, path, value)
+        elif op == "test":
+            if _get(result, path) != operation.get("value"):
+                raise ConfigPatchError(f"Test failed at {path}")
+        else:
+            raise ConfigPatchError(f"Unsupported patch operation: {op}")
+    return result
+
+
+def make_json_patch(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """
+    Compute a JSON Patch that turns ``old`` into ``new``.
+
+    Dicts are diffed key by key (recursively); lists and scalars are replaced
+    as a whole, which keeps patches small for the flat config documents.
+    """
+    if old == new:
+        return []
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return [{"op": "replace", "path": path, "value": new}]
+
+    operations = []
+    for key in old:
+        if key not in new:
+            operations.append({"op": "remove", "path": f"{path}/{_escape_token(key)}"})
+    for key, value in new.items():
+        child = f"{path}/{_escape_token(key)}"
+        if key not in old:
+            operations.append({"op": "add", "path": child, "value": value})
+        else:
+            operations.extend(make_json_patch(old[key], value, child))
+    return operations
+
+
+# ================================================================================
+# STORE
+# ================================================================================
+
+
+def content_hash(config: Optional[Dict[str, Any]]) -> str:
+    """Return a short, stable hash of a config document (empty for None)."""
+    if config is None:
+        return ""
+    encoded = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def format_etag(revision: int, digest: str) -> str:
+    """Format an HTTP ETag for a revision."""
+    return f'"{revision}-{digest}"'
+
+
+def parse_etag(value: Optional[str]) -> Optional[int]:
+    """
+    Extract the revision number from an If-Match value.
+
+    Accepts ETags produced by ``format_etag`` as well as a bare revision number.
+    Returns None for a missing value or ``*``.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value == "*":
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"').split("-", 1)[0]
+    try:
+        return int(value)
+    except ValueError:
+        raise ConfigPatchError(f"Invalid If-Match value: {value}")
+
+
+def _atomic_write(path: Path, data: str) -> None:
+    """Write a file via temp file + fsync + rename so readers never see partial content."""
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    try:
+        dir_fd = os.open(str(path.parent), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+
+class ConfigStore:
+    """
+    Versioned store for one template's ``ui_config.json``.
+
+    Args:
+        config_dir: Directory holding ui_config.json (the template directory)
+        name: Document name; files are ``{name}.json``, ``.{name}.history.jsonl``
+            and ``.{name}.lock``
+    """
+
+    def __init__(self, config_dir: Path, name: str = DEFAULT_NAME):
+        self.config_dir = Path(config_dir)
+        self.name = name
+        self.config_file = self.config_dir / f"{name}.json"
+        self.history_file = self.config_dir / f".{name}.history.jsonl"
+        self.lock_file = self.config_dir / f".{name}.lock"
+        self._thread_lock = threading.Lock()
+
+    # --------------------------------------------------------------------------
+    # Locking and history I/O
+    # --------------------------------------------------------------------------
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold an exclusive lock across processes (flock) and threads."""
+        self.config_dir.mkdir(parents=True, exist_ok=True)
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_file, "a") as lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _read_history(self) -> List[Dict[str, Any]]:
+        if not self.history_file.exists():
+            return []
+        entries = []
+        with open(self.history_file, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from a crash; everything before it is valid
+                    logger.warning("Ignoring corrupt history entry in %s", self.history_file)
+        return entries
+
+    def _append_history(self, entry: Dict[str, Any]) -> None:
+        with open(self.history_file, "a") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read_current(self) -> Optional[Dict[str, Any]]:
+        if not self.config_file.exists():
+            return None
+        with open(self.config_file, "r") as f:
+            return json.load(f)
+
+    def _head(self, history: List[Dict[str, Any]]) -> Tuple[int, str]:
+        if not history:
+            return 0, ""
+        return history[-1]["rev"], history[-1].get("hash", "")
+
+    def _sync_external_edits(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Record the on-disk config as a revision if it was written outside the store.
+
+        Covers configs saved before the store existed and manual edits.
+        """
+        current = self._read_current()
+        revision, digest = self._head(history)
+        if content_hash(current) == digest:
+            return history
+        entry = {
+            "rev": revision + 1,
+            "ts": time.time(),
+            "hash": content_hash(current),
+            "snapshot": current,
+            "source": "external",
+        }
+        self._append_history(entry)
+        return history + [entry]
+
+    def _compact(self, history: List[Dict[str, Any]]) -> None:
+        """Drop old revisions, turning the oldest kept one into a snapshot."""
+        if len(history) <= HISTORY_LIMIT + SNAPSHOT_INTERVAL:
+            return
+        keep = history[-HISTORY_LIMIT:]
+        first = dict(keep[0])
+        first["snapshot"] = self._reconstruct(history, first["rev"])
+        first.pop("patch", None)
+        keep[0] = first
+        _atomic_write(
+            self.history_file,
+            "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in keep)
+        )
+        logger.info("Compacted config history for %s to %d revisions", self.config_dir.name, len(keep))
+
+    @staticmethod
+    def _reconstruct(history: List[Dict[str, Any]], revision: int) -> Optional[Dict[str, Any]]:
+        """Rebuild a revision from the nearest preceding snapshot plus patches."""
+        index = next((i for i, e in enumerate(history) if e["rev"] == revision), None)
+        if index is None:
+            raise KeyError(revision)
+        start = index
+        while start > 0 and "snapshot" not in history[start]:
+            start -= 1
+        if "snapshot" not in history[start]:
+            raise KeyError(revision)
+        document = copy.deepcopy(history[start]["snapshot"])
+        for entry in history[start + 1:index + 1]:
+            if "snapshot" in entry:
+                document = copy.deepcopy(entry["snapshot"])
+            else:
+                document = apply_json_patch(document if document is not None else {}, entry["patch"])
+        return document
+
+    def _commit(
+        self,
+        history: List[Dict[str, Any]],
+        new_config: Optional[Dict[str, Any]],
+        source: str,
+    ) -> Dict[str, Any]:
+        """Write the new config and append its revision entry (lock must be held)."""
+        old_config = self._read_current()
+        revision, _ = self._head(history)
+        entry: Dict[str, Any] = {
+            "rev": revision + 1,
+            "ts": time.time(),
+            "hash": content_hash(new_config),
+            "source": source,
+        }
+        if new_config is None or old_config is None or entry["rev"] % SNAPSHOT_INTERVAL == 1:
+            entry["snapshot"] = new_config
+        else:
+            entry["patch"] = make_json_patch(old_config, new_config)
+
+        if new_config is None:
+            if self.config_file.exists():
+                self.config_file.unlink()
+        else:
+            _atomic_write(self.config_file, json.dumps(new_config, indent=2))
+        self._append_history(entry)
+        self._compact(history + [entry])
+        return entry
+
+    @staticmethod
+    def _check_revision(expected: Optional[int], current: int) -> None:
+        if expected is not None and expected != current:
+            raise ConfigConflictError(expected, current)
+
+    # --------------------------------------------------------------------------
+    # Public API
+    # --------------------------------------------------------------------------
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], int, str]:
+        """
+        Read the current configuration.
+
+        Returns:
+            Tuple of (config or None, revision, etag). Revision is 0 when the
+            config has never been saved through the store.
+        """
+        config = self._read_current()
+        revision, _ = self._head(self._read_history())
+        return config, revision, format_etag(revision, content_hash(config))
+
+    def save(
+        self,
+        config: Dict[str, Any],
+        expected_revision: Optional[int] = None,
+        source: str = "save",
+    ) -> Dict[str, Any]:
+        """
+        Replace the configuration.
+
+        Args:
+            config: New configuration
+            expected_revision: Revision the caller last read (None skips the check)
+            source: Label recorded in history
+
+        Returns:
+            Dict with revision, etag and changed flag
+
+        Raises:
+            ConfigConflictError: If expected_revision is stale
+        """
+        with self._locked():
+            history = self._read_history()
+            self._check_revision(expected_revision, self._head(history)[0])
+            history = self._sync_external_edits(history)
+            revision, digest = self._head(history)
+            if digest == content_hash(config) and self.config_file.exists():
+                return {"revision": revision, "etag": format_etag(revision, digest), "changed": False}
+            entry = self._commit(history, config, source)
+        return {
+            "revision": entry["rev"],
+            "etag": format_etag(entry["rev"], entry["hash"]),
+            "changed": True,
+        }
+
+    def patch(
+        self,
+        operations: List[Dict[str, Any]],
+        expected_revision: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Apply a JSON Patch to the current configuration.
+
+        Args:
+            operations: RFC 6902 operations
+            expected_revision: Revision the patch was computed against
+
+        Returns:
+            Dict with revision, etag, changed flag and the patched config
+
+        Raises:
+            ConfigConflictError: If expected_revision is stale
+            ConfigPatchError: If the patch cannot be applied
+        """
+        with self._locked():
+            history = self._read_history()
+            self._check_revision(expected_revision, self._head(history)[0])
+            history = self._sync_external_edits(history)
+            revision, digest = self._head(history)
+            current = self._read_current() or {}
+            patched = apply_json_patch(current, operations)
+            if not isinstance(patched, dict):
+                raise ConfigPatchError("Patched configuration must be a JSON object")
+            if content_hash(patched) == digest and self.config_file.exists():
+                return {
+                    "revision": revision,
+                    "etag": format_etag(revision, digest),
+                    "changed": False,
+                    "config": patched,
+                }
+            entry = self._commit(history, patched, "patch")
+        return {
+            "revision": entry["rev"],
+            "etag": format_etag(entry["rev"], entry["hash"]),
+            "changed": True,
+            "config": patched,
+        }
+
+    def delete(self, expected_revision: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Delete the configuration, keeping its history.
+
+        Returns:
+            Dict with the deletion revision, or None if nothing was saved
+        """
+        with self._locked():
+            if not self.config_file.exists():
+                return None
+            history = self._read_history()
+            self._check_revision(expected_revision, self._head(history)[0])
+            history = self._sync_external_edits(history)
+            entry = self._commit(history, None, "delete")
+        return {"revision": entry["rev"]}
+
+    def history(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        List recent revisions, newest first.
+
+        Returns:
+            Revision summaries with timestamp, source, hash and changed paths
+        """
+        entries = self._read_history()[-limit:]
+        summaries = []
+        for entry in reversed(entries):
+            summary = {
+                "revision": entry["rev"],
+                "timestamp": entry.get("ts"),
+                "source": entry.get("source"),
+                "hash": entry.get("hash"),
+                "deleted": "snapshot" in entry and entry["snapshot"] is None,
+            }
+            if "patch" in entry:
+                summary["changed_paths"] = [op["path"] for op in entry["patch"]]
+            summaries.append(summary)
+        return summaries
+
+    def get_revision(self, revision: int) -> Optional[Dict[str, Any]]:
+        """
+        Return the configuration as of a revision.
+
+        Raises:
+            KeyError: If the revision is unknown or was compacted away
+        """
+        return self._reconstruct(self._read_history(), revision)
+
+    def diff(self, from_revision: int, to_revision: int) -> List[Dict[str, Any]]:
+        """
+        Return the JSON Patch between two revisions.
+
+        Raises:
+            KeyError: If either revision is unknown
+        """
+        history = self._read_history()
+        old = self._reconstruct(history, from_revision) or {}
+        new = self._reconstruct(history, to_revision) or {}
+        return make_json_patch(old, new)
+
+
+_stores: Dict[Tuple[Path, str], ConfigStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_config_store(config_dir: Path, name: str = DEFAULT_NAME) -> ConfigStore:
+    """Return the shared ConfigStore for a directory and document name."""
+    key = (Path(config_dir).resolve(), name)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ConfigStore(*key)
+        return _stores[key]
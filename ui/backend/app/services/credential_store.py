@@ -0,0 +1,265 @@
+"""Shared storage for AWS session credentials.
+
+``POST /api/aws/credentials/set`` stores credentials here:
+
+- ``MemoryCredentialStore`` (``CREDENTIAL_STORE=memory``, the default) keeps
+  them in this process only, which is enough for a single worker.
+- ``FileCredentialStore`` (``CREDENTIAL_STORE=file``, opt-in) keeps them
+  encrypted in one file, so every worker process sees them (``uvicorn
+  --workers N``, or several containers sharing a volume) without sticky
+  sessions. Writes take an exclusive ``flock`` and replace the file
+  atomically.
+
+The file store encrypts with Fernet (AES-128-CBC with HMAC-SHA256) from the
+``cryptography`` package, the ``shared-credentials`` extra. The key is
+``CREDENTIAL_STORE_KEY`` and must come from the environment; it is never
+written next to the data. A file that was tampered with, or encrypted with
+another key, reads as no credentials.
+
+``CachedCredentialStore`` sits in front of either store. Reads come from
+memory after one ``stat`` of the store file, so a change made by another
+worker is picked up on that worker's next request. Callbacks registered with
+``subscribe`` are told about every change (e.g. to drop boto3 clients built
+with the old credentials).
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # file store unavailable
+    Fernet = InvalidToken = None
+
+logger = logging.getLogger(__name__)
+
+Credentials = Dict[str, Optional[str]]
+
+STORE_KINDS = ("memory", "file")
+
+
+class CredentialStoreError(Exception):
+    """Raised when stored credentials cannot be read or written."""
+
+
+# ================================================================================
+# STORES
+# ================================================================================
+
+
+class CredentialStore:
+    """Interface for credential stores."""
+
+    def get(self) -> Optional[Credentials]:
+        """Stored credentials, or None to use the default AWS credential chain."""
+        raise NotImplementedError
+
+    def set(self, credentials: Credentials) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def version(self) -> Tuple:
+        """Cheap token that changes whenever the stored credentials change."""
+        raise NotImplementedError
+
+
+class MemoryCredentialStore(CredentialStore):
+    """Credentials held by this process only."""
+
+    def __init__(self):
+        self._credentials: Optional[Credentials] = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[Credentials]:
+        return dict(self._credentials) if self._credentials else None
+
+    def set(self, credentials: Credentials) -> None:
+        with self._lock:
+            self._credentials = dict(credentials)
+            self._version += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._credentials = None
+            self._version += 1
+
+    def version(self) -> Tuple:
+        return (self._version,)
+
+
+class FileCredentialStore(CredentialStore):
+    """
+    Encrypted credentials in a file shared by all workers.
+
+    Args:
+        path: Credential file; its directory also holds the lock file
+        key: Fernet key (``Fernet.generate_key()``), from ``CREDENTIAL_STORE_KEY``
+
+    Raises:
+        CredentialStoreError: ``cryptography`` is not installed or the key is missing or invalid
+    """
+
+    def __init__(self, path: Path, key: str):
+        if Fernet is None:
+            raise CredentialStoreError('CREDENTIAL_STORE=file needs cryptography (pip install -e ".[shared-credentials]")')
+        if not key:
+            raise CredentialStoreError("CREDENTIAL_STORE=file needs CREDENTIAL_STORE_KEY to be set")
+        try:
+            self._fernet = Fernet(key.encode())
+        except ValueError:
+            raise CredentialStoreError(
+                "CREDENTIAL_STORE_KEY must be a Fernet key (32 url-safe base64-encoded bytes)"
+            ) from None
+        self.path = Path(path)
+        self.lock_file = self.path.with_name(f".{self.path.name}.lock")
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold an exclusive lock across processes (flock) and threads."""
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_file, "a") as lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _write(self, path: Path, data: bytes) -> None:
+        """Atomically replace ``path``; mkstemp creates the file with mode 0600."""
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def get(self) -> Optional[Credentials]:
+        try:
+            token = self.path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            return json.loads(self._fernet.decrypt(token))
+        except InvalidToken:
+            logger.warning("Ignoring stored AWS credentials in %s: wrong key or modified", self.path)
+            return None
+        except ValueError as e:
+            logger.warning("Ignoring stored AWS credentials in %s: %s", self.path, e)
+            return None
+
+    def set(self, credentials: Credentials) -> None:
+        token = self._fernet.encrypt(json.dumps(credentials).encode())
+        with self._locked():
+            self._write(self.path, token)
+
+    def clear(self) -> None:
+        with self._locked():
+            self.path.unlink(missing_ok=True)
+
+    def version(self) -> Tuple:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return ()
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class CachedCredentialStore(CredentialStore):
+    """
+    In-process cache in front of a store, with change notification.
+
+    Each read compares the backing store's ``version()`` with the cached one
+    and reloads only when it differs.
+    """
+
+    def __init__(self, store: CredentialStore):
+        self.store = store
+        self._cached: Optional[Credentials] = None
+        self._version: Optional[Tuple] = None
+        self._listeners: List[Callable[[Optional[Credentials]], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[[Optional[Credentials]], None]) -> None:
+        """Call ``listener(credentials)`` whenever the credentials change (from any worker)."""
+        self._listeners.append(listener)
+
+    def _refresh(self) -> Optional[Credentials]:
+        version = self.store.version()
+        if version == self._version:
+            return self._cached
+        with self._lock:
+            if version != self._version:
+                first_load = self._version is None
+                credentials = self.store.get()
+                changed = credentials != self._cached
+                self._cached, self._version = credentials, version
+                if changed and not first_load:
+                    self._notify(credentials)
+            return self._cached
+
+    def _notify(self, credentials: Optional[Credentials]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(credentials)
+            except Exception:
+                logger.exception("Credential change listener failed")
+
+    def get(self) -> Optional[Credentials]:
+        credentials = self._refresh()
+        return dict(credentials) if credentials else None
+
+    def set(self, credentials: Credentials) -> None:
+        self.store.set(credentials)
+        self._refresh()
+
+    def clear(self) -> None:
+        self.store.clear()
+        self._refresh()
+
+    def version(self) -> Tuple:
+        return self.store.version()
+
+
+def create_credential_store(kind: str, path: Path, key: str = "") -> CachedCredentialStore:
+    """
+    Build the configured store (``memory`` or ``file``) behind a cache.
+
+    Raises:
+        ValueError: Unknown kind
+        CredentialStoreError: The file store is selected but cannot be used
+    """
+    if kind == "memory":
+        return CachedCredentialStore(MemoryCredentialStore())
+    if kind == "file":
+        return CachedCredentialStore(FileCredentialStore(path, key))
+    raise ValueError(f"Unknown credential store '{kind}' (expected one of: {', '.join(STORE_KINDS)})")
+
+
+# Shared instance
+credential_store = create_credential_store(
+    settings.credential_store, Path(settings.credential_store_path), settings.credential_store_key
+)
@@ -0,0 +1,744 @@
+"""Network topology diagrams built from a Fortinet-Role inventory snapshot.
+
+The inventory has the same shape as the ``resources`` section returned by
+``/api/aws/resources/by-fortinet-role`` (vpcs, subnets, internet_gateways,
+transit_gateways, tgw_attachments, tgw_route_tables, route_tables), so the
+diagram can be drawn from one discovery call instead of the ~48 AWS CLI calls
+made by ``generate_network_diagram.sh``. A terraform state file can be turned
+into the same shape with ``inventory_from_tfstate``.
+
+Rendering is split into one fragment per VPC plus a small global fragment
+(transit gateways and cross-VPC edges). Fragments are cached by the hash of the
+inventory slice they were drawn from, so when a single subnet or route changes
+only the owning VPC is re-rendered. Complete outputs are cached by snapshot hash.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from html import escape
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FORMATS = ("mermaid", "dot", "svg")
+
+INVENTORY_KEYS = (
+    "vpcs",
+    "subnets",
+    "internet_gateways",
+    "transit_gateways",
+    "tgw_attachments",
+    "tgw_route_tables",
+    "route_tables",
+)
+
+# terraform resource type -> inventory key
+_TFSTATE_TYPES = {
+    "aws_vpc": "vpcs",
+    "aws_subnet": "subnets",
+    "aws_internet_gateway": "internet_gateways",
+    "aws_ec2_transit_gateway": "transit_gateways",
+    "aws_ec2_transit_gateway_vpc_attachment": "tgw_attachments",
+    "aws_ec2_transit_gateway_route_table": "tgw_route_tables",
+    "aws_route_table": "route_tables",
+}
+
+# Route attributes that identify a route target, in lookup order
+_ROUTE_TARGET_KEYS = (
+    "transit_gateway_id",
+    "gateway_id",
+    "nat_gateway_id",
+    "vpc_endpoint_id",
+    "network_interface_id",
+    "vpc_peering_connection_id",
+    "local_gateway_id",
+)
+
+
+# ================================================================================
+# INVENTORY HELPERS
+# ================================================================================
+
+
+def snapshot_hash(data: Any) -> str:
+    """
+    Return a stable content hash for any JSON-serializable value.
+
+    Args:
+        data: Inventory snapshot or a slice of it
+
+    Returns:
+        Hex sha256 digest of the canonical JSON encoding
+    """
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def normalize_inventory(inventory: Dict[str, Any]) -> Dict[str, List[dict]]:
+    """
+    Return an inventory with every key present and entries sorted by id.
+
+    Sorting makes the snapshot hash independent of AWS API result ordering.
+    """
+    normalized = {}
+    for key in INVENTORY_KEYS:
+        items = inventory.get(key) or []
+        normalized[key] = sorted(items, key=lambda item: str(item.get("id", "")))
+    return normalized
+
+
+def _route_target(route: Dict[str, Any]) -> Optional[str]:
+    """Return the first populated route target id."""
+    for key in _ROUTE_TARGET_KEYS:
+        value = route.get(key) or route.get(_camel(key))
+        if value:
+            return value
+    return None
+
+
+def _camel(name: str) -> str:
+    """Convert a terraform attribute name to its EC2 API spelling (gateway_id -> GatewayId)."""
+    return "".join(part.capitalize() for part in name.split("_"))
+
+
+def routes_from_api(routes: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Convert EC2 ``describe_route_tables`` routes to compact inventory routes.
+
+    Local routes are dropped since every VPC has one.
+    """
+    compact = []
+    for route in routes or []:
+        destination = route.get("DestinationCidrBlock") or route.get("DestinationPrefixListId")
+        target = _route_target(route)
+        if not destination or not target or target == "local":
+            continue
+        compact.append({"destination": destination, "target": target})
+    compact.sort(key=lambda r: (r["destination"], r["target"]))
+    return compact
+
+
+def inventory_from_tfstate(state: Dict[str, Any], foreign_routes: bool = False) -> Dict[str, List[dict]]:
+    """
+    Build a diagram inventory from a terraform state document (format v4).
+
+    Fortinet-Role and Name tags are read from resource tags as well as from
+    ``aws_ec2_tag`` resources, which existing_vpc_resources uses to tag
+    resources created inside modules. Standalone ``aws_route`` resources are
+    folded into their route table.
+
+    Args:
+        state: Parsed terraform.tfstate JSON
+        foreign_routes: Keep ``aws_route`` resources whose route table is in
+            another state, as ``route_tables`` entries with only ``id`` and
+            ``routes`` (dropped by default)
+
+    Returns:
+        Inventory dict keyed like the discovery endpoint's ``resources``
+    """
+    inventory: Dict[str, List[dict]] = {key: [] for key in INVENTORY_KEYS}
+    extra_tags: Dict[str, Dict[str, str]] = {}
+    extra_routes: Dict[str, List[dict]] = {}
+    by_id: Dict[str, dict] = {}
+
+    for resource in state.get("resources", []):
+        if resource.get("mode") != "managed":
+            continue
+        rtype = resource.get("type")
+        for instance in resource.get("instances", []):
+            attrs = instance.get("attributes") or {}
+            if rtype == "aws_ec2_tag":
+                extra_tags.setdefault(attrs.get("resource_id", ""), {})[attrs.get("key")] = attrs.get("value")
+                continue
+            if rtype == "aws_route":
+                target = _route_target(attrs)
+                destination = attrs.get("destination_cidr_block")
+                if destination and target:
+                    extra_routes.setdefault(attrs.get("route_table_id", ""), []).append(
+                        {"destination": destination, "target": target}
+                    )
+                continue
+
+            key = _TFSTATE_TYPES.get(rtype)
+            if not key or not attrs.get("id"):
+                continue
+            entry = _tfstate_entry(key, attrs)
+            entry["_tags"] = dict(attrs.get("tags_all") or attrs.get("tags") or {})
+            inventory[key].append(entry)
+            by_id[entry["id"]] = entry
+
+    for resource_id, tags in extra_tags.items():
+        if resource_id in by_id:
+            by_id[resource_id]["_tags"].update(tags)
+    for rtb_id, routes in extra_routes.items():
+        if rtb_id in by_id:
+            by_id[rtb_id]["routes"] = sorted(
+                by_id[rtb_id].get("routes", []) + routes,
+                key=lambda r: (r["destination"], r["target"])
+            )
+        elif foreign_routes and rtb_id:
+            inventory["route_tables"].append({
+                "id": rtb_id,
+                "routes": sorted(routes, key=lambda r: (r["destination"], r["target"])),
+            })
+
+    for entry in by_id.values():
+        tags = entry.pop("_tags")
+        entry["fortinet_role"] = tags.get("Fortinet-Role")
+        entry["name"] = tags.get("Name")
+
+    return normalize_inventory(inventory)
+
+
+def _tfstate_entry(key: str, attrs: Dict[str, Any]) -> dict:
+    """Map terraform resource attributes to an inventory entry."""
+    entry = {"id": attrs["id"]}
+    if key == "vpcs":
+        entry["cidr_block"] = attrs.get("cidr_block")
+    elif key == "subnets":
+        entry.update({
+            "cidr_block": attrs.get("cidr_block"),
+            "availability_zone": attrs.get("availability_zone"),
+            "vpc_id": attrs.get("vpc_id"),
+        })
+    elif key == "internet_gateways":
+        entry["vpc_id"] = attrs.get("vpc_id")
+    elif key == "transit_gateways":
+        entry["amazon_side_asn"] = attrs.get("amazon_side_asn")
+    elif key == "tgw_attachments":
+        entry.update({
+            "transit_gateway_id": attrs.get("transit_gateway_id"),
+            "vpc_id": attrs.get("vpc_id"),
+        })
+    elif key == "tgw_route_tables":
+        entry["transit_gateway_id"] = attrs.get("transit_gateway_id")
+    elif key == "route_tables":
+        entry["vpc_id"] = attrs.get("vpc_id")
+        routes = []
+        for route in attrs.get("route") or []:
+            target = _route_target(route)
+            destination = route.get("cidr_block")
+            if destination and target:
+                routes.append({"destination": destination, "target": target})
+        entry["routes"] = sorted(routes, key=lambda r: (r["destination"], r["target"]))
+    return entry
+
+
+# ================================================================================
+# TOPOLOGY GRAPH
+# ================================================================================
+
+
+@dataclass
+class Node:
+    """A drawable resource."""
+    id: str
+    kind: str
+    label: str
+    parent: Optional[str] = None
+    detail: str = ""
+    zone: str = ""
+
+
+@dataclass
+class Edge:
+    """A connection between two nodes."""
+    source: str
+    target: str
+    label: str = ""
+
+
+@dataclass
+class VpcCluster:
+    """A VPC with the nodes and edges drawn inside its box."""
+    vpc: Node
+    nodes: List[Node] = field(default_factory=list)
+    edges: List[Edge] = field(default_factory=list)
+    digest: str = ""
+
+
+@dataclass
+class Topology:
+    """Topology graph split into per-VPC clusters and global elements."""
+    clusters: List[VpcCluster]
+    global_nodes: List[Node]
+    global_edges: List[Edge]
+    global_digest: str
+    snapshot_hash: str
+
+    @property
+    def node_count(self) -> int:
+        return len(self.global_nodes) + sum(1 + len(c.nodes) for c in self.clusters)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.global_edges) + sum(len(c.edges) for c in self.clusters)
+
+
+def _display_name(item: Dict[str, Any]) -> str:
+    """Prefer the Fortinet-Role tag, then Name, then the AWS id."""
+    return item.get("fortinet_role") or item.get("name") or item["id"]
+
+
+def _id_detail(item: Dict[str, Any]) -> str:
+    """Show the AWS id as detail text unless it is already the label."""
+    return item["id"] if _display_name(item) != item["id"] else ""
+
+
+def build_topology(inventory: Dict[str, Any]) -> Topology:
+    """
+    Build the topology graph from an inventory snapshot.
+
+    Args:
+        inventory: Discovery ``resources`` dict or ``inventory_from_tfstate`` output
+
+    Returns:
+        Topology with per-VPC clusters and content digests for each cluster
+    """
+    inventory = normalize_inventory(inventory)
+    vpc_ids = {vpc["id"] for vpc in inventory["vpcs"]}
+    known_ids = set(vpc_ids)
+
+    # Slice the inventory per VPC so each cluster can be hashed independently
+    slices: Dict[str, Dict[str, list]] = {
+        vpc["id"]: {"vpc": vpc, "subnets": [], "internet_gateways": [], "route_tables": []}
+        for vpc in inventory["vpcs"]
+    }
+    for key in ("subnets", "internet_gateways", "route_tables"):
+        for item in inventory[key]:
+            if item.get("vpc_id") in slices:
+                slices[item["vpc_id"]][key].append(item)
+                known_ids.add(item["id"])
+
+    global_nodes = []
+    for tgw in inventory["transit_gateways"]:
+        asn = tgw.get("amazon_side_asn")
+        global_nodes.append(Node(
+            id=tgw["id"], kind="tgw", label=_display_name(tgw),
+            detail=f"ASN {asn}" if asn else _id_detail(tgw)
+        ))
+        known_ids.add(tgw["id"])
+    for rtb in inventory["tgw_route_tables"]:
+        global_nodes.append(Node(
+            id=rtb["id"], kind="tgw-rtb", label=_display_name(rtb), detail=_id_detail(rtb)
+        ))
+        known_ids.add(rtb["id"])
+
+    global_edges = []
+    for rtb in inventory["tgw_route_tables"]:
+        if rtb.get("transit_gateway_id") in known_ids:
+            global_edges.append(Edge(rtb["transit_gateway_id"], rtb["id"]))
+    for attachment in inventory["tgw_attachments"]:
+        if attachment.get("vpc_id") in vpc_ids and attachment.get("transit_gateway_id") in known_ids:
+            global_edges.append(Edge(
+                attachment["vpc_id"], attachment["transit_gateway_id"], _display_name(attachment)
+            ))
+
+    clusters = []
+    for vpc_id, vpc_slice in slices.items():
+        cluster = _build_cluster(vpc_slice)
+        # Routes that leave the VPC (to a TGW or another VPC's resource) are global edges
+        for rtb in vpc_slice["route_tables"]:
+            for route in rtb.get("routes", []):
+                target = route["target"]
+                if target in known_ids and not _in_cluster(cluster, target):
+                    global_edges.append(Edge(rtb["id"], target, route["destination"]))
+        clusters.append(cluster)
+
+    global_slice = {
+        "transit_gateways": inventory["transit_gateways"],
+        "tgw_route_tables": inventory["tgw_route_tables"],
+        "tgw_attachments": inventory["tgw_attachments"],
+        "edges": [(e.source, e.target, e.label) for e in global_edges],
+    }
+    return Topology(
+        clusters=clusters,
+        global_nodes=global_nodes,
+        global_edges=global_edges,
+        global_digest=snapshot_hash(global_slice),
+        snapshot_hash=snapshot_hash(inventory),
+    )
+
+
+def _build_cluster(vpc_slice: Dict[str, Any]) -> VpcCluster:
+    """Build the cluster for one VPC slice."""
+    vpc = vpc_slice["vpc"]
+    cluster = VpcCluster(
+        vpc=Node(id=vpc["id"], kind="vpc", label=_display_name(vpc), detail=vpc.get("cidr_block") or ""),
+        digest=snapshot_hash(vpc_slice),
+    )
+    for igw in vpc_slice["internet_gateways"]:
+        cluster.nodes.append(Node(
+            id=igw["id"], kind="igw", label=_display_name(igw), parent=vpc["id"], detail=_id_detail(igw)
+        ))
+    for subnet in vpc_slice["subnets"]:
+        cluster.nodes.append(Node(
+            id=subnet["id"], kind="subnet", label=_display_name(subnet), parent=vpc["id"],
+            detail=subnet.get("cidr_block") or "", zone=subnet.get("availability_zone") or ""
+        ))
+    for rtb in vpc_slice["route_tables"]:
+        cluster.nodes.append(Node(
+            id=rtb["id"], kind="rtb", label=_display_name(rtb), parent=vpc["id"], detail=_id_detail(rtb)
+        ))
+    for rtb in vpc_slice["route_tables"]:
+        for route in rtb.get("routes", []):
+            if _in_cluster(cluster, route["target"]):
+                cluster.edges.append(Edge(rtb["id"], route["target"], route["destination"]))
+    return cluster
+
+
+def _in_cluster(cluster: VpcCluster, node_id: str) -> bool:
+    return node_id == cluster.vpc.id or any(n.id == node_id for n in cluster.nodes)
+
+
+# ================================================================================
+# RENDERERS
+# ================================================================================
+
+
+def _ident(resource_id: str) -> str:
+    """Turn an AWS id into a Mermaid/DOT-safe identifier."""
+    return "n_" + "".join(ch if ch.isalnum() else "_" for ch in resource_id)
+
+
+def _mermaid_text(*parts: str) -> str:
+    return "<br/>".join(escape(p, quote=True).replace("&quot;", "#quot;") for p in parts if p)
+
+
+def _dot_text(*parts: str) -> str:
+    return "\\n".join(p.replace("\\", "\\\\").replace('"', '\\"') for p in parts if p)
+
+
+_MERMAID_SHAPES = {
+    "tgw": ('{{"', '"}}'),
+    "tgw-rtb": ('[/"', '"/]'),
+    "igw": ('(("', '"))'),
+    "rtb": ('[/"', '"/]'),
+    "vpc": ('(["', '"])'),
+}
+
+_DOT_SHAPES = {
+    "tgw": "hexagon",
+    "tgw-rtb": "note",
+    "igw": "circle",
+    "rtb": "note",
+    "vpc": "plaintext",
+    "subnet": "box",
+}
+
+
+def _mermaid_node(node: Node) -> str:
+    left, right = _MERMAID_SHAPES.get(node.kind, ('["', '"]'))
+    return f"{_ident(node.id)}{left}{_mermaid_text(node.label, node.detail, node.zone)}{right}"
+
+
+def _mermaid_edge(edge: Edge) -> str:
+    if edge.label:
+        return f"{_ident(edge.source)} -->|{_mermaid_text(edge.label)}| {_ident(edge.target)}"
+    return f"{_ident(edge.source)} --- {_ident(edge.target)}"
+
+
+def _render_mermaid_cluster(cluster: VpcCluster) -> str:
+    lines = [f'  subgraph {_ident(cluster.vpc.id)}_box["{_mermaid_text(cluster.vpc.label)}"]']
+    lines.append(f"    {_mermaid_node(cluster.vpc)}")
+    lines.extend(f"    {_mermaid_node(node)}" for node in cluster.nodes)
+    lines.append("  end")
+    lines.extend(f"  {_mermaid_edge(edge)}" for edge in cluster.edges)
+    return "\n".join(lines)
+
+
+def _render_mermaid_global(topology: Topology) -> str:
+    lines = [f"  {_mermaid_node(node)}" for node in topology.global_nodes]
+    lines.extend(f"  {_mermaid_edge(edge)}" for edge in topology.global_edges)
+    return "\n".join(lines)
+
+
+def _dot_node(node: Node) -> str:
+    shape = _DOT_SHAPES.get(node.kind, "box")
+    return f'{_ident(node.id)} [shape={shape}, label="{_dot_text(node.label, node.detail, node.zone)}"];'
+
+
+def _dot_edge(edge: Edge) -> str:
+    label = f' [label="{_dot_text(edge.label)}"]' if edge.label else ""
+    return f"{_ident(edge.source)} -> {_ident(edge.target)}{label};"
+
+
+def _render_dot_cluster(cluster: VpcCluster) -> str:
+    lines = [
+        f"  subgraph cluster_{_ident(cluster.vpc.id)} {{",
+        f'    label="{_dot_text(cluster.vpc.label)}";',
+        "    style=rounded;",
+        f"    {_dot_node(cluster.vpc)}",
+    ]
+    lines.extend(f"    {_dot_node(node)}" for node in cluster.nodes)
+    lines.append("  }")
+    lines.extend(f"  {_dot_edge(edge)}" for edge in cluster.edges)
+    return "\n".join(lines)
+
+
+def _render_dot_global(topology: Topology) -> str:
+    lines = [f"  {_dot_node(node)}" for node in topology.global_nodes]
+    lines.extend(f"  {_dot_edge(edge)}" for edge in topology.global_edges)
+    return "\n".join(lines)
+
+
+# SVG layout constants (pixels)
+_SVG_PAD = 20
+_SVG_CELL_W = 190
+_SVG_CELL_H = 54
+_SVG_HEADER_H = 46
+_SVG_TGW_ROW_H = 120
+
+_SVG_COLORS = {
+    "vpc": "#f4f8fb",
+    "subnet": "#dcebf7",
+    "igw": "#e6f4ea",
+    "rtb": "#fff4e0",
+    "tgw": "#fde8e7",
+    "tgw-rtb": "#fdf3f2",
+}
+
+
+def _svg_box(x: int, y: int, w: int, h: int, node: Node) -> str:
+    fill = _SVG_COLORS.get(node.kind, "#ffffff")
+    lines = [
+        f'<rect x="{x}" y="{y}" width="{w}" height="{h}" rx="6" fill="{fill}" stroke="#5b6770"/>',
+        f'<text x="{x + 8}" y="{y + 18}" font-size="12" font-weight="bold">{escape(node.label)}</text>',
+    ]
+    if node.detail:
+        lines.append(f'<text x="{x + 8}" y="{y + 34}" font-size="11">{escape(node.detail)}</text>')
+    return "\n".join(lines)
+
+
+def _render_svg_cluster(cluster: VpcCluster) -> Tuple[str, int, int]:
+    """
+    Render one VPC box at the origin.
+
+    Subnets are laid out in one column per availability zone; IGWs and route
+    tables share an extra column. Returns (svg, width, height) so the caller
+    can position the fragment with a translate().
+    """
+    zones: Dict[str, List[Node]] = {}
+    others: List[Node] = []
+    for node in cluster.nodes:
+        if node.kind == "subnet":
+            zones.setdefault(node.zone or "-", []).append(node)
+        else:
+            others.append(node)
+    columns = [zones[z] for z in sorted(zones)]
+    if others:
+        columns.append(others)
+    n_cols = max(1, len(columns))
+    n_rows = max([len(col) for col in columns] + [1])
+
+    width = n_cols * (_SVG_CELL_W + _SVG_PAD) + _SVG_PAD
+    height = _SVG_HEADER_H + n_rows * (_SVG_CELL_H + _SVG_PAD) + _SVG_PAD
+
+    parts = [
+        f'<rect x="0" y="0" width="{width}" height="{height}" rx="10" '
+        f'fill="{_SVG_COLORS["vpc"]}" stroke="#2f4f6f" stroke-width="2"/>',
+        f'<text x="{_SVG_PAD}" y="22" font-size="14" font-weight="bold">{escape(cluster.vpc.label)}</text>',
+        f'<text x="{_SVG_PAD}" y="38" font-size="11">{escape(cluster.vpc.detail)}</text>',
+    ]
+    for col_index, column in enumerate(columns):
+        x = _SVG_PAD + col_index * (_SVG_CELL_W + _SVG_PAD)
+        for row_index, node in enumerate(column):
+            y = _SVG_HEADER_H + row_index * (_SVG_CELL_H + _SVG_PAD)
+            parts.append(_svg_box(x, y, _SVG_CELL_W, _SVG_CELL_H, node))
+    return "\n".join(parts), width, height
+
+
+# ================================================================================
+# CACHING RENDERER
+# ================================================================================
+
+
+class DiagramRenderer:
+    """
+    Render topologies with snapshot-level and per-VPC fragment caches.
+
+    Both caches are bounded LRUs. The renderer is thread-safe so it can be
+    shared by request handlers running in the thread pool.
+    """
+
+    def __init__(self, max_outputs: int = 32, max_fragments: int = 512):
+        self.max_outputs = max_outputs
+        self.max_fragments = max_fragments
+        self._outputs: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._fragments: "OrderedDict[Tuple[str, str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+
+    def render(self, inventory: Dict[str, Any], fmt: str = "mermaid") -> Dict[str, Any]:
+        """
+        Render an inventory snapshot.
+
+        Args:
+            inventory: Discovery ``resources`` dict or tfstate inventory
+            fmt: One of mermaid, dot, svg
+
+        Returns:
+            Dict with content, snapshot_hash, cached flag and graph stats
+        """
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported diagram format: {fmt}")
+
+        topology = build_topology(inventory)
+        key = (fmt, topology.snapshot_hash)
+        stats = {
+            "nodes": topology.node_count,
+            "edges": topology.edge_count,
+            "vpcs": len(topology.clusters),
+        }
+
+        with self._lock:
+            if key in self._outputs:
+                self._outputs.move_to_end(key)
+                return {
+                    "format": fmt,
+                    "content": self._outputs[key],
+                    "snapshot_hash": topology.snapshot_hash,
+                    "cached": True,
+                    "stats": {**stats, "fragments_rendered": 0},
+                }
+
+        misses_before = self.fragment_misses
+        if fmt == "mermaid":
+            content = self._assemble_mermaid(topology)
+        elif fmt == "dot":
+            content = self._assemble_dot(topology)
+        else:
+            content = self._assemble_svg(topology)
+
+        with self._lock:
+            self._outputs[key] = content
+            while len(self._outputs) > self.max_outputs:
+                self._outputs.popitem(last=False)
+
+        rendered = self.fragment_misses - misses_before
+        logger.info(
+            "Rendered %s diagram %s (%d of %d fragments re-rendered)",
+            fmt, topology.snapshot_hash[:12], rendered, len(topology.clusters) + 1
+        )
+        return {
+            "format": fmt,
+            "content": content,
+            "snapshot_hash": topology.snapshot_hash,
+            "cached": False,
+            "stats": {**stats, "fragments_rendered": rendered},
+        }
+
+    def clear(self) -> None:
+        """Drop all cached outputs and fragments."""
+        with self._lock:
+            self._outputs.clear()
+            self._fragments.clear()
+
+    def _fragment(self, fmt: str, kind: str, digest: str, render):
+        """Return a cached fragment or render and cache it."""
+        key = (fmt, kind, digest)
+        with self._lock:
+            if key in self._fragments:
+                self._fragments.move_to_end(key)
+                self.fragment_hits += 1
+                return self._fragments[key]
+        value = render()
+        with self._lock:
+            self.fragment_misses += 1
+            self._fragments[key] = value
+            while len(self._fragments) > self.max_fragments:
+                self._fragments.popitem(last=False)
+        return value
+
+    def _assemble_mermaid(self, topology: Topology) -> str:
+        parts = ["flowchart TB"]
+        for cluster in topology.clusters:
+            parts.append(self._fragment(
+                "mermaid", "vpc", cluster.digest, lambda c=cluster: _render_mermaid_cluster(c)
+            ))
+        parts.append(self._fragment(
+            "mermaid", "global", topology.global_digest, lambda: _render_mermaid_global(topology)
+        ))
+        return "\n".join(p for p in parts if p) + "\n"
+
+    def _assemble_dot(self, topology: Topology) -> str:
+        parts = [
+            "digraph topology {",
+            "  rankdir=TB;",
+            '  node [fontname="Helvetica", fontsize=10, style=filled, fillcolor="#ffffff"];',
+            '  edge [fontname="Helvetica", fontsize=9];',
+        ]
+        for cluster in topology.clusters:
+            parts.append(self._fragment(
+                "dot", "vpc", cluster.digest, lambda c=cluster: _render_dot_cluster(c)
+            ))
+        parts.append(self._fragment(
+            "dot", "global", topology.global_digest, lambda: _render_dot_global(topology)
+        ))
+        parts.append("}")
+        return "\n".join(p for p in parts if p) + "\n"
+
+    def _assemble_svg(self, topology: Topology) -> str:
+        # Lay VPCs out left to right below a row of transit gateways
+        placed = []
+        x = _SVG_PAD
+        max_height = 0
+        for cluster in topology.clusters:
+            svg, width, height = self._fragment(
+                "svg", "vpc", cluster.digest, lambda c=cluster: _render_svg_cluster(c)
+            )
+            placed.append((cluster, svg, x, width))
+            x += width + _SVG_PAD
+            max_height = max(max_height, height)
+
+        total_width = max(x, _SVG_PAD * 2 + _SVG_CELL_W)
+        vpc_top = _SVG_PAD + _SVG_TGW_ROW_H
+        total_height = vpc_top + max_height + _SVG_PAD
+
+        tgws = [n for n in topology.global_nodes if n.kind == "tgw"]
+        tgw_x = {}
+        for index, tgw in enumerate(tgws):
+            slot = total_width / (len(tgws) + 1)
+            tgw_x[tgw.id] = int(slot * (index + 1) - _SVG_CELL_W / 2)
+
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{total_width}" height="{total_height}" '
+            f'font-family="Helvetica, Arial, sans-serif">'
+        ]
+        vpc_centers = {c.vpc.id: x0 + w // 2 for c, _, x0, w in placed}
+        for edge in topology.global_edges:
+            if edge.source in vpc_centers and edge.target in tgw_x:
+                x1 = vpc_centers[edge.source]
+                x2 = tgw_x[edge.target] + _SVG_CELL_W // 2
+                parts.append(
+                    f'<line x1="{x1}" y1="{vpc_top}" x2="{x2}" y2="{_SVG_PAD + _SVG_CELL_H}" '
+                    f'stroke="#b03a2e" stroke-width="2"/>'
+                )
+        for tgw in tgws:
+            parts.append(_svg_box(tgw_x[tgw.id], _SVG_PAD, _SVG_CELL_W, _SVG_CELL_H, tgw))
+        for _, svg, x0, _ in placed:
+            parts.append(f'<g transform="translate({x0},{vpc_top})">\n{svg}\n</g>')
+        parts.append("</svg>")
+        return "\n".join(parts) + "\n"
+
+
+# Shared renderer used by the API routers
+diagram_renderer = DiagramRenderer()
+
+
+def render_diagram(inventory: Dict[str, Any], fmt: str = "mermaid") -> Dict[str, Any]:
+    """
+    Convenience function to render an inventory with the shared renderer.
+
+    Args:
+        inventory: Discovery ``resources`` dict or tfstate inventory
+        fmt: One of mermaid, dot, svg
+
+    Returns:
+        Render result dict
+    """
+    return diagram_renderer.render(inventory, fmt)
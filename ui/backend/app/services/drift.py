@@ -0,0 +1,192 @@
+"""Drift between terraform state and the live Fortinet-Role inventory.
+
+A full ``terraform plan`` refreshes every resource and takes minutes. Most of
+the drift we see is console edits to route tables and TGW attachments, which
+one Fortinet-Role discovery snapshot (a handful of describe calls) already
+covers. ``detect_drift`` joins the state inventories (``inventory_from_tfstate``)
+with that snapshot by AWS id and compares the attributes both sides carry:
+CIDRs, AZs, VPC/TGW attachments, ASNs, the Fortinet-Role and Name tags and
+route table routes. Each side is indexed once, so the diff is linear in the
+number of resources.
+
+Every template's state is indexed, not only the one being checked, because
+templates share resources: autoscale_template adds ``aws_route`` entries to
+route tables created by existing_vpc_resources, and a resource in any state is
+not "extra".
+
+Results:
+
+- ``missing``: in state, not in the live inventory (deleted, or its
+  Fortinet-Role tag was changed or removed)
+- ``extra``: tagged for the cp/env in AWS but in no state file
+- ``modified``: in both with differing attributes or routes
+- ``unchecked``: in state without a Fortinet-Role tag for the cp/env, so the
+  tag-based inventory cannot see it either way
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.diagram import INVENTORY_KEYS
+
+logger = logging.getLogger(__name__)
+
+Inventory = Dict[str, List[dict]]
+
+# Attributes that identify a resource rather than describe it
+_IDENTITY_KEYS = ("id", "routes")
+
+
+def _normalize(value: Any) -> Optional[str]:
+    # tfstate and the EC2 API disagree on types (e.g. amazon_side_asn "64512" vs 64512)
+    return None if value is None or value == "" else str(value)
+
+
+def _route_set(entry: dict) -> set:
+    return {(route["destination"], route["target"]) for route in entry.get("routes") or []}
+
+
+def index_states(states: Dict[str, Inventory]) -> Dict[str, dict]:
+    """
+    Index state inventories of several templates by AWS id.
+
+    A resource that appears in more than one state (e.g. a route table with
+    routes added by another template) is merged: its routes are combined and
+    ``templates`` lists every state it is in.
+
+    Args:
+        states: Template name -> ``inventory_from_tfstate(state, foreign_routes=True)``
+            output, so routes added to another template's route table are kept
+
+    Returns:
+        AWS id -> ``{"kind", "entry", "templates"}``
+    """
+    index: Dict[str, dict] = {}
+    for template, inventory in states.items():
+        for kind in INVENTORY_KEYS:
+            for entry in inventory.get(kind) or []:
+                known = index.get(entry["id"])
+                if known is None:
+                    index[entry["id"]] = {"kind": kind, "entry": dict(entry), "templates": [template]}
+                    continue
+                known["templates"].append(template)
+                if kind == "route_tables":
+                    routes = _route_set(known["entry"]) | _route_set(entry)
+                    known["entry"]["routes"] = [
+                        {"destination": destination, "target": target} for destination, target in sorted(routes)
+                    ]
+                for name, value in entry.items():
+                    if known["entry"].get(name) is None:
+                        known["entry"][name] = value
+    return index
+
+
+def compare_entries(state: dict, live: dict) -> Tuple[Dict[str, dict], Dict[str, list]]:
+    """
+    Compare one resource's state and live entries.
+
+    Returns:
+        Tuple of (attribute -> {"state", "live"} for differing attributes,
+        {"added", "removed"} routes when the route sets differ, else {})
+    """
+    changes = {}
+    for name in state.keys() & live.keys():
+        if name in _IDENTITY_KEYS:
+            continue
+        if _normalize(state[name]) != _normalize(live[name]):
+            changes[name] = {"state": state[name], "live": live[name]}
+
+    routes: Dict[str, list] = {}
+    if "routes" in state or "routes" in live:
+        expected, actual = _route_set(state), _route_set(live)
+        if expected != actual:
+            routes = {
+                "added": [{"destination": d, "target": t} for d, t in sorted(actual - expected)],
+                "removed": [{"destination": d, "target": t} for d, t in sorted(expected - actual)],
+            }
+    return changes, routes
+
+
+def _describe(kind: str, entry: dict, **extra: Any) -> dict:
+    return {
+        "kind": kind,
+        "id": entry["id"],
+        "fortinet_role": entry.get("fortinet_role"),
+        "name": entry.get("name"),
+        **extra,
+    }
+
+
+def detect_drift(
+    states: Dict[str, Inventory],
+    live: Inventory,
+    prefix: str,
+    templates: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Diff terraform state against a live Fortinet-Role inventory.
+
+    Args:
+        states: Template name (``template/workspace`` for a workspace) -> state
+            inventory (see ``index_states``), for every working directory with
+            state (all are used to recognise managed resources)
+        live: ``resources`` of a Fortinet-Role discovery snapshot for the cp/env
+        prefix: ``{cp}-{env}``; state resources whose Fortinet-Role does not
+            start with it are reported as unchecked
+        templates: Only report missing/modified/unchecked resources of these
+            templates (default: all in ``states``)
+
+    Returns:
+        Dict with ``summary`` counts and ``missing``, ``extra``, ``modified``
+        and ``unchecked`` resource lists (see module docstring)
+    """
+    managed = index_states(states)
+    live_by_id = {
+        entry["id"]: (kind, entry) for kind in INVENTORY_KEYS for entry in live.get(kind) or []
+    }
+    selected = set(templates or states)
+    role_prefix = f"{prefix}-"
+
+    missing, modified, unchecked = [], [], []
+    in_sync = 0
+    for resource_id, item in managed.items():
+        owners = [template for template in item["templates"] if template in selected]
+        if not owners:
+            continue
+        kind, entry = item["kind"], item["entry"]
+        found = live_by_id.get(resource_id)
+        if found is None:
+            role = entry.get("fortinet_role") or ""
+            if role.startswith(role_prefix):
+                missing.append(_describe(kind, entry, templates=owners))
+            else:
+                reason = f"Fortinet-Role '{role}' is not under {prefix}" if role else "No Fortinet-Role tag in state"
+                unchecked.append(_describe(kind, entry, templates=owners, reason=reason))
+            continue
+        changes, routes = compare_entries(entry, found[1])
+        if changes or routes:
+            modified.append(_describe(kind, entry, templates=owners, changes=changes, routes=routes))
+        else:
+            in_sync += 1
+
+    extra = [
+        _describe(kind, entry) for resource_id, (kind, entry) in live_by_id.items() if resource_id not in managed
+    ]
+
+    order = {kind: position for position, kind in enumerate(INVENTORY_KEYS)}
+    for results in (missing, extra, modified, unchecked):
+        results.sort(key=lambda result: (order[result["kind"]], result["fortinet_role"] or "", result["id"]))
+
+    return {
+        "summary": {
+            "checked": in_sync + len(missing) + len(modified),
+            "in_sync": in_sync,
+            "missing": len(missing),
+            "extra": len(extra),
+            "modified": len(modified),
+            "unchecked": len(unchecked),
+        },
+        "missing": missing,
+        "extra": extra,
+        "modified": modified,
+        "unchecked": unchecked,
+    }
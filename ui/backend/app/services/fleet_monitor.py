@@ -0,0 +1,439 @@
+"""Autoscale group and GWLB target health monitor with batched polling.
+
+Replaces the per-instance polling loop in ``testing_scripts/monitor_asg.sh``.
+Each poll makes a fixed number of API calls regardless of fleet size:
+
+- one paginated ``describe_auto_scaling_groups``
+- one ``describe_instances`` per 200 instances (batched by InstanceIds)
+- one ``describe_target_health`` per target group, issued concurrently
+
+Successive snapshots are diffed and only the changes are pushed to
+subscribers. All subscribers watching the same region/prefix share one poller,
+and the poll interval shortens while the fleet is changing and backs off while
+it is steady.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from app.services import aws_sdk
+
+logger = logging.getLogger(__name__)
+
+# describe_instances accepts large InstanceIds lists, but smaller batches keep
+# responses well under the 1MB page size
+INSTANCE_BATCH_SIZE = 200
+
+# Target groups change rarely; re-list them every N polls
+TARGET_GROUP_REFRESH_POLLS = 10
+
+# States that mean the fleet is still converging
+_TRANSITIONAL_LIFECYCLE = {
+    "Pending", "Pending:Wait", "Pending:Proceed",
+    "Terminating", "Terminating:Wait", "Terminating:Proceed",
+    "Detaching", "EnteringStandby", "Warmed:Pending",
+}
+_TRANSITIONAL_TARGET = {"initial", "draining"}
+_TRANSITIONAL_INSTANCE = {"pending", "stopping", "shutting-down"}
+
+# IDs named in an InvalidInstanceID.NotFound message
+_INSTANCE_ID = re.compile(r"\bi-[0-9a-f]+\b")
+
+
+def diff_snapshots(previous: Dict[str, dict], current: Dict[str, dict]) -> Dict[str, Any]:
+    """
+    Compute the difference between two fleet snapshots.
+
+    Args:
+        previous: Snapshot from the previous poll (entity key -> state)
+        current: Snapshot from this poll
+
+    Returns:
+        Dict with ``added`` (key -> state), ``removed`` (keys) and
+        ``changed`` (key -> only the fields that changed)
+    """
+    added = {key: state for key, state in current.items() if key not in previous}
+    removed = [key for key in previous if key not in current]
+    changed = {}
+    for key, state in current.items():
+        old = previous.get(key)
+        if old is None or old == state:
+            continue
+        changed[key] = {
+            name: value for name, value in state.items() if old.get(name) != value
+        }
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def is_empty_diff(diff: Dict[str, Any]) -> bool:
+    """Return True if a diff contains no changes."""
+    return not (diff["added"] or diff["removed"] or diff["changed"])
+
+
+def is_converging(snapshot: Dict[str, dict]) -> bool:
+    """
+    Return True if any ASG, instance or target is in a transitional state.
+
+    Used to keep polling fast during scale-out/scale-in even between changes.
+    """
+    for state in snapshot.values():
+        kind = state.get("type")
+        if kind == "asg" and state.get("desired") != state.get("instances"):
+            return True
+        if kind == "instance" and (
+            state.get("lifecycle_state") in _TRANSITIONAL_LIFECYCLE
+            or state.get("state") in _TRANSITIONAL_INSTANCE
+        ):
+            return True
+        if kind == "target" and state.get("state") in _TRANSITIONAL_TARGET:
+            return True
+    return False
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class FleetMonitor:
+    """
+    Poll one set of autoscale groups and fan changes out to subscribers.
+
+    Args:
+        region: AWS region name
+        asg_prefix: ASG module prefix (e.g., 'acme-test-asg'); ASGs and target
+            groups whose names start with / contain it are monitored
+        client_factory: Callable(service, region_name=...) returning a boto3 client
+        min_interval: Poll interval while the fleet is changing (seconds)
+        max_interval: Poll interval ceiling while the fleet is steady (seconds)
+        max_concurrency: Maximum concurrent target-health calls
+    """
+
+    def __init__(
+        self,
+        region: str,
+        asg_prefix: str,
+        client_factory: Callable[..., Any],
+        min_interval: float = 2.0,
+        max_interval: float = 30.0,
+        max_concurrency: int = 8,
+    ):
+        self.region = region
+        self.asg_prefix = asg_prefix
+        self.client_factory = client_factory
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.max_concurrency = max_concurrency
+
+        self.snapshot: Dict[str, dict] = {}
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+        self._target_groups: List[Tuple[str, str]] = []
+        self._polls = 0
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    # --------------------------------------------------------------------------
+    # Polling
+    # --------------------------------------------------------------------------
+
+    def _client(self, service: str):
+        with self._lock:
+            if service not in self._clients:
+                self._clients[service] = self.client_factory(service, region_name=self.region)
+            return self._clients[service]
+
+    def reset_clients(self) -> None:
+        """Build new boto3 clients on the next call (e.g. after a credential change)."""
+        with self._lock:
+            self._clients = {}
+
+    def _count_call(self) -> None:
+        # Called from worker threads
+        with self._lock:
+            self.api_calls += 1
+
+    def _describe_groups(self) -> List[dict]:
+        """List autoscale groups whose names start with the prefix."""
+        groups = []
+        paginator = self._client("autoscaling").get_paginator("describe_auto_scaling_groups")
+        for page in paginator.paginate():
+            self._count_call()
+            groups.extend(
+                g for g in page.get("AutoScalingGroups", [])
+                if g["AutoScalingGroupName"].startswith(self.asg_prefix)
+            )
+        return groups
+
+    def _describe_instances(self, instance_ids: List[str]) -> Dict[str, dict]:
+        """Describe instances in batches instead of one call per instance."""
+        described = {}
+        for start in range(0, len(instance_ids), INSTANCE_BATCH_SIZE):
+            described.update(self._describe_batch(instance_ids[start:start + INSTANCE_BATCH_SIZE]))
+        return described
+
+    def _describe_batch(self, batch: List[str]) -> Dict[str, dict]:
+        """
+        Describe one batch of instances.
+
+        One terminated or unknown ID (e.g. during scale-in, when the ASG still
+        lists an instance EC2 has forgotten) fails the whole call with
+        ``InvalidInstanceID.NotFound``. The IDs named in the error are dropped
+        and the batch retried; if the error names none, each ID is described
+        on its own so the rest of the batch is still reported.
+        """
+        described = {}
+        paginator = self._client("ec2").get_paginator("describe_instances")
+        try:
+            for page in paginator.paginate(InstanceIds=batch):
+                self._count_call()
+                for reservation in page.get("Reservations", []):
+                    for instance in reservation.get("Instances", []):
+                        described[instance["InstanceId"]] = instance
+            return described
+        except aws_sdk.ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "InvalidInstanceID.NotFound":
+                raise
+            self._count_call()
+            missing = set(_INSTANCE_ID.findall(e.response["Error"].get("Message", ""))) & set(batch)
+            logger.debug("Instances not found in %s: %s", self.region, ", ".join(sorted(missing)) or "unknown")
+
+        if missing:
+            remaining = [instance_id for instance_id in batch if instance_id not in missing]
+            return self._describe_batch(remaining) if remaining else {}
+        if len(batch) == 1:
+            return {}
+        for instance_id in batch:
+            described.update(self._describe_batch([instance_id]))
+        return described
+
+    def _list_target_groups(self) -> List[Tuple[str, str]]:
+        """Return (name, arn) for target groups whose name contains the prefix."""
+        if self._target_groups and self._polls % TARGET_GROUP_REFRESH_POLLS:
+            return self._target_groups
+        found = []
+        paginator = self._client("elbv2").get_paginator("describe_target_groups")
+        for page in paginator.paginate():
+            self._count_call()
+            for tg in page.get("TargetGroups", []):
+                if self.asg_prefix in tg["TargetGroupName"]:
+                    found.append((tg["TargetGroupName"], tg["TargetGroupArn"]))
+        self._target_groups = found
+        return found
+
+    def _describe_target_health(self, arn: str) -> List[dict]:
+        self._count_call()
+        response = self._client("elbv2").describe_target_health(TargetGroupArn=arn)
+        return response.get("TargetHealthDescriptions", [])
+
+    async def collect(self) -> Dict[str, dict]:
+        """
+        Collect one fleet snapshot.
+
+        Returns:
+            Snapshot dict keyed by ``asg:<name>``, ``instance:<id>`` and
+            ``target:<target group>:<id>``
+        """
+        groups = await asyncio.to_thread(self._describe_groups)
+        membership = {
+            inst["InstanceId"]: (group["AutoScalingGroupName"], inst)
+            for group in groups
+            for inst in group.get("Instances", [])
+        }
+
+        described_task = asyncio.to_thread(self._describe_instances, sorted(membership))
+        target_groups = await asyncio.to_thread(self._list_target_groups)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def health(name: str, arn: str):
+            async with semaphore:
+                return name, await asyncio.to_thread(self._describe_target_health, arn)
+
+        results = await asyncio.gather(
+            described_task, *(health(name, arn) for name, arn in target_groups)
+        )
+        described, health_results = results[0], results[1:]
+        self._polls += 1
+
+        snapshot: Dict[str, dict] = {}
+        for group in groups:
+            instances = group.get("Instances", [])
+            snapshot[f"asg:{group['AutoScalingGroupName']}"] = {
+                "type": "asg",
+                "name": group["AutoScalingGroupName"],
+                "min": group.get("MinSize"),
+                "max": group.get("MaxSize"),
+                "desired": group.get("DesiredCapacity"),
+                "instances": len(instances),
+                "in_service": sum(1 for i in instances if i.get("LifecycleState") == "InService"),
+            }
+        for instance_id, (asg_name, member) in membership.items():
+            detail = described.get(instance_id, {})
+            snapshot[f"instance:{instance_id}"] = {
+                "type": "instance",
+                "id": instance_id,
+                "asg": asg_name,
+                "lifecycle_state": member.get("LifecycleState"),
+                "health_status": member.get("HealthStatus"),
+                "protected_from_scale_in": member.get("ProtectedFromScaleIn"),
+                "state": detail.get("State", {}).get("Name"),
+                "instance_type": detail.get("InstanceType") or member.get("InstanceType"),
+                "availability_zone": member.get("AvailabilityZone"),
+                "private_ip": detail.get("PrivateIpAddress"),
+                "public_ip": detail.get("PublicIpAddress"),
+                "launch_time": detail.get("LaunchTime"),
+            }
+        for name, descriptions in health_results:
+            for desc in descriptions:
+                target = desc.get("Target", {})
+                target_health = desc.get("TargetHealth", {})
+                snapshot[f"target:{name}:{target.get('Id')}"] = {
+                    "type": "target",
+                    "target_group": name,
+                    "id": target.get("Id"),
+                    "port": target.get("Port"),
+                    "state": target_health.get("State"),
+                    "reason": target_health.get("Reason"),
+                }
+        return snapshot
+
+    def next_interval(self, changed: bool, converging: bool) -> float:
+        """
+        Adapt the poll interval to fleet activity.
+
+        Drops to the minimum on any change or transitional state, otherwise
+        backs off by 1.5x up to the maximum.
+        """
+        if changed or converging:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        return self.interval
+
+    # --------------------------------------------------------------------------
+    # Subscribers
+    # --------------------------------------------------------------------------
+
+    def _broadcast(self, event: str, data: Any) -> None:
+        for queue in list(self.subscribers):
+            queue.put_nowait((event, data))
+
+    async def _run(self) -> None:
+        """Poll until the last subscriber leaves."""
+        while self.subscribers:
+            try:
+                started = time.monotonic()
+                calls_before = self.api_calls
+                current = await self.collect()
+                diff = diff_snapshots(self.snapshot, current)
+                first = not self._ready.is_set()
+                self.snapshot = current
+                self._ready.set()
+                changed = not is_empty_diff(diff)
+                interval = self.next_interval(changed and not first, is_converging(current))
+                if changed and not first:
+                    self._broadcast("changes", {
+                        **diff,
+                        "timestamp": time.time(),
+                        "next_poll_seconds": interval,
+                    })
+                logger.debug(
+                    "Polled %s in %s: %d entities, %d API calls, %.2fs, next in %.1fs",
+                    self.asg_prefix, self.region, len(current),
+                    self.api_calls - calls_before, time.monotonic() - started, interval
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Fleet monitor poll failed for %s: %s", self.asg_prefix, str(e))
+                # Credentials may have changed; rebuild clients on the next poll
+                self.reset_clients()
+                self._ready.set()
+                self._broadcast("error", {"message": str(e), "timestamp": time.time()})
+                self.interval = self.max_interval
+            await asyncio.sleep(self.interval)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber and start polling if needed."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._ready.clear()
+            self.snapshot = {}
+            self.interval = self.min_interval
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Remove a subscriber; polling stops after the last one leaves."""
+        self.subscribers.discard(queue)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class FleetMonitorHub:
+    """Share one FleetMonitor per (region, prefix) across all SSE clients."""
+
+    def __init__(self):
+        self._monitors: Dict[Tuple[str, str], FleetMonitor] = {}
+
+    def get(self, region: str, asg_prefix: str, client_factory: Callable[..., Any], **options) -> FleetMonitor:
+        key = (region, asg_prefix)
+        if key not in self._monitors:
+            self._monitors[key] = FleetMonitor(region, asg_prefix, client_factory, **options)
+        return self._monitors[key]
+
+    def reset_clients(self) -> None:
+        """Make every monitor build new boto3 clients (e.g. after a credential change)."""
+        for monitor in list(self._monitors.values()):
+            monitor.reset_clients()
+
+    async def watch(
+        self,
+        region: str,
+        asg_prefix: str,
+        client_factory: Callable[..., Any],
+        heartbeat: float = 15.0,
+        **options,
+    ) -> AsyncIterator[str]:
+        """
+        Yield server-sent events for a fleet.
+
+        The first event is the full ``snapshot``; after that only ``changes``
+        (and ``error``) events are sent, with comment heartbeats in between so
+        proxies keep the connection open.
+        """
+        monitor = self.get(region, asg_prefix, client_factory, **options)
+        queue = monitor.subscribe()
+        try:
+            await monitor._ready.wait()
+            yield format_sse("snapshot", {
+                "region": region,
+                "asg_prefix": asg_prefix,
+                "entities": monitor.snapshot,
+                "timestamp": time.time(),
+                "next_poll_seconds": monitor.interval,
+            })
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                    yield format_sse(event, data)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            monitor.unsubscribe(queue)
+            if not monitor.subscribers:
+                self._monitors.pop((region, asg_prefix), None)
+
+
+# Shared hub used by the API routers
+fleet_monitor_hub = FleetMonitorHub()
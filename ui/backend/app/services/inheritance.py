@@ -0,0 +1,450 @@
+"""Cross-template value inheritance driven by tfvars annotations.
+
+Downstream templates (autoscale_template, ha_pair) take some values from an
+upstream template's saved ``ui_config.json`` (existing_vpc_resources). Which
+values, and how, is declared next to each field in ``terraform.tfvars.example``:
+
+``# @ui-inherit-from: existing_vpc_resources.enable_build_management_vpc``
+    Copy an upstream field (the field becomes read-only in the UI).
+
+``# @ui-inherit-from: existing_vpc_resources`` + ``# @ui-inherit-rule: management-cidrs``
+    Compute the value with a named rule from ``INHERIT_RULES``.
+
+``# @ui-derive: {cp}-{env}-asg``
+    Fill an empty field from other fields of the same template.
+
+The rules of all templates form one dependency graph, built once per set of
+tfvars files. Resolved values are cached per template and keyed by the
+upstream config file and the local config, and each rule keeps a snapshot of
+the values it depends on, so after an upstream change only the rules whose
+inputs changed are recomputed.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.config_store import content_hash, get_config_store
+from app.services.public_ip import PublicIPResolver, public_ip_resolver
+from app.services.schema_registry import TFVARS_EXAMPLE, file_fingerprint, schema_registry
+
+logger = logging.getLogger(__name__)
+
+# Rule dependency on a value of the template being resolved
+LOCAL = "self"
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+# ================================================================================
+# NAMED RULES
+# ================================================================================
+
+
+@dataclass(frozen=True)
+class RuleContext:
+    """Inputs passed to a named inheritance rule."""
+
+    current: Any
+    upstream: Dict[str, Any]
+    local: Dict[str, Any]
+    public_ip: Callable[[], Awaitable[Optional[str]]]
+
+
+@dataclass(frozen=True)
+class NamedRule:
+    """A derivation too involved for a plain copy or ``@ui-derive`` pattern."""
+
+    compute: Callable[[RuleContext], Awaitable[Any]]
+    upstream_fields: Tuple[str, ...]
+    local_fields: Tuple[str, ...]
+    uses_public_ip: bool = False
+
+
+def _split_cidrs(value: Any) -> List[str]:
+    if not value:
+        return []
+    return [cidr.strip() for cidr in str(value).split(",") if cidr.strip()]
+
+
+async def _management_cidrs(ctx: RuleContext) -> Optional[str]:
+    """
+    Merge management access CIDRs.
+
+    Keeps the user's CIDRs (or the caller's public IP when there are none) and
+    adds the upstream management VPC CIDR, or the inspection VPC management
+    subnets when a dedicated management ENI is used.
+    """
+    cidrs = _split_cidrs(ctx.current)
+    if not cidrs:
+        user_ip = await ctx.public_ip()
+        if user_ip:
+            cidrs.append(f"{user_ip}/32")
+
+    if ctx.upstream.get("enable_build_management_vpc"):
+        extra = [ctx.upstream.get("vpc_cidr_management")]
+    elif ctx.local.get("enable_dedicated_management_eni") and ctx.upstream.get("enable_build_management_subnets"):
+        extra = [
+            ctx.upstream.get("cidr_for_mgmt_subnet_in_inspection_vpc_az1"),
+            ctx.upstream.get("cidr_for_mgmt_subnet_in_inspection_vpc_az2"),
+        ]
+    else:
+        extra = []
+    for cidr in extra:
+        if cidr and cidr not in cidrs:
+            cidrs.append(cidr)
+
+    return ", ".join(cidrs) if cidrs else None
+
+
+INHERIT_RULES: Dict[str, NamedRule] = {
+    "management-cidrs": NamedRule(
+        compute=_management_cidrs,
+        upstream_fields=(
+            "enable_build_management_vpc",
+            "vpc_cidr_management",
+            "enable_build_management_subnets",
+            "cidr_for_mgmt_subnet_in_inspection_vpc_az1",
+            "cidr_for_mgmt_subnet_in_inspection_vpc_az2",
+        ),
+        local_fields=("enable_dedicated_management_eni",),
+        uses_public_ip=True,
+    ),
+}
+
+
+# ================================================================================
+# DEPENDENCY GRAPH
+# ================================================================================
+
+
+@dataclass(frozen=True)
+class InheritRule:
+    """How one field of a downstream template gets its value."""
+
+    field: str
+    kind: str  # "copy", "rule" or "derive"
+    upstream: Optional[str] = None
+    source: Optional[str] = None  # upstream field, rule name or derive pattern
+    deps: Tuple[Tuple[str, str], ...] = ()  # (template or LOCAL, field)
+
+
+def rule_from_field(field: Dict[str, Any]) -> Optional[InheritRule]:
+    """
+    Build an inheritance rule from a parsed schema field.
+
+    Args:
+        field: Field dict from the tfvars parser
+
+    Returns:
+        InheritRule, or None if the field declares no inheritance
+
+    Raises:
+        ValueError: If the annotations are malformed or name an unknown rule
+    """
+    name = field["name"]
+    inherit_from = field.get("inherit_from")
+    if inherit_from:
+        upstream, _, source = inherit_from.partition(".")
+        rule_name = field.get("inherit_rule")
+        if rule_name:
+            rule = INHERIT_RULES.get(rule_name)
+            if rule is None:
+                raise ValueError(f"{name}: unknown @ui-inherit-rule '{rule_name}'")
+            deps = tuple((upstream, f) for f in rule.upstream_fields)
+            deps += tuple((LOCAL, f) for f in (name,) + rule.local_fields)
+            return InheritRule(name, "rule", upstream, rule_name, deps)
+        if not source:
+            raise ValueError(f"{name}: @ui-inherit-from needs 'template.field' or an @ui-inherit-rule")
+        return InheritRule(name, "copy", upstream, source, ((upstream, source),))
+
+    pattern = field.get("derive")
+    if pattern:
+        deps = tuple((LOCAL, f) for f in _PLACEHOLDER.findall(pattern))
+        return InheritRule(name, "derive", None, pattern, deps + ((LOCAL, name),))
+
+    return None
+
+
+def order_rules(rules: List[InheritRule]) -> List[InheritRule]:
+    """
+    Order a template's rules so each runs after the rules producing its inputs.
+
+    Raises:
+        ValueError: On a dependency cycle
+    """
+    by_field = {rule.field: rule for rule in rules}
+    ordered: List[InheritRule] = []
+    state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+    def visit(rule: InheritRule) -> None:
+        mark = state.get(rule.field)
+        if mark == 2:
+            return
+        if mark == 1:
+            raise ValueError(f"Inheritance cycle through field '{rule.field}'")
+        state[rule.field] = 1
+        for scope, dep in rule.deps:
+            if scope == LOCAL and dep != rule.field and dep in by_field:
+                visit(by_field[dep])
+        state[rule.field] = 2
+        ordered.append(rule)
+
+    for rule in rules:
+        visit(rule)
+    return ordered
+
+
+@dataclass
+class InheritanceGraph:
+    """Rules of every template plus the template-level dependency order."""
+
+    rules: Dict[str, List[InheritRule]]
+    upstreams: Dict[str, List[str]]
+
+
+def build_graph(schemas: Dict[str, Dict[str, Any]]) -> InheritanceGraph:
+    """
+    Build the inheritance graph from parsed template schemas.
+
+    Args:
+        schemas: Template name -> schema dict from the tfvars parser
+
+    Returns:
+        InheritanceGraph with rules in evaluation order
+
+    Raises:
+        ValueError: On unknown upstream templates or cycles
+    """
+    rules: Dict[str, List[InheritRule]] = {}
+    upstreams: Dict[str, List[str]] = {}
+    for template, schema in schemas.items():
+        template_rules = []
+        for group in schema.get("groups", []):
+            for field in group.get("fields", []):
+                rule = rule_from_field(field)
+                if rule is not None:
+                    template_rules.append(rule)
+        if not template_rules:
+            continue
+        rules[template] = order_rules(template_rules)
+        upstreams[template] = sorted({r.upstream for r in template_rules if r.upstream})
+        for upstream in upstreams[template]:
+            if upstream not in schemas:
+                raise ValueError(f"{template}: unknown upstream template '{upstream}'")
+
+    # Template-level cycle check (a template cannot inherit from itself, even indirectly)
+    def reaches(start: str, target: str, seen: set) -> bool:
+        for upstream in upstreams.get(start, []):
+            if upstream == target or (upstream not in seen and reaches(upstream, target, seen | {upstream})):
+                return True
+        return False
+
+    for template in upstreams:
+        if reaches(template, template, set()):
+            raise ValueError(f"Inheritance cycle through template '{template}'")
+
+    return InheritanceGraph(rules, upstreams)
+
+
+# ================================================================================
+# ENGINE
+# ================================================================================
+
+
+@dataclass
+class InheritanceResult:
+    """Config with inherited values applied."""
+
+    config: Dict[str, Any]
+    inherited_fields: List[str]
+    upstreams: List[str]
+    recomputed: int = 0
+
+
+class InheritanceEngine:
+    """
+    Resolve inherited values for the templates under a terraform directory.
+
+    Args:
+        terraform_dir: Directory containing one subdirectory per template
+        resolver: Public IP resolver for rules that need the caller's address
+        public_ip_budget: Seconds a rule may wait for the public IP
+    """
+
+    def __init__(
+        self,
+        terraform_dir: Path,
+        resolver: Optional[PublicIPResolver] = None,
+        public_ip_budget: float = 0.3,
+    ):
+        self.terraform_dir = Path(terraform_dir)
+        self._resolver = resolver
+        self.public_ip_budget = public_ip_budget
+        self._graph: Optional[InheritanceGraph] = None
+        self._graph_key: Optional[Tuple] = None
+        # Upstream template -> (file fingerprint, config)
+        self._upstream_cache: Dict[str, Tuple[Any, Optional[Dict[str, Any]]]] = {}
+        # (template, field) -> (dependency snapshot, value)
+        self._rule_cache: Dict[Tuple[str, str], Tuple[Tuple, Any]] = {}
+        # template -> (cache key, result)
+        self._result_cache: Dict[str, Tuple[Tuple, InheritanceResult]] = {}
+
+    def _tfvars_files(self) -> Dict[str, Path]:
+        return {
+            path.parent.name: path
+            for path in sorted(self.terraform_dir.glob(f"*/{TFVARS_EXAMPLE}"))
+        }
+
+    @property
+    def graph(self) -> InheritanceGraph:
+        """Inheritance graph, rebuilt only when a tfvars.example file changes."""
+        files = self._tfvars_files()
+        key = tuple((name, file_fingerprint(path)) for name, path in files.items())
+        if self._graph is None or key != self._graph_key:
+            schemas = {name: schema_registry.get(path).schema for name, path in files.items()}
+            self._graph = build_graph(schemas)
+            self._graph_key = key
+            self._rule_cache.clear()
+            self._result_cache.clear()
+            logger.info(
+                "Built inheritance graph: %s",
+                {t: len(r) for t, r in self._graph.rules.items()}
+            )
+        return self._graph
+
+    def _upstream_config(self, template: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """Return (fingerprint, config) of an upstream template, re-reading only on change."""
+        store = get_config_store(self.terraform_dir / template)
+        fingerprint = file_fingerprint(store.config_file)
+        cached = self._upstream_cache.get(template)
+        if cached is not None and cached[0] == fingerprint:
+            return cached
+        config, _, _ = store.load()
+        self._upstream_cache[template] = (fingerprint, config)
+        return fingerprint, config
+
+    async def _lookup_public_ip(self) -> Optional[str]:
+        if self._resolver is None:
+            return None
+        return await self._resolver.resolve(budget=self.public_ip_budget)
+
+    def _cached_public_ip(self) -> Optional[str]:
+        return self._resolver.cached_ip if self._resolver is not None else None
+
+    async def resolve(self, template: str, config: Dict[str, Any]) -> InheritanceResult:
+        """
+        Apply inherited and derived values to a template's config.
+
+        Args:
+            template: Template being loaded
+            config: Its saved config (not modified)
+
+        Returns:
+            InheritanceResult; ``upstreams`` lists upstream templates that had
+            a saved config. Nothing is inherited when none of them do.
+        """
+        rules = self.graph.rules.get(template)
+        if not rules:
+            return InheritanceResult(dict(config), [], [])
+
+        upstream_configs = {}
+        fingerprints = []
+        for upstream in self.graph.upstreams[template]:
+            fingerprint, upstream_config = self._upstream_config(upstream)
+            fingerprints.append((upstream, fingerprint))
+            if upstream_config is not None:
+                upstream_configs[upstream] = upstream_config
+
+        key = (tuple(fingerprints), content_hash(config), self._cached_public_ip())
+        cached = self._result_cache.get(template)
+        if cached is not None and cached[0] == key:
+            result = cached[1]
+            return InheritanceResult(dict(result.config), list(result.inherited_fields), list(result.upstreams))
+
+        if not upstream_configs:
+            return InheritanceResult(dict(config), [], [])
+
+        resolved = dict(config)
+        inherited: List[str] = []
+        recomputed = 0
+        for rule in rules:
+            if rule.upstream and rule.upstream not in upstream_configs:
+                continue
+            upstream = upstream_configs.get(rule.upstream, {})
+
+            if rule.kind == "copy":
+                if rule.source in upstream:
+                    resolved[rule.field] = upstream[rule.source]
+                    inherited.append(rule.field)
+                continue
+
+            snapshot = tuple(
+                resolved.get(f) if scope == LOCAL else upstream_configs.get(scope, {}).get(f)
+                for scope, f in rule.deps
+            )
+            if rule.kind == "rule" and INHERIT_RULES[rule.source].uses_public_ip:
+                snapshot += (self._cached_public_ip(),)
+
+            cache_key = (template, rule.field)
+            cached_rule = self._rule_cache.get(cache_key)
+            if cached_rule is not None and cached_rule[0] == snapshot:
+                value = cached_rule[1]
+            else:
+                value = await self._evaluate(rule, resolved, upstream)
+                recomputed += 1
+                if rule.kind == "rule" and INHERIT_RULES[rule.source].uses_public_ip:
+                    # The lookup may have just filled the cache; key on what was used
+                    snapshot = snapshot[:-1] + (self._cached_public_ip(),)
+                self._rule_cache[cache_key] = (snapshot, value)
+
+            if value is not None and value != resolved.get(rule.field):
+                resolved[rule.field] = value
+                logger.info("Auto-populated %s: %s", rule.field, value)
+
+        result = InheritanceResult(resolved, inherited, sorted(upstream_configs), recomputed)
+        key = (tuple(fingerprints), content_hash(config), self._cached_public_ip())
+        self._result_cache[template] = (key, result)
+        logger.info(
+            "Inherited %d fields for %s from %s (%d derived values recomputed)",
+            len(inherited), template, ", ".join(result.upstreams), recomputed
+        )
+        return InheritanceResult(dict(resolved), list(inherited), list(result.upstreams), recomputed)
+
+    async def _evaluate(self, rule: InheritRule, resolved: Dict[str, Any], upstream: Dict[str, Any]) -> Any:
+        """Compute one rule's value (None means leave the field unchanged)."""
+        if rule.kind == "derive":
+            if resolved.get(rule.field):
+                return None
+            names = _PLACEHOLDER.findall(rule.source)
+            if not all(resolved.get(name) for name in names):
+                return None
+            return _PLACEHOLDER.sub(lambda m: str(resolved[m.group(1)]), rule.source)
+
+        named = INHERIT_RULES[rule.source]
+        ctx = RuleContext(
+            current=resolved.get(rule.field),
+            upstream=upstream,
+            local=resolved,
+            public_ip=self._lookup_public_ip,
+        )
+        return await named.compute(ctx)
+
+
+_engines: Dict[Path, InheritanceEngine] = {}
+
+
+def get_inheritance_engine(terraform_dir: Path) -> InheritanceEngine:
+    """Return the shared inheritance engine for a terraform directory."""
+    key = Path(terraform_dir).resolve()
+    engine = _engines.get(key)
+    if engine is None:
+        engine = InheritanceEngine(
+            key,
+            resolver=public_ip_resolver,
+            public_ip_budget=settings.public_ip_load_budget,
+        )
+        _engines[key] = engine
+    return engine
@@ -0,0 +1,345 @@
+"""Index of license (``.lic``) files in the terraform template directories.
+
+``/api/terraform/license-files`` used to ``rglob`` the whole template
+directory on every request, including ``.terraform`` provider trees with
+thousands of files. The index walks each template once, pruning ignored
+directories, and keeps the result fresh:
+
+- With ``watchfiles`` installed (it comes with ``uvicorn[standard]``), a
+  background thread watches the indexed directories and marks the index
+  dirty on any change.
+- Otherwise, or if watching fails, the directory and file mtimes are
+  re-checked at most every ``poll_interval`` seconds.
+
+A refresh only re-lists directories whose mtime changed and re-reads license
+files whose size or mtime changed.
+"""
+import fnmatch
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import settings
+
+try:
+    import watchfiles
+except ImportError:  # optional; falls back to mtime checks
+    watchfiles = None
+
+logger = logging.getLogger(__name__)
+
+LICENSE_SUFFIX = ".lic"
+
+# License files are a few KB; the PEM header and footer fit in this
+MAX_LICENSE_READ = 16 * 1024
+
+_PEM_BEGIN = re.compile(r"-----BEGIN ([A-Z0-9 ]+?)-----")
+_PEM_END = re.compile(r"-----END ([A-Z0-9 ]+?)-----")
+_SERIAL = re.compile(r"(FGVM[A-Z0-9]{8,14}|F(?:MG|AZ|TS)-?VM[A-Z0-9]{6,14})", re.I)
+
+# PEM label / serial prefix -> product
+PRODUCTS = {
+    "FGT": "FortiGate",
+    "FGVM": "FortiGate",
+    "FMG": "FortiManager",
+    "FAZ": "FortiAnalyzer",
+    "FTS": "FortiTester",
+}
+
+
+def parse_license_metadata(path: Path) -> Dict[str, Any]:
+    """
+    Read the metadata visible without decoding a license file.
+
+    Returns:
+        Dict with product (from the PEM label or serial), serial (from the
+        file name or content), format ("pem" or "unknown") and complete
+        (PEM footer present)
+    """
+    try:
+        with open(path, "rb") as f:
+            text = f.read(MAX_LICENSE_READ).decode("latin-1")
+    except OSError as e:
+        logger.warning("Could not read license file %s: %s", path, e)
+        return {"product": None, "serial": None, "format": "unreadable", "complete": False}
+
+    begin = _PEM_BEGIN.search(text)
+    serial_match = _SERIAL.search(path.name) or _SERIAL.search(text)
+    serial = serial_match.group(1).upper() if serial_match else None
+
+    product = None
+    if begin:
+        product = PRODUCTS.get(begin.group(1).split()[0])
+    if product is None and serial:
+        product = next((name for prefix, name in PRODUCTS.items() if serial.startswith(prefix)), None)
+
+    return {
+        "product": product,
+        "serial": serial,
+        "format": "pem" if begin else "unknown",
+        "complete": bool(begin and _PEM_END.search(text, begin.end())),
+    }
+
+
+@dataclass(frozen=True)
+class LicenseFile:
+    """An indexed license file."""
+
+    path: str  # relative to the template directory, POSIX separators
+    size: int
+    mtime: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def to_option(self) -> Dict[str, Any]:
+        """Dropdown option for the UI (value is relative to the template)."""
+        return {
+            "value": f"./{self.path}",
+            "label": self.path,
+            "size": self.size,
+            "mtime": self.mtime,
+            "metadata": self.metadata,
+        }
+
+
+class LicenseIndex:
+    """
+    License files under one template directory.
+
+    Args:
+        root: Template directory
+        ignore: Directory name patterns to prune (fnmatch)
+        poll_interval: Minimum seconds between mtime checks when not watching
+        watch: Use ``watchfiles`` if available
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ignore: Iterable[str] = (),
+        poll_interval: float = 2.0,
+        watch: bool = True,
+    ):
+        self.root = Path(root).resolve()
+        self.ignore = tuple(ignore)
+        self.poll_interval = poll_interval
+        self._files: Dict[Path, LicenseFile] = {}
+        self._dirs: Dict[Path, int] = {}  # indexed directory -> mtime_ns
+        self._lock = threading.Lock()
+        self._scanned = False
+        self._checked_at = 0.0
+        self._dirty = threading.Event()
+
+        self._watch = watch and watchfiles is not None
+        self._watching = False
+        self._ready = threading.Event()  # current watch session is registered
+        self._stop = threading.Event()
+        self._rewatch = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ----------------------------------------------------------------------------
+    # Scanning
+    # ----------------------------------------------------------------------------
+
+    def _ignored(self, name: str) -> bool:
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.ignore)
+
+    def _index_file(self, path: Path, stat: os.stat_result) -> None:
+        previous = self._files.get(path)
+        if previous is not None and previous.size == stat.st_size and previous.mtime == stat.st_mtime:
+            return
+        self._files[path] = LicenseFile(
+            path=path.relative_to(self.root).as_posix(),
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            metadata=parse_license_metadata(path),
+        )
+
+    def _list_dir(self, directory: Path) -> List[Path]:
+        """Index one directory's license files; return its subdirectories."""
+        try:
+            self._dirs[directory] = directory.stat().st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            self._dirs.pop(directory, None)
+            return []
+
+        present = set()
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not self._ignored(entry.name):
+                        subdirs.append(Path(entry.path))
+                elif entry.name.endswith(LICENSE_SUFFIX) and entry.is_file():
+                    path = Path(entry.path)
+                    present.add(path)
+                    self._index_file(path, entry.stat())
+            except OSError:
+                continue
+
+        for path in [p for p in self._files if p.parent == directory and p not in present]:
+            del self._files[path]
+        return subdirs
+
+    def _walk(self, directory: Path) -> None:
+        pending = [directory]
+        while pending:
+            pending.extend(self._list_dir(pending.pop()))
+
+    def _drop_tree(self, directory: Path) -> None:
+        for path in [d for d in self._dirs if d == directory or directory in d.parents]:
+            del self._dirs[path]
+        for path in [p for p in self._files if directory in p.parents]:
+            del self._files[path]
+
+    def refresh(self) -> None:
+        """Bring the index up to date (full walk the first time)."""
+        with self._lock:
+            dirs_before = set(self._dirs)
+            if not self._scanned:
+                self._walk(self.root)
+                self._scanned = True
+                logger.info(
+                    "Indexed %d license files in %d directories under %s",
+                    len(self._files), len(self._dirs), self.root.name
+                )
+            else:
+                for directory, mtime in list(self._dirs.items()):
+                    if directory not in self._dirs:
+                        continue  # dropped with a removed parent
+                    try:
+                        current = directory.stat().st_mtime_ns
+                    except OSError:
+                        self._drop_tree(directory)
+                        continue
+                    if current != mtime:
+                        # Entries added/removed/renamed: re-list, walk new subdirectories
+                        for subdir in self._list_dir(directory):
+                            if subdir not in self._dirs:
+                                self._walk(subdir)
+                # Content changes don't touch the directory mtime
+                for path in list(self._files):
+                    try:
+                        self._index_file(path, path.stat())
+                    except OSError:
+                        del self._files[path]
+            self._checked_at = time.monotonic()
+            if set(self._dirs) != dirs_before and self._watching:
+                # Watch the new directory set; poll until that session is up
+                self._ready.clear()
+                self._rewatch.set()
+
+    def files(self) -> List[LicenseFile]:
+        """
+        License files sorted by path.
+
+        Refreshes first if the watcher saw a change or is (re)starting or,
+        without a watcher, if the last check is older than ``poll_interval``.
+        """
+        if self._watch and self._thread is None:
+            self.refresh()
+            self._start_watcher()
+        elif not self._scanned or self._dirty.is_set() or (self._watching and not self._ready.is_set()):
+            self._dirty.clear()
+            self.refresh()
+        elif not self._watching and time.monotonic() - self._checked_at >= self.poll_interval:
+            self.refresh()
+        with self._lock:
+            return sorted(self._files.values(), key=lambda f: f.path)
+
+    # ----------------------------------------------------------------------------
+    # Watching
+    # ----------------------------------------------------------------------------
+
+    def _start_watcher(self) -> None:
+        self._watching = True
+        self._thread = threading.Thread(
+            target=self._watch_loop, name=f"license-watch-{self.root.name}", daemon=True
+        )
+        self._thread.start()
+
+    def _watch_loop(self) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            with self._lock:
+                paths = [str(d) for d in self._dirs]
+            self._rewatch.clear()
+            try:
+                # Only the indexed (non-ignored) directories are watched, each
+                # non-recursively. The first yield (a change or a timeout) means
+                # the session is registered.
+                for changes in watchfiles.watch(
+                    *paths,
+                    recursive=False,
+                    debounce=100,
+                    rust_timeout=200,
+                    yield_on_timeout=True,
+                    stop_event=_AnyEvent(self._stop, self._rewatch),
+                    raise_interrupt=False,
+                ):
+                    if not self._ready.is_set():
+                        self._dirty.set()  # changes made while (re)starting
+                        self._ready.set()
+                    if changes:
+                        self._dirty.set()
+                        failures = 0
+                    if self._rewatch.is_set():
+                        break
+            except Exception as e:
+                failures += 1
+                self._dirty.set()
+                if failures >= 3:
+                    logger.warning("License file watcher for %s failed (%s); using mtime checks", self.root.name, e)
+                    break
+                time.sleep(1)
+        self._watching = False
+        self._ready.clear()
+
+    def close(self) -> None:
+        """Stop the watcher thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+
+class _AnyEvent:
+    """Event-like view that is set when any of several events is (for watchfiles' stop_event)."""
+
+    def __init__(self, *events: threading.Event):
+        self._events = events
+
+    def is_set(self) -> bool:
+        return any(event.is_set() for event in self._events)
+
+
+_indexes: Dict[Path, LicenseIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_license_index(template_dir: Path) -> LicenseIndex:
+    """Return the shared license index for a template directory."""
+    key = Path(template_dir).resolve()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = LicenseIndex(
+                key,
+                ignore=settings.license_index_ignore,
+                poll_interval=settings.license_index_poll_interval,
+                watch=settings.license_index_watch,
+            )
+            _indexes[key] = index
+        return index
+
+
+def close_license_indexes() -> None:
+    """Stop all watcher threads (application shutdown)."""
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.close()
+        _indexes.clear()
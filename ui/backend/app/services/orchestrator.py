@@ -0,0 +1,496 @@
+"""Dependency-aware deploy/destroy of several templates.
+
+``deploy_all.sh``, ``destroy_all.sh`` and ``REBUILD_AUTOSCALE_GROUP.sh``
+hard-code the order between existing_vpc_resources and the templates built
+on it, run everything serially and retry in shell loops. The orchestrator
+takes the order from the templates themselves: the ``@ui-inherit-from``
+upstreams of each template (the inheritance graph) are its dependencies.
+
+- ``deploy`` runs a template once all its upstreams succeeded (topological
+  order); ``destroy`` runs it once all its downstreams are destroyed
+  (reverse order). Templates that do not depend on each other, such as
+  autoscale_template and ha_pair, run concurrently, each through the build
+  scheduler (``BUILD_MAX_PARALLEL``, one build per working directory).
+- A failed step whose output looks transient (throttling, AWS 5xx,
+  DependencyViolation while ENIs drain, state lock held, network timeouts)
+  is retried with exponential backoff and jitter, up to ``max_attempts``.
+  Other failures fail the template at once, and the templates that depend on
+  it (deploy) or that it depends on (destroy) are ``blocked``.
+- A destroy only succeeds once the state has no resources left, as
+  ``safe_destroy`` in REBUILD_AUTOSCALE_GROUP.sh checked.
+- The run record (``<runs dir>/<run id>.json``) is rewritten atomically on
+  every change, with per-template and per-step timings. After a crash or
+  restart the run shows as ``interrupted`` and ``resume`` continues it:
+  templates that already succeeded are not run again.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.build_history import BuildHistory, BuildJob, get_build_history
+from app.services.plan_summary import discard_plan
+from app.services.workspaces import BuildScheduler, build_scheduler, has_resources
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("deploy", "destroy")
+
+STEPS: Dict[str, List[List[str]]] = {
+    "deploy": [
+        ["terraform", "init", "-input=false"],
+        ["terraform", "apply", "-auto-approve", "-input=false"],
+    ],
+    "destroy": [
+        ["terraform", "init", "-input=false"],
+        ["terraform", "destroy", "-auto-approve", "-input=false"],
+    ],
+}
+
+# Output that means "try again later" rather than "fix the configuration". Network
+# errors are matched by Go's specific messages, not by a bare "EOF", which also ends
+# provider and HCL errors that will fail the same way again.
+TRANSIENT_ERRORS = re.compile(
+    r"RequestLimitExceeded|Throttling|TooManyRequests|RequestTimeout|ServiceUnavailable"
+    r"|InternalError|InternalFailure|DependencyViolation|Error acquiring the state lock"
+    r"|timeout while waiting|i/o timeout|connection reset|TLS handshake timeout"
+    r"|unexpected EOF|broken pipe|use of closed network connection|net/http: request canceled",
+    re.IGNORECASE,
+)
+
+# Node states; a run is finished when no node is pending or running
+PENDING, RUNNING, SUCCEEDED, FAILED, BLOCKED, SKIPPED = (
+    "pending", "running", "succeeded", "failed", "blocked", "skipped"
+)
+DONE = (SUCCEEDED, SKIPPED)
+
+RunCommand = Callable[..., AsyncIterator[Tuple[str, Optional[int]]]]
+
+
+def dependencies(upstreams: Dict[str, List[str]], templates: List[str], action: str) -> Dict[str, List[str]]:
+    """
+    Templates each template waits for, restricted to ``templates``.
+
+    Deploy waits for upstreams; destroy waits for downstreams (the reverse
+    edges), so dependents are torn down first.
+    """
+    selected = set(templates)
+    waits: Dict[str, List[str]] = {template: [] for template in templates}
+    for template in templates:
+        for upstream in upstreams.get(template, []):
+            if upstream not in selected:
+                continue
+            if action == "deploy":
+                waits[template].append(upstream)
+            else:
+                waits[upstream].append(template)
+    return {template: sorted(waiting) for template, waiting in waits.items()}
+
+
+def topological_order(waits: Dict[str, List[str]]) -> List[str]:
+    """Execution order for display (ties in name order); raises ValueError on a cycle."""
+    remaining = {template: set(waiting) for template, waiting in waits.items()}
+    order: List[str] = []
+    while remaining:
+        ready = sorted(template for template, waiting in remaining.items() if not waiting)
+        if not ready:
+            raise ValueError(f"Dependency cycle between: {', '.join(sorted(remaining))}")
+        for template in ready:
+            order.append(template)
+            del remaining[template]
+        for waiting in remaining.values():
+            waiting.difference_update(ready)
+    return order
+
+
+def is_transient(output: str) -> bool:
+    """True if a failed step's output matches a known transient error."""
+    return bool(TRANSIENT_ERRORS.search(output))
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Seconds to wait before retry ``attempt`` (1-based): exponential with jitter, at most ``cap``."""
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Orchestrator:
+    """
+    Run and resume deploy/destroy runs over several templates.
+
+    Args:
+        runs_dir: Directory for run records and per-template logs
+        run_command: ``run_command(command, cwd, job)`` yielding ``(line, exit_code)``
+            with exit_code set on the last item (``run_command_stream``)
+        scheduler: Build scheduler every template's steps run under
+        history: Build history each attempt is recorded in (kind ``orchestrate``)
+        max_attempts: Attempts per template for transient failures
+        backoff_base: Seconds before the first retry (doubles per attempt)
+        backoff_max: Longest wait between attempts
+    """
+
+    def __init__(
+        self,
+        runs_dir: Path,
+        run_command: RunCommand,
+        scheduler: BuildScheduler,
+        history: Optional[BuildHistory] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 10.0,
+        backoff_max: float = 120.0,
+    ):
+        self.runs_dir = Path(runs_dir)
+        self.run_command = run_command
+        self.scheduler = scheduler
+        self.history = history
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    # --------------------------------------------------------------------------
+    # Run records
+    # --------------------------------------------------------------------------
+
+    def _record_path(self, run_id: str) -> Path:
+        if not re.fullmatch(r"[0-9]{8}-[0-9]{6}-[0-9a-f]{6}", run_id):
+            raise KeyError(run_id)
+        return self.runs_dir / f"{run_id}.json"
+
+    def log_path(self, run_id: str, template: str) -> Path:
+        return self._record_path(run_id).with_suffix("") / f"{template}.log"
+
+    def _save(self, run: Dict[str, Any]) -> None:
+        run["updated"] = time.time()
+        path = self._record_path(run["id"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(run, f, indent=2)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def get(self, run_id: str) -> Dict[str, Any]:
+        """
+        A run record; a ``running`` run whose process is gone reads as ``interrupted``.
+
+        Raises:
+            KeyError: Unknown run id
+        """
+        path = self._record_path(run_id)
+        try:
+            with open(path) as f:
+                run = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(run_id)
+        if run["status"] == RUNNING and run_id not in self._tasks and not (
+            run.get("pid") != os.getpid() and _pid_alive(run.get("pid"))
+        ):
+            run["status"] = "interrupted"
+        return run
+
+    def list_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent runs first, without per-step detail."""
+        if not self.runs_dir.is_dir():
+            return []
+        runs = []
+        for path in sorted(self.runs_dir.glob("*.json"), reverse=True)[:limit]:
+            try:
+                run = self.get(path.stem)
+            except (KeyError, ValueError):
+                continue
+            summary = {key: run[key] for key in ("id", "action", "workspace", "status", "created", "duration_s")}
+            summary["nodes"] = {template: node["status"] for template, node in run["nodes"].items()}
+            runs.append(summary)
+        return runs
+
+    def active(self, workspace: Optional[str]) -> Optional[str]:
+        """Id of a run in progress in this process for the same working directories."""
+        for run_id, task in self._tasks.items():
+            if not task.done() and self.get(run_id).get("workspace") == workspace:
+                return run_id
+        return None
+
+    # --------------------------------------------------------------------------
+    # Starting and resuming
+    # --------------------------------------------------------------------------
+
+    def start(
+        self,
+        action: str,
+        templates: List[str],
+        upstreams: Dict[str, List[str]],
+        directory: Callable[[str], Path],
+        workspace: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Create a run and start it in the background.
+
+        Args:
+            action: deploy or destroy
+            templates: Templates to include
+            upstreams: Template -> upstream templates (the inheritance graph)
+            directory: Working directory of a template (blocking; run in a thread)
+            workspace: Workspace name the directories belong to, recorded for resume
+
+        Returns:
+            The new run record
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Invalid action '{action}'. Must be one of: {', '.join(ACTIONS)}")
+        waits = dependencies(upstreams, templates, action)
+        order = topological_order(waits)
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        run = {
+            "id": run_id,
+            "action": action,
+            "workspace": workspace,
+            "order": order,
+            "dependencies": waits,
+            "status": RUNNING,
+            "created": time.time(),
+            "duration_s": None,
+            "resumed": 0,
+            "nodes": {
+                template: {"status": PENDING, "attempts": 0, "duration_s": None, "steps": [], "error": None}
+                for template in order
+            },
+        }
+        self._launch(run, directory)
+        logger.info("Started %s run %s: %s", action, run_id, " -> ".join(order))
+        return run
+
+    def resume(self, run_id: str, directory: Callable[[str], Path]) -> Dict[str, Any]:
+        """
+        Continue an interrupted or failed run; succeeded and skipped templates are kept.
+
+        Raises:
+            KeyError: Unknown run id
+            ValueError: The run is still in progress or already succeeded
+        """
+        run = self.get(run_id)
+        if run["status"] == RUNNING:
+            raise ValueError(f"Run {run_id} is still in progress")
+        if run["status"] == SUCCEEDED:
+            raise ValueError(f"Run {run_id} already succeeded")
+        for node in run["nodes"].values():
+            if node["status"] not in DONE:
+                node.update(status=PENDING, error=None)
+        run["status"] = RUNNING
+        run["resumed"] += 1
+        self._launch(run, directory)
+        logger.info("Resumed %s run %s", run["action"], run_id)
+        return run
+
+    def _launch(self, run: Dict[str, Any], directory: Callable[[str], Path]) -> None:
+        run["pid"] = os.getpid()
+        self._save(run)
+        task = asyncio.create_task(self._execute(run, directory))
+        self._tasks[run["id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(run["id"], None))
+
+    # --------------------------------------------------------------------------
+    # Execution
+    # --------------------------------------------------------------------------
+
+    async def _execute(self, run: Dict[str, Any], directory: Callable[[str], Path]) -> None:
+        """Start every template whose dependencies are done, until none can start."""
+        started = time.perf_counter()
+        nodes, waits = run["nodes"], run["dependencies"]
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while True:
+                for template in run["order"]:
+                    node = nodes[template]
+                    if node["status"] != PENDING:
+                        continue
+                    if any(nodes[dependency]["status"] in (FAILED, BLOCKED) for dependency in waits[template]):
+                        blocked_by = [d for d in waits[template] if nodes[d]["status"] in (FAILED, BLOCKED)]
+                        node.update(status=BLOCKED, error=f"Waiting on {', '.join(blocked_by)}, which did not complete")
+                        self._save(run)
+                    elif all(nodes[dependency]["status"] in DONE for dependency in waits[template]):
+                        node["status"] = RUNNING
+                        self._save(run)
+                        running[asyncio.create_task(self._run_node(run, template, directory))] = template
+                if not running:
+                    break
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    running.pop(task)
+        except asyncio.CancelledError:
+            for task in running:
+                task.cancel()
+            raise
+        finally:
+            statuses = {node["status"] for node in nodes.values()}
+            if statuses <= set(DONE):
+                run["status"] = SUCCEEDED
+            elif RUNNING in statuses or PENDING in statuses:
+                run["status"] = "interrupted"
+            else:
+                run["status"] = FAILED
+            run["duration_s"] = round(time.perf_counter() - started, 1)
+            self._save(run)
+            logger.info("%s run %s %s in %.0f s", run["action"], run["id"], run["status"], run["duration_s"])
+
+    async def _run_node(self, run: Dict[str, Any], template: str, directory: Callable[[str], Path]) -> None:
+        """Run one template's steps with retries and record the outcome."""
+        node = run["nodes"][template]
+        log_path = self.log_path(run["id"], template)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        try:
+            cwd = await asyncio.to_thread(directory, template)
+            skip = await asyncio.to_thread(self._skip_reason, run["action"], cwd)
+            if skip:
+                node.update(status=SKIPPED, error=skip)
+                return
+
+            for attempt in range(1, self.max_attempts + 1):
+                node["attempts"] += 1
+                # Attempts are numbered across resumes; the retry budget is per run of the node
+                error, transient = await self._attempt(run, template, cwd, log_path, node["attempts"])
+                if error is None:
+                    node.update(status=SUCCEEDED, error=None)
+                    return
+                node["error"] = error
+                if not transient or attempt == self.max_attempts:
+                    node["status"] = FAILED
+                    return
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                node["retry_in_s"] = round(delay, 1)
+                self._save(run)
+                self._log(log_path, f"\n[Transient failure: {error}. Retrying in {delay:.1f} s]\n")
+                await asyncio.sleep(delay)
+                node.pop("retry_in_s", None)
+        except asyncio.CancelledError:
+            node["status"] = PENDING  # resumable
+            raise
+        except Exception as e:
+            logger.error("%s of %s failed: %s", run["action"], template, e)
+            node.update(status=FAILED, error=str(e))
+        finally:
+            node["duration_s"] = round((node["duration_s"] or 0) + time.perf_counter() - started, 1)
+            self._save(run)
+
+    def _skip_reason(self, action: str, cwd: Path) -> Optional[str]:
+        if action == "deploy" and not (cwd / "terraform.tfvars").exists():
+            return "No terraform.tfvars"
+        if action == "destroy" and not ((cwd / "terraform.tfstate").exists() and has_resources(cwd / "terraform.tfstate")):
+            return "No resources in state"
+        return None
+
+    async def _attempt(
+        self, run: Dict[str, Any], template: str, cwd: Path, log_path: Path, attempt: int
+    ) -> Tuple[Optional[str], bool]:
+        """
+        Run the action's steps once under a build slot.
+
+        Returns:
+            Tuple of (error message or None, whether the error looks transient)
+        """
+        # Same key as GET /build, so a manual build of the directory waits for us and vice versa
+        key = f"{template}/{run['workspace']}" if run.get("workspace") else template
+        async with self.scheduler.slot(key):
+            job = None
+            if self.history is not None:
+                try:
+                    job = await asyncio.to_thread(
+                        self.history.start, template, "orchestrate", cwd, run.get("workspace")
+                    )
+                except Exception as e:  # history is best effort; never fail the attempt over it
+                    logger.warning("Build history unavailable for %s: %s", template, e)
+            try:
+                error = await self._run_steps(run, template, cwd, log_path, attempt, job)
+            finally:
+                if job is not None:
+                    job.finish()
+                # A plan saved before this apply or destroy no longer describes the state
+                discard_plan(cwd)
+            if error:
+                return error
+
+        if run["action"] == "destroy":
+            state = cwd / "terraform.tfstate"
+            if state.exists() and await asyncio.to_thread(has_resources, state):
+                # Resources left behind are usually still draining (ENIs, endpoints)
+                return "Resources remain in state after destroy", True
+        return None, False
+
+    async def _run_steps(
+        self, run: Dict[str, Any], template: str, cwd: Path, log_path: Path, attempt: int, job: Optional[BuildJob]
+    ) -> Optional[Tuple[str, bool]]:
+        """Run the action's commands in order; (error, transient) for the first that fails."""
+        node = run["nodes"][template]
+        for command in STEPS[run["action"]]:
+            step = {"step": command[1], "attempt": attempt, "started": time.time(), "exit_code": None}
+            node["steps"].append(step)
+            self._save(run)
+            self._log(log_path, f"\n=== [{template}] {' '.join(command)} (attempt {attempt}) ===\n")
+            output: List[str] = []
+            step_started = time.perf_counter()
+            exit_code = None
+            async for line, code in self.run_command(command, cwd, job):
+                output.append(line)
+                self._log(log_path, line)
+                if code is not None:
+                    exit_code = code
+            step.update(exit_code=exit_code, duration_s=round(time.perf_counter() - step_started, 1))
+            self._save(run)
+            if exit_code != 0:
+                tail = "".join(output[-200:])
+                return f"terraform {command[1]} exited with {exit_code}", is_transient(tail)
+        return None
+
+    @staticmethod
+    def _log(path: Path, text: str) -> None:
+        with open(path, "a") as f:
+            f.write(text)
+
+
+_orchestrators: Dict[Path, Orchestrator] = {}
+
+
+def get_orchestrator(terraform_dir: Path, run_command: RunCommand) -> Orchestrator:
+    """Return the shared orchestrator for a terraform directory."""
+    key = Path(terraform_dir).resolve()
+    orchestrator = _orchestrators.get(key)
+    if orchestrator is None:
+        try:
+            history = get_build_history(key)
+        except Exception as e:  # e.g. unwritable BUILD_HISTORY_PATH; run without history
+            logger.warning("Build history unavailable, orchestrated runs are not recorded: %s", e)
+            history = None
+        orchestrator = Orchestrator(
+            Path(settings.orchestrator_runs_dir) if settings.orchestrator_runs_dir else key / ".orchestrator",
+            run_command,
+            build_scheduler,
+            history=history,
+            max_attempts=settings.orchestrator_max_attempts,
+            backoff_base=settings.orchestrator_backoff_base,
+            backoff_max=settings.orchestrator_backoff_max,
+        )
+        _orchestrators[key] = orchestrator
+    return orchestrator
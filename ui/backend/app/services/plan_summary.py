@@ -0,0 +1,346 @@
+"""Summaries of saved terraform plans from ``terraform show -json``.
+
+The raw ``terraform plan`` text does not tell a reviewer how many
+resources of each type change or which ones are replaced or destroyed. The
+JSON form does, but for a large environment ``terraform show -json tfplan``
+prints tens of megabytes, most of it ``prior_state`` and ``configuration``
+that the summary does not need.
+
+``iter_array_items`` parses the output as it streams from the process:
+sections before ``resource_changes`` are skipped by matching strings and
+brackets without decoding them, and each element of the array is decoded
+on its own. Only the current chunk and element are held in memory, and
+reading stops as soon as the array closes (the process is then
+terminated), so the sections after it are never read. Each element is
+reduced to a compact entry (address, type, action, replace paths) before
+the next one is parsed.
+
+Results are cached by the SHA-256 of the plan file, so reloading the page
+or paging through changes does not run terraform again.
+
+The apply step applies the saved plan, so what was reviewed is what gets
+applied. A plan is discarded after apply or destroy and when the
+directory's terraform.tfvars is written; ``stale_reason`` catches the
+remaining cases (files changed by hand).
+"""
+import asyncio
+import codecs
+import hashlib
+import json
+import logging
+import re
+import subprocess
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncContextManager, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PLAN_FILE = "tfplan"
+
+# Files whose change makes a saved plan out of date
+PLAN_INPUTS = ("terraform.tfvars", "terraform.tfstate")
+
+# A whole string, a bracket, or (an unterminated string at the end of the buffer) a lone quote
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]|"', re.DOTALL)
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# Actions in the order the summary lists them
+ACTIONS = ("create", "update", "replace", "delete", "read", "no-op")
+
+
+class PlanError(Exception):
+    """Raised when there is no saved plan or ``terraform show`` fails."""
+
+
+def stale_reason(working_dir: Path, plan_file: str = PLAN_FILE) -> Optional[str]:
+    """Why the saved plan no longer matches its directory (None if it does or there is no plan)."""
+    try:
+        planned = (Path(working_dir) / plan_file).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    for name in PLAN_INPUTS:
+        try:
+            if (Path(working_dir) / name).stat().st_mtime_ns > planned:
+                return f"{name} changed after the plan was saved"
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def discard_plan(working_dir: Path, plan_file: str = PLAN_FILE) -> bool:
+    """Delete a saved plan (it was applied, or its inputs changed); True if there was one."""
+    try:
+        (Path(working_dir) / plan_file).unlink()
+    except FileNotFoundError:
+        return False
+    logger.info("Discarded saved plan %s in %s", plan_file, working_dir)
+    return True
+
+
+def iter_array_items(stream: BinaryIO, key: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level array in a JSON document, parsing it incrementally.
+
+    Until the array, whole strings and brackets are matched by one regex and
+    only the nesting depth is tracked, so skipped sections are never
+    decoded. Each array element is decoded by ``JSONDecoder.raw_decode``
+    straight from the buffer; an element cut off at the end of a chunk is
+    decoded again once the next chunk arrives.
+
+    Args:
+        stream: Binary stream of one JSON object
+        key: Top-level key of the array (e.g. ``resource_changes``)
+        chunk_size: Bytes read at a time
+
+    Yields:
+        Each array element, decoded; stops reading once the array closes
+
+    Raises:
+        ValueError: The document is malformed or ends before it is complete
+            (or before the array closes)
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = depth = 0
+    key_pending = in_array = eof = False
+
+    while True:
+        if in_array:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer):
+                if buffer[pos] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A number cut off by the end of the chunk (e.g. "-3e" of "-3e5") decodes
+                    # too early; an element is complete once a separator follows it
+                    if eof or (end < len(buffer) and buffer[end] in ",] \t\r\n"):
+                        pos = end
+                        yield item
+                        continue
+        else:
+            match = _TOKEN.search(buffer, pos)
+            if match is not None and match.group() != '"':
+                token = match.group()
+                pos = match.end()
+                if token[0] == '"':
+                    key_pending = depth == 1 and token[1:-1] == key
+                elif token == "[" and key_pending:
+                    in_array = True
+                else:
+                    key_pending = False
+                    depth += 1 if token in "{[" else -1
+                continue
+            # Nothing complete left: keep an unterminated string for the next chunk
+            pos = match.start() if match is not None else len(buffer)
+
+        if eof:
+            if in_array or depth:
+                raise ValueError(f"JSON document ends inside {'the ' + key + ' array' if in_array else 'an object'}")
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
+
+
+def change_action(actions: List[str]) -> str:
+    """Single action label for terraform's ``change.actions`` list."""
+    if len(actions) == 2 and set(actions) == {"create", "delete"}:
+        return "replace"
+    return actions[0] if len(actions) == 1 else "-".join(actions)
+
+
+def compact_change(change: Dict[str, Any]) -> Dict[str, Any]:
+    """The reviewable part of a ``resource_changes`` element (no before/after values)."""
+    details = change.get("change") or {}
+    entry = {
+        "address": change.get("address"),
+        "type": change.get("type"),
+        "mode": change.get("mode", "managed"),
+        "action": change_action(details.get("actions") or ["no-op"]),
+    }
+    if change.get("module_address"):
+        entry["module"] = change["module_address"]
+    if change.get("action_reason"):
+        entry["reason"] = change["action_reason"]
+    if details.get("replace_paths"):
+        entry["replace_paths"] = details["replace_paths"]
+    return entry
+
+
+def summarize_changes(changes: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Counts by action and by resource type, and the replaced/destroyed addresses.
+
+    Args:
+        changes: ``resource_changes`` elements (raw or compact)
+
+    Returns:
+        Dict with ``summary`` and ``changes`` (compact entries that are not no-op)
+    """
+    by_action: Dict[str, int] = {}
+    by_type: Dict[str, Dict[str, int]] = {}
+    replacements, destroys, entries = [], [], []
+    for change in changes:
+        entry = change if "action" in change else compact_change(change)
+        action = entry["action"]
+        by_action[action] = by_action.get(action, 0) + 1
+        if action == "no-op":
+            continue
+        counts = by_type.setdefault(entry["type"], {})
+        counts[action] = counts.get(action, 0) + 1
+        if action == "replace":
+            replacements.append(entry["address"])
+        elif action == "delete":
+            destroys.append(entry["address"])
+        entries.append(entry)
+
+    order = {action: position for position, action in enumerate(ACTIONS)}
+    return {
+        "summary": {
+            "changes": len(entries),
+            "by_action": dict(sorted(by_action.items(), key=lambda item: order.get(item[0], len(order)))),
+            "by_type": dict(sorted(by_type.items(), key=lambda item: (-sum(item[1].values()), item[0]))),
+            "replacements": replacements,
+            "destroys": destroys,
+        },
+        "changes": entries,
+    }
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def show_plan(working_dir: Path, plan_file: str = PLAN_FILE, env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Run ``terraform show -json`` on a saved plan and summarize it while it streams (blocking).
+
+    Raises:
+        PlanError: terraform failed before ``resource_changes`` was read, or
+            printed output that is not valid JSON
+    """
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            ["terraform", "show", "-json", plan_file],
+            cwd=str(working_dir),
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            env=env,
+        )
+        stopped_early = False
+        parse_error: Optional[ValueError] = None
+        try:
+            result = summarize_changes(
+                compact_change(change) for change in iter_array_items(process.stdout, "resource_changes")
+            )
+            # The rest of the document (prior state, configuration) is not needed
+            stopped_early = process.stdout.read(1) != b""
+        except ValueError as e:  # truncated or malformed output (json.JSONDecodeError)
+            parse_error = e
+        finally:
+            if stopped_early or process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+        if not stopped_early and process.returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode("utf-8", errors="replace").strip()
+            raise PlanError(f"terraform show failed: {message or f'exit code {process.returncode}'}")
+        if parse_error is not None:
+            raise PlanError(f"terraform show printed invalid JSON: {parse_error}")
+    return result
+
+
+class PlanSummaries:
+    """
+    Plan summaries cached by plan file hash (least recently used first out).
+
+    Args:
+        max_entries: Plans kept in memory
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max(1, max_entries)
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(
+        self,
+        working_dir: Path,
+        env: Optional[Dict[str, str]] = None,
+        hold: Optional[Callable[[], AsyncContextManager]] = None,
+    ) -> Tuple[str, Dict[str, Any], bool]:
+        """
+        Summary of the saved plan in ``working_dir``.
+
+        Args:
+            working_dir: Directory holding the plan
+            env: Environment for terraform
+            hold: Context held while terraform runs (e.g. the scheduler's
+                directory lock, so no build changes the directory meanwhile)
+
+        Returns:
+            Tuple of (plan hash, summary dict, whether it came from the cache)
+
+        Raises:
+            PlanError: No saved plan, or terraform show failed
+        """
+        plan_file = Path(working_dir) / PLAN_FILE
+        if not plan_file.exists():
+            raise PlanError(f"No saved plan ({PLAN_FILE}) in {working_dir}. Run the plan step first.")
+        digest = await asyncio.to_thread(file_hash, plan_file)
+
+        # One terraform show per plan, even if several requests arrive together
+        lock = self._locks.setdefault(digest, asyncio.Lock())
+        async with lock:
+            cached = digest in self._cache
+            if cached:
+                self._cache.move_to_end(digest)
+            else:
+                if hold is None:
+                    summary = await asyncio.to_thread(show_plan, working_dir, PLAN_FILE, env)
+                else:
+                    async with hold():
+                        summary = await asyncio.to_thread(show_plan, working_dir, PLAN_FILE, env)
+                self._cache[digest] = summary
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+                logger.info(
+                    "Summarized plan %s in %s: %d changes",
+                    digest[:12], working_dir, self._cache[digest]["summary"]["changes"]
+                )
+            result = self._cache[digest]
+        if not lock.locked():
+            self._locks.pop(digest, None)
+        return digest, result, cached
+
+
+def page(changes: List[Dict[str, Any]], offset: int, limit: int,
+         action: Optional[str] = None, resource_type: Optional[str] = None) -> Dict[str, Any]:
+    """A page of compact changes, optionally only one action and/or resource type."""
+    if action or resource_type:
+        changes = [
+            change for change in changes
+            if (not action or change["action"] == action) and (not resource_type or change["type"] == resource_type)
+        ]
+    return {"total": len(changes), "offset": offset, "limit": limit, "items": changes[offset:offset + limit]}
+
+
+# Shared instance used by the plan summary endpoint
+plan_summaries = PlanSummaries(settings.plan_summary_cache_size)
@@ -0,0 +1,241 @@
+"""On-demand request profiling.
+
+With ``PROFILING_ENABLED=true``, a request carrying ``X-Profile: <format>``
+(or ``?profile=<format>``) is profiled by ``ProfilingMiddleware`` and the
+result is saved under ``PROFILE_DIR``:
+
+- ``pstats`` (or ``1``/``true``): deterministic ``cProfile`` capture, saved as
+  ``.prof`` (open with ``python -m pstats`` or snakeviz)
+- ``speedscope``: stack samples of the event loop thread every
+  ``PROFILE_SAMPLE_INTERVAL`` seconds, saved as speedscope JSON
+  (https://www.speedscope.app)
+
+Only the event loop thread is profiled, so work handed to worker threads
+shows up as waiting, and other requests running concurrently on the loop
+appear in the profile too. One request is profiled at a time.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import marshal
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Format -> file extension
+FORMATS = {"pstats": ".prof", "speedscope": ".speedscope.json"}
+FORMAT_ALIASES = {"1": "pstats", "true": "pstats", "pstats": "pstats", "speedscope": "speedscope"}
+
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.(prof|speedscope\.json)$")
+
+
+def requested_format(value: Optional[str]) -> Optional[str]:
+    """Profile format for an ``X-Profile`` / ``profile`` value, or None if not requested."""
+    if not value:
+        return None
+    return FORMAT_ALIASES.get(value.strip().lower())
+
+
+def token_matches(supplied: Optional[str], token: str) -> bool:
+    """
+    Constant-time check of an ``X-Profile-Token`` value (always True when no token is set).
+
+    Compared as bytes: ``hmac.compare_digest`` rejects non-ASCII ``str`` with TypeError.
+    """
+    if not token:
+        return True
+    return hmac.compare_digest((supplied or "").encode("latin-1", errors="replace"), token.encode())
+
+
+# ================================================================================
+# PROFILERS
+# ================================================================================
+
+
+class DeterministicProfiler:
+    """``cProfile`` capture of the current thread."""
+
+    format = "pstats"
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def dump(self, name: str) -> bytes:
+        """pstats file content (what ``Profile.dump_stats`` writes)."""
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+class SamplingProfiler:
+    """
+    Stack sampler for the thread that calls ``start`` (the event loop).
+
+    A background thread reads that thread's current frame every ``interval``
+    seconds; nothing is traced, so the profiled code runs at full speed.
+
+    Args:
+        interval: Seconds between samples
+    """
+
+    format = "speedscope"
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self._thread_id = 0
+        self._samples: List[Tuple[float, Tuple[Frame, ...]]] = []
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._stopped = 0.0
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self._stopped = time.perf_counter()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self._samples.append((time.perf_counter(), tuple(stack)))
+
+    def dump(self, name: str) -> bytes:
+        """speedscope "sampled" profile (root frame first in each sample)."""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Frame, int] = {}
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        previous = self._started
+        for taken_at, stack in self._samples:
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(taken_at - previous)
+            previous = taken_at
+
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": settings.app_name,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self._stopped - self._started,
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+        return json.dumps(document).encode()
+
+
+def create_profiler(profile_format: str):
+    """Profiler for a format returned by ``requested_format``."""
+    if profile_format == "speedscope":
+        return SamplingProfiler(settings.profile_sample_interval)
+    return DeterministicProfiler()
+
+
+# ================================================================================
+# STORAGE
+# ================================================================================
+
+
+class ProfileStore:
+    """
+    Directory of saved profiles, keeping only the newest ``max_files``.
+
+    Args:
+        directory: Where profiles are written (created on first write)
+        max_files: Number of profiles kept; older ones are deleted on write
+    """
+
+    def __init__(self, directory: Path, max_files: int = 50):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def new_name(self, method: str, path: str, profile_format: str) -> str:
+        """Unique, sortable file name for a request's profile."""
+        slug = re.sub(r"[^\w-]+", "_", path.strip("/")).strip("_")[:60] or "root"
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        return f"{stamp}-{method.lower()}-{slug}-{uuid.uuid4().hex[:8]}{FORMATS[profile_format]}"
+
+    def write(self, name: str, data: bytes) -> Path:
+        """Atomically write a profile, then delete the oldest beyond ``max_files``."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.directory / name
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            for old in self.list()[self.max_files:]:
+                old.unlink(missing_ok=True)
+        return target
+
+    def list(self) -> List[Path]:
+        """Saved profiles, newest first."""
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for path in self.directory.iterdir():
+            if _PROFILE_NAME.match(path.name):
+                try:
+                    profiles.append((path.stat().st_mtime_ns, path.name, path))
+                except OSError:
+                    continue  # deleted meanwhile
+        return [path for _, _, path in sorted(profiles, reverse=True)]
+
+    def path(self, name: str) -> Optional[Path]:
+        """Path of a saved profile, or None (also for names outside the directory)."""
+        if not _PROFILE_NAME.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+
+# Shared store used by the middleware and /profiles
+profile_store = ProfileStore(Path(settings.profile_dir), settings.profile_max_files)
@@ -0,0 +1,196 @@
+"""Cached, non-blocking public IP lookup.
+
+Used to pre-fill management CIDRs (``management_cidr_sg``,
+``fortigate_management_cidr``) and by ``/api/aws/my-ip``. Lookups run in a
+worker thread so the event loop is never blocked, and:
+
+- results are cached for ``ttl`` seconds (failures for ``failure_ttl``)
+- concurrent callers share one in-flight lookup
+- providers are tried in order, each started ``stagger`` seconds after the
+  previous one if it has not answered yet; the first valid address wins
+- callers pass a ``budget``; if the lookup is not done in time they get the
+  last known address (or None) and the lookup finishes in the background
+"""
+import asyncio
+import ipaddress
+import logging
+import time
+from typing import Callable, List, Optional
+from urllib.parse import urlsplit
+
+from app.config import settings
+from app.services.metrics import PUBLIC_IP_LOOKUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def parse_ip(text: str) -> Optional[str]:
+    """
+    Extract an IP address from a provider response body.
+
+    Args:
+        text: Response body (plain text, e.g. ``"203.0.113.7\\n"``)
+
+    Returns:
+        Normalized IP address, or None if the body is not an address
+    """
+    candidate = text.strip()
+    try:
+        return str(ipaddress.ip_address(candidate))
+    except ValueError:
+        return None
+
+
+def fetch_text(url: str, timeout: float) -> str:
+    """
+    Fetch a provider URL and return its body (blocking; run in a thread).
+
+    Args:
+        url: Provider URL returning the caller's IP as plain text
+        timeout: Connect/read timeout in seconds
+
+    Returns:
+        Response body
+
+    Raises:
+        requests.RequestException: On connection errors or non-2xx responses
+    """
+    import requests  # imported on first lookup, not at startup
+
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        outcome = "success"
+        return response.text
+    finally:
+        PUBLIC_IP_LOOKUP_SECONDS.labels(urlsplit(url).hostname or url, outcome).observe(
+            time.perf_counter() - started
+        )
+
+
+class PublicIPResolver:
+    """Resolve this host's public IP with caching, coalescing and fallback."""
+
+    def __init__(
+        self,
+        providers: List[str],
+        ttl: float = 300.0,
+        failure_ttl: float = 30.0,
+        timeout: float = 3.0,
+        stagger: float = 0.25,
+        fetch: Callable[[str, float], str] = fetch_text,
+    ):
+        """
+        Args:
+            providers: Provider URLs in order of preference
+            ttl: Seconds a resolved address is reused
+            failure_ttl: Seconds to wait before retrying after all providers failed
+            timeout: Per-provider request timeout in seconds
+            stagger: Delay before starting the next provider while one is pending
+            fetch: Blocking ``fetch(url, timeout) -> body`` function
+        """
+        self.providers = list(providers)
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.timeout = timeout
+        self.stagger = stagger
+        self._fetch = fetch
+        self._ip: Optional[str] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+
+    @property
+    def cached_ip(self) -> Optional[str]:
+        """Last resolved address, even if expired."""
+        return self._ip
+
+    def invalidate(self) -> None:
+        """Drop the cached address so the next call performs a lookup."""
+        self._expires_at = 0.0
+
+    async def resolve(self, budget: Optional[float] = None) -> Optional[str]:
+        """
+        Return the public IP, waiting at most ``budget`` seconds.
+
+        Args:
+            budget: Maximum seconds to wait; None waits for the lookup to finish
+
+        Returns:
+            Public IP address, the last known address if the budget ran out,
+            or None if it has never been resolved
+        """
+        if time.monotonic() < self._expires_at:
+            return self._ip
+
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._refresh())
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._inflight), budget)
+        except asyncio.TimeoutError:
+            logger.debug("Public IP lookup exceeded %.2fs budget", budget)
+            return self._ip
+
+    def prefetch(self) -> None:
+        """Start a background lookup without waiting for it (e.g. at startup)."""
+        if time.monotonic() >= self._expires_at and (
+            self._inflight is None or self._inflight.done()
+        ):
+            self._inflight = asyncio.create_task(self._refresh())
+
+    async def _refresh(self) -> Optional[str]:
+        """Run one staggered lookup across providers and update the cache."""
+        started = time.monotonic()
+        ip = await self._race_providers()
+        if ip:
+            self._ip = ip
+            self._expires_at = time.monotonic() + self.ttl
+            logger.info("Resolved public IP %s in %.2fs", ip, time.monotonic() - started)
+        else:
+            self._expires_at = time.monotonic() + self.failure_ttl
+            logger.warning("Could not resolve public IP from %d providers", len(self.providers))
+        return self._ip
+
+    async def _race_providers(self) -> Optional[str]:
+        """Start providers one ``stagger`` apart and return the first valid answer."""
+        pending = set()
+        queue = list(self.providers)
+        try:
+            while queue or pending:
+                if queue:
+                    url = queue.pop(0)
+                    pending.add(asyncio.create_task(self._query(url)))
+                wait_for = self.stagger if queue else None
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    ip = task.result()
+                    if ip:
+                        return ip
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _query(self, url: str) -> Optional[str]:
+        """Query a single provider; errors and invalid bodies yield None."""
+        try:
+            body = await asyncio.to_thread(self._fetch, url, self.timeout)
+        except Exception as e:
+            logger.debug("Public IP provider %s failed: %s", url, e)
+            return None
+        ip = parse_ip(body)
+        if ip is None:
+            logger.debug("Public IP provider %s returned an invalid body", url)
+        return ip
+
+
+# Shared resolver used by the API routers
+public_ip_resolver = PublicIPResolver(
+    providers=settings.public_ip_providers,
+    ttl=settings.public_ip_cache_ttl,
+    timeout=settings.public_ip_timeout,
+)
@@ -0,0 +1,169 @@
+"""Concurrent discovery of Fortinet-Role tagged resources across regions.
+
+``/resources/by-fortinet-role`` looks in one region. To find an environment
+that was built in the wrong region, or resources a cleanup left behind, the
+multi-region scan runs the same per-region discovery in every enabled region:
+
+- regions are scanned concurrently in worker threads (boto3 blocks), limited
+  by one concurrency cap shared by all scans in the process, so two users
+  scanning at once do not double the load on the AWS APIs
+- each region has its own timeout, counted from when it gets a slot; a slow
+  region is reported as ``timeout`` and the others are not held up
+- results are yielded per region in completion order, so the API can stream
+  them as they arrive
+- successful results are cached per (account, cp, env) for ``cache_ttl``
+  seconds; a repeat scan returns cached regions at once and only scans the
+  regions that failed, timed out or were not scanned yet
+"""
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+class RegionDiscovery:
+    """
+    Multi-region scanner with a global concurrency cap and a result cache.
+
+    Args:
+        max_concurrency: Regions scanned at once across all scans
+        region_timeout: Seconds a region may take once it has a slot
+        cache_ttl: Seconds successful region results are reused (0 = no cache)
+    """
+
+    def __init__(self, max_concurrency: int = 8, region_timeout: float = 20.0, cache_ttl: float = 300.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.region_timeout = region_timeout
+        self.cache_ttl = cache_ttl
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._cache: Dict[CacheKey, Dict[str, Tuple[float, dict]]] = {}
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    def cached(self, key: CacheKey) -> Dict[str, dict]:
+        """Unexpired region results for a key (region -> result)."""
+        now = time.monotonic()
+        entries = self._cache.get(key, {})
+        for region in [r for r, (stored, _) in entries.items() if now - stored >= self.cache_ttl]:
+            del entries[region]
+        return {region: result for region, (_, result) in entries.items()}
+
+    def invalidate(self, key: Optional[CacheKey] = None) -> None:
+        """Drop cached results for one key, or all of them."""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    async def _scan_region(self, region: str, scan: Callable[[str], dict]) -> dict:
+        """
+        Scan one region in a worker thread, within a slot and the region timeout.
+
+        The slot is released when the thread finishes rather than when the
+        timeout fires: a thread cannot be cancelled, and releasing early would
+        let timed-out scans pile up beyond the cap.
+
+        Returns:
+            Result dict with ``region``, ``status`` (ok, error or timeout),
+            ``elapsed_ms`` and, for ok, the scan's ``total_resources`` and
+            ``resources``; for error/timeout an ``error`` message
+        """
+        slots = self._semaphore()
+        await slots.acquire()
+        started = time.perf_counter()
+        task = asyncio.ensure_future(asyncio.to_thread(scan, region))
+
+        def _finished(done: asyncio.Future) -> None:
+            slots.release()
+            if not done.cancelled():
+                done.exception()  # retrieved so a timed-out failure is not logged as unhandled
+
+        task.add_done_callback(_finished)
+        try:
+            found = await asyncio.wait_for(asyncio.shield(task), self.region_timeout)
+            result = {
+                "region": region,
+                "status": "ok",
+                "total_resources": found.get("total_resources", 0),
+                "resources": found.get("resources", {}),
+            }
+        except asyncio.TimeoutError:
+            logger.warning("Discovery in %s timed out after %g s", region, self.region_timeout)
+            result = {"region": region, "status": "timeout", "error": f"Timed out after {self.region_timeout:g} s"}
+        except Exception as e:
+            logger.warning("Discovery in %s failed: %s", region, e)
+            result = {"region": region, "status": "error", "error": str(e)}
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    async def scan(
+        self,
+        key: CacheKey,
+        regions: List[str],
+        scan: Callable[[str], dict],
+        refresh: bool = False,
+    ) -> AsyncIterator[dict]:
+        """
+        Yield one result per region, cached results first, then in completion order.
+
+        Args:
+            key: Cache key, (account, cp, env)
+            regions: Regions to scan
+            scan: Blocking per-region discovery, ``scan(region) -> dict`` with
+                ``total_resources`` and ``resources``
+            refresh: Ignore (and replace) cached results
+
+        Returns:
+            Async iterator of result dicts (see ``_scan_region``); cached
+            results have ``cached: True``
+        """
+        if refresh:
+            self.invalidate(key)
+        cached = self.cached(key) if self.cache_ttl > 0 else {}
+        for region in regions:
+            if region in cached:
+                yield {**cached[region], "cached": True}
+
+        tasks = [
+            asyncio.ensure_future(self._scan_region(region, scan))
+            for region in regions if region not in cached
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                if result["status"] == "ok" and self.cache_ttl > 0:
+                    self._cache.setdefault(key, {})[result["region"]] = (time.monotonic(), result)
+                yield {**result, "cached": False}
+        finally:
+            # Client went away mid-scan: stop waiting (threads finish on their own)
+            for task in tasks:
+                task.cancel()
+
+
+def summarize(results: List[dict]) -> Dict[str, Any]:
+    """Totals for a finished scan: resources found, regions with resources, failures."""
+    found = sorted(r["region"] for r in results if r.get("total_resources"))
+    failed = {r["region"]: r["error"] for r in results if r["status"] != "ok"}
+    return {
+        "total_resources": sum(r.get("total_resources", 0) for r in results),
+        "regions_scanned": len(results),
+        "regions_with_resources": found,
+        "failed_regions": failed,
+    }
+
+
+# Shared instance: one concurrency cap and cache for all multi-region scans
+region_discovery = RegionDiscovery(
+    max_concurrency=settings.discovery_max_concurrency,
+    region_timeout=settings.discovery_region_timeout,
+    cache_ttl=settings.discovery_cache_ttl,
+)
@@ -0,0 +1,187 @@
+"""Ahead-of-time compiled schema bundles.
+
+``python -m app.services.schema_bundle`` (or the ``build-schema-bundles``
+script) parses each template's ``terraform.tfvars.example`` once and writes
+``.schema_bundle.json`` next to it. A bundle holds:
+
+- the parsed schema (groups and fields)
+- compute metadata: evaluation order and the fields each expression reads
+- condition metadata: the distinct show-if/hide-if expressions and which
+  fields use them
+- ``source_sha256`` of the tfvars.example, ``parser_sha256`` of the parser
+  code and ``content_hash`` of the schema, so identical sources produce
+  identical bundles on every replica
+
+``SchemaRegistry`` loads a bundle instead of parsing when its source and
+parser hashes still match. Otherwise (the example was edited, the parser
+changed, or there is no bundle) it parses live as before. Hashes are
+compared instead of mtimes because a git checkout resets mtimes.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.parsers import tfvars_parser
+from app.parsers.tfvars_parser import parse_tfvars_file
+from app.services.compute import ComputeProgram
+from app.services.conditions import Visibility
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_VERSION = 1
+BUNDLE_NAME = ".schema_bundle.json"
+TFVARS_EXAMPLE = "terraform.tfvars.example"
+
+# Bundles built by another parser version are stale even if the source is not
+PARSER_SHA256 = hashlib.sha256(Path(tfvars_parser.__file__).read_bytes()).hexdigest()
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_hash(schema: Dict[str, Any]) -> str:
+    """Hash of the schema's canonical JSON form."""
+    return sha256_bytes(json.dumps(schema, sort_keys=True, separators=(",", ":")).encode())
+
+
+def bundle_path(tfvars_path: Path) -> Path:
+    return Path(tfvars_path).with_name(BUNDLE_NAME)
+
+
+def compile_bundle(tfvars_path: Path) -> Dict[str, Any]:
+    """
+    Parse a tfvars.example and build its bundle.
+
+    Args:
+        tfvars_path: Path to terraform.tfvars.example
+
+    Returns:
+        Bundle dict (see module docstring)
+    """
+    tfvars_path = Path(tfvars_path)
+    source = tfvars_path.read_bytes()
+    schema = parse_tfvars_file(tfvars_path)
+    compute = ComputeProgram.from_schema(schema)
+    visibility = Visibility(schema)
+    return {
+        "bundle_version": BUNDLE_VERSION,
+        "template": tfvars_path.parent.name,
+        "source_sha256": sha256_bytes(source),
+        "parser_sha256": PARSER_SHA256,
+        "content_hash": content_hash(schema),
+        "schema": schema,
+        "compute": {
+            "order": compute.order,
+            "references": {
+                field: sorted(compiled.references) for field, compiled in compute.expressions.items()
+            },
+        },
+        "conditions": {
+            "expressions": visibility.expressions,
+            "predicates": visibility.predicates,
+        },
+    }
+
+
+def write_bundle(tfvars_path: Path, bundle: Optional[Dict[str, Any]] = None) -> Path:
+    """Atomically write a bundle (compiled if not given) next to the tfvars.example."""
+    bundle = bundle or compile_bundle(tfvars_path)
+    target = bundle_path(tfvars_path)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f"{target.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(bundle, f, separators=(",", ":"))
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return target
+
+
+def load_bundle(tfvars_path: Path, source: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Load the bundle for a tfvars.example if it matches the current source.
+
+    Args:
+        tfvars_path: Path to terraform.tfvars.example
+        source: The tfvars.example contents
+
+    Returns:
+        The bundle, or None if it is missing, unreadable or stale
+    """
+    path = bundle_path(tfvars_path)
+    try:
+        with open(path) as f:
+            bundle = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable schema bundle %s: %s", path, e)
+        return None
+
+    reason = stale_reason(bundle, source)
+    if reason:
+        logger.info("Schema bundle %s is stale (%s); parsing %s", path, reason, TFVARS_EXAMPLE)
+        return None
+    return bundle
+
+
+def stale_reason(bundle: Dict[str, Any], source: bytes) -> str:
+    """Why a bundle can't be used for ``source`` ("" if it can)."""
+    if bundle.get("bundle_version") != BUNDLE_VERSION:
+        return f"bundle version {bundle.get('bundle_version')}, expected {BUNDLE_VERSION}"
+    if bundle.get("parser_sha256") != PARSER_SHA256:
+        return "parser changed"
+    if bundle.get("source_sha256") != sha256_bytes(source):
+        return f"{TFVARS_EXAMPLE} changed"
+    return ""
+
+
+def template_sources(terraform_dir: Path, templates: Optional[List[str]] = None) -> List[Path]:
+    """tfvars.example files of the given templates (default: every template that has one)."""
+    if templates:
+        return [Path(terraform_dir) / template / TFVARS_EXAMPLE for template in templates]
+    return sorted(Path(terraform_dir).glob(f"*/{TFVARS_EXAMPLE}"))
+
+
+def main():
+    # Same location get_terraform_dir() uses: backend/app/services -> ... -> terraform
+    default_dir = Path(__file__).parent.parent.parent.parent.parent / "terraform"
+    parser = argparse.ArgumentParser(description="Compile terraform.tfvars.example files into schema bundles")
+    parser.add_argument("templates", nargs="*", help="Template names (default: all)")
+    parser.add_argument("--terraform-dir", type=Path, default=default_dir)
+    parser.add_argument("--check", action="store_true", help="Only verify bundles are up to date (exit 1 if not)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+
+    stale = 0
+    for source_path in template_sources(args.terraform_dir, args.templates):
+        if not source_path.exists():
+            print(f"{source_path}: not found", file=sys.stderr)
+            stale += 1
+            continue
+        if args.check:
+            try:
+                reason = stale_reason(json.loads(bundle_path(source_path).read_text()), source_path.read_bytes())
+            except FileNotFoundError:
+                reason = "missing"
+            except (OSError, ValueError) as e:
+                reason = f"unreadable: {e}"
+            stale += bool(reason)
+            print(f"{bundle_path(source_path)}: {reason or 'ok'}")
+            continue
+        bundle = compile_bundle(source_path)
+        print(f"{write_bundle(source_path, bundle)}: {bundle['content_hash'][:12]}")
+    sys.exit(1 if stale else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Cache of parsed template schemas and the artifacts compiled from them.
+
+Every endpoint that needs a template's schema used to re-parse its
+``terraform.tfvars.example``. The registry parses each file once and keeps the
+result until the file's mtime or size changes. Derived artifacts (the compute
+program, the show-if/hide-if predicates and the field validators) are built alongside the schema so they are also compiled
+only once per file version.
+
+With ``use_bundles`` the schema comes from the template's precompiled
+``.schema_bundle.json`` when it matches the source (see
+``app.services.schema_bundle``), so nothing is parsed on the request path;
+``preload`` loads every template at startup.
+
+Callers must treat the returned schema as read-only.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.parsers.tfvars_parser import parse_tfvars_file
+from app.services.compute import ComputeProgram
+from app.services.conditions import Visibility
+from app.services.metrics import SCHEMA_COMPILE_SECONDS
+from app.services.schema_bundle import TFVARS_EXAMPLE, load_bundle, template_sources
+from app.services.validation import ConfigValidator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompiledSchema:
+    """A parsed schema and the artifacts compiled from it."""
+
+    schema: Dict[str, Any]
+    fields: Dict[str, Dict[str, Any]]
+    compute: ComputeProgram
+    visibility: Visibility
+    validator: ConfigValidator
+    fingerprint: Tuple[int, int]
+    source: str = "parsed"  # "bundle" when loaded from .schema_bundle.json
+
+    def with_computed(self, config: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Evaluate all computed fields for a config.
+
+        ``output`` fields are display-only and are never written to the config;
+        other computed fields are filled in when the config leaves them empty.
+
+        Returns:
+            Tuple of (config with computed inputs filled, all computed values)
+        """
+        computed = self.compute.evaluate(config)
+        filled = dict(config)
+        for name, value in computed.items():
+            if self.fields[name].get("type") != "output" and not filled.get(name) and value:
+                filled[name] = value
+        return filled, computed
+
+
+def file_fingerprint(path: Path) -> Optional[Tuple[int, int]]:
+    """Return (mtime_ns, size) for a file, or None if it does not exist."""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SchemaRegistry:
+    """
+    Parse-once cache of tfvars.example schemas keyed by file path.
+
+    Args:
+        use_bundles: Load up-to-date ``.schema_bundle.json`` files instead of parsing
+    """
+
+    def __init__(self, use_bundles: bool = True):
+        self.use_bundles = use_bundles
+        self._entries: Dict[Path, CompiledSchema] = {}
+        self._lock = threading.Lock()
+
+    def _load_schema(self, path: Path) -> Tuple[Dict[str, Any], str]:
+        """Return (schema, "bundle" or "parsed")."""
+        if self.use_bundles:
+            bundle = load_bundle(path, path.read_bytes())
+            if bundle is not None:
+                return bundle["schema"], "bundle"
+        return parse_tfvars_file(path), "parsed"
+
+    def get(self, tfvars_path: Path) -> CompiledSchema:
+        """
+        Return the compiled schema for a tfvars.example file.
+
+        Args:
+            tfvars_path: Path to terraform.tfvars.example
+
+        Returns:
+            CompiledSchema, re-parsed only if the file changed
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        path = Path(tfvars_path).resolve()
+        fingerprint = file_fingerprint(path)
+        if fingerprint is None:
+            raise FileNotFoundError(f"File not found: {tfvars_path}")
+
+        entry = self._entries.get(path)
+        if entry is not None and entry.fingerprint == fingerprint:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.fingerprint == fingerprint:
+                return entry
+            started = time.perf_counter()
+            schema, source = self._load_schema(path)
+            fields = {
+                field["name"]: field
+                for group in schema.get("groups", [])
+                for field in group.get("fields", [])
+            }
+            visibility = Visibility(schema)
+            entry = CompiledSchema(
+                schema=schema,
+                fields=fields,
+                compute=ComputeProgram.from_schema(schema),
+                visibility=visibility,
+                validator=ConfigValidator(schema, visibility),
+                fingerprint=fingerprint,
+                source=source,
+            )
+            self._entries[path] = entry
+            SCHEMA_COMPILE_SECONDS.labels(path.parent.name).observe(time.perf_counter() - started)
+            logger.info(
+                "Compiled schema %s (%s): %d fields, %d computed, %d conditional",
+                path.parent.name, source, len(fields), len(entry.compute.order), len(entry.visibility.predicates)
+            )
+            return entry
+
+    def preload(self, terraform_dir: Path) -> int:
+        """
+        Load every template's schema now instead of on its first request.
+
+        With ``use_bundles``, templates that had no up-to-date bundle are
+        logged as a warning, since they were parsed instead.
+
+        Returns:
+            Number of schemas loaded
+        """
+        loaded = 0
+        parsed = []
+        for tfvars_path in template_sources(terraform_dir):
+            try:
+                entry = self.get(tfvars_path)
+                loaded += 1
+                if entry.source != "bundle":
+                    parsed.append(tfvars_path.parent.name)
+            except Exception as e:
+                logger.warning("Could not preload schema %s: %s", tfvars_path, e)
+        if self.use_bundles and parsed:
+            logger.warning(
+                "No up-to-date schema bundle for %s; parsed instead. Run build-schema-bundles to create them.",
+                ", ".join(parsed)
+            )
+        return loaded
+
+    def get_template(self, terraform_dir: Path, template: str) -> CompiledSchema:
+        """Return the compiled schema for a template directory."""
+        return self.get(Path(terraform_dir) / template / TFVARS_EXAMPLE)
+
+
+# Shared registry used by the API routers and services
+schema_registry = SchemaRegistry(use_bundles=settings.schema_bundles)
@@ -0,0 +1,176 @@
+"""Render ``terraform.tfvars`` content from a UI configuration.
+
+Shared by ``/config/generate`` and ``/config/save-to-template``. Fields the
+form hides (the schema's ``@ui-show-if`` / ``@ui-hide-if`` conditions) are
+left out so Terraform falls back to the variable default. Hidden fields whose
+variable has no default are still written, since Terraform would otherwise
+prompt for them.
+"""
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Tuple
+
+from app.services.schema_registry import CompiledSchema, file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# UI-only fields, converted to other variables in the Terraform-only section
+UI_ONLY_FIELDS = {"create_nat_gateway_subnets"}
+
+# Used by Terraform regardless of the condition that hides them in the form
+# (attach_to_tgw_name: inspection/management VPC modules; update_tgw_routes:
+# ha_pair tgw_routes.tf, whose default is true)
+ALWAYS_RENDERED_FIELDS = {"attach_to_tgw_name", "update_tgw_routes"}
+
+# Fields entered as comma-separated strings but declared as Terraform lists
+LIST_FIELDS = {
+    "management_cidr_sg", "fortigate_management_cidr",
+    "fortiflex_sn_list", "fortiflex_configid_list",
+}
+
+# autoscale_template: FortiFlex is only used when a username is set
+FORTIFLEX_FIELDS = {
+    "fortiflex_username", "fortiflex_password",
+    "fortiflex_sn_list", "fortiflex_configid_list",
+}
+
+_VARIABLE_BLOCK = re.compile(r'^variable\s+"?([\w-]+)"?\s*\{(.*?)^\}', re.M | re.S)
+_DEFAULT = re.compile(r"^\s*default\s*=", re.M)
+
+_required_cache: Dict[Path, Tuple[Tuple, FrozenSet[str]]] = {}
+_required_lock = threading.Lock()
+
+
+def required_variables(template_dir: Path) -> FrozenSet[str]:
+    """
+    Variables declared without a default in a template's ``*.tf`` files.
+
+    Cached until one of the files changes.
+    """
+    template_dir = Path(template_dir).resolve()
+    files = sorted(template_dir.glob("*.tf"))
+    fingerprint = tuple((f.name, file_fingerprint(f)) for f in files)
+    cached = _required_cache.get(template_dir)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    required = set()
+    for path in files:
+        for match in _VARIABLE_BLOCK.finditer(path.read_text()):
+            if not _DEFAULT.search(match.group(2)):
+                required.add(match.group(1))
+    result = frozenset(required)
+    with _required_lock:
+        _required_cache[template_dir] = (fingerprint, result)
+    return result
+
+
+def format_value(field_name: str, value: Any) -> str:
+    """Format a config value as an HCL literal."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        if field_name in LIST_FIELDS:
+            # Split by comma and strip whitespace; a single value is still a list
+            items = [item.strip() for item in value.split(",") if item.strip()]
+            return "[" + ", ".join(f'"{item}"' for item in items) + "]"
+        return f'"{value}"'
+    if isinstance(value, list):
+        return str(value).replace("'", '"')
+    return str(value)
+
+
+def render_tfvars(
+    template: str,
+    compiled: CompiledSchema,
+    config: Dict[str, Any],
+    required: FrozenSet[str] = frozenset(),
+) -> str:
+    """
+    Render tfvars content for a template.
+
+    Args:
+        template: Template name
+        compiled: Compiled schema of the template
+        config: Config values (computed inputs already filled)
+        required: Variables without a default (see ``required_variables``)
+
+    Returns:
+        tfvars file content
+    """
+    hidden = compiled.visibility.hidden(config)
+
+    lines = []
+    lines.append("# Generated by Terraform UI")
+    lines.append("# Template: " + template)
+    lines.append("")
+
+    # Iterate through groups in order
+    for group in compiled.schema['groups']:
+        # Add group header
+        lines.append("#" + "=" * 100)
+        lines.append(f"# {group['name'].upper()}")
+        lines.append("#" + "=" * 100)
+
+        for field in group['fields']:
+            field_name = field['name']
+
+            # Skip output fields (calculated/computed values that shouldn't be in tfvars)
+            if field.get('type') == 'output' or field_name in UI_ONLY_FIELDS:
+                continue
+
+            # Skip fields the form hides, unless Terraform needs a value
+            if field_name in hidden and field_name not in required and field_name not in ALWAYS_RENDERED_FIELDS:
+                continue
+
+            if template == "autoscale_template" and field_name in FORTIFLEX_FIELDS and not config.get("fortiflex_username", ""):
+                continue
+
+            # Skip if field not in config (e.g., computed output fields)
+            if field_name not in config:
+                continue
+
+            value = config[field_name]
+
+            # Auto-generate attach_to_tgw_name if empty or using default value
+            if field_name == "attach_to_tgw_name" and template == "existing_vpc_resources":
+                cp = config.get("cp", "")
+                env = config.get("env", "")
+                # If value is empty or still has default "acme-test-tgw", regenerate it
+                if cp and env and (not value or value == "acme-test-tgw" or value.startswith("acme-")):
+                    value = f"{cp}-{env}-tgw"
+                    logger.info("Auto-generated attach_to_tgw_name: %s", value)
+
+            lines.append(f"{field_name} = {format_value(field_name, value)}")
+
+        lines.append("")  # Blank line between groups
+
+    content = "\n".join(lines)
+
+    # Add derived fields that aren't in the UI but required by Terraform
+    terraform_only = []
+    if "vpc_cidr_inspection" in config:
+        terraform_only.append(f'vpc_cidr_ns_inspection = "{config["vpc_cidr_inspection"]}"')
+    if "vpc_cidr_west" in config or "vpc_cidr_east" in config:
+        terraform_only.append('vpc_cidr_spoke = "192.168.0.0/16"')
+    if "linux_host_ip" in config:
+        terraform_only.append('acl = "private"')
+
+    if template == "existing_vpc_resources":
+        # Convert create_nat_gateway_subnets checkbox to access_internet_mode
+        access_mode = "nat_gw" if config.get("create_nat_gateway_subnets", False) else "eip"
+        terraform_only.append(f'access_internet_mode = "{access_mode}"')
+
+    if template in ("autoscale_template", "ha_pair"):
+        # acl is required by these templates but not shown in UI
+        terraform_only.append('acl = "private"')
+
+    if terraform_only:
+        content += "\n\n# Hidden fields (required by Terraform, auto-generated)\n"
+        content += "\n".join(terraform_only)
+
+    return content
@@ -0,0 +1,545 @@
+"""Server-side validation of template configurations.
+
+Ports ``ui/frontend/src/utils/validation.js`` (the ``@ui-validation`` rules)
+and adds the checks the browser does through input attributes
+(``@ui-required`` and ``@ui-pattern``), so API and bulk callers get the same
+per-field errors as the form. Each field's rules are compiled once per schema
+version into check functions; hidden fields (see ``conditions.py``) are not
+checked. Template-level rules such as ``validate_autoscale_config`` run on
+top.
+
+``BatchValidator`` spreads large batches over a process pool.
+"""
+import asyncio
+import ipaddress
+import logging
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.conditions import Visibility, js_number, js_string
+
+logger = logging.getLogger(__name__)
+
+# (value, config) -> error message or None
+Check = Callable[[Any, Dict[str, Any]], Optional[str]]
+
+_CIDR = re.compile(r"^([0-9]{1,3}\.){3}[0-9]{1,3}/([0-9]|[1-2][0-9]|3[0-2])$")
+_VERSION = re.compile(r"^\d+\.\d+(\.\d+)?$")
+_SINGLE_LETTER = re.compile(r"^[a-z]$", re.I)
+
+# Batches up to this size are validated in-process
+INLINE_BATCH_SIZE = 256
+
+# Error for a non-numeric value in a field with numeric rules
+NOT_A_NUMBER = "Must be a number"
+
+
+# ================================================================================
+# RULES
+# ================================================================================
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == ""
+
+
+def _strict_equal(a: Any, b: Any) -> bool:
+    """JavaScript ``===`` for config values (no bool/number coercion)."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    return a == b
+
+
+def is_valid_cidr(value: Any) -> bool:
+    """IPv4 CIDR with octets 0-255 and prefix 0-32."""
+    if not value or not _CIDR.match(str(value)):
+        return False
+    return all(int(octet) <= 255 for octet in str(value).split("/")[0].split("."))
+
+
+def _ip_within(ip: Any, cidr: Any) -> bool:
+    if not ip or not cidr:
+        return False
+    try:
+        return ipaddress.IPv4Address(str(ip)) in ipaddress.IPv4Network(str(cidr), strict=False)
+    except ValueError:
+        return False
+
+
+def _cidrs_overlap(a: Any, b: Any) -> bool:
+    if not a or not b:
+        return False
+    try:
+        return ipaddress.IPv4Network(str(a), strict=False).overlaps(ipaddress.IPv4Network(str(b), strict=False))
+    except ValueError:
+        return False
+
+
+def _min_length(param: str) -> Check:
+    limit = int(param)
+    return lambda value, config: (
+        f"Minimum length is {param} characters" if len(js_string(value)) < limit else None
+    )
+
+
+def _max_length(param: str) -> Check:
+    limit = int(param)
+    return lambda value, config: (
+        f"Maximum length is {param} characters" if len(js_string(value)) > limit else None
+    )
+
+
+def _min(param: str) -> Check:
+    limit = js_number(param)
+
+    def check(value: Any, config: Dict[str, Any]) -> Optional[str]:
+        number = js_number(value)
+        if math.isnan(number):
+            return NOT_A_NUMBER
+        return f"Minimum value is {param}" if number < limit else None
+    return check
+
+
+def _max(param: str) -> Check:
+    limit = js_number(param)
+
+    def check(value: Any, config: Dict[str, Any]) -> Optional[str]:
+        number = js_number(value)
+        if math.isnan(number):
+            return NOT_A_NUMBER
+        return f"Maximum value is {param}" if number > limit else None
+    return check
+
+
+def _gte(param: str) -> Check:
+    def check(value: Any, config: Dict[str, Any]) -> Optional[str]:
+        if math.isnan(js_number(value)):
+            return NOT_A_NUMBER
+        other = config.get(param)
+        if not _is_empty(other) and js_number(value) < js_number(other):
+            return f"Must be greater than or equal to {param} ({js_string(other)})"
+        return None
+    return check
+
+
+def _lte(param: str) -> Check:
+    def check(value: Any, config: Dict[str, Any]) -> Optional[str]:
+        if math.isnan(js_number(value)):
+            return NOT_A_NUMBER
+        other = config.get(param)
+        if not _is_empty(other) and js_number(value) > js_number(other):
+            return f"Must be less than or equal to {param} ({js_string(other)})"
+        return None
+    return check
+
+
+def _cidr(param: str) -> Check:
+    return lambda value, config: None if is_valid_cidr(value) else "Invalid CIDR format (e.g., 10.0.0.0/16)"
+
+
+def _version_format(param: str) -> Check:
+    return lambda value, config: (
+        None if value and _VERSION.match(js_string(value)) else "Invalid version format (use X.Y or X.Y.Z)"
+    )
+
+
+def _single_letter(param: str) -> Check:
+    return lambda value, config: (
+        None if _SINGLE_LETTER.match(js_string(value)) else "Must be a single letter (a-z)"
+    )
+
+
+def _different_from(param: str) -> Check:
+    return lambda value, config: (
+        f"Must be different from {param}" if _strict_equal(value, config.get(param)) else None
+    )
+
+
+def _within(param: str) -> Check:
+    return lambda value, config: (
+        None if _ip_within(value, config.get(param)) else f"IP must be within {param} CIDR range"
+    )
+
+
+def _not_overlap(param: str) -> Check:
+    return lambda value, config: (
+        f"CIDR must not overlap with {param}" if _cidrs_overlap(value, config.get(param)) else None
+    )
+
+
+# @ui-validation rule name -> factory taking the rule parameter
+RULES: Dict[str, Callable[[str], Check]] = {
+    "min-length": _min_length,
+    "max-length": _max_length,
+    "min": _min,
+    "max": _max,
+    "gte": _gte,
+    "lte": _lte,
+    "cidr": _cidr,
+    "version-format": _version_format,
+    "single-letter": _single_letter,
+    "different-from": _different_from,
+    "within": _within,
+    "not-overlap": _not_overlap,
+}
+
+
+def _pattern(pattern: str) -> Optional[Check]:
+    """HTML ``pattern`` attribute semantics: the whole value must match."""
+    try:
+        compiled = re.compile(f"(?:{pattern})")
+    except re.error as e:
+        logger.warning("Ignoring invalid @ui-pattern %r: %s", pattern, e)
+        return None
+    return lambda value, config: (
+        None if compiled.fullmatch(js_string(value)) else f"Must match the pattern {pattern}"
+    )
+
+
+# ================================================================================
+# COMPILED VALIDATOR
+# ================================================================================
+
+
+@dataclass(frozen=True)
+class FieldRules:
+    """Compiled checks of one field."""
+
+    name: str
+    required: bool
+    checks: Tuple[Check, ...]
+
+
+def compile_field(field: Dict[str, Any]) -> Optional[FieldRules]:
+    """
+    Compile a schema field's validation annotations.
+
+    Returns:
+        FieldRules, or None if the field has nothing to check
+    """
+    required = bool(field.get("required"))
+    checks: List[Check] = []
+    for rule in field.get("validation") or []:
+        name, _, param = rule.partition(":")
+        if name == "required":
+            required = True
+            continue
+        factory = RULES.get(name)
+        if factory is None:
+            logger.warning("Unknown validation rule %r on %s", rule, field.get("name"))
+            continue
+        try:
+            checks.append(factory(param))
+        except ValueError:
+            logger.warning("Invalid parameter in validation rule %r on %s", rule, field.get("name"))
+    if field.get("pattern"):
+        check = _pattern(field["pattern"])
+        if check is not None:
+            checks.append(check)
+    if not required and not checks:
+        return None
+    return FieldRules(field["name"], required, tuple(checks))
+
+
+class ConfigValidator:
+    """
+    Per-field validation of one schema.
+
+    Args:
+        schema: Parsed tfvars schema
+        visibility: Visibility of the same schema (hidden fields are skipped)
+    """
+
+    def __init__(self, schema: Dict[str, Any], visibility: Visibility):
+        self.visibility = visibility
+        self.fields: List[FieldRules] = []
+        for group in schema.get("groups", []):
+            for field in group.get("fields", []):
+                if field.get("type") == "output":
+                    continue
+                rules = compile_field(field)
+                if rules is not None:
+                    self.fields.append(rules)
+
+    def field_errors(self, config: Dict[str, Any], hidden: Optional[Set[str]] = None) -> Dict[str, str]:
+        """
+        Check every visible field.
+
+        Args:
+            config: Config values
+            hidden: Hidden fields, if already evaluated for this config
+
+        Returns:
+            Field name -> first error (as the form shows one error per field)
+        """
+        if hidden is None:
+            hidden = self.visibility.hidden(config)
+        errors = {}
+        for rules in self.fields:
+            if rules.name in hidden:
+                continue
+            value = config.get(rules.name)
+            if _is_empty(value):
+                if rules.required:
+                    errors[rules.name] = "This field is required"
+                continue
+            for check in rules.checks:
+                try:
+                    message = check(value, config)
+                except (TypeError, ValueError) as e:
+                    logger.debug("Validation of %s failed: %s", rules.name, e)
+                    message = None
+                if message:
+                    errors[rules.name] = message
+                    break
+        return errors
+
+
+# ================================================================================
+# TEMPLATE RULES
+# ================================================================================
+
+
+def validate_autoscale_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate autoscale_template configuration.
+
+    Returns dict with 'errors' and 'warnings' lists.
+    """
+    errors = []
+    warnings = []
+
+    license_model = config.get("autoscale_license_model", "hybrid")
+
+    # Validate BYOL capacity for hybrid mode
+    if license_model == "hybrid":
+        byol_min = config.get("asg_byol_asg_min_size", 1)
+        byol_max = config.get("asg_byol_asg_max_size", 2)
+        byol_desired = config.get("asg_byol_asg_desired_size", 1)
+
+        # In hybrid mode, BYOL provides fixed baseline - min should equal desired
+        if byol_min != byol_desired:
+            errors.append(
+                f"Hybrid mode requires BYOL min_size ({byol_min}) == desired_size ({byol_desired}) "
+                "for fixed baseline capacity. The BYOL ASG provides steady-state capacity."
+            )
+
+        # Warning: max > min allows manual scale-out (need extra licenses)
+        if byol_max > byol_min:
+            warnings.append(
+                f"BYOL max_size ({byol_max}) > min_size ({byol_min}) allows manual scale-out. "
+                "Ensure you have sufficient licenses available before manually increasing capacity."
+            )
+
+    # Validate scale thresholds
+    scale_out = config.get("asg_scale_out_threshold", 80)
+    scale_in = config.get("asg_scale_in_threshold", 20)
+
+    if scale_in >= scale_out:
+        errors.append(
+            f"Scale-in threshold ({scale_in}%) must be less than scale-out threshold ({scale_out}%). "
+            "Otherwise, scaling oscillation will occur."
+        )
+
+    # Warn if thresholds are too close (< 30% gap)
+    if (scale_out - scale_in) < 30 and scale_in < scale_out:
+        warnings.append(
+            f"Scale thresholds are close ({scale_out}% out, {scale_in}% in). "
+            "Consider at least 30% gap to prevent scaling oscillation."
+        )
+
+    return {"errors": errors, "warnings": warnings}
+
+
+# Template name -> cross-field rules run after the per-field checks
+TEMPLATE_RULES: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "autoscale_template": validate_autoscale_config,
+}
+
+
+def _rule_values(compiled: Any, config: Dict[str, Any], hidden: Set[str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Visible values for the template rules, with numeric strings converted.
+
+    Fields with a numeric default are compared as numbers by the template
+    rules, so a value the per-field checks accept as a number (``"80"``) is
+    passed on as one.
+
+    Returns:
+        Tuple of (values, field name -> error for values that are not numbers)
+    """
+    values, errors = {}, {}
+    for name, value in config.items():
+        if name in hidden:
+            continue
+        default = compiled.fields.get(name, {}).get("default_value")
+        if isinstance(value, str) and isinstance(default, (int, float)) and not isinstance(default, bool):
+            number = js_number(value)
+            if math.isnan(number):
+                errors[name] = NOT_A_NUMBER
+                continue
+            value = int(number) if number.is_integer() else number
+        values[name] = value
+    return values, errors
+
+
+def validate_config(template: str, compiled: Any, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a config against its template.
+
+    Args:
+        template: Template name
+        compiled: CompiledSchema of the template
+        config: Config values
+
+    Returns:
+        Dict with valid, errors, warnings and field_errors
+    """
+    hidden = compiled.visibility.hidden(config)
+    field_errors = compiled.validator.field_errors(config, hidden)
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    rules = TEMPLATE_RULES.get(template)
+    if rules is not None:
+        values, type_errors = _rule_values(compiled, config, hidden)
+        result = {"errors": [], "warnings": []}
+        if type_errors:
+            # Reported per field, as the per-field checks do; the cross-field
+            # rules run once the values are numbers
+            for name, message in type_errors.items():
+                field_errors.setdefault(name, message)
+        else:
+            try:
+                result = rules(values)
+            except (TypeError, ValueError) as e:
+                logger.warning("Template rules of %s could not run: %s", template, e)
+        errors.extend(result["errors"])
+        warnings.extend(result["warnings"])
+
+    return {
+        "valid": not errors and not field_errors,
+        "errors": errors,
+        "warnings": warnings,
+        "field_errors": field_errors,
+    }
+
+
+# ================================================================================
+# BATCH
+# ================================================================================
+
+
+def _validate_chunk(terraform_dir: str, template: str, configs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Worker entry point: validate configs of one template."""
+    # Imported here because the registry imports this module
+    from app.services.schema_registry import schema_registry
+
+    compiled = schema_registry.get_template(Path(terraform_dir), template)
+    return [validate_config(template, compiled, config) for config in configs]
+
+
+class BatchValidator:
+    """
+    Validate many configs, in parallel worker processes for large batches.
+
+    Each worker compiles a template's schema once and reuses it for every
+    chunk it receives.
+
+    Args:
+        workers: Worker processes (0 = CPU count)
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: the API process runs threads (fleet monitor, IP resolver)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+        return self._pool
+
+    async def validate(
+        self,
+        terraform_dir: Path,
+        items: List[Tuple[str, Dict[str, Any]]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate (template, config) pairs.
+
+        Returns:
+            One result per item, in input order
+        """
+        by_template: Dict[str, List[int]] = {}
+        for position, (template, _) in enumerate(items):
+            by_template.setdefault(template, []).append(position)
+
+        if len(items) > INLINE_BATCH_SIZE and self.workers > 1:
+            try:
+                return await self._validate_parallel(terraform_dir, items, by_template)
+            except BrokenProcessPool as e:
+                logger.warning("Validation worker pool failed (%s); validating in-process", e)
+                self.shutdown()
+
+        if len(items) > INLINE_BATCH_SIZE:
+            # Single worker: keep the event loop responsive
+            return await asyncio.to_thread(self._validate_inline, terraform_dir, items, by_template)
+        return self._validate_inline(terraform_dir, items, by_template)
+
+    @staticmethod
+    def _validate_inline(
+        terraform_dir: Path,
+        items: List[Tuple[str, Dict[str, Any]]],
+        by_template: Dict[str, List[int]],
+    ) -> List[Dict[str, Any]]:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        for template, positions in by_template.items():
+            chunk = _validate_chunk(str(terraform_dir), template, [items[p][1] for p in positions])
+            for position, result in zip(positions, chunk):
+                results[position] = result
+        return results
+
+    async def _validate_parallel(
+        self,
+        terraform_dir: Path,
+        items: List[Tuple[str, Dict[str, Any]]],
+        by_template: Dict[str, List[int]],
+    ) -> List[Dict[str, Any]]:
+        # A few chunks per worker keeps them busy when templates differ in cost
+        chunk_size = max(INLINE_BATCH_SIZE // 4, math.ceil(len(items) / (self.workers * 4)))
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        chunks = []
+        futures = []
+        for template, positions in by_template.items():
+            for start in range(0, len(positions), chunk_size):
+                chunk = positions[start:start + chunk_size]
+                chunks.append(chunk)
+                futures.append(loop.run_in_executor(
+                    pool, _validate_chunk, str(terraform_dir), template, [items[p][1] for p in chunk]
+                ))
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        for chunk, chunk_results in zip(chunks, await asyncio.gather(*futures)):
+            for position, result in zip(chunk, chunk_results):
+                results[position] = result
+        return results
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Shared batch validator used by the terraform router
+batch_validator = BatchValidator(settings.validate_batch_workers)
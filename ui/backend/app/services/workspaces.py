@@ -0,0 +1,364 @@
+"""Per-environment terraform workspaces and the parallel build scheduler.
+
+A template directory holds one ``terraform.tfvars`` and one local state, so
+``acme-test`` and ``acme-prod`` of the same template could not be deployed
+at the same time. A workspace is a separate working directory for one cp/env
+of a template, ``<workspace root>/<template>/<cp>-<env>``:
+
+- the template's sources (``.tf`` files, config templates, scripts, license
+  files) are symlinked, so a workspace costs a few inodes and always builds
+  the current sources. Directories are real directories with linked files,
+  not linked directories, so scripts that find the working directory from
+  their own location (``verify_scripts/*.sh``) use the workspace
+- state, ``terraform.tfvars``, ``.terraform``, UI config files and files the
+  build generates stay local to the workspace (``WORKSPACE_LOCAL``)
+- ``.terraform.lock.hcl`` is copied, so ``terraform init`` in one workspace
+  does not rewrite the template's lock file
+- providers are shared through ``TF_PLUGIN_CACHE_DIR``, so each workspace's
+  ``init`` links providers from the cache instead of downloading them
+
+``BuildScheduler`` runs builds in parallel up to a limit, one at a time per
+working directory. Terraform does not support concurrent ``init`` against a
+shared plugin cache, so ``init`` steps take turns.
+"""
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_DIR = ".workspaces"
+PLUGIN_CACHE_DIR = ".plugin-cache"
+
+# Never linked: per-workspace files (fnmatch against the name and the relative path)
+WORKSPACE_LOCAL = (
+    ".terraform",
+    ".terraform.lock.hcl",  # copied instead
+    ".terraform.tfstate.lock.info",
+    "terraform.tfstate.d",
+    "*.tfstate",
+    "*.tfstate.*",
+    "terraform.tfvars",
+    "*.tfplan",
+    "tfplan",
+    "crash.log",
+    "*.log",
+    "ui_config.json",
+    ".ui_config.*",
+    "cidr_plan.json",
+    ".cidr_plan.*",
+    ".schema_bundle.json",
+    ".schema_bundle.json.*",
+    "verify_scripts/terraform_verification_data.sh",
+    ".gitignore",
+    ".DS_Store",
+)
+
+_NAME_PART = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+
+class WorkspaceError(Exception):
+    """Raised for invalid workspace names or a workspace that does not exist."""
+
+
+def workspace_name(cp: str, env: str) -> str:
+    """Workspace name for a cp/env (``{cp}-{env}``, the resource prefix)."""
+    for label, value in (("cp", cp), ("env", env)):
+        if not value or not _NAME_PART.match(value) or ".." in value:
+            raise WorkspaceError(f"Invalid {label} '{value}' for a workspace name")
+    return f"{cp}-{env}"
+
+
+def is_workspace_local(relative: Path) -> bool:
+    """True if a path (relative to the template) belongs to each workspace rather than the sources."""
+    text = relative.as_posix()
+    return any(fnmatch.fnmatch(relative.name, pattern) or fnmatch.fnmatch(text, pattern)
+               for pattern in WORKSPACE_LOCAL)
+
+
+class WorkspaceManager:
+    """
+    Create, refresh, list and remove workspaces under ``root``.
+
+    Args:
+        terraform_dir: Directory holding the template directories
+        root: Workspace root (default ``<terraform_dir>/.workspaces``)
+    """
+
+    def __init__(self, terraform_dir: Path, root: Optional[Path] = None):
+        self.terraform_dir = Path(terraform_dir)
+        self.root = Path(root) if root else self.terraform_dir / WORKSPACE_DIR
+        self._lock = threading.Lock()
+
+    @property
+    def plugin_cache_dir(self) -> Path:
+        return self.root / PLUGIN_CACHE_DIR
+
+    def path(self, template: str, name: str) -> Path:
+        if not _NAME_PART.match(name) or ".." in name:
+            raise WorkspaceError(f"Invalid workspace name '{name}'")
+        return self.root / template / name
+
+    def exists(self, template: str, name: str) -> bool:
+        return self.path(template, name).is_dir()
+
+    def _source_files(self, source: Path) -> Iterable[Tuple[Path, bool]]:
+        """(relative path, is_dir) of every linkable entry of a template, parents first."""
+        for dirpath, dirnames, filenames in os.walk(source):
+            base = Path(dirpath).relative_to(source)
+            dirnames[:] = sorted(d for d in dirnames if not is_workspace_local(base / d))
+            for name in dirnames:
+                yield base / name, True
+            for name in sorted(filenames):
+                if not is_workspace_local(base / name):
+                    yield base / name, False
+
+    def sync(self, template: str, name: str) -> Dict[str, Any]:
+        """
+        Create a workspace or bring its links up to date with the template.
+
+        New source files are linked, links to deleted sources are removed,
+        and workspace-local files are never touched.
+
+        Returns:
+            Dict with the workspace ``path``, ``created`` and counts of
+            ``linked`` and ``removed`` entries
+        """
+        source = self.terraform_dir / template
+        if not source.is_dir():
+            raise WorkspaceError(f"Template directory not found: {source}")
+        target = self.path(template, name)
+        with self._lock:
+            created = not target.exists()
+            target.mkdir(parents=True, exist_ok=True)
+            linked = removed = 0
+            wanted = set()
+            for relative, is_dir in self._source_files(source):
+                wanted.add(relative)
+                destination = target / relative
+                if is_dir:
+                    if destination.is_symlink():
+                        destination.unlink()
+                    destination.mkdir(exist_ok=True)
+                    continue
+                if destination.is_symlink() and os.readlink(destination) == str(source / relative):
+                    continue
+                if destination.exists() and not destination.is_symlink():
+                    continue  # generated in the workspace; leave it alone
+                if destination.is_symlink():
+                    destination.unlink()
+                destination.symlink_to(source / relative)
+                linked += 1
+
+            # Drop links whose source is gone (files deleted or renamed in the template)
+            for dirpath, dirnames, filenames in os.walk(target):
+                base = Path(dirpath).relative_to(target)
+                dirnames[:] = [d for d in dirnames if not is_workspace_local(base / d)]
+                for filename in filenames:
+                    path = Path(dirpath) / filename
+                    if path.is_symlink() and path.relative_to(target) not in wanted:
+                        path.unlink()
+                        removed += 1
+
+            lock_file = source / ".terraform.lock.hcl"
+            if lock_file.exists() and not (target / lock_file.name).exists():
+                shutil.copy2(lock_file, target / lock_file.name)
+
+        if created:
+            logger.info("Created workspace %s/%s (%d links)", template, name, linked)
+        return {"path": str(target), "created": created, "linked": linked, "removed": removed}
+
+    def list_workspaces(self, template: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Workspaces (of one template or all) with whether they have tfvars and state."""
+        if template:
+            templates = [template]
+        elif self.root.is_dir():
+            templates = sorted(p.name for p in self.root.iterdir() if p.is_dir() and p.name != PLUGIN_CACHE_DIR)
+        else:
+            templates = []
+        workspaces = []
+        for template_name in templates:
+            template_root = self.root / template_name
+            if not template_root.is_dir():
+                continue
+            for path in sorted(p for p in template_root.iterdir() if p.is_dir()):
+                state = path / "terraform.tfstate"
+                workspaces.append({
+                    "template": template_name,
+                    "workspace": path.name,
+                    "path": str(path),
+                    "has_tfvars": (path / "terraform.tfvars").exists(),
+                    "has_state": state.exists() and has_resources(state),
+                })
+        return workspaces
+
+    def remove(self, template: str, name: str) -> None:
+        """Delete a workspace; refuses while its state still tracks resources."""
+        target = self.path(template, name)
+        if not target.is_dir():
+            raise WorkspaceError(f"Workspace {template}/{name} does not exist")
+        state = target / "terraform.tfstate"
+        if state.exists() and has_resources(state):
+            raise WorkspaceError(f"Workspace {template}/{name} still has resources in its state; destroy them first")
+        shutil.rmtree(target)
+        logger.info("Removed workspace %s/%s", template, name)
+
+
+def has_resources(state_file: Path) -> bool:
+    """True if a terraform.tfstate tracks any managed resource."""
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return True  # unreadable state: assume it matters
+    return any(resource.get("mode") == "managed" for resource in state.get("resources", []))
+
+
+def uses_plugin_cache() -> bool:
+    """True if terraform runs with a shared provider cache (ours or one set in the environment)."""
+    return settings.terraform_plugin_cache or bool(os.environ.get("TF_PLUGIN_CACHE_DIR"))
+
+
+def subprocess_env(manager: WorkspaceManager) -> Optional[Dict[str, str]]:
+    """
+    Environment for build subprocesses: the shared provider cache, unless disabled or already set.
+
+    Returns:
+        Environment dict, or None to inherit this process's environment
+    """
+    if not settings.terraform_plugin_cache or os.environ.get("TF_PLUGIN_CACHE_DIR"):
+        return None
+    manager.plugin_cache_dir.mkdir(parents=True, exist_ok=True)
+    return {**os.environ, "TF_PLUGIN_CACHE_DIR": str(manager.plugin_cache_dir)}
+
+
+_managers: Dict[Path, WorkspaceManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_workspace_manager(terraform_dir: Path) -> WorkspaceManager:
+    """Return the shared WorkspaceManager for a terraform directory."""
+    key = Path(terraform_dir).resolve()
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = WorkspaceManager(key, Path(settings.workspace_dir) if settings.workspace_dir else None)
+        return _managers[key]
+
+
+# ================================================================================
+# BUILD SCHEDULING
+# ================================================================================
+
+
+class BuildScheduler:
+    """
+    Run builds in parallel up to ``max_parallel``, one at a time per working directory.
+
+    Limits apply within one backend process.
+    """
+
+    def __init__(self, max_parallel: int = 2):
+        self.max_parallel = max(1, max_parallel)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._directory_locks: Dict[str, asyncio.Lock] = {}
+        self._init_lock: Optional[asyncio.Lock] = None
+        self.running: List[str] = []
+        self.queued: List[str] = []
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_parallel)
+        return self._slots
+
+    @property
+    def init_lock(self) -> asyncio.Lock:
+        """Held while ``terraform init`` runs (the shared plugin cache is not concurrency safe)."""
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        return self._init_lock
+
+    def waiting_reason(self, key: str) -> Optional[str]:
+        """Why a build of ``key`` would wait now, or None if it would start at once."""
+        if key in self.running or key in self.queued:
+            return f"another build of {key} is running"
+        if len(self.running) >= self.max_parallel:
+            return f"{len(self.running)} of {self.max_parallel} build slots in use"
+        return None
+
+    def directory_busy(self, key: str) -> bool:
+        """True while a build of ``key`` runs or waits."""
+        return key in self.running or key in self.queued
+
+    @asynccontextmanager
+    async def directory(self, key: str) -> AsyncIterator[None]:
+        """
+        Hold the working directory ``key`` without taking a build slot.
+
+        For short read-only commands (``terraform show``) that must not run
+        while a build changes the directory, but need not wait for builds of
+        other directories.
+        """
+        lock = self._directory_locks.setdefault(key, asyncio.Lock())
+        self.queued.append(key)
+        try:
+            await lock.acquire()
+        finally:
+            self.queued.remove(key)
+        try:
+            yield
+        finally:
+            lock.release()
+            if not lock.locked() and key not in self.queued:
+                self._directory_locks.pop(key, None)
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[None]:
+        """Wait for the working directory ``key`` to be free, then for a build slot."""
+        lock = self._directory_locks.setdefault(key, asyncio.Lock())
+        self.queued.append(key)
+        try:
+            await lock.acquire()
+            try:
+                await self._semaphore().acquire()
+            except BaseException:
+                lock.release()
+                raise
+        finally:
+            self.queued.remove(key)
+        self.running.append(key)
+        try:
+            yield
+        finally:
+            self.running.remove(key)
+            self._semaphore().release()
+            lock.release()
+            if not lock.locked() and key not in self.queued:
+                self._directory_locks.pop(key, None)
+
+    async def run(self, key: str, output: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Stream ``output`` once ``key`` has a slot, with a note if it had to wait."""
+        reason = self.waiting_reason(key)
+        if reason:
+            yield f"Queued: {reason}. Waiting for a build slot...\n"
+        async with self.slot(key):
+            if reason:
+                yield "Build slot acquired.\n\n"
+            async for chunk in output:
+                yield chunk
+
+    def status(self) -> Dict[str, Any]:
+        return {"max_parallel": self.max_parallel, "running": list(self.running), "queued": list(self.queued)}
+
+
+# Shared instance used by the build endpoints
+build_scheduler = BuildScheduler(settings.build_max_parallel)
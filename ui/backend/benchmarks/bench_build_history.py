@@ -0,0 +1,96 @@
+"""Benchmark build history recording and queries.
+
+Feeds synthetic ``terraform apply`` output (progress lines for each resource
+plus "Still creating..." and plan noise) through a ``StepRecorder``, as
+``run_command_stream`` does for every line of a build, then times writing
+the step and the slowest-resource and critical-path queries over ``builds``
+recorded applies.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_build_history [--resources 500] [--builds 200]
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.services.build_history import BuildHistory
+
+TYPES = ("aws_vpc", "aws_subnet", "aws_route_table", "aws_route", "aws_instance", "aws_lb", "aws_security_group")
+
+
+def apply_output(resources: int, seed: int = 0) -> List[str]:
+    """Lines of a synthetic apply creating ``resources`` resources."""
+    rng = random.Random(seed)
+    lines = []
+    for index in range(resources):
+        address = f"module.m{index % 7}.{TYPES[index % len(TYPES)]}.r[{index}]"
+        lines.append(f"{address}: Creating...\n")
+        for elapsed in range(rng.randrange(3)):
+            lines.append(f"{address}: Still creating... [{(elapsed + 1) * 10}s elapsed]\n")
+        lines.append(f"  # {address} will be created\n")
+        lines.append("      + arn = (known after apply)\n")
+        lines.append(f"{address}: Creation complete after {rng.randrange(1, 200)}s [id=id-{index:08x}]\n")
+    lines.append(f"Apply complete! Resources: {resources} added, 0 changed, 0 destroyed.\n")
+    return lines
+
+
+def run(resources: int = 500, builds: int = 200) -> Dict[str, Any]:
+    """
+    Time per-line parsing, step recording and queries.
+
+    Returns:
+        Microseconds per output line, milliseconds to record a step, and
+        query times over ``builds`` recorded applies
+    """
+    lines = apply_output(resources)
+    with tempfile.TemporaryDirectory() as tmp:
+        history = BuildHistory(Path(tmp) / "history.sqlite3")
+        parse = record = 0.0
+        for _ in range(builds):
+            job = history.start("autoscale_template", "build", Path(tmp))
+            recorder = job.step("apply", ["terraform", "apply", "-auto-approve"])
+            started = time.perf_counter()
+            for line in lines:
+                recorder.feed(line)
+            parse += time.perf_counter() - started
+            started = time.perf_counter()
+            recorder.finish(0)
+            record += time.perf_counter() - started
+            job.finish()
+
+        started = time.perf_counter()
+        slowest = history.slowest_resources(group_by="address", limit=20)
+        slowest_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        path = history.critical_path(job.id)
+        critical_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        history.trends("autoscale_template")
+        trends_ms = (time.perf_counter() - started) * 1000
+
+    assert len(slowest) == 20 and path["resources"] == resources, (len(slowest), path["resources"])
+    return {
+        "lines_per_build": len(lines),
+        "rows": resources * builds,
+        "us_per_line": round(parse * 1e6 / (len(lines) * builds), 3),
+        "record_step_ms": round(record * 1000 / builds, 2),
+        "slowest_ms": round(slowest_ms, 1),
+        "critical_path_ms": round(critical_ms, 1),
+        "trends_ms": round(trends_ms, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=500)
+    parser.add_argument("--builds", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.resources, args.builds), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark the CIDR overlap index with a large random prefix set.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_cidr_index [--size 100000] [--queries 10000] [--verify]
+"""
+import argparse
+import ipaddress
+import json
+import random
+import time
+from typing import Dict, List
+
+from app.services.cidr_index import KIND_SUBNET, KIND_VPC, CidrEntry, CidrIndex
+
+
+def random_entries(count: int, rng: random.Random) -> List[CidrEntry]:
+    """Random VPC-sized (/16-/24) and subnet-sized (/24-/28) prefixes in 10.0.0.0/8."""
+    entries = []
+    for i in range(count):
+        prefixlen = rng.randint(16, 28)
+        address = (10 << 24) | rng.getrandbits(24)
+        network = ipaddress.IPv4Network((address, prefixlen), strict=False)
+        kind = KIND_VPC if prefixlen <= 24 else KIND_SUBNET
+        entries.append(CidrEntry(network, kind, "bench", f"e{i}"))
+    return entries
+
+
+def run(size: int = 100_000, queries: int = 10_000, seed: int = 0, verify: bool = False) -> Dict[str, float]:
+    """
+    Build an index of ``size`` prefixes and time overlap and free-block queries.
+
+    Returns:
+        Metrics in milliseconds (build) and microseconds per query
+    """
+    rng = random.Random(seed)
+    entries = random_entries(size, rng)
+    probes = [e.network for e in random_entries(queries, rng)]
+
+    started = time.perf_counter()
+    index = CidrIndex(entries)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for network in probes:
+        index.overlaps(network)
+    overlaps_us = (time.perf_counter() - started) * 1e6 / queries
+
+    started = time.perf_counter()
+    found = 0
+    for network in probes:
+        found += len(index.overlapping(network))
+    overlapping_us = (time.perf_counter() - started) * 1e6 / queries
+
+    # First query pays for building the gap tree
+    started = time.perf_counter()
+    index.first_free(ipaddress.IPv4Network("10.0.0.0/8"), 24)
+    gap_build_ms = (time.perf_counter() - started) * 1000
+
+    supernets = [ipaddress.IPv4Network((int(n.network_address) & 0xFFFF0000, 16)) for n in probes]
+    started = time.perf_counter()
+    for supernet in supernets:
+        index.first_free(supernet, 26)
+    free_us = (time.perf_counter() - started) * 1e6 / queries
+
+    if verify:
+        for network in probes[:200]:
+            expected = {e for e in entries if e.network.overlaps(network)}
+            actual = set(index.overlapping(network))
+            assert expected == actual, f"overlap mismatch for {network}"
+            block = index.first_free(ipaddress.IPv4Network("10.0.0.0/8"), network.prefixlen)
+            assert block is None or not any(e.network.overlaps(block) for e in entries), block
+
+    return {
+        "size": size,
+        "build_ms": round(build_ms, 2),
+        "overlaps_us": round(overlaps_us, 2),
+        "overlapping_us": round(overlapping_us, 2),
+        "avg_overlaps": round(found / queries, 2),
+        "gap_build_ms": round(gap_build_ms, 2),
+        "first_free_us": round(free_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true", help="Check results against a linear scan")
+    args = parser.parse_args()
+    print(json.dumps(run(args.size, args.queries, args.seed, args.verify), indent=2))
+
+
+if __name__ == "__main__":
+    main()
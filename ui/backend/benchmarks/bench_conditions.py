@@ -0,0 +1,110 @@
+"""Benchmark show-if/hide-if predicates over many random configs.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_conditions [--configs 10000] [--verify]
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.services.conditions import _compile
+from app.services.schema_registry import schema_registry
+
+TERRAFORM_DIR = Path(__file__).resolve().parents[3] / "terraform"
+TEMPLATES = ["existing_vpc_resources", "autoscale_template", "ha_pair"]
+
+
+def random_configs(compiled: Any, count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Schema defaults with checkboxes, selects and numbers randomised."""
+    base = {name: f.get("default_value") for name, f in compiled.fields.items() if f.get("default_value") is not None}
+    configs = []
+    for _ in range(count):
+        config = dict(base)
+        for name, field in compiled.fields.items():
+            kind = field.get("type")
+            if kind == "checkbox":
+                config[name] = rng.random() < 0.5
+            elif kind == "select" and field.get("options"):
+                option = rng.choice(field["options"])
+                config[name] = option.get("value") if isinstance(option, dict) else option
+            elif kind in ("number", "slider"):
+                config[name] = rng.randint(0, 4)
+        configs.append(config)
+    return configs
+
+
+def _interpreted_hidden(schema: Dict[str, Any], config: Dict[str, Any]) -> set:
+    """Reference implementation that re-parses every expression on every call."""
+    hidden = set()
+    for group in schema.get("groups", []):
+        group_visible = _compile(group["show_if"])(config) if group.get("show_if") else True
+        for field in group.get("fields", []):
+            if field.get("show_if"):
+                visible = _compile(field["show_if"])(config)
+            elif field.get("hide_if"):
+                visible = not _compile(field["hide_if"])(config)
+            else:
+                visible = True
+            if not (group_visible and visible):
+                hidden.add(field["name"])
+    return hidden
+
+
+def run(configs: int = 10_000, seed: int = 0, verify: bool = False) -> Dict[str, float]:
+    """
+    Evaluate every predicate of every template for ``configs`` configs.
+
+    Returns:
+        Total milliseconds and microseconds per config, compiled vs re-parsed
+    """
+    rng = random.Random(seed)
+    compiled = {t: schema_registry.get_template(TERRAFORM_DIR, t) for t in TEMPLATES}
+    samples = {t: random_configs(c, configs, rng) for t, c in compiled.items()}
+    fields = sum(len(c.visibility.predicates) for c in compiled.values())
+    conditions = sum(len(c.visibility.conditions) for c in compiled.values())
+
+    started = time.perf_counter()
+    hidden = 0
+    for template, entry in compiled.items():
+        for config in samples[template]:
+            hidden += len(entry.visibility.hidden(config))
+    compiled_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for template, entry in compiled.items():
+        for config in samples[template]:
+            _interpreted_hidden(entry.schema, config)
+    interpreted_ms = (time.perf_counter() - started) * 1000
+
+    if verify:
+        for template, entry in compiled.items():
+            for config in samples[template][:500]:
+                assert entry.visibility.hidden(config) == _interpreted_hidden(entry.schema, config), template
+
+    evaluated = configs * len(TEMPLATES)
+    return {
+        "configs": evaluated,
+        "conditional_fields": fields,
+        "conditions": conditions,
+        "avg_hidden": round(hidden / evaluated, 2),
+        "compiled_ms": round(compiled_ms, 2),
+        "compiled_us_per_config": round(compiled_ms * 1000 / evaluated, 2),
+        "interpreted_ms": round(interpreted_ms, 2),
+        "speedup": round(interpreted_ms / compiled_ms, 1) if compiled_ms else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", type=int, default=10_000, help="Configs per template")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true", help="Check against re-parsed evaluation")
+    args = parser.parse_args()
+    print(json.dumps(run(args.configs, args.seed, args.verify), indent=2))
+
+
+if __name__ == "__main__":
+    main()
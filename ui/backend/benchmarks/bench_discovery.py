@@ -0,0 +1,135 @@
+"""Benchmark Fortinet-Role discovery (find_fortinet_resources) against a moto-backed local AWS.
+
+Requires ``moto`` (``pip install "moto[ec2]"``); without it the benchmark
+reports itself as skipped. Timings include moto's in-process request
+handling, so compare them only with other runs on the same machine.
+``resources_found`` follows moto's emulation (its transit gateways and
+attachments never reach the "available" state the endpoint filters on).
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_discovery [--environments 5] [--calls 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict
+
+REGION = "us-west-2"
+ROLES = ["inspection", "management", "east", "west"]
+
+
+def populate(ec2: Any, cp: str, env: str, index: int) -> int:
+    """Create the tagged resources existing_vpc_resources would; return how many."""
+    prefix = f"{cp}-{env}"
+
+    def tagged(resource_type: str, role: str) -> list:
+        return [{
+            "ResourceType": resource_type,
+            "Tags": [
+                {"Key": "Fortinet-Role", "Value": f"{prefix}-{role}"},
+                {"Key": "Name", "Value": f"{prefix}-{role}"},
+            ],
+        }]
+
+    count = 0
+    tgw = ec2.create_transit_gateway(TagSpecifications=tagged("transit-gateway", "tgw"))["TransitGateway"]
+    count += 1
+    for role in ("inspection", "spoke"):
+        ec2.create_transit_gateway_route_table(
+            TransitGatewayId=tgw["TransitGatewayId"],
+            TagSpecifications=tagged("transit-gateway-route-table", f"{role}-tgw-rtb"),
+        )
+        count += 1
+
+    for offset, role in enumerate(ROLES):
+        cidr = f"10.{index % 64 * 4 + offset}.0.0/16"
+        vpc = ec2.create_vpc(CidrBlock=cidr, TagSpecifications=tagged("vpc", f"{role}-vpc"))["Vpc"]
+        subnets = []
+        for az, third in (("a", 0), ("b", 1)):
+            subnet = ec2.create_subnet(
+                VpcId=vpc["VpcId"],
+                CidrBlock=cidr.replace(".0.0/16", f".{third}.0/24"),
+                AvailabilityZone=f"{REGION}{az}",
+                TagSpecifications=tagged("subnet", f"{role}-public-{az}"),
+            )["Subnet"]
+            subnets.append(subnet["SubnetId"])
+        igw = ec2.create_internet_gateway(TagSpecifications=tagged("internet-gateway", f"{role}-igw"))
+        ec2.attach_internet_gateway(
+            InternetGatewayId=igw["InternetGateway"]["InternetGatewayId"], VpcId=vpc["VpcId"]
+        )
+        route_table = ec2.create_route_table(
+            VpcId=vpc["VpcId"], TagSpecifications=tagged("route-table", f"{role}-public-rt")
+        )["RouteTable"]
+        ec2.create_route(
+            RouteTableId=route_table["RouteTableId"],
+            DestinationCidrBlock="0.0.0.0/0",
+            GatewayId=igw["InternetGateway"]["InternetGatewayId"],
+        )
+        ec2.create_transit_gateway_vpc_attachment(
+            TransitGatewayId=tgw["TransitGatewayId"],
+            VpcId=vpc["VpcId"],
+            SubnetIds=subnets[:1],
+            TagSpecifications=tagged("transit-gateway-attachment", f"{role}-tgw-attachment"),
+        )
+        count += 1 + len(subnets) + 1 + 1 + 1
+    return count
+
+
+def run(environments: int = 5, calls: int = 10) -> Dict[str, Any]:
+    """
+    Create ``environments`` cp/env deployments and discover the first one ``calls`` times.
+
+    Returns:
+        Resources created and found, and milliseconds per discovery call
+        (or ``{"skipped": reason}`` without moto)
+    """
+    try:
+        from moto import mock_aws
+    except ImportError:
+        return {"skipped": "moto is not installed"}
+
+    from app.api import aws as aws_api
+    from app.services import aws_sdk
+
+    # moto intercepts requests, but botocore still needs credentials to sign them
+    for key, value in {
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_SESSION_TOKEN": "testing",
+        "AWS_DEFAULT_REGION": REGION,
+    }.items():
+        os.environ.setdefault(key, value)
+
+    with mock_aws():
+        ec2 = aws_sdk.boto3.client("ec2", region_name=REGION)
+        created = sum(populate(ec2, "bench", f"env{i}", i) for i in range(environments))
+
+        result = asyncio.run(aws_api.find_fortinet_resources(REGION, "bench", "env0"))
+        timings = []
+        for _ in range(calls):
+            started = time.perf_counter()
+            asyncio.run(aws_api.find_fortinet_resources(REGION, "bench", "env0"))
+            timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    return {
+        "environments": environments,
+        "resources_created": created,
+        "resources_found": result["total_resources"],
+        "discover_ms": round(timings[len(timings) // 2] * 1000, 1),
+        "discover_ms_min": round(timings[0] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--environments", type=int, default=5, help="cp/env deployments to create")
+    parser.add_argument("--calls", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args.environments, args.calls), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark drift detection between state inventories and a live snapshot.
+
+Builds synthetic state inventories for two templates (route tables in the
+first, extra routes for them in the second) and a live inventory with a
+known number of deleted, added and modified resources, then times
+``detect_drift`` and checks that it reports exactly those.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_drift [--resources 20000] [--drift 0.01]
+"""
+import argparse
+import copy
+import json
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.services.diagram import INVENTORY_KEYS
+from app.services.drift import detect_drift
+
+PREFIX = "acme-test"
+
+
+def _entry(kind: str, index: int, rng: random.Random) -> dict:
+    entry = {
+        "id": f"{kind[:4]}-{index:017x}",
+        "fortinet_role": f"{PREFIX}-{kind}-{index}",
+        "name": f"{kind}-{index}",
+    }
+    if kind in ("vpcs", "subnets"):
+        entry["cidr_block"] = f"10.{index % 256}.{rng.randrange(256)}.0/24"
+    if kind in ("subnets", "internet_gateways", "tgw_attachments", "route_tables"):
+        entry["vpc_id"] = f"vpc-{rng.getrandbits(68):017x}"
+    if kind in ("tgw_attachments", "tgw_route_tables"):
+        entry["transit_gateway_id"] = f"tgw-{rng.getrandbits(68):017x}"
+    if kind == "route_tables":
+        entry["routes"] = [
+            {"destination": f"10.{rng.randrange(256)}.0.0/16", "target": f"tgw-{rng.getrandbits(32):08x}"}
+            for _ in range(3)
+        ]
+    return entry
+
+
+def inventories(resources: int, drift: float, seed: int = 0) -> Tuple[Dict[str, Any], Dict[str, List[dict]], int]:
+    """
+    Synthetic states, a live inventory with drift, and how many resources were deleted, added and edited (each).
+
+    Returns:
+        Tuple of (template -> state inventory, live inventory, drift count)
+    """
+    rng = random.Random(seed)
+    base: Dict[str, List[dict]] = {kind: [] for kind in INVENTORY_KEYS}
+    for index in range(resources):
+        kind = INVENTORY_KEYS[index % len(INVENTORY_KEYS)]
+        base[kind].append(_entry(kind, index, rng))
+
+    # A second template adds one route to every route table of the first
+    added_routes = {
+        "route_tables": [
+            {"id": table["id"], "routes": [{"destination": "0.0.0.0/0", "target": "vpce-0123456789abcdef0"}]}
+            for table in base["route_tables"]
+        ]
+    }
+    live = copy.deepcopy(base)
+    for table in live["route_tables"]:
+        table["routes"] = sorted(
+            table["routes"] + added_routes["route_tables"][0]["routes"],
+            key=lambda r: (r["destination"], r["target"])
+        )
+
+    drifted = max(1, int(resources * drift))
+    entries = [entry for kind in INVENTORY_KEYS for entry in live[kind]]
+    rng.shuffle(entries)
+    deleted = {entry["id"] for entry in entries[:drifted]}
+    for entry in entries[drifted:2 * drifted]:
+        entry["name"] = f"{entry['name']}-edited"
+    for kind in INVENTORY_KEYS:
+        live[kind] = [entry for entry in live[kind] if entry["id"] not in deleted]
+    for index in range(drifted):
+        kind = INVENTORY_KEYS[index % len(INVENTORY_KEYS)]
+        live[kind].append(_entry(kind, resources + index, rng))
+
+    return {"existing_vpc_resources": base, "autoscale_template": added_routes}, live, drifted
+
+
+def run(resources: int = 20_000, drift: float = 0.01, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Time ``detect_drift`` over ``resources`` state resources.
+
+    Returns:
+        Best time in ms and the reported summary
+    """
+    states, live, drifted = inventories(resources, drift)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        report = detect_drift(states, live, PREFIX)
+        best = min(best, time.perf_counter() - started)
+
+    summary = report["summary"]
+    assert (summary["missing"], summary["extra"], summary["modified"]) == (drifted, drifted, drifted), summary
+    return {
+        "resources": resources,
+        "drifted_each": drifted,
+        "summary": summary,
+        "detect_ms": round(best * 1000, 2),
+        "us_per_resource": round(best * 1e6 / resources, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=20_000)
+    parser.add_argument("--drift", type=float, default=0.01, help="Fraction deleted, added and modified")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.resources, args.drift, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
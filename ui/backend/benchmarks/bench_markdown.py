@@ -0,0 +1,101 @@
+"""Benchmark convert_to_markdown on large synthetic verify_all.sh logs.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_markdown [--rows 100] [--checks 5000]
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict
+
+from app.api.terraform import convert_to_markdown
+
+RULE = "=" * 72
+GREEN, RED, NC = "\x1b[0;32m", "\x1b[0;31m", "\x1b[0m"
+VPC_SECTIONS = ["TRANSIT GATEWAY", "MANAGEMENT VPC", "INSPECTION VPC", "EAST SPOKE VPC", "WEST SPOKE VPC"]
+
+
+def _section(title: str, body: str) -> str:
+    return f"\n{RULE}\n{title}\n{RULE}\n{body}\n"
+
+
+def synthetic_log(rows: int, checks: int, seed: int = 0) -> str:
+    """
+    A verify_all.sh log shaped like verify_summary.sh output.
+
+    Args:
+        rows: Rows in the default route and public IP tables
+        checks: Per-resource check lines (about 1% [FAILED]) before the summary
+    """
+    rng = random.Random(seed)
+    parts = []
+    failed = 0
+    for index in range(checks):
+        if rng.random() < 0.01:
+            failed += 1
+            parts.append(f"Testing FortiGate {index} (10.0.{index % 256}.1)... {RED}[FAILED]{NC} UNREACHABLE")
+        else:
+            parts.append(f"Checking resource acme-test-{index}... {GREEN}[PASS]{NC}")
+    attachments = [f"tgw-attach-{rng.getrandbits(48):012x}" for _ in range(8)]
+    for name, attachment in zip(["inspection", "management", "east", "west"], attachments):
+        parts.append(f"acme-test-{name}-tgw-attachment: {attachment}")
+
+    summary = f"Scripts Run:    8\nScripts Passed: {8 - min(failed, 8)}\nScripts Failed: {min(failed, 8)}\n"
+    summary += f"\n{RED}SOME VERIFICATIONS FAILED{NC}\n" if failed else f"\n{GREEN}ALL VERIFICATIONS PASSED{NC}\n"
+    parts.append(_section("OVERALL VERIFICATION SUMMARY", summary))
+
+    routes = [f"{'ROUTE TABLE':<50} {'ROUTE TABLE ID':<25} {'TARGET':<25}", f"{'-----------':<50} {'---------------':<25} {'------':<25}"]
+    for index in range(rows):
+        target = rng.choice(attachments + ["igw-0a1b2c3d", "No default route"])
+        routes.append(f"{'VPC ' + str(index) + ' Public':<50} {'rtb-%08x' % index:<25} {target:<25}")
+    parts.append(_section("ALL DEFAULT ROUTES (0.0.0.0/0)", "\n".join(routes)))
+
+    ips = [f"{'INSTANCE NAME':<50} {'INSTANCE ID':<20} {'PRIVATE IP':<15} {'PUBLIC IP':<15}", f"{'-------------':<50} {'-----------':<20} {'----------':<15} {'---------':<15}"]
+    for index in range(rows):
+        ips.append(
+            f"{'acme-test-fgt-' + str(index):<50} {'i-%017x' % index:<20} "
+            f"{'10.0.%d.%d' % (index // 256 % 256, index % 256):<15} {'203.0.%d.%d' % (index // 256 % 256, index % 256):<15}"
+        )
+    parts.append(_section("ALL PUBLIC IP ADDRESSES", "\n".join(ips)))
+
+    for title in VPC_SECTIONS:
+        body = "\n".join(f"{title.title()} resource {i}: ok" for i in range(max(1, rows // 10)))
+        parts.append(_section(title, body))
+    return "\n".join(parts)
+
+
+def run(rows: int = 100, checks: int = 5000, repeat: int = 3) -> Dict[str, float]:
+    """
+    Convert a synthetic log ``repeat`` times.
+
+    Returns:
+        Log size and best milliseconds per conversion
+    """
+    log = synthetic_log(rows, checks)
+    best = float("inf")
+    markdown = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        markdown = convert_to_markdown(log)
+        best = min(best, time.perf_counter() - started)
+    assert "## Default Routes" in markdown and "## Public IP Addresses" in markdown
+    return {
+        "log_lines": log.count("\n") + 1,
+        "log_kb": round(len(log) / 1024, 1),
+        "markdown_kb": round(len(markdown) / 1024, 1),
+        "convert_ms": round(best * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100, help="Rows per summary table")
+    parser.add_argument("--checks", type=int, default=5000, help="Check lines before the summary")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.checks, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark TFVarsParser.parse on the shipped and a synthetic template.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_parser [--iterations 50] [--fields 2000]
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from app.parsers.tfvars_parser import TFVarsParser
+
+TERRAFORM_DIR = Path(__file__).resolve().parents[3] / "terraform"
+TEMPLATES = ["existing_vpc_resources", "autoscale_template", "ha_pair"]
+SEPARATOR = "#" + "=" * 100
+
+
+def synthetic_template(fields: int, per_group: int = 20) -> str:
+    """A tfvars.example with ``fields`` annotated fields of every common type."""
+    lines = []
+    for index in range(fields):
+        if index % per_group == 0:
+            group = index // per_group
+            lines += [
+                SEPARATOR, f"# GROUP {group}", SEPARATOR,
+                f"# @ui-group: Group {group}",
+                f"# @ui-order: {group + 1}",
+                f"# @ui-description: Synthetic group {group}",
+                f"# @ui-show-if: enable_group_{group} == true" if group % 3 == 0 else "",
+                "",
+            ]
+        kind = ("text", "number", "checkbox", "select", "cidr")[index % 5]
+        lines += [
+            f"# @ui-type: {kind}",
+            f"# @ui-label: Field {index}",
+            f"# @ui-description: Synthetic field {index}",
+            "# @ui-required: true",
+            "# @ui-width: half",
+        ]
+        if kind == "text":
+            value = f'"value-{index}"'
+            lines.append("# @ui-validation: min-length:2,max-length:40")
+        elif kind == "number":
+            value = str(index)
+            lines.append("# @ui-validation: min:0,max:100000")
+        elif kind == "checkbox":
+            value = "true"
+        elif kind == "select":
+            value = '"b"'
+            lines.append("# @ui-options: a|Option A,b|Option B,c|Option C")
+        else:
+            value = f'"10.{index // 256 % 256}.{index % 256}.0/24"'
+            lines.append("# @ui-validation: cidr")
+        if index % 7 == 0:
+            lines.append(f"# @ui-hide-if: field_{index - 1} == false")
+        lines += [f"field_{index} = {value}", ""]
+    return "\n".join(lines) + "\n"
+
+
+def _best_ms(function: Callable[[], object], iterations: int) -> float:
+    best = float("inf")
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run(iterations: int = 50, fields: int = 2000) -> Dict[str, float]:
+    """
+    Parse each shipped template and a synthetic one ``iterations`` times.
+
+    Returns:
+        Best milliseconds per parse for each template, their sum and the
+        synthetic template
+    """
+    # The shipped templates have fields without @ui-type, which log a warning per parse
+    logging.getLogger("app.parsers.tfvars_parser").setLevel(logging.ERROR)
+
+    result: Dict[str, float] = {}
+    for template in TEMPLATES:
+        path = TERRAFORM_DIR / template / "terraform.tfvars.example"
+        result[f"{template}_ms"] = round(_best_ms(lambda: TFVarsParser(path).parse(), iterations), 3)
+    result["shipped_ms"] = round(sum(result[f"{t}_ms"] for t in TEMPLATES), 3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "terraform.tfvars.example"
+        path.write_text(synthetic_template(fields))
+        parsed = TFVarsParser(path).parse()
+        assert parsed["metadata"]["total_fields"] == fields, parsed["metadata"]
+        synthetic_ms = _best_ms(lambda: TFVarsParser(path).parse(), max(3, iterations // 10))
+
+    result["synthetic_fields"] = fields
+    result["synthetic_ms"] = round(synthetic_ms, 3)
+    result["synthetic_us_per_field"] = round(synthetic_ms * 1000 / fields, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--fields", type=int, default=2000, help="Fields in the synthetic template")
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations, args.fields), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark plan summaries: incremental parsing vs loading the whole document.
+
+Builds a synthetic ``terraform show -json`` document with ``changes``
+resource changes (before/after values included) followed by a large
+``prior_state``, then summarizes it with ``iter_array_items`` (as the plan
+summary endpoint does) and with ``json.loads`` of the whole document, and
+reports time and peak Python memory of each. The incremental parse stops
+at the end of ``resource_changes``, as the endpoint does.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_plan_summary [--changes 20000] [--state-mb 50]
+"""
+import argparse
+import io
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+from app.services.plan_summary import compact_change, iter_array_items, summarize_changes
+
+ACTIONS = (["create"], ["update"], ["delete", "create"], ["delete"], ["no-op"], ["read"])
+
+
+def plan_document(changes: int, state_mb: int) -> bytes:
+    """A show -json document: variables, resource_changes, then prior_state of ``state_mb`` MB."""
+    parts = []
+    for index in range(changes):
+        actions = ACTIONS[index % len(ACTIONS)]
+        parts.append(json.dumps({
+            "address": f"module.fgt.aws_instance.this[{index}]",
+            "module_address": "module.fgt",
+            "mode": "managed",
+            "type": ("aws_instance", "aws_subnet", "aws_route")[index % 3],
+            "name": "this",
+            "change": {
+                "actions": actions,
+                "before": {"tags": {"Name": f"fgt-{index}", "Fortinet-Role": "acme-test-fgt"}, "user_data": "x" * 400},
+                "after": {"tags": {"Name": f"fgt-{index}-new"}, "user_data": "y" * 400},
+                "replace_paths": [["ami"]] if len(actions) == 2 else None,
+            },
+        }))
+    state = json.dumps({"values": {"root_module": {"resources": ["s" * 1000] * (state_mb * 1000)}}})
+    return (
+        '{"format_version":"1.2","variables":{"cp":{"value":"acme"}},"resource_changes":['
+        + ",".join(parts) + '],"prior_state":' + state + "}"
+    ).encode()
+
+
+def _measure(function: Callable[[], Any]) -> Tuple[Any, float, float]:
+    """Result, seconds and peak traced bytes (timed separately: tracing slows allocation)."""
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(changes: int = 20_000, state_mb: int = 50) -> Dict[str, Any]:
+    """
+    Summarize the same document incrementally and with a full load.
+
+    Returns:
+        Document size, milliseconds and peak MB for each approach
+    """
+    document = plan_document(changes, state_mb)
+
+    incremental, incremental_s, incremental_peak = _measure(lambda: summarize_changes(
+        compact_change(change) for change in iter_array_items(io.BytesIO(document), "resource_changes")
+    ))
+    full, full_s, full_peak = _measure(lambda: summarize_changes(json.loads(document)["resource_changes"]))
+
+    assert incremental == full, "summaries differ"
+    return {
+        "document_mb": round(len(document) / 1e6, 1),
+        "changes": changes,
+        "incremental_ms": round(incremental_s * 1000, 1),
+        "incremental_peak_mb": round(incremental_peak / 1e6, 1),
+        "full_load_ms": round(full_s * 1000, 1),
+        "full_load_peak_mb": round(full_peak / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--changes", type=int, default=20_000)
+    parser.add_argument("--state-mb", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.changes, args.state_mb), indent=2))
+
+
+if __name__ == "__main__":
+    main()
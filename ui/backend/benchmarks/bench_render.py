@@ -0,0 +1,58 @@
+"""Benchmark terraform.tfvars generation (computed fields + render_tfvars).
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_render [--configs 2000]
+"""
+import argparse
+import json
+import logging
+import random
+import time
+from typing import Dict
+
+from app.services.schema_registry import schema_registry
+from app.services.tfvars_renderer import render_tfvars, required_variables
+from benchmarks.bench_conditions import TEMPLATES, TERRAFORM_DIR, random_configs
+
+
+def run(configs: int = 2000, seed: int = 0) -> Dict[str, float]:
+    """
+    Generate tfvars for ``configs`` random configs per template.
+
+    Returns:
+        Microseconds per generated file, per template and overall
+    """
+    logging.getLogger("app.services.tfvars_renderer").setLevel(logging.WARNING)
+    rng = random.Random(seed)
+    result: Dict[str, float] = {}
+    total_us = 0.0
+    for template in TEMPLATES:
+        compiled = schema_registry.get_template(TERRAFORM_DIR, template)
+        required = required_variables(TERRAFORM_DIR / template)
+        samples = random_configs(compiled, configs, rng)
+
+        started = time.perf_counter()
+        size = 0
+        for config in samples:
+            filled, _ = compiled.with_computed(config)
+            size += len(render_tfvars(template, compiled, filled, required))
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        result[f"{template}_us"] = round(elapsed_us / configs, 2)
+        result[f"{template}_avg_bytes"] = size // configs
+        total_us += elapsed_us
+
+    result["configs"] = configs * len(TEMPLATES)
+    result["us_per_render"] = round(total_us / (configs * len(TEMPLATES)), 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", type=int, default=2000, help="Configs per template")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.configs, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
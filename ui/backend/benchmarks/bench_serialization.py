@@ -0,0 +1,141 @@
+"""Benchmark JSON serialization and compression of large endpoint payloads.
+
+For each payload this compares FastAPI's default path for a returned dict
+(``jsonable_encoder`` + ``JSONResponse``) with ``FastJSONResponse`` using
+orjson (when installed) and its stdlib fallback, and reports gzip/brotli sizes and
+times at the levels ``CompressionMiddleware`` uses by default.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_serialization [--configs 500] [--resources 200]
+"""
+import argparse
+import gzip
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import responses
+from app.middleware import brotli
+from app.responses import FastJSONResponse
+from app.services.schema_registry import schema_registry
+from app.services.validation import validate_config
+from benchmarks.bench_conditions import TEMPLATES, TERRAFORM_DIR, random_configs
+
+
+def _best_ms(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+
+def _stdlib_ms(content: Any, repeat: int) -> float:
+    """Time FastJSONResponse with its stdlib fallback (as without orjson)."""
+    saved, responses.orjson = responses.orjson, None
+    try:
+        return _best_ms(lambda: FastJSONResponse(content), repeat)
+    finally:
+        responses.orjson = saved
+
+
+def discovery_payload(resources: int, seed: int = 0) -> Dict[str, Any]:
+    """A /resources/by-fortinet-role response with about ``resources`` entries."""
+    rng = random.Random(seed)
+    prefix = "acme-test"
+    kinds = ["vpcs", "subnets", "internet_gateways", "transit_gateways",
+             "tgw_attachments", "tgw_route_tables", "route_tables"]
+    discovered: Dict[str, list] = {kind: [] for kind in kinds}
+    for index in range(resources):
+        kind = kinds[index % len(kinds)]
+        role = f"{prefix}-{rng.choice(['inspection', 'management', 'east', 'west'])}-{kind}-{index}"
+        discovered[kind].append({
+            "id": f"{kind[:4]}-{rng.getrandbits(68):017x}",
+            "fortinet_role": role,
+            "name": role,
+            "cidr_block": f"10.{index % 256}.{rng.randrange(256)}.0/24",
+            "vpc_id": f"vpc-{rng.getrandbits(68):017x}",
+        })
+    return {"prefix": prefix, "region": "us-west-2", "total_resources": resources, "resources": discovered}
+
+
+def payloads(configs: int, resources: int, seed: int = 0) -> Dict[str, Any]:
+    """Representative response bodies, keyed by endpoint."""
+    rng = random.Random(seed)
+    result: Dict[str, Any] = {}
+    for template in TEMPLATES:
+        result[f"schema:{template}"] = schema_registry.get(
+            TERRAFORM_DIR / template / "terraform.tfvars.example"
+        ).schema
+
+    compiled = schema_registry.get_template(TERRAFORM_DIR, "autoscale_template")
+    config = random_configs(compiled, 1, rng)[0]
+    result["config/load"] = {
+        "success": True, "message": "Configuration loaded successfully", "config": config,
+        "inherited_fields": {name: "existing_vpc_resources" for name in list(config)[:20]}, "revision": 12,
+    }
+
+    samples = random_configs(compiled, configs, rng)
+    results = [
+        {**validate_config("autoscale_template", compiled, sample), "index": index, "template": "autoscale_template"}
+        for index, sample in enumerate(samples)
+    ]
+    result["config/validate-batch"] = {
+        "valid": all(r["valid"] for r in results), "count": len(results),
+        "invalid": sum(not r["valid"] for r in results), "results": results, "elapsed_ms": 0.0,
+    }
+    result["resources/by-fortinet-role"] = discovery_payload(resources, seed)
+    return result
+
+
+def run(configs: int = 500, resources: int = 200, repeat: int = 20) -> Dict[str, Any]:
+    """
+    Serialize and compress each payload ``repeat`` times.
+
+    Returns:
+        Per payload: bytes, best ms for the default path, FastJSONResponse
+        and its stdlib fallback, and compressed sizes/times; plus totals
+    """
+    logging.getLogger("app.parsers.tfvars_parser").setLevel(logging.ERROR)
+    result: Dict[str, Any] = {"orjson": responses.orjson is not None}
+    totals = {"default_ms": 0.0, "fast_ms": 0.0, "stdlib_ms": 0.0}
+    for name, content in payloads(configs, resources).items():
+        body = FastJSONResponse(content).body
+        assert json.loads(body) == json.loads(JSONResponse(jsonable_encoder(content)).body)
+        entry = {
+            "bytes": len(body),
+            "default_ms": _best_ms(lambda: JSONResponse(jsonable_encoder(content)), repeat),
+            "fast_ms": _best_ms(lambda: FastJSONResponse(content), repeat),
+            "stdlib_ms": _stdlib_ms(content, repeat),
+            "gzip_bytes": len(gzip.compress(body, compresslevel=6, mtime=0)),
+            "gzip_ms": _best_ms(lambda: gzip.compress(body, compresslevel=6, mtime=0), repeat),
+        }
+        if brotli is not None:
+            entry["br_bytes"] = len(brotli.compress(body, quality=4))
+            entry["br_ms"] = _best_ms(lambda: brotli.compress(body, quality=4), repeat)
+        for key in totals:
+            totals[key] += entry[key]
+        result[name] = entry
+
+    result.update({key: round(value, 3) for key, value in totals.items()})
+    result["speedup"] = round(totals["default_ms"] / totals["fast_ms"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", type=int, default=500, help="Results in the validate-batch payload")
+    parser.add_argument("--resources", type=int, default=200, help="Resources in the discovery payload")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.configs, args.resources, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
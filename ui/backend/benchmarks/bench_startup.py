@@ -0,0 +1,111 @@
+"""Measure backend cold-start import time with ``python -X importtime``.
+
+Imports ``app.main`` in fresh interpreters and fails (exit code 1) if the
+median import time exceeds the budget or if a module that should load
+lazily (boto3, botocore, requests) is imported at startup.
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_startup [--runs 5] [--budget-ms 500]
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from app.services.aws_sdk import HEAVY_MODULES
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_BUDGET_MS = 500.0
+
+# "import time:  self [us] | cumulative | imported package", indented 2 per level
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(module: str = "app.main") -> Tuple[List[Tuple[str, int, int]], float]:
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns:
+        ([(name, cumulative_us, depth)] in ``-X importtime`` order, process wall time in ms)
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            entries.append((match.group(4), int(match.group(2)), len(match.group(3)) // 2))
+    return entries, wall_ms
+
+
+def direct_imports(entries: List[Tuple[str, int, int]], module: str) -> List[Tuple[str, int]]:
+    """Modules first imported by top-level ``module`` (listed before it, one level deeper)."""
+    children: List[Tuple[str, int]] = []
+    for name, cumulative, depth in entries:
+        if depth == 0:
+            if name == module:
+                return children
+            children = []
+        elif depth == 1:
+            children.append((name, cumulative))
+    return []
+
+
+def run(runs: int = 5, budget_ms: float = DEFAULT_BUDGET_MS, top: int = 8) -> Dict[str, Any]:
+    """
+    Import ``app.main`` ``runs`` times (after one warm-up run that writes .pyc files).
+
+    Returns:
+        Median import and process times, the slowest direct imports of
+        app.main, heavy modules found and whether the budget was met
+    """
+    import_times()  # bytecode cache
+    samples: List[float] = []
+    walls: List[float] = []
+    entries: List[Tuple[str, int, int]] = []
+    for _ in range(runs):
+        entries, wall_ms = import_times()
+        samples.append(next(us for name, us, depth in entries if name == "app.main" and depth == 0) / 1000)
+        walls.append(wall_ms)
+
+    heavy = sorted(name for name, _, _ in entries if name.split(".")[0] in HEAVY_MODULES)
+    children = sorted(direct_imports(entries, "app.main"), key=lambda item: -item[1])
+    import_ms = statistics.median(samples)
+    return {
+        "runs": runs,
+        "import_ms": round(import_ms, 1),
+        "import_ms_min": round(min(samples), 1),
+        "process_ms": round(statistics.median(walls), 1),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in children[:top]},
+        "heavy_modules": heavy,
+        "budget_ms": budget_ms,
+        "within_budget": import_ms <= budget_ms and not heavy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Median import time budget")
+    args = parser.parse_args()
+    result = run(args.runs, args.budget_ms)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["within_budget"] else 1)
+
+
+if __name__ == "__main__":
+    main()
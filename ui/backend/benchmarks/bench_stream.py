@@ -0,0 +1,66 @@
+"""Benchmark run_command_stream throughput (build output streaming).
+
+Usage (from ui/backend):
+    python -m benchmarks.bench_stream [--lines 200000] [--width 120]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+from app.api.terraform import run_command_stream
+
+
+async def _consume(lines: int, width: int) -> Dict[str, float]:
+    command = [
+        sys.executable, "-c",
+        f"import sys\nline = 'x' * {width} + '\\n'\nsys.stdout.writelines(line for _ in range({lines}))",
+    ]
+    received = 0
+    size = 0
+    exit_code = None
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        async for line, code in run_command_stream(command, Path(tmp)):
+            if code is None:
+                received += 1
+                size += len(line)
+            else:
+                exit_code = code
+    elapsed = time.perf_counter() - started
+    assert exit_code == 0 and received == lines, (exit_code, received)
+    return {"elapsed": elapsed, "size": size}
+
+
+def run(lines: int = 200_000, width: int = 120) -> Dict[str, float]:
+    """
+    Stream ``lines`` lines of ``width`` characters from a child process.
+
+    Returns:
+        Total milliseconds, lines per second and MB per second
+    """
+    measured = asyncio.run(_consume(lines, width))
+    elapsed = measured["elapsed"]
+    return {
+        "lines": lines,
+        "stream_ms": round(elapsed * 1000, 1),
+        "us_per_line": round(elapsed * 1e6 / lines, 3),
+        "lines_per_s": round(lines / elapsed),
+        "mb_per_s": round(measured["size"] / elapsed / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--width", type=int, default=120)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines, args.width), indent=2))
+
+
+if __name__ == "__main__":
+    main()
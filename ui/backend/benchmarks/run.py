@@ -0,0 +1,204 @@
+"""Run the benchmark suite and compare it against a stored baseline.
+
+Each benchmark's ``run()`` is called with the parameters below in a fresh
+interpreter (so benchmarks don't warm or disturb each other), ``--repeat``
+times, keeping the best value of each timing metric (lower is better).
+These are compared with ``baseline.json``. The run fails (exit code 1) if
+any metric is slower than the baseline by more than the threshold.
+Baselines are machine-specific, so record one on the machine that runs the
+comparison.
+
+Usage (from ui/backend):
+    python -m benchmarks.run --update-baseline          # record a baseline
+    python -m benchmarks.run [--threshold 0.25]         # compare with it
+    python -m benchmarks.run --only parser,render --repeat 5
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 3
+
+# Timings below this are dominated by noise; regressions on them are reported but don't fail
+NOISE_FLOOR = {"ms": 1.0, "us": 1.0}
+
+
+class Benchmark(NamedTuple):
+    module: str
+    kwargs: Dict[str, Any]
+    metrics: Tuple[str, ...]  # timing keys of run()'s result, lower is better
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "parser": Benchmark("benchmarks.bench_parser", {"iterations": 30, "fields": 2000},
+                        ("shipped_ms", "synthetic_ms")),
+    "render": Benchmark("benchmarks.bench_render", {"configs": 1000}, ("us_per_render",)),
+    "markdown": Benchmark("benchmarks.bench_markdown", {"rows": 100, "checks": 5000}, ("convert_ms",)),
+    "serialization": Benchmark("benchmarks.bench_serialization", {"configs": 500, "resources": 200},
+                               ("fast_ms", "stdlib_ms")),
+    "stream": Benchmark("benchmarks.bench_stream", {"lines": 200_000}, ("us_per_line",)),
+    "discovery": Benchmark("benchmarks.bench_discovery", {"environments": 5, "calls": 10}, ("discover_ms",)),
+    "conditions": Benchmark("benchmarks.bench_conditions", {"configs": 5000}, ("compiled_us_per_config",)),
+    "drift": Benchmark("benchmarks.bench_drift", {"resources": 20_000}, ("detect_ms",)),
+    "build_history": Benchmark("benchmarks.bench_build_history", {"resources": 500, "builds": 200},
+                               ("us_per_line", "record_step_ms", "slowest_ms")),
+    "plan_summary": Benchmark("benchmarks.bench_plan_summary", {"changes": 20_000, "state_mb": 50},
+                              ("incremental_ms",)),
+    "cidr_index": Benchmark("benchmarks.bench_cidr_index", {"size": 50_000, "queries": 5000},
+                            ("build_ms", "overlapping_us", "first_free_us")),
+    "startup": Benchmark("benchmarks.bench_startup", {"runs": 5}, ("import_ms",)),
+}
+
+
+def run_isolated(benchmark: Benchmark) -> Dict[str, Any]:
+    """Call a benchmark's ``run()`` in a new interpreter and return its result."""
+    script = (
+        "import json, sys\n"
+        f"from {benchmark.module} import run\n"
+        f"result = run(**{benchmark.kwargs!r})\n"
+        "sys.stdout.write('\\n' + json.dumps(result) + '\\n')\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{benchmark.module} failed:\n{completed.stderr[-3000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(names: List[str], repeat: int = DEFAULT_REPEAT) -> Dict[str, Dict[str, Any]]:
+    """Run the named benchmarks; returns each one's result with the best of each timing metric."""
+    results = {}
+    for name in names:
+        benchmark = BENCHMARKS[name]
+        started = time.perf_counter()
+        print(f"[{name}] running {repeat}x...", file=sys.stderr, flush=True)
+        best: Dict[str, Any] = {}
+        for _ in range(repeat):
+            result = run_isolated(benchmark)
+            if "skipped" in result:
+                best = result
+                break
+            for key, value in result.items():
+                if key in benchmark.metrics and key in best:
+                    best[key] = min(best[key], value)
+                else:
+                    best.setdefault(key, value)
+        best["wall_s"] = round(time.perf_counter() - started, 2)
+        results[name] = best
+    return results
+
+
+def _unit_floor(metric: str) -> float:
+    return next((floor for unit, floor in NOISE_FLOOR.items() if metric.endswith(unit)), 0.0)
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Compare timing metrics with the baseline.
+
+    Returns:
+        (rows of name/metric/baseline/current/change/status, True if any regression fails the run)
+    """
+    rows = []
+    failed = False
+    for name, result in results.items():
+        if "skipped" in result:
+            rows.append({"benchmark": name, "metric": "-", "status": f"skipped: {result['skipped']}"})
+            continue
+        for metric in BENCHMARKS[name].metrics:
+            current = result.get(metric)
+            previous = baseline.get(name, {}).get(metric)
+            row = {"benchmark": name, "metric": metric, "baseline": previous, "current": current}
+            if previous is None or current is None or previous <= 0:
+                row["status"] = "new"
+            else:
+                change = current / previous - 1
+                row["change"] = f"{change:+.1%}"
+                if change > threshold:
+                    noisy = max(current, previous) < _unit_floor(metric)
+                    row["status"] = "regression (below noise floor)" if noisy else "REGRESSION"
+                    failed = failed or not noisy
+                elif change < -threshold:
+                    row["status"] = "improved"
+                else:
+                    row["status"] = "ok"
+            rows.append(row)
+    return rows, failed
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: Dict[str, Dict[str, Any]], previous: Optional[Dict[str, Any]]) -> None:
+    """Write results as the baseline, keeping entries of benchmarks not run this time."""
+    merged = dict((previous or {}).get("results", {}))
+    merged.update({name: result for name, result in results.items() if "skipped" not in result})
+    document = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.node()}",
+        "results": merged,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per benchmark (best is kept)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Save results as the baseline")
+    parser.add_argument("--json", action="store_true", help="Print full results as JSON")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    results = run_benchmarks(names, args.repeat)
+    baseline = load_baseline(args.baseline)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results, baseline)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --update-baseline first", file=sys.stderr)
+        sys.exit(2)
+
+    rows, failed = compare(results, baseline.get("results", {}), args.threshold)
+    print(f"Baseline: {baseline.get('created')} ({baseline.get('machine')}), threshold {args.threshold:.0%}")
+    for row in rows:
+        print(
+            f"{row['benchmark']:<12} {row['metric']:<24} {str(row.get('baseline', '')):>10} -> "
+            f"{str(row.get('current', '')):>10} {row.get('change', ''):>8}  {row['status']}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Saved configurations: JSON Patch, revisions and history (see app/services/config_store.py)."""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.api.terraform as terraform_api
+from app.main import app
+from app.services.config_store import (
+    SNAPSHOT_INTERVAL,
+    ConfigPatchError,
+    ConfigStore,
+    apply_json_patch,
+    make_json_patch,
+)
+
+TEMPLATE = "ha_pair"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(terraform_api, "get_terraform_dir", lambda: tmp_path)
+    return TestClient(app)
+
+
+def save(client, config, revision=None):
+    body = {"template": TEMPLATE, "config": config, "revision": revision}
+    return client.post("/api/terraform/config/save", json=body)
+
+
+def patch(client, operations, revision=None):
+    params = {"template": TEMPLATE}
+    if revision is not None:
+        params["revision"] = revision
+    return client.patch("/api/terraform/config", params=params, json=operations)
+
+
+def saved_config(tmp_path):
+    return json.loads((tmp_path / TEMPLATE / "ui_config.json").read_text())
+
+
+def test_stale_revision_conflicts(client):
+    assert save(client, {"cp": "acme"}).json()["revision"] == 1
+    assert save(client, {"cp": "acme", "env": "test"}, revision=1).json()["revision"] == 2
+
+    response = patch(client, [{"op": "replace", "path": "/cp", "value": "other"}], revision=1)
+    assert response.status_code == 409
+    assert save(client, {"cp": "other"}, revision=1).status_code == 409
+
+    response = patch(client, [{"op": "replace", "path": "/cp", "value": "other"}], revision=2)
+    assert response.status_code == 200
+    assert response.json()["revision"] == 3
+
+
+def test_patch_operations(client, tmp_path):
+    save(client, {"cp": "acme", "zones": ["a", "b", "c"], "fgt": {"size": "c5.xlarge"}})
+    response = patch(client, [
+        {"op": "test", "path": "/cp", "value": "acme"},
+        {"op": "add", "path": "/env", "value": "prod"},
+        {"op": "add", "path": "/zones/-", "value": "d"},
+        {"op": "remove", "path": "/zones/0"},
+        {"op": "copy", "from": "/fgt/size", "path": "/fgt/previous_size"},
+        {"op": "move", "from": "/fgt/size", "path": "/size"},
+    ])
+    assert response.status_code == 200, response.text
+    assert response.json()["changed"] is True
+    assert saved_config(tmp_path) == {
+        "cp": "acme",
+        "zones": ["b", "c", "d"],
+        "fgt": {"previous_size": "c5.xlarge"},
+        "env": "prod",
+        "size": "c5.xlarge",
+    }
+
+
+@pytest.mark.parametrize("operations", [
+    [{"op": "replace", "path": "/zones/9", "value": "x"}],
+    [{"op": "remove", "path": "/zones/x"}],
+    [{"op": "add", "path": "/zones/4", "value": "x"}],
+    [{"op": "test", "path": "/cp", "value": "other"}],
+    [{"op": "move", "path": "/size"}],
+])
+def test_invalid_patch_is_rejected(client, tmp_path, operations):
+    save(client, {"cp": "acme", "zones": ["a", "b"]})
+    response = patch(client, operations)
+    assert response.status_code == 422
+    assert saved_config(tmp_path) == {"cp": "acme", "zones": ["a", "b"]}
+
+
+def test_history_across_snapshot_boundary(tmp_path):
+    store = ConfigStore(tmp_path)
+    versions = {}
+    for revision in range(1, SNAPSHOT_INTERVAL + 6):
+        config = {"cp": "acme", "count": revision, "zones": ["a"] * (revision % 3 + 1)}
+        if revision % 2:
+            config["odd"] = True
+        assert store.save(config)["revision"] == revision
+        versions[revision] = config
+
+    entries = {entry["rev"]: entry for entry in store._read_history()}
+    assert "snapshot" in entries[SNAPSHOT_INTERVAL + 1]
+    assert "patch" in entries[SNAPSHOT_INTERVAL]
+
+    for revision, config in versions.items():
+        assert store.get_revision(revision) == config
+    before, after = SNAPSHOT_INTERVAL - 2, SNAPSHOT_INTERVAL + 3
+    assert store.diff(before, after) == make_json_patch(versions[before], versions[after])
+    assert store.history(limit=1)[0]["changed_paths"] == ["/count", "/zones", "/odd"]
+
+    with pytest.raises(KeyError):
+        store.get_revision(SNAPSHOT_INTERVAL + 6)
+
+
+def test_replace_keeps_key_order(tmp_path):
+    document = {"a": 1, "b": {"x": 1, "y": 2}, "c": 3}
+    patched = apply_json_patch(document, [
+        {"op": "replace", "path": "/b/x", "value": 9},
+        {"op": "replace", "path": "/a", "value": 0},
+    ])
+    assert list(patched) == ["a", "b", "c"]
+    assert list(patched["b"]) == ["x", "y"]
+    assert document["a"] == 1  # the input is not modified
+
+    store = ConfigStore(tmp_path)
+    store.save({"cp": "acme", "env": "test", "region": "us-west-2"})
+    store.save({"cp": "acme", "env": "prod", "region": "us-west-2"})
+    assert list(store.get_revision(2)) == ["cp", "env", "region"]
+    assert list(store.load()[0]) == ["cp", "env", "region"]
+
+
+def test_replace_of_missing_member_fails():
+    with pytest.raises(ConfigPatchError):
+        apply_json_patch({"a": 1}, [{"op": "replace", "path": "/b", "value": 2}])
@@ -0,0 +1,109 @@
+"""Incremental plan parsing (see app/services/plan_summary.py)."""
+import asyncio
+import io
+import json
+
+import pytest
+
+from app.services import plan_summary
+from app.services.plan_summary import PlanSummaries, change_action, iter_array_items
+
+TRICKY = 'quote " backslash \\ brackets [ ] braces { } café 日本'
+
+CHANGES = [
+    {
+        "address": "aws_instance.fgt[0]",
+        "type": "aws_instance",
+        "change": {"actions": ["delete", "create"], "replace_paths": [["ami"]]},
+        "note": TRICKY,
+    },
+    {"address": 'aws_route.this["a]\\"b"]', "type": "aws_route", "change": {"actions": ["update"]}},
+    {"address": "aws_vpc.this", "type": "aws_vpc", "change": {"actions": ["no-op"]}, "n": -3e5},
+    [TRICKY, {"}": "]"}],
+]
+
+DOCUMENT = json.dumps({
+    "format_version": "1.2",
+    "variables": {"cp": {"value": TRICKY}, "resource_changes": {"value": "decoy"}},
+    "prior_state": {"values": {"resource_changes": [{"address": "decoy.nested"}]}},
+    "description": "resource_changes",
+    "resource_changes": CHANGES,
+    "configuration": {"resource_changes": [{"address": "decoy.after"}]},
+}, ensure_ascii=False).encode()
+
+
+class SplitStream:
+    """Binary stream that returns the given pieces one read at a time."""
+
+    def __init__(self, *pieces: bytes):
+        self.pieces = [piece for piece in pieces if piece]
+
+    def read(self, size: int = -1) -> bytes:
+        return self.pieces.pop(0) if self.pieces else b""
+
+
+def test_items_split_at_every_byte_offset():
+    for offset in range(len(DOCUMENT) + 1):
+        stream = SplitStream(DOCUMENT[:offset], DOCUMENT[offset:])
+        assert list(iter_array_items(stream, "resource_changes")) == CHANGES, f"split at byte {offset}"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 17, 1 << 20])
+def test_items_with_small_chunks(chunk_size):
+    items = iter_array_items(io.BytesIO(DOCUMENT), "resource_changes", chunk_size=chunk_size)
+    assert list(items) == CHANGES
+
+
+def test_stops_reading_when_the_array_closes():
+    stream = io.BytesIO(DOCUMENT)
+    assert list(iter_array_items(stream, "resource_changes", chunk_size=64)) == CHANGES
+    assert stream.tell() < len(DOCUMENT)
+
+
+def test_missing_array_yields_nothing():
+    document = b'{"resource_changes_x": [1], "a": {"resource_changes": [2]}}'
+    assert list(iter_array_items(io.BytesIO(document), "resource_changes")) == []
+
+
+ARRAY_START = DOCUMENT.index(b'"resource_changes": [{"address": "aws_instance.fgt[0]"')
+
+
+@pytest.mark.parametrize("end", [
+    ARRAY_START - 5,  # before the array
+    ARRAY_START + 30,  # inside the first element
+    DOCUMENT.index(b', {"address": "aws_vpc.this"') + 1,  # between elements
+])
+def test_truncated_document_raises(end):
+    with pytest.raises(ValueError):
+        list(iter_array_items(io.BytesIO(DOCUMENT[:end]), "resource_changes", chunk_size=16))
+
+
+def test_malformed_element_raises():
+    with pytest.raises(ValueError):
+        list(iter_array_items(io.BytesIO(b'{"resource_changes": [{"a": 1,}]}'), "resource_changes"))
+
+
+def test_change_action():
+    assert change_action(["delete", "create"]) == "replace"
+    assert change_action(["create", "delete"]) == "replace"
+    assert change_action(["update"]) == "update"
+    assert change_action(["no-op"]) == "no-op"
+
+
+async def test_concurrent_requests_run_terraform_once(tmp_path, monkeypatch):
+    (tmp_path / plan_summary.PLAN_FILE).write_bytes(b"plan")
+    calls = []
+
+    def show_plan(working_dir, plan_file, env):
+        calls.append(working_dir)
+        return plan_summary.summarize_changes(CHANGES[:3])
+
+    monkeypatch.setattr(plan_summary, "show_plan", show_plan)
+    summaries = PlanSummaries()
+    results = await asyncio.gather(*(summaries.get(tmp_path) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert sum(cached for _, _, cached in results) == 4
+    summary = results[0][1]["summary"]
+    assert summary["by_action"] == {"update": 1, "replace": 1, "no-op": 1}
+    assert summary["replacements"] == ["aws_instance.fgt[0]"]
@@ -0,0 +1,26 @@
+"""Cold start must not import the AWS SDK (see app/services/aws_sdk.py)."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from app.services.aws_sdk import HEAVY_MODULES
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_app_import_is_lazy():
+    script = (
+        "import json, sys\n"
+        "import app.main\n"
+        f"print(json.dumps([m for m in {list(HEAVY_MODULES)!r} if m in sys.modules]))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    assert loaded == [], f"imported at startup: {', '.join(loaded)}"
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef, useMemo } from 'react';
 import api from '../services/api';
 import FormGroup from './FormGroup';
+import { configPatch } from '../utils/configPatch';
 import './TerraformConfig.css';
 import Anser from 'anser';
 
@@ -21,36 +22,39 @@ function TerraformConfig() {
   const [showBuildTerminal, setShowBuildTerminal] = useState(false);
   const [showBuildSteps, setShowBuildSteps] = useState(false);
   const [inheritedFields, setInheritedFields] = useState([]);
+  const [configRevision, setConfigRevision] = useState(null);
+  // Config as of configRevision, once this page has written it (later saves send only the changes)
+  const savedConfigRef = useRef(null);
   const [showSaveLogModal, setShowSaveLogModal] = useState(false);
   const terminalOutputRef = useRef(null);
 
-  // Load schema and config on mount or template change
+  // Load schema, config, credential status and first option lists on mount or template change
   useEffect(() => {
     loadSchemaAndConfig();
-    checkAwsCredentials();
   }, [template]);
 
-  const checkAwsCredentials = async () => {
-    try {
-      const status = await api.aws.checkCredentials();
-      setAwsCredentialsValid(status.valid);
-    } catch (err) {
-      console.warn('AWS credentials not available:', err);
-      setAwsCredentialsValid(false);
-    }
-  };
-
   const loadSchemaAndConfig = async () => {
     setLoading(true);
     setError(null);
 
     try {
-      // Load schema
-      const schemaData = await api.terraform.getSchema(template);
+      // One round trip; the backend gathers every section concurrently
+      const data = await api.terraform.bootstrap(template);
+      setAwsCredentialsValid(Boolean(data.credentials?.valid));
+      if (data.errors.credentials) {
+        console.warn('AWS credentials not available:', data.errors.credentials);
+      }
+
+      const schemaData = data.schema;
+      const configData = data.config;
+      if (!schemaData || !configData) {
+        throw new Error(data.errors.schema || data.errors.config || 'Failed to load template');
+      }
       setSchema(schemaData);
 
-      // Try to load saved config
-      const configData = await api.terraform.loadConfig(template);
+      setConfigRevision(configData.revision ?? null);
+      // The loaded config includes inherited and detected values, so it is not the stored document
+      savedConfigRef.current = null;
       if (configData.success && configData.config) {
         setConfig(configData.config);
         setHasSavedConfig(true);
@@ -85,7 +89,12 @@ function TerraformConfig() {
   const handleSave = async () => {
     setSaving(true);
     try {
-      await api.terraform.saveConfig(template, config);
+      const saved = savedConfigRef.current;
+      const result = saved
+        ? await api.terraform.patchConfig(template, configPatch(saved, config), configRevision)
+        : await api.terraform.saveConfig(template, config, configRevision);
+      savedConfigRef.current = config;
+      setConfigRevision(result.revision);
       setHasSavedConfig(true);
       alert('Configuration saved successfully!');
     } catch (err) {
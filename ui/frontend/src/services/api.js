@@ -4,10 +4,20 @@
 
 const API_BASE_URL = 'http://127.0.0.1:8000';
 
+// GET responses delivered by /api/terraform/bootstrap, keyed by endpoint path.
+// Each is served once; later requests for the same path go to the backend.
+const prefetched = new Map();
+
 /**
  * Fetch wrapper with error handling
  */
 async function apiFetch(endpoint, options = {}) {
+  if (!options.method && prefetched.has(endpoint)) {
+    const data = prefetched.get(endpoint);
+    prefetched.delete(endpoint);
+    return data;
+  }
+
   const url = `${API_BASE_URL}${endpoint}`;
   
   try {
@@ -129,6 +139,20 @@ export const api = {
 
   // Terraform API methods
   terraform: {
+    /**
+     * Load everything the configuration page needs in one request
+     * (schema, config, credential status and first option lists).
+     * Option lists are kept for the matching getRegions/getKeypairs/... calls.
+     * @param {string} template - Template name
+     * @returns {Promise<Object>} schema, config, credentials, options, errors, timings_ms
+     */
+    bootstrap: async (template) => {
+      const data = await apiFetch(`/api/terraform/bootstrap?template=${template}`);
+      prefetched.clear();
+      Object.entries(data.options || {}).forEach(([path, value]) => prefetched.set(path, value));
+      return data;
+    },
+
     /**
      * Get configuration schema for a template
      * @param {string} template - Template name
@@ -142,15 +166,41 @@ export const api = {
      * Save configuration
      * @param {string} template - Template name
      * @param {Object} config - Configuration object
-     * @returns {Promise<Object>} Save response
+     * @param {number} [revision] - Revision the config was loaded at (409 if stale)
+     * @returns {Promise<Object>} Save response with new revision
      */
-    saveConfig: async (template, config) => {
+    saveConfig: async (template, config, revision) => {
       return apiFetch('/api/terraform/config/save', {
         method: 'POST',
-        body: JSON.stringify({ template, config }),
+        body: JSON.stringify({ template, config, revision }),
       });
     },
 
+    /**
+     * Apply a JSON Patch to the saved configuration (only changed fields)
+     * @param {string} template - Template name
+     * @param {Array} operations - JSON Patch operations
+     * @param {number} [revision] - Revision the patch was computed against (409 if stale)
+     * @returns {Promise<Object>} Patch response with new revision
+     */
+    patchConfig: async (template, operations, revision) => {
+      const query = revision !== undefined && revision !== null ? `&revision=${revision}` : '';
+      return apiFetch(`/api/terraform/config?template=${template}${query}`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json-patch+json' },
+        body: JSON.stringify(operations),
+      });
+    },
+
+    /**
+     * Get saved configuration revision history
+     * @param {string} template - Template name
+     * @returns {Promise<Object>} Revision summaries, newest first
+     */
+    getConfigHistory: async (template) => {
+      return apiFetch(`/api/terraform/config/history?template=${template}`);
+    },
+
     /**
      * Load saved configuration
      * @param {string} template - Template name
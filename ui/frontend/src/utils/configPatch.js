@@ -0,0 +1,29 @@
+/**
+ * JSON Patch (RFC 6902) of the fields that changed between two configurations
+ *
+ * Configurations are flat objects of field values, so fields are compared
+ * whole: a changed or new field becomes an "add" (which replaces an existing
+ * member), a field that is gone becomes a "remove".
+ */
+
+function pointer(field) {
+  return `/${field.replace(/~/g, '~0').replace(/\//g, '~1')}`;
+}
+
+export function configPatch(saved, config) {
+  const operations = [];
+
+  Object.keys(saved).forEach(field => {
+    if (!(field in config)) {
+      operations.push({ op: 'remove', path: pointer(field) });
+    }
+  });
+
+  Object.entries(config).forEach(([field, value]) => {
+    if (!(field in saved) || JSON.stringify(saved[field]) !== JSON.stringify(value)) {
+      operations.push({ op: 'add', path: pointer(field), value });
+    }
+  });
+
+  return operations;
+}
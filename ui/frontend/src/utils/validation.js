@@ -31,6 +31,10 @@ export function validateField(field, value, config) {
   return null; // All validations passed
 }
 
+function isNotANumber(value) {
+  return value !== undefined && value !== null && value !== '' && Number.isNaN(Number(value));
+}
+
 function validateRule(rule, value, field, config) {
   const ruleParts = rule.split(':');
   const ruleName = ruleParts[0];
@@ -50,18 +54,27 @@ function validateRule(rule, value, field, config) {
       break;
 
     case 'min':
+      if (isNotANumber(value)) {
+        return 'Must be a number';
+      }
       if (Number(value) < Number(ruleParam)) {
         return `Minimum value is ${ruleParam}`;
       }
       break;
 
     case 'max':
+      if (isNotANumber(value)) {
+        return 'Must be a number';
+      }
       if (Number(value) > Number(ruleParam)) {
         return `Maximum value is ${ruleParam}`;
       }
       break;
 
     case 'gte':
+      if (isNotANumber(value)) {
+        return 'Must be a number';
+      }
       // Greater than or equal to another field's value
       if (config[ruleParam] !== undefined && config[ruleParam] !== null && config[ruleParam] !== '') {
         if (Number(value) < Number(config[ruleParam])) {
@@ -71,6 +84,9 @@ function validateRule(rule, value, field, config) {
       break;
 
     case 'lte':
+      if (isNotANumber(value)) {
+        return 'Must be a number';
+      }
       // Less than or equal to another field's value
       if (config[ruleParam] !== undefined && config[ruleParam] !== null && config[ruleParam] !== '') {
         if (Number(value) > Number(config[ruleParam])) {